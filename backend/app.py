@@ -5,12 +5,19 @@ app.py - Flask application for Weekly Report and OKR Assistant
 """
 
 import os
+import json
 import logging
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from generator import generate_weekly_report, generate_okr, validate_weekly_report, validate_okr
-from parser import parse_and_categorize, get_current_week_range, format_date
+from generator import stream_weekly_report, stream_okr
+from parser import parse_and_categorize, get_current_week_range, format_date, get_parse_cache_stats
 from config import Config
+from circuit_breaker import get_circuit_states
+from deadline import request_deadline
+from batch_extraction import save_extracted_items, plan_batch, start_batch_extraction, get_batch_status
+from jobs import submit_job, request_cancel, start_job_workers, get_job_stats
+from pregeneration import start_pregen_scheduler, notify_daily_report_changed, get_pregen_status
 import database as db
 
 # Configure logging
@@ -25,13 +32,146 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
 
+def start_background_services():
+    """
+    Start this process's background threads.
+    
+    Called from the server entry points (__main__ below, post_fork in
+    gunicorn.conf.py), not on import, so tests and tools importing the app
+    start no threads.
+    """
+    # Optionally open the provider connection before the first request
+    if Config.LLM_PREWARM:
+        import threading
+        from llm_client import prewarm_llm_client
+        threading.Thread(target=prewarm_llm_client, daemon=True).start()
+    
+    # Background job workers; they also resume jobs interrupted by a restart
+    if Config.JOB_WORKERS > 0:
+        start_job_workers()
+    
+    # Weekly report drafts pre-generated ahead of the Friday rush
+    if Config.WEEKLY_PREGEN_ENABLED:
+        start_pregen_scheduler()
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'llm_configured': Config.is_llm_configured(),
-        'max_input_chars': Config.MAX_INPUT_CHARS
+        'max_input_chars': Config.MAX_INPUT_CHARS,
+        'max_total_input_chars': Config.MAX_TOTAL_INPUT_CHARS,
+        'llm_circuit': get_circuit_states()
+    })
+
+
+@app.route('/api/metrics/parse', methods=['GET'])
+def get_parse_metrics():
+    """Get parse_and_categorize memo statistics (hit rate, size, evictions)"""
+    return jsonify({
+        'success': True,
+        'data': get_parse_cache_stats()
+    })
+
+
+@app.route('/api/metrics/connections', methods=['GET'])
+def get_connection_metrics():
+    """Get LLM HTTP connection pool statistics (reuse rate, connect-time savings)"""
+    from http_pool import get_connection_stats
+    return jsonify({
+        'success': True,
+        'data': get_connection_stats()
+    })
+
+
+@app.route('/api/metrics/llm-cache', methods=['GET'])
+def get_llm_cache_metrics():
+    """Get LLM response cache statistics"""
+    import llm_cache
+    return jsonify({
+        'success': True,
+        'data': llm_cache.get_cache_stats()
+    })
+
+
+@app.route('/api/llm-cache', methods=['DELETE'])
+def clear_llm_cache():
+    """Remove all cached LLM responses"""
+    import llm_cache
+    deleted = llm_cache.clear()
+    return jsonify({
+        'success': True,
+        'message': f'已清除 {deleted} 条 LLM 缓存',
+        'deleted_count': deleted
+    })
+
+
+@app.route('/api/metrics/rate-limit', methods=['GET'])
+def get_rate_limit_metrics():
+    """Get LLM rate controller limits and throttle counters"""
+    from rate_control import get_rate_controller
+    return jsonify({
+        'success': True,
+        'data': get_rate_controller().get_stats()
+    })
+
+
+@app.route('/api/metrics/single-flight', methods=['GET'])
+def get_single_flight_metrics():
+    """Get counters for coalesced identical in-flight LLM calls"""
+    from single_flight import get_single_flight_stats
+    return jsonify({
+        'success': True,
+        'data': get_single_flight_stats()
+    })
+
+
+@app.route('/api/metrics/extraction', methods=['GET'])
+def get_extraction_metrics():
+    """Get how extraction responses were recovered: parsed, repaired (locally or by a fragment request) vs full re-calls"""
+    from json_repair import get_repair_stats
+    return jsonify({
+        'success': True,
+        'data': get_repair_stats()
+    })
+
+
+@app.route('/api/metrics/providers', methods=['GET'])
+def get_provider_metrics():
+    """Get per-provider latency, error rate and hedging statistics"""
+    from llm_client import get_llm_client
+    from provider_pool import ProviderPool
+    
+    client = get_llm_client() if Config.is_llm_configured() else None
+    if not isinstance(client, ProviderPool):
+        return jsonify({
+            'success': True,
+            'data': {'enabled': False, 'endpoints': []}
+        })
+    return jsonify({
+        'success': True,
+        'data': client.get_stats()
+    })
+
+
+@app.route('/api/metrics/llm', methods=['GET'])
+def get_llm_metrics():
+    """
+    Get LLM call telemetry: latency percentiles, tokens, retries and outcomes
+    per purpose, per model tier (task -> model) and per day.
+    
+    Query params:
+        days: how many days back, default 7
+        purpose: only this purpose (weekly_report, okr, extraction, star...)
+    """
+    from telemetry import get_llm_metrics as aggregate_llm_metrics
+    days = request.args.get('days', 7, type=int)
+    purpose = request.args.get('purpose')
+    return jsonify({
+        'success': True,
+        'data': aggregate_llm_metrics(days=days, purpose=purpose)
     })
 
 
@@ -60,10 +200,10 @@ def parse_daily_report():
     
     content = data['content']
     
-    if len(content) > Config.MAX_INPUT_CHARS:
+    if len(content) > Config.MAX_TOTAL_INPUT_CHARS:
         return jsonify({
             'success': False,
-            'error': f'输入超过最大长度限制 ({Config.MAX_INPUT_CHARS} 字符)'
+            'error': f'输入超过最大长度限制 ({Config.MAX_TOTAL_INPUT_CHARS} 字符)'
         }), 400
     
     try:
@@ -80,6 +220,32 @@ def parse_daily_report():
         }), 500
 
 
+def _generation_error(result):
+    """500 for a failed generation, 503 + Retry-After when the LLM circuit is open, 504 past the deadline"""
+    if result.get('timeout'):
+        return jsonify(result), 504
+    if result.get('circuit_open'):
+        response = jsonify(result)
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, int(result.get('retry_after') or 0)))
+        return response
+    return jsonify(result), 500
+
+
+def _wants_async(data) -> bool:
+    """Whether the caller asked for a background job (?async=1 or "async": true)"""
+    if request.args.get('async', '').lower() in ('1', 'true'):
+        return True
+    return bool(isinstance(data, dict) and data.get('async'))
+
+
+def _job_accepted(kind: str, params: dict):
+    """Queue a job for an endpoint's async mode; 202 with the job to poll"""
+    params = {k: v for k, v in (params or {}).items() if k != 'async'}
+    job = submit_job(kind, params)
+    return jsonify({'success': True, 'data': job}), 202
+
+
 @app.route('/api/generate/weekly-report', methods=['POST'])
 def api_generate_weekly_report():
     """
@@ -90,7 +256,9 @@ def api_generate_weekly_report():
         "content": "daily report text...",
         "use_mock": false,  // optional, default false
         "start_date": "2025-12-08",  // optional, date range start
-        "end_date": "2025-12-12"  // optional, date range end
+        "end_date": "2025-12-12",  // optional, date range end
+        "no_cache": false,  // optional, bypass the LLM response cache
+        "async": false  // optional, run as a background job and return its id
     }
     """
     data = request.get_json()
@@ -100,6 +268,9 @@ def api_generate_weekly_report():
             'error': '缺少 content 字段'
         }), 400
     
+    if _wants_async(data):
+        return _job_accepted('weekly_report', data)
+    
     content = data['content']
     use_mock = data.get('use_mock', False)
     start_date = data.get('start_date')
@@ -114,7 +285,9 @@ def api_generate_weekly_report():
         content, 
         use_mock=use_mock,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        use_cache=not data.get('no_cache', False),
+        deadline=request_deadline()
     )
     
     if result['success']:
@@ -123,7 +296,64 @@ def api_generate_weekly_report():
         result['validation'] = validation
         return jsonify(result)
     else:
-        return jsonify(result), 500
+        return _generation_error(result)
+
+
+def _range_params(data):
+    """start_date/end_date of a range generation request, or an error response"""
+    start_date = (data or {}).get('start_date')
+    end_date = (data or {}).get('end_date')
+    if not start_date or not end_date:
+        return None, (jsonify({'success': False, 'error': '缺少 start_date 或 end_date 字段'}), 400)
+    if start_date > end_date:
+        return None, (jsonify({'success': False, 'error': 'start_date 不能晚于 end_date'}), 400)
+    return (start_date, end_date), None
+
+
+@app.route('/api/generate/weekly-report/range', methods=['POST'])
+def api_generate_weekly_report_range():
+    """
+    Generate the weekly report for a date range from the stored daily reports.
+    
+    The report is saved with a fingerprint of the daily reports it was
+    built from; while they are unchanged the saved report is returned
+    without calling the LLM (unchanged = true).
+    
+    Request body:
+    {
+        "start_date": "2025-12-08",
+        "end_date": "2025-12-12",
+        "use_mock": false,  // optional, default false
+        "force": false,  // optional, regenerate even if the daily reports are unchanged
+        "no_cache": false,  // optional, bypass the LLM response cache (implies force)
+        "async": false  // optional, run as a background job and return its id
+    }
+    """
+    from weekly_reports import generate_weekly_for_range
+    
+    data = request.get_json(silent=True) or {}
+    date_range, error = _range_params(data)
+    if error:
+        return error
+    
+    if _wants_async(data):
+        return _job_accepted('weekly_report_range', data)
+    
+    no_cache = bool(data.get('no_cache', False))
+    result = generate_weekly_for_range(
+        *date_range,
+        use_mock=data.get('use_mock', False) or not Config.is_llm_configured(),
+        use_cache=not no_cache,
+        force=bool(data.get('force')) or no_cache,
+        deadline=request_deadline()
+    )
+    
+    if result['success']:
+        result['validation'] = validate_weekly_report(result['report'])
+        return jsonify(result)
+    if 'status' in result:
+        return jsonify({'success': False, 'error': result['error']}), result['status']
+    return _generation_error(result)
 
 
 @app.route('/api/generate/okr', methods=['POST'])
@@ -135,7 +365,9 @@ def api_generate_okr():
     {
         "content": "historical materials...",
         "next_quarter": "2026第一季度",  // optional
-        "use_mock": false  // optional, default false
+        "use_mock": false,  // optional, default false
+        "no_cache": false,  // optional, bypass the LLM response cache
+        "async": false  // optional, run as a background job and return its id
     }
     """
     data = request.get_json()
@@ -145,6 +377,9 @@ def api_generate_okr():
             'error': '缺少 content 字段'
         }), 400
     
+    if _wants_async(data):
+        return _job_accepted('okr', data)
+    
     content = data['content']
     next_quarter = data.get('next_quarter', '2026第一季度')
     use_mock = data.get('use_mock', False)
@@ -154,7 +389,13 @@ def api_generate_okr():
         use_mock = True
         logger.info("LLM not configured, using mock mode")
     
-    result = generate_okr(content, next_quarter=next_quarter, use_mock=use_mock)
+    result = generate_okr(
+        content,
+        next_quarter=next_quarter,
+        use_mock=use_mock,
+        use_cache=not data.get('no_cache', False),
+        deadline=request_deadline()
+    )
     
     if result['success']:
         # Validate the generated OKR
@@ -162,7 +403,270 @@ def api_generate_okr():
         result['validation'] = validation
         return jsonify(result)
     else:
-        return jsonify(result), 500
+        return _generation_error(result)
+
+
+@app.route('/api/generate/okr/quarter', methods=['POST'])
+def api_generate_quarter_okr():
+    """
+    Generate next quarter's OKR from a quarter's stored weekly reports and work items.
+    
+    The quarter is condensed week -> month -> quarter; each level is stored
+    and only regenerated when its inputs changed, so an unchanged quarter
+    needs a single LLM call.
+    
+    Request body:
+    {
+        "quarter": "2025-Q4",  // quarter whose history is used
+        "next_quarter": "2026第一季度",  // optional, default the quarter after
+        "content": "...",  // optional, extra material appended to the summary
+        "use_mock": false,  // optional, default false
+        "force": false,  // optional, regenerate the month and quarter summaries
+        "no_cache": false,  // optional, bypass stored summaries and the LLM response cache
+        "async": false  // optional, run as a background job and return its id
+    }
+    """
+    from quarterly_summaries import generate_quarter_okr, parse_quarter
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        parse_quarter(data.get('quarter'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if _wants_async(data):
+        return _job_accepted('okr_quarter', data)
+    
+    no_cache = bool(data.get('no_cache', False))
+    result = generate_quarter_okr(
+        data['quarter'].strip().upper(),
+        next_quarter=data.get('next_quarter'),
+        extra_content=data.get('content') or '',
+        use_mock=data.get('use_mock', False) or not Config.is_llm_configured(),
+        use_cache=not no_cache,
+        force=bool(data.get('force')),
+        deadline=request_deadline()
+    )
+    
+    if result['success']:
+        result['validation'] = validate_okr(result['okr'])
+        return jsonify(result)
+    if 'status' in result:
+        return jsonify({'success': False, 'error': result['error']}), result['status']
+    return _generation_error(result)
+
+
+@app.route('/api/quarter-summaries/<quarter>', methods=['GET'])
+def get_quarter_summaries(quarter):
+    """
+    Stored month and quarter summaries of a quarter and whether they are stale.
+    
+    URL parameter: quarter (YYYY-Qn)
+    """
+    from quarterly_summaries import get_quarter_status
+    
+    try:
+        status = get_quarter_status(quarter.upper())
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'data': status})
+
+
+# ========================
+# Streaming Generation API (SSE)
+# ========================
+
+def _format_sse(event: dict) -> str:
+    """Format a generator event dict as a server-sent event"""
+    payload = {k: v for k, v in event.items() if k != 'event'}
+    return f"event: {event['event']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(events, kind: str, scope: str, on_done=None) -> Response:
+    """
+    Relay generator events to the browser as text/event-stream.
+    
+    Text streamed so far is saved to generation_drafts when the client
+    disconnects or the provider fails mid-stream; complete output is
+    saved as a complete draft.
+    
+    Args:
+        events: Iterator of event dicts from generator.stream_*
+        kind: Draft kind (weekly_report, okr, star)
+        scope: Draft scope key
+        on_done: Optional callback receiving the done event
+    """
+    def generate():
+        parts = []
+        finished = False
+        try:
+            for event in events:
+                if event['event'] == 'delta':
+                    parts.append(event['content'])
+                elif event['event'] == 'done':
+                    finished = True
+                    db.save_generation_draft(kind, scope, ''.join(parts), status='complete')
+                    if on_done:
+                        on_done(event)
+                elif event['event'] == 'error':
+                    finished = True
+                    if event.get('partial'):
+                        db.save_generation_draft(kind, scope, event['partial'], status='partial')
+                yield _format_sse(event)
+        finally:
+            if not finished:
+                # 客户端断开连接：关闭上游流并保存已生成的部分
+                events.close()
+                if parts:
+                    db.save_generation_draft(kind, scope, ''.join(parts), status='partial')
+                    logger.info(f"Client disconnected, partial {kind} saved for {scope}")
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/api/generate/weekly-report/stream', methods=['POST'])
+def api_stream_weekly_report():
+    """
+    Stream weekly report generation as server-sent events.
+    
+    Request body: same as /api/generate/weekly-report
+    
+    Events: meta, delta (content chunk), done (report, validation), error
+    """
+    data = request.get_json()
+    if not data or 'content' not in data:
+        return jsonify({
+            'success': False,
+            'error': '缺少 content 字段'
+        }), 400
+    
+    use_mock = data.get('use_mock', False) or not Config.is_llm_configured()
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+    
+    if start_date and end_date:
+        scope = f"{start_date}~{end_date}"
+    else:
+        monday, friday = get_current_week_range()
+        scope = f"{format_date(monday)}~{format_date(friday)}"
+    
+    events = stream_weekly_report(
+        data['content'],
+        use_mock=use_mock,
+        start_date=start_date,
+        end_date=end_date,
+        use_cache=not data.get('no_cache', False),
+        deadline=request_deadline()
+    )
+    return _sse_response(events, 'weekly_report', scope)
+
+
+@app.route('/api/generate/weekly-report/range/stream', methods=['POST'])
+def api_stream_weekly_report_range():
+    """
+    Stream /api/generate/weekly-report/range as server-sent events.
+    
+    An unchanged saved report is sent at once as a single delta.
+    
+    Events: meta, delta, done (report, validation, unchanged, daily_dates), error
+    """
+    from weekly_reports import stream_weekly_for_range
+    
+    data = request.get_json(silent=True) or {}
+    date_range, error = _range_params(data)
+    if error:
+        return error
+    
+    no_cache = bool(data.get('no_cache', False))
+    events = stream_weekly_for_range(
+        *date_range,
+        use_mock=data.get('use_mock', False) or not Config.is_llm_configured(),
+        use_cache=not no_cache,
+        force=bool(data.get('force')) or no_cache,
+        deadline=request_deadline()
+    )
+    return _sse_response(events, 'weekly_report', '~'.join(date_range))
+
+
+@app.route('/api/generate/okr/stream', methods=['POST'])
+def api_stream_okr():
+    """
+    Stream OKR generation as server-sent events.
+    
+    Request body: same as /api/generate/okr
+    
+    Events: meta, delta (content chunk), done (okr, validation), error
+    """
+    data = request.get_json()
+    if not data or 'content' not in data:
+        return jsonify({
+            'success': False,
+            'error': '缺少 content 字段'
+        }), 400
+    
+    next_quarter = data.get('next_quarter', '2026第一季度')
+    use_mock = data.get('use_mock', False) or not Config.is_llm_configured()
+    
+    events = stream_okr(
+        data['content'],
+        next_quarter=next_quarter,
+        use_mock=use_mock,
+        use_cache=not data.get('no_cache', False),
+        deadline=request_deadline()
+    )
+    return _sse_response(events, 'okr', next_quarter)
+
+
+@app.route('/api/projects/<int:project_id>/star/stream', methods=['POST'])
+def stream_project_star(project_id):
+    """
+    Stream STAR summary generation as server-sent events.
+    The finished summary is saved to the project like /star does.
+    
+    Events: progress (large projects, while windows are summarized),
+    meta, delta (content chunk), done (summary), error
+    """
+    from star_summaries import stream_project_star as stream_star
+    
+    data = request.get_json(silent=True) or {}
+    
+    project = db.get_project_with_work_items(project_id)
+    if not project:
+        return jsonify({'success': False, 'error': '项目不存在'}), 404
+    
+    if not project.get('work_items'):
+        return jsonify({'success': False, 'error': '项目没有工作记录，无法生成 STAR 总结'}), 400
+    
+    use_mock = not Config.is_llm_configured()
+    events = stream_star(
+        project, use_mock=use_mock, use_cache=not data.get('no_cache', False), deadline=request_deadline()
+    )
+    return _sse_response(events, 'star', str(project_id))
+
+
+@app.route('/api/generation-drafts', methods=['GET'])
+def get_generation_draft():
+    """
+    Get the latest streamed draft (complete, or partial after a disconnect).
+    
+    Query parameters:
+    - kind: weekly_report, okr or star
+    - scope: "start~end" for weekly reports, quarter for OKR, project id for STAR
+    """
+    kind = request.args.get('kind')
+    scope = request.args.get('scope')
+    
+    if not kind or not scope:
+        return jsonify({
+            'success': False,
+            'error': '缺少 kind 或 scope 参数'
+        }), 400
+    
+    draft = db.get_generation_draft(kind, scope)
+    return jsonify({'success': True, 'data': draft})
 
 
 @app.route('/api/validate/weekly-report', methods=['POST'])
@@ -249,6 +753,7 @@ def save_daily_report():
     success = db.save_daily_report(data['entry_date'], data['content'])
     
     if success:
+        notify_daily_report_changed(data['entry_date'])
         return jsonify({'success': True, 'message': '日报保存成功'})
     else:
         return jsonify({'success': False, 'error': '日报保存失败'}), 500
@@ -310,6 +815,7 @@ def delete_daily_report(entry_date):
     success = db.delete_daily_report(entry_date)
     
     if success:
+        notify_daily_report_changed(entry_date)
         return jsonify({'success': True, 'message': '日报删除成功'})
     else:
         return jsonify({'success': False, 'error': '日报不存在或删除失败'}), 404
@@ -349,7 +855,8 @@ def save_weekly_report():
 @app.route('/api/weekly-reports/query', methods=['GET'])
 def query_weekly_report():
     """
-    Get a weekly report by start and end date.
+    Get a weekly report by start and end date, with its freshness
+    (see GET /api/weekly-reports).
     
     Query parameters:
     - start_date: Week start date (YYYY-MM-DD)
@@ -367,11 +874,21 @@ def query_weekly_report():
     report = db.get_weekly_report(start_date, end_date)
     
     if report:
+        from weekly_reports import get_freshness
+        report['freshness'] = get_freshness(report)
         return jsonify({'success': True, 'data': report})
     else:
         return jsonify({'success': True, 'data': None})
 
 
+@app.route('/api/weekly-reports/pregeneration', methods=['GET'])
+def get_weekly_pregeneration():
+    """
+    State of the weekly draft pre-generation scheduler in this process.
+    """
+    return jsonify({'success': True, 'data': get_pregen_status()})
+
+
 @app.route('/api/weekly-reports/latest', methods=['GET'])
 def get_latest_weekly_report():
     """
@@ -389,8 +906,13 @@ def get_latest_weekly_report():
 def get_all_weekly_reports():
     """
     Get all weekly reports ordered by end_date descending.
+    
+    Each report has freshness.stale = true when a daily report it was
+    generated from has changed since (null if it was not generated from
+    stored daily reports).
     """
-    reports = db.get_all_weekly_reports()
+    from weekly_reports import annotate_freshness
+    reports = annotate_freshness(db.get_all_weekly_reports())
     return jsonify({'success': True, 'data': reports})
 
 
@@ -689,32 +1211,92 @@ def delete_project(project_id):
 def generate_project_star(project_id):
     """
     Generate STAR summary for a project.
+    
+    The summary is only regenerated when the project's work items changed
+    since it was last generated (data.unchanged = true otherwise).
+    
+    Request body (optional):
+    {
+        "force": false,  // regenerate even if the work items are unchanged
+        "no_cache": false,  // bypass the LLM response cache (implies force)
+        "async": false  // run as a background job and return its id
+    }
     """
-    from generator import generate_star_summary
+    from star_summaries import refresh_project_star
+    
+    data = request.get_json(silent=True) or {}
     
     project = db.get_project_with_work_items(project_id)
     if not project:
         return jsonify({'success': False, 'error': '项目不存在'}), 404
     
-    work_items = project.get('work_items', [])
-    if not work_items:
+    if not project.get('work_items'):
         return jsonify({'success': False, 'error': '项目没有工作记录，无法生成 STAR 总结'}), 400
     
-    use_mock = not Config.is_llm_configured()
-    result = generate_star_summary(project['name'], work_items, use_mock=use_mock)
+    if _wants_async(data):
+        return _job_accepted('star', {**data, 'project_id': project_id})
+    
+    no_cache = bool(data.get('no_cache', False))
+    result = refresh_project_star(
+        project_id,
+        use_mock=not Config.is_llm_configured(),
+        use_cache=not no_cache,
+        force=bool(data.get('force')) or no_cache,
+        deadline=request_deadline()
+    )
     
     if result['success']:
-        # Save the STAR summary to project
-        db.update_project(project_id, star_summary=result['summary'])
         return jsonify({
             'success': True,
-            'summary': result['summary']
+            'summary': result['summary'],
+            'unchanged': result['unchanged']
         })
     else:
         return jsonify({
             'success': False,
             'error': result.get('error', '生成失败')
-        }), 500
+        }), result.get('status', 500)
+
+
+@app.route('/api/projects/star/refresh-all', methods=['POST'])
+def refresh_all_project_stars():
+    """
+    Queue a background job regenerating every stale STAR summary.
+    
+    A summary is stale when it is missing or the project's work items
+    changed since it was generated. Poll the returned job at /api/jobs/<id>.
+    
+    Request body (optional):
+    {
+        "force": false,  // regenerate every project with work items
+        "concurrency": 2,  // projects at a time, default STAR_REFRESH_CONCURRENCY
+        "no_cache": false  // bypass cached window summaries and LLM responses
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    
+    concurrency = data.get('concurrency')
+    if concurrency is not None:
+        try:
+            concurrency = max(1, int(concurrency))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'concurrency 必须是正整数'}), 400
+    
+    return _job_accepted('star_refresh_all', {**data, 'concurrency': concurrency})
+
+
+@app.route('/api/projects/star/stale', methods=['GET'])
+def get_stale_project_stars():
+    """
+    Projects whose STAR summary is missing or out of date.
+    """
+    from star_summaries import get_stale_star_projects
+    
+    stale = [
+        {'id': p['id'], 'name': p['name'], 'items_count': len(p['work_items']), 'has_summary': bool(p.get('star_summary'))}
+        for p in get_stale_star_projects()
+    ]
+    return jsonify({'success': True, 'data': stale})
 
 
 @app.route('/api/projects/cleanup/null', methods=['POST'])
@@ -890,74 +1472,161 @@ def extract_work_items_api():
     {
         "log_content": "Daily log text...",
         "log_date": "2025-12-30",
-        "auto_save": false  // optional, whether to auto-save extracted items
+        "auto_save": false,  // optional, whether to auto-save extracted items
+        "no_cache": false  // optional, bypass the LLM response cache
     }
     """
-    from generator import extract_work_items, find_best_matching_project
+    from generator import extract_work_items
     
     data = request.get_json()
     if not data or 'log_content' not in data or 'log_date' not in data:
         return jsonify({'success': False, 'error': '缺少 log_content 或 log_date 字段'}), 400
     
     use_mock = not Config.is_llm_configured()
-    result = extract_work_items(data['log_content'], data['log_date'], use_mock=use_mock)
+    result = extract_work_items(
+        data['log_content'],
+        data['log_date'],
+        use_mock=use_mock,
+        use_cache=not data.get('no_cache', False),
+        deadline=request_deadline()
+    )
+    if result.get('timeout'):
+        return jsonify(result), 504
     
     if result['success'] and data.get('auto_save'):
-        # Get existing projects for similarity matching
-        existing_projects = db.get_all_projects()
-        
-        # Auto-save extracted items to database
-        saved_items = []
-        for item in result.get('work_items', []):
-            # Create or find project with similarity matching
-            project_id = None
-            if item.get('project') and item.get('project') != '日常工作':
-                # First, try to find a similar existing project
-                matching_project = find_best_matching_project(
-                    item['project'], 
-                    existing_projects, 
-                    threshold=0.6
-                )
-                
-                if matching_project:
-                    project_id = matching_project['id']
-                    # Update the item's project name to match the existing one
-                    item['project'] = matching_project['name']
-                else:
-                    # Create new project
-                    project = db.create_project(name=item['project'])
-                    if project:
-                        project_id = project['id']
-                        # Add to existing_projects for future matching in this batch
-                        existing_projects.append(project)
-            
-            # Save work item
-            skills_json = None
-            if item.get('skills'):
-                import json
-                skills_json = json.dumps(item['skills'], ensure_ascii=False)
-                # Update skills table
-                for skill in item['skills']:
-                    if skill and skill not in ['null', 'None', '待补充']:
-                        db.upsert_skill(skill)
-            
-            saved = db.create_work_item(
-                raw_log_date=data['log_date'],
-                project_id=project_id,
-                action=item.get('action'),
-                problem=item.get('problem'),
-                result_metric=item.get('result_metric'),
-                skills_tags=skills_json,
-                extraction_status='extracted'
-            )
-            if saved:
-                saved_items.append(saved)
-        
-        result['saved_items'] = saved_items
+        result['saved_items'] = save_extracted_items(
+            data['log_date'],
+            result.get('work_items', []),
+            db.get_all_projects()
+        )
     
     return jsonify(result)
 
 
+@app.route('/api/extract-work-items/stream', methods=['POST'])
+def stream_extract_work_items_api():
+    """
+    Extract work items from one daily log as server-sent events.
+    
+    Each work item is sent (and, with auto_save, saved) as soon as the
+    LLM has finished writing it, before the whole response is complete.
+    
+    Request body: same as /api/extract-work-items
+    
+    Events: meta (log_date), item (index, item, saved), done (the
+    /api/extract-work-items result plus saved_count), error
+    """
+    from generator import stream_extract_work_items
+    
+    data = request.get_json()
+    if not data or 'log_content' not in data or 'log_date' not in data:
+        return jsonify({'success': False, 'error': '缺少 log_content 或 log_date 字段'}), 400
+    
+    log_date = data['log_date']
+    auto_save = bool(data.get('auto_save'))
+    events = stream_extract_work_items(
+        data['log_content'],
+        log_date,
+        use_mock=not Config.is_llm_configured(),
+        use_cache=not data.get('no_cache', False),
+        deadline=request_deadline()
+    )
+    
+    def generate():
+        existing_projects = db.get_all_projects() if auto_save else []
+        saved_count = 0
+        for event in events:
+            if auto_save and event['event'] == 'item':
+                saved = save_extracted_items(log_date, [event['item']], existing_projects)
+                event['saved'] = bool(saved)
+                saved_count += len(saved)
+            elif auto_save and event['event'] in ('done', 'error'):
+                event['saved_count'] = saved_count
+            yield _format_sse(event)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/api/extract-work-items/batch', methods=['POST'])
+def extract_work_items_batch_api():
+    """
+    Extract work items for every daily log in a date range, server-side.
+    
+    Runs with bounded concurrency in a background thread and saves each
+    day as it finishes, so a closed connection does not lose progress.
+    Days already extracted are skipped; re-posting retries failed days.
+    
+    Request body:
+    {
+        "start_date": "2025-12-01",
+        "end_date": "2025-12-31",
+        "dates": ["2025-12-03"],  // optional, only these days of the range
+        "force": false,  // optional, re-extract days that are done
+        "concurrency": 4,  // optional, default LLM_CONCURRENCY
+        "no_cache": false,  // optional, bypass the LLM response cache
+        "async": false  // optional, run as a background job instead of streaming
+    }
+    
+    Events: meta (total, dates, skipped), progress (per day), done
+    (succeeded, failed dates, items_count), error
+    """
+    data = request.get_json()
+    if not data or 'start_date' not in data or 'end_date' not in data:
+        return jsonify({'success': False, 'error': '缺少 start_date 或 end_date 字段'}), 400
+    
+    concurrency = data.get('concurrency')
+    if concurrency is not None:
+        try:
+            concurrency = max(1, int(concurrency))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'concurrency 必须是正整数'}), 400
+    
+    if _wants_async(data):
+        return _job_accepted('extract_batch', {**data, 'concurrency': concurrency})
+    
+    logs, skipped = plan_batch(
+        data['start_date'],
+        data['end_date'],
+        dates=data.get('dates'),
+        force=bool(data.get('force'))
+    )
+    events = start_batch_extraction(
+        logs,
+        skipped=skipped,
+        use_mock=not Config.is_llm_configured(),
+        use_cache=not data.get('no_cache', False),
+        concurrency=concurrency,
+        deadline=request_deadline()
+    )
+    
+    def generate():
+        for event in events:
+            yield _format_sse(event)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/api/extract-work-items/status', methods=['GET'])
+def extract_work_items_status_api():
+    """
+    Per-day batch extraction status for a date range.
+    
+    Query params: start_date, end_date
+    """
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    if not start_date or not end_date:
+        return jsonify({'success': False, 'error': '缺少 start_date 或 end_date 参数'}), 400
+    
+    return jsonify({'success': True, 'data': get_batch_status(start_date, end_date)})
+
+
 # --- Skills API ---
 
 @app.route('/api/skills', methods=['GET'])
@@ -994,39 +1663,27 @@ def recategorize_skills():
 def recategorize_skills_with_llm():
     """
     使用 LLM 智能识别并更新所有技能的分类。
-    """
-    from generator import categorize_skills_with_llm
     
-    # 获取所有技能
-    skills = db.get_all_skills_for_categorization()
+    已有分类决策的技能直接沿用，只有新技能才发送给 LLM；
+    请求体 {"force": true} 时忽略已有决策全部重新识别。
+    ?async=1 时作为后台任务运行，返回任务 ID。
+    """
+    from skill_categorization import recategorize_skills
     
-    if not skills:
-        return jsonify({
-            'success': True,
-            'message': '没有需要分类的技能',
-            'updated_count': 0
-        })
+    data = request.get_json(silent=True) or {}
+    force = bool(data.get('force'))
+    if _wants_async(data):
+        return _job_accepted('skill_recategorize', {'force': force})
     
-    # 使用 LLM 进行分类
     use_mock = not Config.is_llm_configured()
-    result = categorize_skills_with_llm(skills, use_mock=use_mock)
-    
-    if not result['success']:
-        return jsonify(result), 500
-    
-    # 更新数据库中的分类
-    categorized_skills = result.get('categorized_skills', [])
-    update_result = db.update_skill_categories(categorized_skills)
+    result = recategorize_skills(use_mock=use_mock, force=force, deadline=request_deadline())
+    if result.get('timeout'):
+        return jsonify(result), 504
     
-    if update_result['success']:
-        return jsonify({
-            'success': True,
-            'message': f"已使用 AI 更新 {update_result['updated_count']} 个技能的分类",
-            'updated_count': update_result['updated_count'],
-            'details': categorized_skills
-        })
+    if result['success']:
+        return jsonify(result)
     else:
-        return jsonify(update_result), 500
+        return jsonify(result), 500
 
 
 @app.route('/api/skills/<skill_name>/work-items', methods=['GET'])
@@ -1042,6 +1699,88 @@ def get_work_items_by_skill(skill_name):
     })
 
 
+# ========================
+# Background Jobs API
+# ========================
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue a background job.
+    
+    Request body:
+    {
+        "kind": "weekly_report",  // see below
+        "params": {...},  // same fields as the matching endpoint's request body
+        "dedup_key": "..."  // optional, default derived from kind + params
+    }
+    
+    Kinds: weekly_report, weekly_report_range, weekly_pregen, okr,
+    okr_quarter, star, star_refresh_all, extract_batch, skill_recategorize
+    (the registered handlers; GET /api/metrics/jobs lists them as "kinds").
+    
+    A queued or running job with the same dedup key is returned instead of
+    a new one (data.deduplicated = true).
+    """
+    data = request.get_json()
+    if not data or not data.get('kind'):
+        return jsonify({'success': False, 'error': '缺少 kind 字段'}), 400
+    
+    try:
+        job = submit_job(data['kind'], data.get('params') or {}, dedup_key=data.get('dedup_key'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({'success': True, 'data': job}), 202
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """
+    List recent jobs (without results).
+    
+    Query params: status, kind, limit (default 50)
+    """
+    try:
+        limit = min(500, max(1, int(request.args.get('limit', 50))))
+    except ValueError:
+        limit = 50
+    jobs = db.list_jobs(status=request.args.get('status'), kind=request.args.get('kind'), limit=limit)
+    return jsonify({'success': True, 'data': jobs})
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Poll a job: status, progress and, once finished, result or error.
+    """
+    job = db.get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+    return jsonify({'success': True, 'data': job})
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    Cancel a job. Queued jobs stop at once; running jobs stop at their next
+    progress update (data.cancel_requested = true until then).
+    """
+    job = request_cancel(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': '任务不存在'}), 404
+    return jsonify({'success': True, 'data': job})
+
+
+@app.route('/api/metrics/jobs', methods=['GET'])
+def get_job_metrics():
+    """
+    Job queue status: this process's workers and job counts by status.
+    """
+    return jsonify({'success': True, 'data': get_job_stats()})
+
+
 # ========================
 # LLM Configuration API
 # ========================
@@ -1131,9 +1870,11 @@ def save_llm_config():
         Config.LLM_API_KEY = api_key
         Config.LLM_MODEL = model
         
-        # 刷新数据库配置缓存
+        # 刷新数据库配置缓存，并重建共享的 LLM 客户端
         from config import reload_db_config
+        from llm_client import reset_llm_clients
         reload_db_config()
+        reset_llm_clients()
         
         return jsonify({
             'success': True,
@@ -1183,9 +1924,11 @@ def test_llm_config():
             'error': '请填写完整的 API URL 和 API Key'
         }), 400
     
-    # 尝试调用 LLM API
+    # 尝试调用 LLM API（复用连接池中的会话）
     try:
         import requests
+        from llm_client import get_registered_client
+        from http_pool import ConnectTracker
         
         # 构建完整的 API URL（与 llm_client.py 保持一致）
         # 如果 URL 已经包含 /chat/completions，则不再添加
@@ -1205,12 +1948,23 @@ def test_llm_config():
         }
         
         logger.info(f"Testing LLM connection to: {test_url}")
-        response = requests.post(test_url, json=payload, headers=headers, timeout=30)
+        client = get_registered_client({
+            'api_url': api_url,
+            'api_key': api_key,
+            'model': model,
+            'use_deepseek': False
+        })
+        with ConnectTracker() as tracker:
+            response = client.session.post(test_url, json=payload, headers=headers, timeout=30)
         
         if response.status_code == 200:
             return jsonify({
                 'success': True,
-                'message': 'LLM 连接测试成功'
+                'message': 'LLM 连接测试成功',
+                'connection': {
+                    'reused': tracker.reused,
+                    'connect_ms': round(tracker.connect_ms, 2)
+                }
             })
         else:
             error_msg = response.text[:200] if response.text else f'HTTP {response.status_code}'
@@ -1235,6 +1989,106 @@ def test_llm_config():
         })
 
 
+
+def _mask_api_key(api_key: str) -> str:
+    """Show only the first and last 4 characters of an API key (all stars when it is short)"""
+    if api_key and len(api_key) > 8:
+        return api_key[:4] + '*' * (len(api_key) - 8) + api_key[-4:]
+    return '*' * len(api_key or '')
+
+
+@app.route('/api/config/llm/tiers', methods=['GET'])
+def get_llm_tiers():
+    """
+    获取按任务划分的模型配置，以及各任务近 7 天的调用延迟。
+    
+    未单独配置的任务使用默认 LLM 配置（/api/config/llm）。
+    """
+    from telemetry import get_llm_metrics as aggregate_llm_metrics
+    
+    saved = db.get_config('llm_tiers') or {}
+    by_tier = aggregate_llm_metrics(days=7)['by_tier']
+    default_model = Config.get_llm_config().get('model')
+    
+    tiers = {}
+    for task in Config.LLM_TASKS:
+        tier = saved.get(task) or {}
+        model = Config.get_llm_config(task).get('model')
+        stats = by_tier.get(task, {}).get(model)
+        tiers[task] = {
+            'api_url': tier.get('api_url', ''),
+            'api_key': _mask_api_key(tier.get('api_key', '')),
+            'model': tier.get('model', ''),
+            'effective_model': model,
+            'latency': {
+                'calls': stats['calls'],
+                'p50_ms': stats['latency_ms']['p50'],
+                'p95_ms': stats['latency_ms']['p95']
+            } if stats else None
+        }
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'default_model': default_model,
+            'tiers': tiers
+        }
+    })
+
+
+@app.route('/api/config/llm/tiers', methods=['POST'])
+def save_llm_tiers():
+    """
+    保存按任务划分的模型配置。留空的字段使用默认 LLM 配置。
+    请求中未出现的任务保留原配置；所有字段都留空的任务清除其单独配置。
+    
+    Request body:
+    {
+        "tiers": {
+            "extraction": {"model": "deepseek-chat", "api_url": "", "api_key": ""},
+            "weekly_report": {"model": "deepseek-reasoner"}
+        }
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    tiers = data.get('tiers')
+    if not isinstance(tiers, dict):
+        return jsonify({'success': False, 'error': '缺少 tiers 配置'}), 400
+    
+    unknown = [task for task in tiers if task not in Config.LLM_TASKS]
+    if unknown:
+        return jsonify({'success': False, 'error': f"未知任务: {', '.join(unknown)}"}), 400
+    
+    existing = db.get_config('llm_tiers') or {}
+    config = dict(existing)
+    for task, tier in tiers.items():
+        if not isinstance(tier, dict):
+            return jsonify({'success': False, 'error': f'{task} 配置格式错误'}), 400
+        values = {field: str(tier.get(field) or '').strip() for field in Config.LLM_TIER_FIELDS}
+        # 原样回传的掩码 API Key 保留原值
+        existing_key = (existing.get(task) or {}).get('api_key', '')
+        if existing_key and values['api_key'] == _mask_api_key(existing_key):
+            values['api_key'] = existing_key
+        values = {field: value for field, value in values.items() if value}
+        if values:
+            config[task] = values
+        else:
+            config.pop(task, None)
+    
+    if not db.save_config('llm_tiers', config):
+        return jsonify({'success': False, 'error': '保存配置失败'}), 500
+    
+    # 刷新数据库配置缓存，并重建共享的 LLM 客户端
+    from config import reload_db_config
+    from llm_client import reset_llm_clients
+    reload_db_config()
+    reset_llm_clients()
+    
+    return jsonify({
+        'success': True,
+        'message': '任务模型配置保存成功'
+    })
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', 'false').lower() == 'true'
@@ -1242,4 +2096,8 @@ if __name__ == '__main__':
     logger.info(f"Starting Flask server on port {port}")
     logger.info(f"LLM configured: {Config.is_llm_configured()}")
     
+    # 调试模式下重载器的父进程不处理请求，只在子进程中启动
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+    
     app.run(host='0.0.0.0', port=port, debug=debug)
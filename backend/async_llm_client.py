@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+async_llm_client.py - Asyncio LLM client with bounded concurrency
+
+LLMClient is synchronous and sleeps between retries, so fanning out many
+calls (a month of extraction, chunked skill categorization) runs serially.
+AsyncLLMClient keeps the same retry/backoff and cache semantics but awaits
+instead of blocking, and caps in-flight requests with a semaphore.
+Synchronous callers use run_llm_batch().
+
+When LLM_PROVIDERS configures several endpoints, batches go through the
+synchronous ProviderPool in worker threads instead, so they get the same
+failover and latency-aware routing as single calls and feed its stats.
+"""
+
+import time
+import asyncio
+import logging
+import queue
+import threading
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Tuple, Callable, Awaitable
+from config import Config
+import llm_cache
+import telemetry
+from single_flight import AsyncSingleFlight
+from rate_control import get_rate_controller, classify_error, backoff_delay
+from circuit_breaker import breaker_for, CircuitOpenError
+from deadline import Deadline, DeadlineExceeded
+
+try:
+    from openai import AsyncOpenAI
+    HAS_OPENAI = True
+except ImportError:
+    HAS_OPENAI = False
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLLMClient:
+    """Asyncio client for OpenAI-like chat completions API"""
+
+    def __init__(self, config: Optional[Dict] = None, concurrency: Optional[int] = None):
+        """
+        Initialize async LLM client.
+
+        Args:
+            config: Optional config dict, defaults to Config.get_llm_config()
+            concurrency: Max in-flight requests, defaults to Config.LLM_CONCURRENCY
+        """
+        self.config = config or Config.get_llm_config()
+        self.api_url = self.config.get('api_url', '').rstrip('/')
+        self.api_key = self.config.get('api_key', '')
+        self.model = self.config.get('model', 'default/deepseek-v3-2')
+        self.timeout = self.config.get('timeout', 30)
+        self.retry = self.config.get('retry', 2)
+        self.temperature = self.config.get('temperature', 0)
+        self.concurrency = max(1, concurrency or Config.LLM_CONCURRENCY)
+
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._flights = AsyncSingleFlight()
+
+        # Retries are handled here, not by the SDK, to match LLMClient
+        self._client = None
+        if HAS_OPENAI and self.is_configured():
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.api_url,
+                timeout=self.timeout,
+                max_retries=0
+            )
+
+    def is_configured(self) -> bool:
+        """Check if LLM client is properly configured"""
+        return bool(self.api_url and self.api_key)
+
+    async def call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        purpose: Optional[str] = None,
+        use_cache: bool = True,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Call LLM API with response caching, retry and exponential backoff.
+
+        Args:
+            prompt: User message/prompt
+            system_prompt: Optional system message
+            purpose: What the call is for (see LLMClient.call)
+            use_cache: Set False to force a fresh completion
+            deadline: Request time budget (see LLMClient.call)
+
+        Returns:
+            LLM response content string
+
+        Raises:
+            RuntimeError: If LLM is not configured
+            Exception: If all retries fail
+        """
+        if not self.is_configured():
+            raise RuntimeError('LLM_API_URL or LLM_API_KEY not configured')
+
+        record = telemetry.start_call(purpose, self.api_url, self.model, prompt, system_prompt)
+        try:
+            content = await self._call(prompt, system_prompt, purpose, use_cache, record, deadline)
+        except Exception as e:
+            telemetry.finish_call(record, error=e)
+            raise
+        telemetry.finish_call(record, response=content)
+        return content
+
+    async def _call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        purpose: Optional[str],
+        use_cache: bool,
+        record: Dict,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """call() without telemetry bookkeeping (see LLMClient._call)"""
+        cache_key = None
+        if llm_cache.is_cacheable(purpose, self.temperature, use_cache):
+            cache_key = llm_cache.make_cache_key(
+                self.model, prompt, system_prompt,
+                {'temperature': self.temperature}
+            )
+            cached = await asyncio.to_thread(llm_cache.get, cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit ({purpose or 'default'}), response length: {len(cached)}")
+                record['outcome'] = 'cache_hit'
+                return cached
+
+        async def fetch() -> str:
+            async with self._semaphore:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                try:
+                    content = await self._with_retry(
+                        lambda: self._call_provider(prompt, system_prompt, record), record, deadline
+                    )
+                finally:
+                    self.in_flight -= 1
+            if cache_key:
+                await asyncio.to_thread(llm_cache.put, cache_key, content, self.model, purpose)
+            return content
+
+        # 同一批次中的相同请求只发送一次（与 LLMClient 的单飞合并一致）
+        if self.temperature != 0:
+            return await fetch()
+        flight_key = llm_cache.make_cache_key(
+            self.model, prompt, system_prompt,
+            {'temperature': self.temperature, 'api_url': self.api_url}
+        )
+        content, shared = await self._flights.do(flight_key, fetch, deadline)
+        if shared:
+            record['outcome'] = 'coalesced'
+        return content
+
+    async def gather(self, requests: Iterable[Dict[str, Any]], return_exceptions: bool = True) -> List[Any]:
+        """
+        Run many calls concurrently, bounded by the client's semaphore.
+
+        Args:
+            requests: Dicts of call() keyword arguments (prompt, system_prompt, purpose, use_cache)
+            return_exceptions: Return failures in place instead of raising the first one
+
+        Returns:
+            Responses (or exceptions) in request order
+        """
+        tasks = [self.call(**req) for req in requests]
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+    async def _with_retry(
+        self,
+        attempt_fn: Callable[[], Awaitable[str]],
+        record: Optional[Dict] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Await attempt_fn under the shared rate controller, retrying with the
+        same error classification, backoff and deadline handling as
+        LLMClient._with_retry. An attempt that outlives the remaining budget
+        is cancelled.
+        """
+        controller = get_rate_controller()
+        breaker = breaker_for(self.api_url)
+        last_error = None
+
+        for attempt in range(self.retry + 1):
+            if deadline and not deadline.can_fit(0):
+                raise DeadlineExceeded('Async LLM API', last_error)
+            # 令牌桶/AIMD 是线程同步原语，在线程中等待以免阻塞事件循环
+            if not await asyncio.to_thread(controller.acquire, deadline.remaining() if deadline else None):
+                raise DeadlineExceeded('Async LLM API', last_error)
+            probe = settled = False
+            try:
+                if breaker:
+                    probe = breaker.before_call()
+                telemetry.add_attempt(record)
+                logger.info(f"Async LLM API call attempt {attempt + 1}/{self.retry + 1}")
+                if deadline:
+                    result = await asyncio.wait_for(attempt_fn(), deadline.timeout(self.timeout))
+                else:
+                    result = await attempt_fn()
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                last_error = e
+                decision = classify_error(e)
+                controller.on_error(decision)
+                if breaker:
+                    breaker.record(decision)
+                settled = True
+                logger.warning(f"Async LLM API call attempt {attempt + 1} failed ({decision.kind}): {e}")
+
+                if not decision.retryable:
+                    raise
+            else:
+                controller.on_success()
+                if breaker:
+                    breaker.record_success()
+                settled = True
+                return result
+            finally:
+                controller.release()
+                # 被取消（CancelledError 等 BaseException）的探测既未成功也未失败，归还探测名额
+                if probe and not settled:
+                    breaker.release_probe()
+
+            if attempt < self.retry:
+                wait_time = backoff_delay(attempt, decision.retry_after)
+                if deadline and not deadline.can_fit(wait_time):
+                    raise DeadlineExceeded('Async LLM API', last_error)
+                logger.info(f"Retrying in {wait_time:.1f}s...")
+                await asyncio.sleep(wait_time)
+
+        raise last_error or Exception("Async LLM API call failed after all retries")
+
+    async def _call_provider(self, prompt: str, system_prompt: Optional[str] = None, record: Optional[Dict] = None) -> str:
+        messages = []
+        if system_prompt:
+            messages.append({'role': 'system', 'content': system_prompt})
+        messages.append({'role': 'user', 'content': prompt})
+
+        if self._client is None:
+            # openai 未安装时退回到线程中运行同步客户端（单次请求，重试在此处处理）
+            from llm_client import get_registered_client
+            sync_client = get_registered_client(self.config)
+            return await asyncio.to_thread(sync_client._attempt, prompt, system_prompt, record)
+
+        start = time.monotonic()
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature
+        )
+        telemetry.add_connect(record, 0.0, (time.monotonic() - start) * 1000)
+        telemetry.set_usage(record, getattr(response, 'usage', None))
+        content = response.choices[0].message.content or ''
+        logger.info(f"Async LLM API call successful, response length: {len(content)}")
+        return content
+
+    async def aclose(self):
+        """Release the underlying HTTP client"""
+        if self._client is not None:
+            await self._client.close()
+
+
+class AsyncClientAdapter:
+    """
+    Run a synchronous client (e.g. MockLLMClient) behind the async interface.
+
+    Calls execute in worker threads, bounded by the same kind of semaphore.
+    """
+
+    def __init__(self, sync_client, concurrency: Optional[int] = None):
+        self.sync_client = sync_client
+        self.concurrency = max(1, concurrency or Config.LLM_CONCURRENCY)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    def is_configured(self) -> bool:
+        return self.sync_client.is_configured()
+
+    async def call(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> str:
+        async with self._semaphore:
+            return await asyncio.to_thread(self.sync_client.call, prompt, system_prompt, **kwargs)
+
+    async def gather(self, requests: Iterable[Dict[str, Any]], return_exceptions: bool = True) -> List[Any]:
+        tasks = [self.call(**req) for req in requests]
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+    async def aclose(self):
+        pass
+
+
+def get_async_llm_client(
+    use_mock: bool = False,
+    concurrency: Optional[int] = None,
+    purpose: Optional[str] = None
+):
+    """
+    Get an async client matching get_llm_client()'s choice.
+
+    Must be called inside the event loop that will use it.
+
+    Args:
+        use_mock: Force use of mock client
+        concurrency: Max in-flight requests
+        purpose: Selects the task's model tier (see get_llm_client)
+
+    Returns:
+        AsyncLLMClient, or AsyncClientAdapter wrapping MockLLMClient, a
+        cassette client or the ProviderPool
+    """
+    from llm_client import MockLLMClient, get_llm_client
+
+    if Config.LLM_CASSETTE_MODE in ('record', 'replay') and not use_mock:
+        # 录制/回放走同步客户端，在线程中执行
+        return AsyncClientAdapter(get_llm_client(purpose=purpose), concurrency=concurrency)
+    if use_mock or not Config.is_llm_configured():
+        return AsyncClientAdapter(MockLLMClient(), concurrency=concurrency)
+    task = Config.task_for_purpose(purpose)
+    if not (task and Config.get_llm_tier(task)) and len(Config.get_provider_configs()) > 1:
+        # 多个 provider：经 ProviderPool 路由（故障转移、按延迟选择并更新统计）
+        return AsyncClientAdapter(get_llm_client(purpose=purpose), concurrency=concurrency)
+    return AsyncLLMClient(Config.get_llm_config(task), concurrency=concurrency)
+
+
+def _batch_purpose(requests: List[Dict[str, Any]], purpose: Optional[str]) -> Optional[str]:
+    """The purpose picking a batch's model tier: given, or shared by every request"""
+    if purpose:
+        return purpose
+    purposes = {req.get('purpose') for req in requests}
+    return purposes.pop() if len(purposes) == 1 else None
+
+
+def _run_coroutine(coro):
+    """Run a coroutine to completion from synchronous code"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # 已处于事件循环中（例如被异步代码调用）：在独立线程中运行
+    result: Dict[str, Any] = {}
+
+    def runner():
+        try:
+            result['value'] = asyncio.run(coro)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['value']
+
+
+def run_llm_batch(
+    requests: List[Dict[str, Any]],
+    use_mock: bool = False,
+    concurrency: Optional[int] = None,
+    purpose: Optional[str] = None
+) -> List[Any]:
+    """
+    Synchronous facade: run many LLM calls concurrently and wait for all.
+
+    Args:
+        requests: Dicts of call() keyword arguments
+        use_mock: Force use of mock client
+        concurrency: Max in-flight requests (default Config.LLM_CONCURRENCY)
+        purpose: Model tier to use (default: the purpose shared by the requests)
+
+    Returns:
+        Responses (or exceptions) in request order
+    """
+    if not requests:
+        return []
+
+    async def main():
+        client = get_async_llm_client(
+            use_mock=use_mock, concurrency=concurrency, purpose=_batch_purpose(requests, purpose)
+        )
+        try:
+            return await client.gather(requests)
+        finally:
+            await client.aclose()
+
+    return _run_coroutine(main())
+
+
+def iter_llm_batch(
+    requests: List[Dict[str, Any]],
+    use_mock: bool = False,
+    concurrency: Optional[int] = None,
+    purpose: Optional[str] = None
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Synchronous facade yielding each result as soon as its call finishes.
+
+    The batch runs on its own event loop in a background thread, so calls
+    keep completing while the consumer handles earlier results. When the
+    consumer stops iterating (the generator is closed, e.g. because the
+    SSE client disconnected), the remaining calls are cancelled.
+
+    Args:
+        requests: Dicts of call() keyword arguments
+        use_mock: Force use of mock client
+        concurrency: Max in-flight requests (default Config.LLM_CONCURRENCY)
+        purpose: Model tier to use (default: the purpose shared by the requests)
+
+    Yields:
+        (request index, response or exception) in completion order
+    """
+    if not requests:
+        return
+
+    results: queue.Queue = queue.Queue()
+    finished = object()
+    stop = threading.Event()
+    running: Dict[str, Any] = {}
+
+    async def one(client, index: int, req: Dict[str, Any]):
+        if stop.is_set():
+            return
+        try:
+            value = await client.call(**req)
+        except Exception as e:
+            value = e
+        results.put((index, value))
+
+    async def main():
+        running['loop'] = asyncio.get_running_loop()
+        running['task'] = asyncio.current_task()
+        client = get_async_llm_client(
+            use_mock=use_mock, concurrency=concurrency, purpose=_batch_purpose(requests, purpose)
+        )
+        try:
+            await asyncio.gather(*(one(client, i, req) for i, req in enumerate(requests)))
+        finally:
+            await client.aclose()
+
+    def runner():
+        try:
+            asyncio.run(main())
+        except BaseException as e:
+            results.put((None, e))
+        finally:
+            results.put(finished)
+
+    threading.Thread(target=runner, name='llm-batch', daemon=True).start()
+    try:
+        while True:
+            item = results.get()
+            if item is finished:
+                return
+            if item[0] is None:
+                raise item[1]
+            yield item
+    finally:
+        # 消费方不再读取：不再发起新调用，并取消进行中的调用
+        stop.set()
+        loop = running.get('loop')
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(running['task'].cancel)
+            except RuntimeError:
+                pass  # 事件循环已结束
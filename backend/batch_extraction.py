@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+batch_extraction.py - Server-side batch work item extraction
+
+Reads daily_reports for a date range and extracts work items with bounded
+concurrency. Each day is saved as soon as its extraction finishes and its
+status is recorded in work_item_extractions, so re-running a failed or
+interrupted batch only redoes the days that are not done yet.
+
+The batch runs in a daemon thread; the HTTP response only relays its
+progress events, so closing the browser tab does not stop it. A streamed
+batch is still bounded by the request deadline: days it does not reach are
+marked failed and picked up by the next run (long ranges belong in a
+background job).
+"""
+
+import json
+import queue
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+
+import database as db
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# 本进程内正在提取的日期，避免重复提交的批次同时处理同一天
+_active_dates: set = set()
+_active_lock = threading.Lock()
+
+
+def save_extracted_items(log_date: str, work_items: List[Dict], existing_projects: List[Dict]) -> List[Dict]:
+    """
+    Save extracted work items, matching or creating their projects.
+
+    Args:
+        log_date: Date of the daily log (YYYY-MM-DD)
+        work_items: Items from extract_work_items (project names are
+            rewritten to the matched existing project)
+        existing_projects: Projects for similarity matching; projects
+            created here are appended for later days in the same batch
+
+    Returns:
+        Saved work item rows
+    """
+    from generator import find_best_matching_project
+
+    saved_items = []
+    for item in work_items:
+        # Create or find project with similarity matching
+        project_id = None
+        if item.get('project') and item.get('project') != '日常工作':
+            matching_project = find_best_matching_project(
+                item['project'],
+                existing_projects,
+                threshold=0.6
+            )
+
+            if matching_project:
+                project_id = matching_project['id']
+                item['project'] = matching_project['name']
+            else:
+                project = db.create_project(name=item['project'])
+                if project:
+                    project_id = project['id']
+                    existing_projects.append(project)
+
+        skills_json = None
+        if item.get('skills'):
+            skills_json = json.dumps(item['skills'], ensure_ascii=False)
+            for skill in item['skills']:
+                if skill and skill not in ['null', 'None', '待补充']:
+                    db.upsert_skill(skill)
+
+        saved = db.create_work_item(
+            raw_log_date=log_date,
+            project_id=project_id,
+            action=item.get('action'),
+            problem=item.get('problem'),
+            result_metric=item.get('result_metric'),
+            skills_tags=skills_json,
+            extraction_status='extracted'
+        )
+        if saved:
+            saved_items.append(saved)
+
+    return saved_items
+
+
+def plan_batch(
+    start_date: str,
+    end_date: str,
+    dates: Optional[List[str]] = None,
+    force: bool = False
+) -> Tuple[List[Dict], Dict[str, List[str]]]:
+    """
+    Pick the daily logs a batch should extract.
+
+    Days already done are skipped unless force; days with an empty log or
+    already being extracted by another batch are always skipped. The
+    returned days are reserved until run_batch_extraction() finishes them.
+
+    Args:
+        start_date: Range start (YYYY-MM-DD)
+        end_date: Range end (YYYY-MM-DD)
+        dates: Optional subset of days within the range (e.g. failed days)
+        force: Re-extract days that are already done
+
+    Returns:
+        (logs to extract as {log_date, log_content}, skipped dates by reason)
+    """
+    reports = db.get_daily_reports_by_range(start_date, end_date)
+    if dates:
+        wanted = set(dates)
+        reports = [r for r in reports if r['entry_date'] in wanted]
+    statuses = db.get_extraction_statuses(start_date, end_date)
+
+    logs = []
+    skipped = {'done': [], 'empty': [], 'in_progress': []}
+    with _active_lock:
+        for report in reports:
+            log_date = report['entry_date']
+            if not (report.get('content') or '').strip():
+                skipped['empty'].append(log_date)
+            elif log_date in _active_dates:
+                skipped['in_progress'].append(log_date)
+            elif not force and statuses.get(log_date, {}).get('status') == STATUS_DONE:
+                skipped['done'].append(log_date)
+            else:
+                logs.append({'log_date': log_date, 'log_content': report['content']})
+        # 规划时即占用这些日期，直到 run_batch_extraction 处理完
+        _active_dates.update(log['log_date'] for log in logs)
+    return logs, skipped
+
+
+def run_batch_extraction(
+    logs: List[Dict],
+    skipped: Optional[Dict[str, List[str]]] = None,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Extract and save work items for several days, yielding progress.
+
+    A day's previously extracted items are replaced when it is saved, so
+    retrying a day never duplicates its items.
+
+    Args:
+        logs: From plan_batch()
+        skipped: Skipped dates by reason, echoed in the meta event
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether identical earlier completions may be reused
+        concurrency: Max concurrent LLM calls (default Config.LLM_CONCURRENCY)
+        deadline: Request time budget; days it cuts off are marked failed
+            and extracted again on the next run
+
+    Yields:
+        meta {total, dates, skipped}, one progress event per day
+        {log_date, status, items_count, work_items, extraction_quality,
+        error, completed, total}, then
+        done {succeeded, failed, items_count}
+    """
+    from generator import iter_extract_work_items
+
+    dates = [log['log_date'] for log in logs]
+    try:
+        yield {'event': 'meta', 'total': len(logs), 'dates': dates, 'skipped': skipped or {}}
+        for log_date in dates:
+            db.set_extraction_status(log_date, STATUS_RUNNING)
+
+        existing_projects = db.get_all_projects()
+        succeeded: List[str] = []
+        failed: List[str] = []
+        items_total = 0
+
+        for result in iter_extract_work_items(
+            logs, use_mock=use_mock, use_cache=use_cache, concurrency=concurrency, deadline=deadline
+        ):
+            log_date = result['log_date']
+            progress = {'event': 'progress', 'log_date': log_date}
+            try:
+                if not result['success']:
+                    raise RuntimeError(result.get('error') or '提取失败')
+                db.delete_extracted_work_items(log_date)
+                saved = save_extracted_items(log_date, result.get('work_items', []), existing_projects)
+                db.set_extraction_status(log_date, STATUS_DONE, items_count=len(saved))
+                succeeded.append(log_date)
+                items_total += len(saved)
+                progress.update({
+                    'status': STATUS_DONE,
+                    'items_count': len(saved),
+                    'work_items': result.get('work_items', []),
+                    'extraction_quality': result.get('extraction_quality'),
+                    'error': None
+                })
+            except Exception as e:
+                db.set_extraction_status(log_date, STATUS_FAILED, error=str(e))
+                failed.append(log_date)
+                progress.update({'status': STATUS_FAILED, 'items_count': 0, 'error': str(e)})
+
+            with _active_lock:
+                _active_dates.discard(log_date)
+            progress.update({'completed': len(succeeded) + len(failed), 'total': len(logs)})
+            yield progress
+
+        logger.info(f"Batch extraction finished: {len(succeeded)} done, {len(failed)} failed")
+        yield {
+            'event': 'done',
+            'succeeded': len(succeeded),
+            'failed': sorted(failed),
+            'items_count': items_total
+        }
+    finally:
+        with _active_lock:
+            _active_dates.difference_update(dates)
+
+
+def start_batch_extraction(logs: List[Dict], **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Run run_batch_extraction() in a daemon thread.
+
+    Returns:
+        Iterator relaying the batch's events; abandoning it (client
+        disconnect) leaves the batch running
+    """
+    events: queue.Queue = queue.Queue()
+
+    def worker():
+        try:
+            for event in run_batch_extraction(logs, **kwargs):
+                events.put(event)
+        except Exception as e:
+            logger.error(f"Batch extraction failed: {e}")
+            events.put({'event': 'error', 'error': str(e)})
+        finally:
+            events.put(None)
+
+    threading.Thread(target=worker, name='batch-extraction', daemon=True).start()
+
+    def relay():
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            yield event
+
+    return relay()
+
+
+def get_batch_status(start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    Per-day extraction status for a range (for reconnecting clients).
+
+    Returns:
+        Dict with days [{log_date, status, items_count, error}] and counts
+        per status; days never extracted are pending
+    """
+    statuses = db.get_extraction_statuses(start_date, end_date)
+    with _active_lock:
+        active = set(_active_dates)
+
+    days = []
+    counts: Dict[str, int] = {}
+    for report in db.get_daily_reports_by_range(start_date, end_date):
+        log_date = report['entry_date']
+        row = statuses.get(log_date, {})
+        status = row.get('status', 'pending')
+        if status == STATUS_RUNNING and log_date not in active:
+            # 上次运行被进程重启打断
+            status = 'interrupted'
+        counts[status] = counts.get(status, 0) + 1
+        days.append({
+            'log_date': log_date,
+            'status': status,
+            'items_count': row.get('items_count', 0),
+            'error': row.get('error')
+        })
+    return {'days': days, 'counts': counts}
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_async_llm.py - Serial LLMClient vs AsyncLLMClient fan-out benchmark
+
+Starts the local stub provider (stub_provider.py) with fixed latency, then sends the same
+batch of prompts serially through LLMClient and concurrently through
+run_llm_batch() at several concurrency levels.
+
+Usage:
+    python benchmarks/bench_async_llm.py [--requests 20] [--latency 0.3]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from stub_provider import StubProvider
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.3, help='stub latency in seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    # 基准测试不应命中响应缓存
+    Config.LLM_CACHE_ENABLED = False
+
+    stub = StubProvider(latency=f"fixed:{args.latency}")
+    stub.start()
+    config = {
+        'api_url': stub.base_url,
+        'api_key': 'bench-key',
+        'model': 'bench-model',
+        'timeout': 30,
+        'retry': 0,
+        'temperature': 0,
+        'use_deepseek': False
+    }
+    Config.get_llm_config = classmethod(lambda cls, task=None: dict(config))
+    Config.is_llm_configured = classmethod(lambda cls: True)
+
+    from llm_client import LLMClient
+    from async_llm_client import run_llm_batch
+
+    prompts = [{'prompt': f'日志 {i}', 'system_prompt': 'bench'} for i in range(args.requests)]
+
+    client = LLMClient(config)
+    start = time.perf_counter()
+    for req in prompts:
+        client.call(req['prompt'], req['system_prompt'])
+    serial = time.perf_counter() - start
+    print(f"serial LLMClient           : {serial:6.2f}s  ({args.requests / serial:6.1f} req/s)")
+
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        results = run_llm_batch(prompts, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for r in results if isinstance(r, Exception))
+        print(
+            f"async concurrency={concurrency:<3}     : {elapsed:6.2f}s  "
+            f"({args.requests / elapsed:6.1f} req/s, speedup {serial / elapsed:4.1f}x, errors {errors})"
+        )
+
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+load_test.py - HTTP load test for the Flask API against a stub LLM provider
+
+By default starts, in this process:
+- a StubProvider (stub_provider.py) with the requested latency / error profile
+- the Flask app on a local port, with a temporary database, pointed at the stub
+
+then drives the chosen scenarios at each concurrency level and reports
+p50/p95/p99 latency and throughput. Use --base-url to target an already
+running backend instead (its own LLM settings apply).
+
+--record saves every LLM interaction of the run to a cassette (cassette.py);
+--replay serves a recorded cassette instead of starting the stub, so the
+whole pipeline can be benchmarked reproducibly without any network access.
+
+Usage:
+    python benchmarks/load_test.py --scenarios weekly okr extract crud --concurrency 1 4 8
+    python benchmarks/load_test.py --latency lognormal:0.8,0.5 --rate-limit-rate 0.05 --requests 50
+    python benchmarks/load_test.py --base-url http://127.0.0.1:5000 --scenarios crud
+    python benchmarks/load_test.py --record data/cassettes/load.jsonl.gz --requests 5 --concurrency 1
+    python benchmarks/load_test.py --replay data/cassettes/load.jsonl.gz --replay-latency
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Callable, Tuple, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_DAILY = """20251208 8h
+- 完成O类文档生产环境部署与联调，修复若干提取问题
+- 参加项目周会，同步进展
+20251209 8h
+- 排查I_C-I_E类文档准确率下降原因
+- 临时工作：支持业务方数据统计
+20251210 8h
+- 服务化：完成接口化改造方案评审
+- 处理服务器迁移工单"""
+
+SAMPLE_MATERIAL = """本季度完成O类文档生产部署，准确率从85%提升到92%。
+服务化改造完成设计评审，核心接口开发进度60%。
+风险：I_C-I_E类文档准确率波动，资源紧张。"""
+
+
+Request = Tuple[str, str, Optional[Dict]]
+
+
+def _crud_requests(counter) -> List[Request]:
+    """One CRUD cycle: create project, read lists, create/delete todo, save daily report"""
+    n = next(counter)
+    return [
+        ('POST', '/api/projects', {'name': f'压测项目{n}', 'description': 'load test'}),
+        ('GET', '/api/projects', None),
+        ('GET', '/api/work-items', None),
+        ('POST', '/api/todo-items', {'content': f'压测待办{n}'}),
+        ('GET', '/api/todo-items', None),
+        ('POST', '/api/daily-reports', {'entry_date': f'2025-{(n % 12) + 1:02d}-{(n % 28) + 1:02d}', 'content': SAMPLE_DAILY}),
+    ]
+
+
+def build_scenarios(no_cache: bool) -> Dict[str, Callable[[], List[Request]]]:
+    """Scenario name -> factory returning the request(s) of one iteration"""
+    counter = itertools.count()
+    return {
+        'weekly': lambda: [('POST', '/api/generate/weekly-report', {'content': SAMPLE_DAILY, 'no_cache': no_cache})],
+        'okr': lambda: [('POST', '/api/generate/okr', {'content': SAMPLE_MATERIAL, 'no_cache': no_cache})],
+        'extract': lambda: [('POST', '/api/extract-work-items', {
+            'log_content': SAMPLE_DAILY, 'log_date': '2025-12-08', 'no_cache': no_cache
+        })],
+        'crud': lambda: _crud_requests(counter),
+    }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run_scenario(base_url: str, factory: Callable[[], List[Request]], iterations: int, concurrency: int) -> Dict:
+    """Run `iterations` scenario iterations with `concurrency` workers"""
+    local = threading.local()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one_iteration(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        for method, path, body in factory():
+            start = time.perf_counter()
+            try:
+                resp = session.request(method, base_url + path, json=body, timeout=120)
+                status = str(resp.status_code)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_iteration, range(iterations)))
+    wall = time.perf_counter() - start
+
+    ok = sum(count for status, count in statuses.items() if status.startswith('2'))
+    return {
+        'requests': len(latencies),
+        'ok': ok,
+        'errors': len(latencies) - ok,
+        'statuses': statuses,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'wall_s': round(wall, 2)
+    }
+
+
+def start_local_backend(args) -> Tuple[str, Callable[[], None]]:
+    """Start stub provider (unless replaying) + Flask app in this process; returns (base_url, stop)"""
+    from stub_provider import StubProvider
+    from config import Config
+
+    stub = None
+    if args.replay:
+        Config.LLM_CASSETTE_MODE = 'replay'
+        Config.LLM_CASSETTE_PATH = args.replay
+        Config.LLM_CASSETTE_REPLAY_LATENCY = args.replay_latency
+    else:
+        stub = StubProvider(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            retry_after=args.retry_after,
+            timeout_rate=args.timeout_rate,
+            hang_seconds=args.hang_seconds,
+            seed=args.seed
+        )
+        stub.start()
+        if args.record:
+            Config.LLM_CASSETTE_MODE = 'record'
+            Config.LLM_CASSETTE_PATH = args.record
+
+    # 临时数据库，避免污染 data/reports.db
+    import database
+    tmp_dir = tempfile.mkdtemp(prefix='workpilot-load-')
+    database.DB_PATH = os.path.join(tmp_dir, 'load.db')
+    database.init_database()
+
+    llm_config = {
+        'api_url': stub.base_url if stub else 'http://127.0.0.1:9/v1',  # 回放时不会被请求
+        'api_key': 'load-test-key',
+        'model': 'stub-model',
+        'timeout': args.llm_timeout,
+        'retry': Config.LLM_RETRY,
+        'temperature': 0,
+        'use_deepseek': False
+    }
+    Config.get_llm_config = classmethod(lambda cls, task=None: dict(llm_config))
+    Config.is_llm_configured = classmethod(lambda cls: True)
+    Config.get_provider_configs = classmethod(lambda cls: [dict(llm_config)])
+
+    from werkzeug.serving import make_server
+    from app import app
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def stop():
+        server.shutdown()
+        if stub:
+            stub.stop()
+            print(f"\nstub provider: {json.dumps(stub.stats, ensure_ascii=False)}")
+        if args.record or args.replay:
+            from cassette import get_cassette
+            print(f"cassette: {len(get_cassette())} interactions in {args.record or args.replay}")
+
+    return f"http://127.0.0.1:{server.server_port}", stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load test for the WorkPilot API')
+    parser.add_argument('--base-url', help='target a running backend instead of starting one')
+    parser.add_argument('--scenarios', nargs='+', default=['weekly', 'okr', 'extract', 'crud'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--requests', type=int, default=20, help='scenario iterations per concurrency level')
+    parser.add_argument('--cache', action='store_true', help='allow LLM response cache hits')
+    parser.add_argument('--latency', default='lognormal:0.5,0.4', help='stub latency spec (see stub_provider.parse_latency)')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--hang-seconds', type=float, default=10.0)
+    parser.add_argument('--llm-timeout', type=float, default=5.0, help='LLM client timeout for the local backend')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_out', help='write results to this JSON file')
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument('--record', metavar='CASSETTE', help='record LLM interactions to this .jsonl.gz')
+    cassette_group.add_argument('--replay', metavar='CASSETTE', help='serve LLM calls from this cassette, no stub/network')
+    parser.add_argument('--replay-latency', action='store_true', help='sleep for the recorded latency when replaying')
+    args = parser.parse_args()
+    if args.base_url and (args.record or args.replay):
+        parser.error('--record/--replay need the local backend (no --base-url)')
+
+    stop = None
+    if args.base_url:
+        base_url = args.base_url.rstrip('/')
+    else:
+        base_url, stop = start_local_backend(args)
+
+    scenarios = build_scenarios(no_cache=not args.cache)
+    unknown = [name for name in args.scenarios if name not in scenarios]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(scenarios)})")
+
+    results = []
+    header = f"{'scenario':<10}{'conc':>5}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}"
+    print(f"target: {base_url}")
+    print(header)
+    print('-' * len(header))
+    try:
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                result = run_scenario(base_url, scenarios[name], args.requests, concurrency)
+                result.update({'scenario': name, 'concurrency': concurrency})
+                results.append(result)
+                print(
+                    f"{name:<10}{concurrency:>5}{result['requests']:>7}{result['errors']:>8}"
+                    f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                    f"{result['throughput_rps']:>9.2f}"
+                )
+    finally:
+        if stop:
+            stop()
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"results written to {args.json_out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+cassette.py - Record and replay LLM interactions
+
+MockLLMClient answers every prompt with the same canned text, so it is no
+use for benchmarking the generation pipeline or checking that a prompt
+change still parses. With LLM_CASSETTE_MODE=record every provider call
+(and every stream, chunk by chunk with its timing) is appended to a
+gzip-compressed JSON-lines cassette; with LLM_CASSETTE_MODE=replay the
+same interactions are served offline, matched by normalized prompts,
+optionally with the recorded latency.
+"""
+
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Iterator
+
+from config import Config
+import llm_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a prompt was never recorded"""
+
+    def __init__(self, purpose: Optional[str], key: str):
+        super().__init__(f"No recorded interaction for purpose={purpose or '-'} (key {key[:12]})")
+        self.purpose = purpose
+        self.key = key
+
+
+def interaction_key(prompt: str, system_prompt: Optional[str] = None) -> str:
+    """Match key for an interaction; independent of the model so a cassette replays under any tier"""
+    return llm_cache.make_cache_key('', prompt, system_prompt)
+
+
+class Cassette:
+    """
+    One cassette file: recorded interactions grouped by key.
+
+    A prompt recorded several times is replayed in recording order, the
+    last recording repeating once they are used up.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: .jsonl.gz file, created on the first recorded interaction
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self.model: Optional[str] = None  # 最后录制的模型名
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 录制进程被中断时最后一行可能不完整
+                    logger.warning(f"Skipping corrupt cassette line in {self.path}")
+                    continue
+                self._entries.setdefault(entry['key'], []).append(entry)
+                self.model = entry.get('model') or self.model
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def append(self, entry: Dict[str, Any]):
+        """Write one interaction (one gzip member per entry, so the file survives a crash)"""
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(line)
+            self._entries.setdefault(entry['key'], []).append(entry)
+            self.model = entry.get('model') or self.model
+
+    def next(self, prompt: str, system_prompt: Optional[str] = None, purpose: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Recorded interaction to serve for a prompt.
+
+        Raises:
+            CassetteMiss: If the prompt is not in the cassette
+        """
+        key = interaction_key(prompt, system_prompt)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(purpose, key)
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return entries[min(index, len(entries) - 1)]
+
+    def rewind(self):
+        """Start serving every prompt from its first recording again"""
+        with self._lock:
+            self._cursor.clear()
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: Optional[str] = None) -> Cassette:
+    """Shared Cassette for a path (default Config.LLM_CASSETTE_PATH)"""
+    path = os.path.abspath(path or Config.LLM_CASSETTE_PATH)
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = Cassette(path)
+            _cassettes[path] = cassette
+        return cassette
+
+
+def reset_cassettes():
+    """Forget loaded cassettes (reread from disk on next use)"""
+    with _cassettes_lock:
+        _cassettes.clear()
+
+
+class RecordingLLMClient:
+    """
+    Wrap a real client and append every completed call to a cassette.
+
+    The response cache is bypassed while recording so that the cassette
+    holds real completions with real timings.
+    """
+
+    def __init__(self, inner, cassette: Optional[Cassette] = None):
+        self.inner = inner
+        self.cassette = cassette or get_cassette()
+
+    def __getattr__(self, name):
+        # model, api_url, prewarm, close ... 由被包装的客户端提供
+        return getattr(self.inner, name)
+
+    def _record(self, prompt, system_prompt, purpose, response, started, first_byte=None, chunks=None):
+        self.cassette.append({
+            'key': interaction_key(prompt, system_prompt),
+            'purpose': purpose,
+            'model': getattr(self.inner, 'model', None),
+            'system_prompt': system_prompt,
+            'prompt': prompt,
+            'response': response,
+            'stream': chunks is not None,
+            'chunks': chunks,
+            'first_byte_s': round(first_byte, 4) if first_byte is not None else None,
+            'latency_s': round(time.monotonic() - started, 4),
+            'recorded_at': time.time()
+        })
+
+    def call(self, prompt: str, system_prompt: Optional[str] = None, purpose: Optional[str] = None, **kwargs) -> str:
+        kwargs['use_cache'] = False
+        started = time.monotonic()
+        content = self.inner.call(prompt, system_prompt, purpose=purpose, **kwargs)
+        self._record(prompt, system_prompt, purpose, content, started)
+        return content
+
+    def stream(self, prompt: str, system_prompt: Optional[str] = None, purpose: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """Yield the inner stream; the interaction is recorded only if it is read to the end"""
+        kwargs['use_cache'] = False
+        started = time.monotonic()
+        chunks = []
+        for chunk in self.inner.stream(prompt, system_prompt, purpose=purpose, **kwargs):
+            chunks.append([round(time.monotonic() - started, 4), chunk])
+            yield chunk
+        first_byte = chunks[0][0] if chunks else None
+        self._record(prompt, system_prompt, purpose, ''.join(c for _, c in chunks), started, first_byte, chunks)
+
+
+class ReplayLLMClient:
+    """Serve recorded interactions offline in place of a provider"""
+
+    def __init__(
+        self,
+        cassette: Optional[Cassette] = None,
+        simulate_latency: Optional[bool] = None,
+        speed: Optional[float] = None
+    ):
+        """
+        Args:
+            cassette: Source of interactions (default: the configured cassette)
+            simulate_latency: Sleep for the recorded latency / chunk timing
+                (default Config.LLM_CASSETTE_REPLAY_LATENCY)
+            speed: Divide recorded delays by this factor (default Config.LLM_CASSETTE_REPLAY_SPEED)
+        """
+        self.cassette = cassette or get_cassette()
+        self.simulate_latency = Config.LLM_CASSETTE_REPLAY_LATENCY if simulate_latency is None else simulate_latency
+        self.speed = max(0.001, Config.LLM_CASSETTE_REPLAY_SPEED if speed is None else speed)
+        # 保持录制时的模型名，使 token 预算和分段与录制时一致
+        self.model = self.cassette.model or 'cassette'
+        self.api_url = 'cassette://' + self.cassette.path
+
+    def is_configured(self) -> bool:
+        return True
+
+    def prewarm(self) -> bool:
+        return False
+
+    def close(self):
+        pass
+
+    def _sleep(self, seconds: Optional[float]):
+        if self.simulate_latency and seconds:
+            time.sleep(seconds / self.speed)
+
+    def call(self, prompt: str, system_prompt: Optional[str] = None, purpose: Optional[str] = None, **kwargs) -> str:
+        """
+        Raises:
+            CassetteMiss: If the prompt was not recorded
+        """
+        entry = self.cassette.next(prompt, system_prompt, purpose)
+        self._sleep(entry.get('latency_s'))
+        return entry['response']
+
+    def stream(self, prompt: str, system_prompt: Optional[str] = None, purpose: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """Replay recorded chunks with their spacing; a recorded plain call comes back as one chunk"""
+        entry = self.cassette.next(prompt, system_prompt, purpose)
+        chunks = entry.get('chunks')
+        if not chunks:
+            self._sleep(entry.get('latency_s'))
+            yield entry['response']
+            return
+        elapsed = 0.0
+        for offset, text in chunks:
+            self._sleep(offset - elapsed)
+            elapsed = offset
+            yield text
+
+
+def wrap_for_cassette(client):
+    """Wrap a real client for recording when LLM_CASSETTE_MODE=record"""
+    if Config.LLM_CASSETTE_MODE == 'record':
+        return RecordingLLMClient(client)
+    return client
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+circuit_breaker.py - Per-provider circuit breaker for LLM calls
+
+States:
+- closed: calls go through; consecutive availability failures are counted
+- open: calls fail immediately with CircuitOpenError until the recovery
+  timeout passes
+- half_open: a limited number of probe calls go through; a success closes
+  the breaker, a failure opens it again, and a probe that ends neither way
+  (cancelled) gives its slot back with release_probe()
+
+Only failures that say the provider is unavailable (timeouts, connection
+errors, 5xx) count. A 429 or a 4xx means the provider answered, so it
+counts as alive.
+"""
+
+import time
+import threading
+import logging
+from typing import Optional, Dict
+
+from config import Config
+from rate_control import ErrorDecision
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"LLM provider {name} unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def is_outage(decision: ErrorDecision) -> bool:
+    """Whether a classified error says the provider is down"""
+    return decision.kind in ('timeout', 'connection') or decision.kind.startswith('http_5')
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker guarding one provider"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        recovery_timeout: Optional[float] = None,
+        half_open_probes: Optional[int] = None
+    ):
+        """
+        Args:
+            name: Provider label (api_url) for logs and stats
+            failure_threshold: Consecutive failures that open the breaker
+            recovery_timeout: Seconds to stay open before probing
+            half_open_probes: Concurrent probe calls allowed when half open
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.LLM_BREAKER_FAILURE_THRESHOLD
+        self.recovery_timeout = Config.LLM_BREAKER_RECOVERY_TIMEOUT if recovery_timeout is None else recovery_timeout
+        self.half_open_probes = half_open_probes or Config.LLM_BREAKER_HALF_OPEN_PROBES
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.stats = {'opened': 0, 'rejected': 0, 'failures': 0, 'successes': 0}
+
+    def _retry_in(self, now: float) -> float:
+        return max(0.0, self.opened_at + self.recovery_timeout - now)
+
+    def before_call(self) -> bool:
+        """
+        Admit one provider attempt or raise CircuitOpenError.
+
+        Returns:
+            True if the attempt took a half-open probe slot
+
+        Raises:
+            CircuitOpenError: Breaker open, or half open with all probe slots taken
+        """
+        now = time.monotonic()
+        with self.lock:
+            if self.state == OPEN:
+                if self._retry_in(now) > 0:
+                    self.stats['rejected'] += 1
+                    raise CircuitOpenError(self.name, self._retry_in(now))
+                self.state = HALF_OPEN
+                self.probes_in_flight = 0
+                logger.info(f"LLM circuit for {self.name} half open, probing")
+            if self.state == HALF_OPEN:
+                if self.probes_in_flight >= self.half_open_probes:
+                    self.stats['rejected'] += 1
+                    raise CircuitOpenError(self.name, 0)
+                self.probes_in_flight += 1
+                return True
+            return False
+
+    def release_probe(self):
+        """A probe ended without a result (e.g. cancelled); free its slot"""
+        with self.lock:
+            if self.state == HALF_OPEN and self.probes_in_flight > 0:
+                self.probes_in_flight -= 1
+
+    def record_success(self):
+        """The provider answered"""
+        with self.lock:
+            self.stats['successes'] += 1
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                self.probes_in_flight = 0
+                self.state = CLOSED
+                logger.info(f"LLM circuit for {self.name} closed")
+
+    def record_failure(self):
+        """The provider was unreachable, timed out or answered 5xx"""
+        with self.lock:
+            self.stats['failures'] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.stats['opened'] += 1
+                    logger.warning(
+                        f"LLM circuit for {self.name} opened after {self.consecutive_failures} "
+                        f"consecutive failures, failing fast for {self.recovery_timeout:.0f}s"
+                    )
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probes_in_flight = 0
+
+    def record(self, decision: ErrorDecision):
+        """Feed a classified provider error into the breaker"""
+        if is_outage(decision):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected without probing"""
+        with self.lock:
+            return self.state == OPEN and self._retry_in(time.monotonic()) > 0
+
+    def get_state(self) -> Dict:
+        with self.lock:
+            now = time.monotonic()
+            return {
+                'name': self.name,
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'retry_in_sec': round(self._retry_in(now), 1) if self.state == OPEN else 0.0,
+                **self.stats
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get the process-wide breaker for a provider (keyed by api_url)"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_for(name: str) -> Optional[CircuitBreaker]:
+    """Breaker guarding a provider, or None when LLM_BREAKER_ENABLED is off"""
+    return get_circuit_breaker(name) if Config.LLM_BREAKER_ENABLED else None
+
+
+def get_circuit_states() -> Dict:
+    """
+    Summary for /api/health.
+
+    Returns:
+        Dict with overall state (closed when every provider is closed, open
+        when every provider is open, otherwise degraded) and per-provider
+        details
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    providers = [b.get_state() for b in breakers]
+    states = {p['state'] for p in providers}
+    if not providers or states == {CLOSED}:
+        overall = CLOSED
+    elif states == {OPEN}:
+        overall = OPEN
+    else:
+        overall = 'degraded'
+    return {
+        'enabled': Config.LLM_BREAKER_ENABLED,
+        'state': overall,
+        'providers': providers
+    }
+
+
+def reset_circuit_breakers():
+    """Forget all breakers (tests, config reload)"""
+    with _breakers_lock:
+        _breakers.clear()
@@ -5,6 +5,7 @@ config.py - Configuration management for the Weekly Report and OKR Assistant
 """
 
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,6 +14,8 @@ load_dotenv()
 # 数据库配置缓存（避免循环导入）
 _db_config_cache = None
 _db_config_loaded = False
+_db_tiers_cache = None
+_db_tiers_loaded = False
 
 
 def _load_db_config():
@@ -33,10 +36,54 @@ def _load_db_config():
     return _db_config_cache
 
 
+def _load_db_tiers():
+    """从数据库加载按任务划分的模型配置（config 表中的 llm_tiers）"""
+    global _db_tiers_cache, _db_tiers_loaded
+    
+    if _db_tiers_loaded:
+        return _db_tiers_cache
+    
+    try:
+        from database import get_config
+        _db_tiers_cache = get_config('llm_tiers')
+    except Exception:
+        _db_tiers_cache = None
+    _db_tiers_loaded = True
+    
+    return _db_tiers_cache
+
+
+def _load_extra_providers():
+    """Parse LLM_PROVIDERS (JSON list of {name, api_url, api_key, model})"""
+    raw = os.getenv('LLM_PROVIDERS', '').strip()
+    if not raw:
+        return []
+    try:
+        providers = json.loads(raw)
+    except ValueError:
+        return []
+    if not isinstance(providers, list):
+        return []
+    return [p for p in providers if isinstance(p, dict) and p.get('api_url') and p.get('api_key')]
+
+
+def _load_model_limits():
+    """Parse LLM_MODEL_LIMITS (JSON object {model substring: {limit: tokens}})"""
+    raw = os.getenv('LLM_MODEL_LIMITS', '').strip()
+    if not raw:
+        return {}
+    try:
+        limits = json.loads(raw)
+    except ValueError:
+        return {}
+    return limits if isinstance(limits, dict) else {}
+
+
 def reload_db_config():
     """强制重新加载数据库配置"""
-    global _db_config_cache, _db_config_loaded
+    global _db_config_loaded, _db_tiers_loaded
     _db_config_loaded = False
+    _db_tiers_loaded = False
     return _load_db_config()
 
 
@@ -49,7 +96,92 @@ class Config:
     LLM_MODEL = os.getenv('LLM_MODEL', 'default/deepseek-v3-2')
     LLM_TIMEOUT = int(os.getenv('LLM_TIMEOUT', '30'))
     LLM_RETRY = int(os.getenv('LLM_RETRY', '2'))
+    # Time budget of one HTTP request; keep below the gunicorn worker timeout (60s)
+    REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', '50'))  # seconds, 0 disables
+    LLM_MIN_ATTEMPT_TIMEOUT = float(os.getenv('LLM_MIN_ATTEMPT_TIMEOUT', '3'))  # don't start an attempt with less left
     LLM_TEMPERATURE = 0  # Fixed per spec
+    LLM_PREWARM = os.getenv('LLM_PREWARM', 'false').lower() == 'true'  # Open provider connection at startup
+    LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '4'))  # Max in-flight calls for batch fan-out
+    # Batch extraction packs several short days into one prompt (0 disables)
+    LLM_EXTRACTION_PACK_TOKENS = int(os.getenv('LLM_EXTRACTION_PACK_TOKENS', '1500'))  # log tokens per packed prompt
+    LLM_EXTRACTION_PACK_MAX_DAYS = int(os.getenv('LLM_EXTRACTION_PACK_MAX_DAYS', '7'))
+    SKILL_CATEGORIZE_CHUNK_SIZE = int(os.getenv('SKILL_CATEGORIZE_CHUNK_SIZE', '80'))  # skills per categorization call
+    # Projects with more work items are summarized per time window first
+    STAR_MAX_ITEMS = int(os.getenv('STAR_MAX_ITEMS', '40'))
+    STAR_REFRESH_CONCURRENCY = int(os.getenv('STAR_REFRESH_CONCURRENCY', '2'))  # projects at a time in bulk refresh
+    
+    # Model tiers: each task can use its own model/endpoint (config table key llm_tiers)
+    LLM_TASKS = ('weekly_report', 'okr', 'extraction', 'star', 'skill_categorization', 'summarize')
+    LLM_TIER_FIELDS = ('api_url', 'api_key', 'model')
+    # Purposes that run on another task's tier
+    LLM_PURPOSE_TASKS = {
+        'extraction_repair': 'extraction',
+        'chunk_summary': 'summarize',
+        'star_window': 'star',
+        'month_summary': 'okr',
+        'quarter_summary': 'okr'
+    }
+    
+    # Process-wide rate control (shared by every LLM caller)
+    LLM_RATE_LIMIT = float(os.getenv('LLM_RATE_LIMIT', '0'))  # requests/second, 0 = unlimited
+    LLM_RATE_BURST = int(os.getenv('LLM_RATE_BURST', '5'))
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))  # AIMD upper bound
+    LLM_MIN_CONCURRENCY = int(os.getenv('LLM_MIN_CONCURRENCY', '1'))  # AIMD lower bound
+    LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', '1'))  # seconds
+    LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', '30'))  # seconds, also caps Retry-After
+    
+    # Coalesce identical in-flight LLM calls: off, local (per worker) or shared (across workers)
+    LLM_SINGLE_FLIGHT = os.getenv('LLM_SINGLE_FLIGHT', 'local').strip().lower()
+    LLM_SINGLE_FLIGHT_LEASE = float(os.getenv('LLM_SINGLE_FLIGHT_LEASE', '120'))  # seconds
+    
+    # Multi-provider routing: extra OpenAI-compatible endpoints as a JSON list
+    LLM_PROVIDERS = _load_extra_providers()
+    LLM_EWMA_ALPHA = float(os.getenv('LLM_EWMA_ALPHA', '0.3'))  # weight of the newest latency sample
+    LLM_PROVIDER_EXPLORE = float(os.getenv('LLM_PROVIDER_EXPLORE', '0.05'))  # share of calls sent to a random endpoint
+    LLM_PROVIDER_COOLDOWN = float(os.getenv('LLM_PROVIDER_COOLDOWN', '30'))  # seconds an erroring endpoint is skipped
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+    LLM_HEDGE_DELAY = float(os.getenv('LLM_HEDGE_DELAY', '2'))  # seconds, until enough samples for p95
+    LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '0.5'))  # seconds
+    
+    # Circuit breaker per provider: fail fast while the provider is down
+    LLM_BREAKER_ENABLED = os.getenv('LLM_BREAKER_ENABLED', 'true').lower() == 'true'
+    LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5'))  # consecutive failed attempts
+    LLM_BREAKER_RECOVERY_TIMEOUT = float(os.getenv('LLM_BREAKER_RECOVERY_TIMEOUT', '30'))  # seconds open before a probe
+    LLM_BREAKER_HALF_OPEN_PROBES = int(os.getenv('LLM_BREAKER_HALF_OPEN_PROBES', '1'))  # concurrent probe calls
+    # While the breaker is open, weekly reports fall back to a rule-based draft
+    LLM_DEGRADED_FALLBACK = os.getenv('LLM_DEGRADED_FALLBACK', 'true').lower() == 'true'
+    
+    # Per-call LLM telemetry (latency, tokens, retries) written by a background thread
+    LLM_TELEMETRY_ENABLED = os.getenv('LLM_TELEMETRY_ENABLED', 'true').lower() == 'true'
+    LLM_TELEMETRY_MAX_ROWS = int(os.getenv('LLM_TELEMETRY_MAX_ROWS', '50000'))  # oldest rows are pruned
+    LLM_TELEMETRY_QUEUE_SIZE = int(os.getenv('LLM_TELEMETRY_QUEUE_SIZE', '1000'))  # records dropped when full
+    LLM_TELEMETRY_FLUSH_INTERVAL = float(os.getenv('LLM_TELEMETRY_FLUSH_INTERVAL', '2'))  # seconds
+    
+    # Background job queue (SQLite-backed; workers run in every server process)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))  # threads per process, 0 = only enqueue
+    JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))  # a dead worker's job is resumed after this
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))  # seconds between queue polls when idle
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))  # claims before an interrupted job is failed
+    
+    # Pre-generation of the week's report draft from stored daily reports (see pregeneration.py)
+    WEEKLY_PREGEN_ENABLED = os.getenv('WEEKLY_PREGEN_ENABLED', 'false').lower() == 'true'
+    WEEKLY_PREGEN_AT = os.getenv('WEEKLY_PREGEN_AT', 'fri 16:00').strip()  # weekly run, empty disables
+    WEEKLY_PREGEN_ON_LAST_WORKDAY = os.getenv('WEEKLY_PREGEN_ON_LAST_WORKDAY', 'true').lower() == 'true'
+    WEEKLY_PREGEN_DELAY = float(os.getenv('WEEKLY_PREGEN_DELAY', '120'))  # seconds after a daily report is saved
+    WEEKLY_PREGEN_JITTER = float(os.getenv('WEEKLY_PREGEN_JITTER', '300'))  # random extra delay, seconds
+    
+    # LLM response cache (deterministic temperature=0 calls only)
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600)))  # seconds
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '2000'))
+    # Comma-separated purposes that always go to the provider, e.g. "okr,star"
+    LLM_CACHE_BYPASS = {p.strip() for p in os.getenv('LLM_CACHE_BYPASS', '').split(',') if p.strip()}
+    
+    # Record/replay of LLM interactions (see cassette.py): off, record or replay
+    LLM_CASSETTE_MODE = os.getenv('LLM_CASSETTE_MODE', 'off').strip().lower()
+    LLM_CASSETTE_PATH = os.getenv('LLM_CASSETTE_PATH', os.path.join(os.path.dirname(__file__), 'data', 'cassettes', 'llm.jsonl.gz'))
+    LLM_CASSETTE_REPLAY_LATENCY = os.getenv('LLM_CASSETTE_REPLAY_LATENCY', 'false').lower() == 'true'  # sleep as recorded
+    LLM_CASSETTE_REPLAY_SPEED = float(os.getenv('LLM_CASSETTE_REPLAY_SPEED', '1'))  # 2 = replay twice as fast
     
     # DeepSeek API Configuration (optional, for direct DeepSeek integration)
     DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '').strip()
@@ -57,8 +189,12 @@ class Config:
     DEEPSEEK_MODEL = os.getenv('DEEPSEEK_MODEL', 'deepseek-chat').strip()
     
     # Application Configuration
-    MAX_INPUT_CHARS = 20000  # Fixed per spec
+    MAX_INPUT_CHARS = 20000  # Fixed per spec; longer input is summarized in chunks first
+    MAX_TOTAL_INPUT_CHARS = int(os.getenv('MAX_TOTAL_INPUT_CHARS', '400000'))  # hard cap for map-reduce input
+    # Per-model token limits overriding token_budget.DEFAULT_MODEL_LIMITS
+    LLM_MODEL_LIMITS = _load_model_limits()
     WEEK_MODE = 'current_week'  # Fixed per spec
+    PARSE_CACHE_SIZE = int(os.getenv('PARSE_CACHE_SIZE', '128'))  # 0 disables parse memoization
     
     # Classification Keywords (frozen, extensible)
     KEYWORDS_RESEARCH = ['PoC', '调研']
@@ -70,8 +206,49 @@ class Config:
     KEYWORDS_ADMIN = ['会议', '沟通', '统计', '填报', '分享', '支持', '论文分享', '技术分享']
     
     @classmethod
-    def get_llm_config(cls):
-        """Return LLM configuration as dictionary, prioritizing database config"""
+    def task_for_purpose(cls, purpose):
+        """The model tier (task) a call purpose runs on, or None for the default"""
+        if purpose in cls.LLM_TASKS:
+            return purpose
+        return cls.LLM_PURPOSE_TASKS.get(purpose)
+    
+    @classmethod
+    def get_llm_tier(cls, task):
+        """
+        Return the non-empty overrides (api_url, api_key, model) configured
+        for a task; empty when the task uses the default model.
+        """
+        tiers = _load_db_tiers() or {}
+        tier = tiers.get(task) if isinstance(tiers, dict) else None
+        if not isinstance(tier, dict):
+            return {}
+        return {
+            field: str(tier[field]).strip()
+            for field in cls.LLM_TIER_FIELDS
+            if tier.get(field) and str(tier[field]).strip()
+        }
+    
+    @classmethod
+    def get_llm_config(cls, task=None):
+        """
+        Return LLM configuration as dictionary, prioritizing database config.
+        
+        Args:
+            task: One of LLM_TASKS; its tier overrides are applied on top of
+                the default configuration
+        """
+        config = cls._default_llm_config()
+        tier = cls.get_llm_tier(task) if task else {}
+        if tier:
+            config = {**config, **tier}
+            if 'api_url' in tier:
+                # 独立端点走通用 HTTP 客户端
+                config['use_deepseek'] = False
+        return config
+    
+    @classmethod
+    def _default_llm_config(cls):
+        """The single default configuration (database, DeepSeek, providers, env)"""
         # 首先检查数据库配置
         db_config = _load_db_config()
         if db_config and db_config.get('api_url') and db_config.get('api_key'):
@@ -97,6 +274,10 @@ class Config:
                 'use_deepseek': True
             }
         
+        # 仅配置了 LLM_PROVIDERS 时，以第一个为主配置
+        if not (cls.LLM_API_URL and cls.LLM_API_KEY) and cls.LLM_PROVIDERS:
+            return cls._provider_config(cls.LLM_PROVIDERS[0])
+        
         # 回退到通用 LLM 配置
         return {
             'api_url': cls.LLM_API_URL,
@@ -121,4 +302,36 @@ class Config:
             return True
         
         # 回退到通用 LLM 配置
-        return bool(cls.LLM_API_URL and cls.LLM_API_KEY)
+        return bool(cls.LLM_API_URL and cls.LLM_API_KEY) or bool(cls.LLM_PROVIDERS)
+    
+    @classmethod
+    def _provider_config(cls, provider):
+        """Expand an LLM_PROVIDERS entry into a full LLM config dict"""
+        return {
+            'name': provider.get('name', ''),
+            'api_url': provider['api_url'],
+            'api_key': provider['api_key'],
+            'model': provider.get('model', cls.LLM_MODEL),
+            'timeout': provider.get('timeout', cls.LLM_TIMEOUT),
+            'retry': provider.get('retry', cls.LLM_RETRY),
+            'temperature': cls.LLM_TEMPERATURE,
+            'use_deepseek': False
+        }
+    
+    @classmethod
+    def get_provider_configs(cls):
+        """
+        Return every configured provider: the primary from get_llm_config()
+        followed by LLM_PROVIDERS entries, without duplicates.
+        """
+        configs = []
+        seen = set()
+        primary = cls.get_llm_config()
+        candidates = [primary] if primary.get('api_url') and primary.get('api_key') else []
+        candidates += [cls._provider_config(p) for p in cls.LLM_PROVIDERS]
+        for config in candidates:
+            key = (config['api_url'].rstrip('/'), config['api_key'], config['model'])
+            if key not in seen:
+                seen.add(key)
+                configs.append(config)
+        return configs
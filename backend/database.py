@@ -6,15 +6,16 @@ database.py - SQLite database module for Weekly Report and OKR Assistant
 
 import sqlite3
 import os
+import json
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, date
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Database file path
-DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'reports.db')
+# Database file path (REPORTS_DB_PATH overrides it, e.g. to keep the test suite off the real database)
+DB_PATH = os.getenv('REPORTS_DB_PATH') or os.path.join(os.path.dirname(__file__), 'data', 'reports.db')
 
 
 def get_db_connection() -> sqlite3.Connection:
@@ -145,6 +146,180 @@ def init_database():
             )
         ''')
         
+        # Create llm_response_cache table (LLM 响应缓存，多 worker 共享)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_response_cache (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT,
+                purpose TEXT,
+                response TEXT NOT NULL,
+                hit_count INTEGER DEFAULT 0,
+                accessed_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_llm_response_cache_accessed
+            ON llm_response_cache (accessed_at)
+        ''')
+        
+        # Create generation_drafts table (流式生成的草稿/中断时的部分输出)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS generation_drafts (
+                kind TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                content TEXT NOT NULL,
+                status TEXT DEFAULT 'partial',
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (kind, scope)
+            )
+        ''')
+        
+        # Create llm_inflight table (跨 worker 合并相同的进行中 LLM 请求)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_inflight (
+                flight_key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                status TEXT DEFAULT 'running',
+                response TEXT,
+                error TEXT,
+                lease_expires REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        
+        # Create llm_telemetry table (每次 LLM 调用的耗时/用量记录，有上限)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_telemetry (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                day TEXT NOT NULL,
+                purpose TEXT,
+                endpoint TEXT,
+                model TEXT,
+                stream INTEGER DEFAULT 0,
+                prompt_chars INTEGER DEFAULT 0,
+                response_chars INTEGER DEFAULT 0,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                total_tokens INTEGER,
+                tokens_estimated INTEGER DEFAULT 0,
+                connect_ms REAL,
+                first_byte_ms REAL,
+                total_ms REAL,
+                attempts INTEGER DEFAULT 0,
+                retries INTEGER DEFAULT 0,
+                outcome TEXT NOT NULL,
+                error_kind TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_llm_telemetry_day
+            ON llm_telemetry (day)
+        ''')
+        
+        # Create jobs table (后台任务队列：可轮询、可取消、进程重启后续跑)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT,
+                dedup_key TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                progress TEXT,
+                checkpoint TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                worker TEXT,
+                lease_expires REAL,
+                cancel_requested INTEGER DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_created
+            ON jobs (status, created_at)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_jobs_dedup_key
+            ON jobs (dedup_key)
+        ''')
+        
+        # Create work_item_extractions table (批量提取的逐日进度，支持断点续跑)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS work_item_extractions (
+                log_date TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                items_count INTEGER DEFAULT 0,
+                error TEXT,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # 按日期范围生成的周报：生成时所用日报的指纹，用于判断周报是否过期
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS weekly_report_state (
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                daily_dates TEXT,
+                report_hash TEXT,
+                generated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (start_date, end_date)
+            )
+        ''')
+        
+        # 月度/季度分层总结：按下一层内容的指纹判断是否需要重新生成
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS period_summaries (
+                level TEXT NOT NULL,
+                period TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                sources TEXT,
+                generated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (level, period)
+            )
+        ''')
+        
+        # STAR 总结状态：生成时工作项的指纹，用于判断是否需要重新生成
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS star_summary_state (
+                project_id INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                items_count INTEGER DEFAULT 0,
+                windows_count INTEGER DEFAULT 0,
+                generated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # 大项目分时间段的 STAR 中间总结，按该时间段工作项的指纹缓存
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS star_partial_summaries (
+                fingerprint TEXT PRIMARY KEY,
+                project_id INTEGER,
+                window_label TEXT,
+                summary TEXT NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # 技能分类决策缓存：按规范化技能名记录 LLM 给出的分类
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS skill_category_cache (
+                normalized_name TEXT PRIMARY KEY,
+                category TEXT NOT NULL,
+                model TEXT,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         conn.commit()
         logger.info("Database initialized successfully")
         
@@ -486,8 +661,13 @@ def delete_weekly_report(start_date: str, end_date: str) -> bool:
             DELETE FROM weekly_reports 
             WHERE start_date = ? AND end_date = ?
         ''', (start_date, end_date))
+        deleted = cursor.rowcount > 0
+        cursor.execute(
+            'DELETE FROM weekly_report_state WHERE start_date = ? AND end_date = ?',
+            (start_date, end_date)
+        )
         conn.commit()
-        return cursor.rowcount > 0
+        return deleted
         
     except Exception as e:
         logger.error(f"Error deleting weekly report: {e}")
@@ -496,6 +676,83 @@ def delete_weekly_report(start_date: str, end_date: str) -> bool:
         conn.close()
 
 
+def get_weekly_report_states() -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    获取所有按日期范围生成的周报的输入指纹。
+    
+    Returns:
+        Dict: {(start_date, end_date): {fingerprint, daily_dates, report_hash, generated_at}}
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('SELECT * FROM weekly_report_state')
+        states = {}
+        for row in cursor.fetchall():
+            state = dict(row)
+            state['daily_dates'] = json.loads(state['daily_dates'] or '[]')
+            states[(state['start_date'], state['end_date'])] = state
+        return states
+    except Exception as e:
+        logger.error(f"Error getting weekly report states: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def get_weekly_report_state(start_date: str, end_date: str) -> Optional[Dict[str, Any]]:
+    """
+    获取某个日期范围周报的输入指纹。
+    
+    Returns:
+        Dict with fingerprint, daily_dates, report_hash, generated_at or None
+    """
+    return get_weekly_report_states().get((start_date, end_date))
+
+
+def save_weekly_report_state(
+    start_date: str,
+    end_date: str,
+    fingerprint: str,
+    daily_dates: List[str],
+    report_hash: str
+) -> bool:
+    """
+    记录周报生成时所用日报的指纹。
+    
+    Args:
+        start_date: 周报开始日期
+        end_date: 周报结束日期
+        fingerprint: 日报指纹
+        daily_dates: 参与生成的日报日期
+        report_hash: 生成内容的哈希（用于判断周报保存前是否被手动修改）
+        
+    Returns:
+        bool: True if successful
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO weekly_report_state (start_date, end_date, fingerprint, daily_dates, report_hash, generated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(start_date, end_date) DO UPDATE SET
+                fingerprint = excluded.fingerprint,
+                daily_dates = excluded.daily_dates,
+                report_hash = excluded.report_hash,
+                generated_at = CURRENT_TIMESTAMP
+        ''', (start_date, end_date, fingerprint, json.dumps(daily_dates), report_hash))
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error saving weekly report state: {e}")
+        return False
+    finally:
+        conn.close()
+
+
 # ========================
 # OKR Reports CRUD
 # ========================
@@ -1357,23 +1614,22 @@ def update_skill_categories(categorized_skills: List[Dict]) -> Dict[str, Any]:
         categorized_skills: 包含 id, new_category 的技能列表
         
     Returns:
-        操作结果
+        操作结果（updated_count 只计分类实际发生变化的技能）
     """
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
         now = datetime.now().isoformat()
-        updated_count = 0
-        
-        for skill in categorized_skills:
-            cursor.execute('''
-                UPDATE skills SET category = ?, updated_at = ? WHERE id = ?
-            ''', (skill['new_category'], now, skill['id']))
-            if cursor.rowcount > 0:
-                updated_count += 1
+        before = conn.total_changes
         
+        # 单个事务内批量更新；分类未变化的行不写入
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.executemany('''
+            UPDATE skills SET category = ?, updated_at = ? WHERE id = ? AND category IS NOT ?
+        ''', [(s['new_category'], now, s['id'], s['new_category']) for s in categorized_skills])
         conn.commit()
+        updated_count = conn.total_changes - before
         
         return {
             'success': True,
@@ -1839,5 +2095,1113 @@ def delete_config(key: str) -> bool:
         conn.close()
 
 
+
+# ========================
+# LLM Response Cache
+# ========================
+
+def get_llm_cache_entry(cache_key: str, now: float) -> Optional[str]:
+    """
+    获取未过期的 LLM 缓存响应，并刷新其访问时间（LRU）。
+    
+    Args:
+        cache_key: 缓存键
+        now: 当前时间戳（秒）
+        
+    Returns:
+        缓存的响应文本，或 None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            SELECT response FROM llm_response_cache
+            WHERE cache_key = ? AND expires_at > ?
+        ''', (cache_key, now))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        
+        cursor.execute('''
+            UPDATE llm_response_cache
+            SET accessed_at = ?, hit_count = hit_count + 1
+            WHERE cache_key = ?
+        ''', (now, cache_key))
+        conn.commit()
+        return row['response']
+        
+    except Exception as e:
+        logger.error(f"Error getting LLM cache entry: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def save_llm_cache_entry(
+    cache_key: str,
+    response: str,
+    now: float,
+    expires_at: float,
+    max_entries: int,
+    model: str = None,
+    purpose: str = None
+) -> bool:
+    """
+    保存 LLM 响应到缓存，并清理过期及超出容量的条目（按最近访问时间淘汰）。
+    
+    Args:
+        cache_key: 缓存键
+        response: 响应文本
+        now: 当前时间戳（秒）
+        expires_at: 过期时间戳（秒）
+        max_entries: 缓存最大条目数
+        model: 模型名称
+        purpose: 调用用途
+        
+    Returns:
+        bool: True if successful
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO llm_response_cache
+            (cache_key, model, purpose, response, hit_count, accessed_at, expires_at)
+            VALUES (?, ?, ?, ?, 0, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+                response = excluded.response,
+                accessed_at = excluded.accessed_at,
+                expires_at = excluded.expires_at
+        ''', (cache_key, model, purpose, response, now, expires_at))
+        
+        cursor.execute('DELETE FROM llm_response_cache WHERE expires_at <= ?', (now,))
+        
+        cursor.execute('SELECT COUNT(*) FROM llm_response_cache')
+        overflow = cursor.fetchone()[0] - max_entries
+        if overflow > 0:
+            cursor.execute('''
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_response_cache
+                    ORDER BY accessed_at ASC
+                    LIMIT ?
+                )
+            ''', (overflow,))
+        
+        conn.commit()
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error saving LLM cache entry: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def get_llm_cache_summary() -> Dict[str, Any]:
+    """获取 LLM 缓存的条目数及按用途的分布。"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            SELECT COALESCE(purpose, 'default') as purpose,
+                   COUNT(*) as entries,
+                   SUM(hit_count) as hits
+            FROM llm_response_cache
+            GROUP BY COALESCE(purpose, 'default')
+        ''')
+        by_purpose = {row['purpose']: {'entries': row['entries'], 'hits': row['hits'] or 0}
+                      for row in cursor.fetchall()}
+        return {
+            'entries': sum(v['entries'] for v in by_purpose.values()),
+            'by_purpose': by_purpose
+        }
+    except Exception as e:
+        logger.error(f"Error getting LLM cache summary: {e}")
+        return {'entries': 0, 'by_purpose': {}}
+    finally:
+        conn.close()
+
+
+def clear_llm_cache() -> int:
+    """
+    清空 LLM 响应缓存。
+    
+    Returns:
+        删除的条目数
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('DELETE FROM llm_response_cache')
+        conn.commit()
+        return cursor.rowcount
+    except Exception as e:
+        logger.error(f"Error clearing LLM cache: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+
+# ========================
+# Generation Drafts
+# ========================
+
+def save_generation_draft(kind: str, scope: str, content: str, status: str = 'partial') -> bool:
+    """
+    保存生成草稿（流式生成中断时的部分输出，或完整输出）。
+    
+    Args:
+        kind: 生成类型（weekly_report, okr, star）
+        scope: 草稿范围（周报为 "开始日期~结束日期"，OKR 为季度，STAR 为项目 ID）
+        content: 草稿内容
+        status: partial 或 complete
+        
+    Returns:
+        bool: True if successful
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO generation_drafts (kind, scope, content, status, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(kind, scope) DO UPDATE SET
+                content = excluded.content,
+                status = excluded.status,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (kind, scope, content, status))
+        
+        conn.commit()
+        logger.info(f"Generation draft saved: {kind} / {scope} ({status})")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error saving generation draft: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def get_generation_draft(kind: str, scope: str) -> Optional[Dict[str, Any]]:
+    """
+    获取生成草稿。
+    
+    Args:
+        kind: 生成类型
+        scope: 草稿范围
+        
+    Returns:
+        草稿字典，或 None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(
+            'SELECT * FROM generation_drafts WHERE kind = ? AND scope = ?',
+            (kind, scope)
+        )
+        row = cursor.fetchone()
+        return dict(row) if row else None
+        
+    except Exception as e:
+        logger.error(f"Error getting generation draft: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+
+# ========================
+# LLM In-flight Requests (single-flight across workers)
+# ========================
+
+def claim_llm_flight(flight_key: str, owner: str, now: float, lease_seconds: float) -> bool:
+    """
+    尝试成为某个 LLM 请求的执行者（leader）。
+    
+    已结束（done/failed）或租约过期的记录会被替换。
+    
+    Args:
+        flight_key: 请求键
+        owner: 执行者标识
+        now: 当前时间戳（秒）
+        lease_seconds: 租约时长，执行者崩溃后其他 worker 可在租约到期后接管
+        
+    Returns:
+        bool: True if this owner now holds the flight
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            DELETE FROM llm_inflight
+            WHERE flight_key = ? AND (status != 'running' OR lease_expires <= ?)
+        ''', (flight_key, now))
+        cursor.execute('''
+            INSERT OR IGNORE INTO llm_inflight (flight_key, owner, status, lease_expires, updated_at)
+            VALUES (?, ?, 'running', ?, ?)
+        ''', (flight_key, owner, now + lease_seconds, now))
+        claimed = cursor.rowcount == 1
+        conn.commit()
+        return claimed
+        
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error claiming LLM flight: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def finish_llm_flight(
+    flight_key: str,
+    owner: str,
+    now: float,
+    response: str = None,
+    error: str = None
+) -> bool:
+    """
+    记录 LLM 请求的结果，供等待中的其他 worker 读取。
+    
+    Args:
+        flight_key: 请求键
+        owner: 执行者标识（只更新自己持有的记录）
+        now: 当前时间戳（秒）
+        response: 成功时的响应文本
+        error: 失败时的错误信息
+        
+    Returns:
+        bool: True if the record was updated
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            UPDATE llm_inflight
+            SET status = ?, response = ?, error = ?, updated_at = ?
+            WHERE flight_key = ? AND owner = ?
+        ''', ('failed' if error is not None else 'done', response, error, now, flight_key, owner))
+        updated = cursor.rowcount == 1
+        
+        # 顺带清理早已结束的记录
+        cursor.execute('''
+            DELETE FROM llm_inflight
+            WHERE status != 'running' AND updated_at < ?
+        ''', (now - 3600,))
+        
+        conn.commit()
+        return updated
+        
+    except Exception as e:
+        logger.error(f"Error finishing LLM flight: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def release_llm_flight(flight_key: str, owner: str) -> bool:
+    """
+    放弃执行某个 LLM 请求（不记录结果），等待中的 worker 可以立即接管。
+    
+    Args:
+        flight_key: 请求键
+        owner: 执行者标识（只删除自己持有的记录）
+        
+    Returns:
+        bool: True if the record was removed
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('DELETE FROM llm_inflight WHERE flight_key = ? AND owner = ?', (flight_key, owner))
+        released = cursor.rowcount == 1
+        conn.commit()
+        return released
+        
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error releasing LLM flight: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def get_llm_flight(flight_key: str) -> Optional[Dict[str, Any]]:
+    """
+    获取 LLM 进行中请求的记录。
+    
+    Args:
+        flight_key: 请求键
+        
+    Returns:
+        记录字典，或 None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('SELECT * FROM llm_inflight WHERE flight_key = ?', (flight_key,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+        
+    except Exception as e:
+        logger.error(f"Error getting LLM flight: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+# ========================
+# LLM Telemetry
+# ========================
+
+TELEMETRY_COLUMNS = [
+    'ts', 'day', 'purpose', 'endpoint', 'model', 'stream',
+    'prompt_chars', 'response_chars', 'prompt_tokens', 'completion_tokens',
+    'total_tokens', 'tokens_estimated', 'connect_ms', 'first_byte_ms',
+    'total_ms', 'attempts', 'retries', 'outcome', 'error_kind'
+]
+
+
+def insert_llm_telemetry(records: List[Dict[str, Any]], max_rows: int) -> int:
+    """
+    批量写入 LLM 调用记录，并删除超出上限的最旧记录。
+    
+    Args:
+        records: 记录字典列表（键见 TELEMETRY_COLUMNS，缺省为 NULL）
+        max_rows: 表内最多保留的记录数
+        
+    Returns:
+        写入的记录数
+    """
+    if not records:
+        return 0
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        placeholders = ', '.join('?' for _ in TELEMETRY_COLUMNS)
+        cursor.executemany(
+            f"INSERT INTO llm_telemetry ({', '.join(TELEMETRY_COLUMNS)}) VALUES ({placeholders})",
+            [tuple(record.get(col) for col in TELEMETRY_COLUMNS) for record in records]
+        )
+        cursor.execute('''
+            DELETE FROM llm_telemetry
+            WHERE id <= (SELECT MAX(id) FROM llm_telemetry) - ?
+        ''', (max_rows,))
+        conn.commit()
+        return len(records)
+        
+    except Exception as e:
+        logger.error(f"Error inserting LLM telemetry: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+def get_llm_telemetry(since_day: str = None, purpose: str = None) -> List[Dict[str, Any]]:
+    """
+    获取 LLM 调用记录（按时间升序）。
+    
+    Args:
+        since_day: 起始日期 (YYYY-MM-DD)，含当天
+        purpose: 只返回该用途的记录
+        
+    Returns:
+        记录字典列表
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        query = 'SELECT * FROM llm_telemetry WHERE 1=1'
+        params = []
+        if since_day:
+            query += ' AND day >= ?'
+            params.append(since_day)
+        if purpose:
+            query += ' AND purpose = ?'
+            params.append(purpose)
+        query += ' ORDER BY id ASC'
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+        
+    except Exception as e:
+        logger.error(f"Error getting LLM telemetry: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def clear_llm_telemetry() -> int:
+    """
+    清空 LLM 调用记录。
+    
+    Returns:
+        删除的记录数
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('DELETE FROM llm_telemetry')
+        conn.commit()
+        return cursor.rowcount
+    except Exception as e:
+        logger.error(f"Error clearing LLM telemetry: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+
+# ========================
+# Work Item Extraction Progress
+# ========================
+
+def set_extraction_status(log_date: str, status: str, items_count: int = 0, error: str = None) -> bool:
+    """
+    记录某天日志的提取状态。
+    
+    Args:
+        log_date: 日志日期 (YYYY-MM-DD)
+        status: pending, running, done, failed
+        items_count: 保存的工作项数
+        error: 失败原因
+        
+    Returns:
+        bool: True if successful
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO work_item_extractions (log_date, status, items_count, error, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(log_date) DO UPDATE SET
+                status = excluded.status,
+                items_count = excluded.items_count,
+                error = excluded.error,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (log_date, status, items_count, error))
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error saving extraction status: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def get_extraction_statuses(start_date: str, end_date: str) -> Dict[str, Dict[str, Any]]:
+    """
+    获取日期范围内各天的提取状态。
+    
+    Returns:
+        {log_date: 状态记录}
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            SELECT * FROM work_item_extractions
+            WHERE log_date >= ? AND log_date <= ?
+            ORDER BY log_date
+        ''', (start_date, end_date))
+        return {row['log_date']: dict(row) for row in cursor.fetchall()}
+    except Exception as e:
+        logger.error(f"Error getting extraction statuses: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def delete_extracted_work_items(log_date: str) -> int:
+    """
+    删除某天由 LLM 提取的工作项（重新提取前调用，避免重复）。
+    
+    Returns:
+        删除的记录数
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(
+            "DELETE FROM work_items WHERE raw_log_date = ? AND extraction_status = 'extracted'",
+            (log_date,)
+        )
+        conn.commit()
+        return cursor.rowcount
+    except Exception as e:
+        logger.error(f"Error deleting extracted work items: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+
+# ========================
+# Background Jobs
+# ========================
+
+JOB_JSON_FIELDS = ('params', 'progress', 'checkpoint', 'result')
+JOB_ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _job_from_row(row) -> Dict[str, Any]:
+    """Decode the JSON columns of a jobs row"""
+    job = dict(row)
+    for field in JOB_JSON_FIELDS:
+        if job.get(field):
+            job[field] = json.loads(job[field])
+    job['cancel_requested'] = bool(job.get('cancel_requested'))
+    return job
+
+
+def create_job(job_id: str, kind: str, params: Dict, dedup_key: Optional[str], now: float) -> Optional[Dict[str, Any]]:
+    """
+    创建后台任务；若已有相同 dedup_key 的排队中/运行中任务，则返回该任务。
+    
+    Args:
+        job_id: 新任务 ID
+        kind: 任务类型
+        params: 任务参数
+        dedup_key: 去重键（None 表示不去重）
+        now: 当前时间戳（秒）
+        
+    Returns:
+        新建或已存在的任务字典，失败时为 None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        if dedup_key:
+            cursor.execute('''
+                SELECT * FROM jobs
+                WHERE dedup_key = ? AND status IN ('queued', 'running')
+                ORDER BY created_at LIMIT 1
+            ''', (dedup_key,))
+            row = cursor.fetchone()
+            if row:
+                conn.commit()
+                return _job_from_row(row)
+        
+        cursor.execute('''
+            INSERT INTO jobs (id, kind, params, dedup_key, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 'queued', ?, ?)
+        ''', (job_id, kind, json.dumps(params, ensure_ascii=False), dedup_key, now, now))
+        cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        conn.commit()
+        return _job_from_row(row)
+        
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error creating job: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def claim_job(worker: str, now: float, lease_seconds: float, max_attempts: int) -> Optional[Dict[str, Any]]:
+    """
+    领取下一个任务：最早的排队任务，或租约已过期的运行中任务（执行者崩溃/重启）。
+    
+    超过 max_attempts 次仍未完成的过期任务标记为失败。
+    
+    Args:
+        worker: 执行者标识
+        now: 当前时间戳（秒）
+        lease_seconds: 租约时长，执行者需在到期前续约
+        max_attempts: 最多领取次数
+        
+    Returns:
+        领取到的任务字典，没有可执行任务时为 None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            UPDATE jobs
+            SET status = 'failed', error = '任务执行者多次中断，已放弃', finished_at = ?, updated_at = ?
+            WHERE status = 'running' AND lease_expires <= ? AND attempts >= ?
+        ''', (now, now, now, max_attempts))
+        cursor.execute('''
+            UPDATE jobs
+            SET status = 'cancelled', finished_at = ?, updated_at = ?
+            WHERE status = 'running' AND lease_expires <= ? AND cancel_requested = 1
+        ''', (now, now, now))
+        cursor.execute('''
+            SELECT id FROM jobs
+            WHERE status = 'queued' OR (status = 'running' AND lease_expires <= ?)
+            ORDER BY created_at LIMIT 1
+        ''', (now,))
+        row = cursor.fetchone()
+        if not row:
+            conn.commit()
+            return None
+        
+        cursor.execute('''
+            UPDATE jobs
+            SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1,
+                started_at = COALESCE(started_at, ?), updated_at = ?
+            WHERE id = ?
+        ''', (worker, now + lease_seconds, now, now, row['id']))
+        cursor.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],))
+        job = _job_from_row(cursor.fetchone())
+        conn.commit()
+        return job
+        
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error claiming job: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def touch_job(
+    job_id: str,
+    worker: str,
+    lease_expires: float,
+    now: float,
+    progress: Optional[Dict] = None,
+    checkpoint: Optional[Dict] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    续约运行中的任务，可同时保存进度和断点。
+    
+    Returns:
+        任务字典（含 cancel_requested）；任务已不归该执行者所有时为 None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        sets = ['lease_expires = ?', 'updated_at = ?']
+        values: List[Any] = [lease_expires, now]
+        if progress is not None:
+            sets.append('progress = ?')
+            values.append(json.dumps(progress, ensure_ascii=False))
+        if checkpoint is not None:
+            sets.append('checkpoint = ?')
+            values.append(json.dumps(checkpoint, ensure_ascii=False))
+        cursor.execute(f'''
+            UPDATE jobs SET {', '.join(sets)}
+            WHERE id = ? AND worker = ? AND status = 'running'
+        ''', values + [job_id, worker])
+        conn.commit()
+        if cursor.rowcount == 0:
+            return None
+        cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        return _job_from_row(cursor.fetchone())
+        
+    except Exception as e:
+        logger.error(f"Error updating job: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def finish_job(
+    job_id: str,
+    worker: str,
+    status: str,
+    now: float,
+    result: Optional[Dict] = None,
+    error: Optional[str] = None
+) -> bool:
+    """
+    结束任务（done / failed / cancelled）。
+    
+    Returns:
+        bool: 任务仍归该执行者所有并已更新时为 True
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            UPDATE jobs
+            SET status = ?, result = ?, error = ?, finished_at = ?, updated_at = ?, lease_expires = NULL
+            WHERE id = ? AND worker = ? AND status = 'running'
+        ''', (
+            status,
+            json.dumps(result, ensure_ascii=False) if result is not None else None,
+            error, now, now, job_id, worker
+        ))
+        conn.commit()
+        return cursor.rowcount == 1
+        
+    except Exception as e:
+        logger.error(f"Error finishing job: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def cancel_job(job_id: str, now: float) -> Optional[Dict[str, Any]]:
+    """
+    取消任务：排队中的任务直接取消，运行中的任务标记取消请求，由执行者在下一个检查点停止。
+    
+    Returns:
+        更新后的任务字典，不存在时为 None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ?, updated_at = ?
+            WHERE id = ? AND status = 'queued'
+        ''', (now, now, job_id))
+        cursor.execute('''
+            UPDATE jobs SET cancel_requested = 1, updated_at = ?
+            WHERE id = ? AND status = 'running'
+        ''', (now, job_id))
+        conn.commit()
+        cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        return _job_from_row(row) if row else None
+        
+    except Exception as e:
+        logger.error(f"Error cancelling job: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """获取任务详情。"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        return _job_from_row(row) if row else None
+    except Exception as e:
+        logger.error(f"Error getting job: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def list_jobs(status: str = None, kind: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """按创建时间倒序列出任务（不含 result，避免列表过大）。"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        query = 'SELECT * FROM jobs WHERE 1=1'
+        params: List[Any] = []
+        if status:
+            query += ' AND status = ?'
+            params.append(status)
+        if kind:
+            query += ' AND kind = ?'
+            params.append(kind)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+        cursor.execute(query, params)
+        jobs = []
+        for row in cursor.fetchall():
+            job = _job_from_row(row)
+            job.pop('result', None)
+            jobs.append(job)
+        return jobs
+    except Exception as e:
+        logger.error(f"Error listing jobs: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+# ========================
+# Skill Category Decisions
+# ========================
+
+def get_skill_category_decisions() -> Dict[str, Dict[str, Any]]:
+    """
+    获取已缓存的技能分类决策。
+    
+    Returns:
+        Dict: {normalized_name: {category, model, updated_at}}
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('SELECT normalized_name, category, model, updated_at FROM skill_category_cache')
+        return {
+            row['normalized_name']: {
+                'category': row['category'],
+                'model': row['model'],
+                'updated_at': row['updated_at']
+            }
+            for row in cursor.fetchall()
+        }
+    except Exception as e:
+        logger.error(f"Error getting skill category decisions: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def save_skill_category_decisions(decisions: Dict[str, str], model: str = None) -> int:
+    """
+    批量保存技能分类决策（已存在的覆盖）。
+    
+    Args:
+        decisions: {normalized_name: category}
+        model: 给出分类的模型
+        
+    Returns:
+        int: 保存的条数
+    """
+    if not decisions:
+        return 0
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        now = datetime.now().isoformat()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.executemany('''
+            INSERT INTO skill_category_cache (normalized_name, category, model, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(normalized_name) DO UPDATE SET
+                category = excluded.category,
+                model = excluded.model,
+                updated_at = excluded.updated_at
+        ''', [(name, category, model, now) for name, category in decisions.items()])
+        conn.commit()
+        return len(decisions)
+    except Exception as e:
+        logger.error(f"Error saving skill category decisions: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        conn.close()
+
+
+# ========================
+# STAR Summary State
+# ========================
+
+def get_star_states() -> Dict[int, Dict[str, Any]]:
+    """
+    获取所有项目的 STAR 生成状态。
+    
+    Returns:
+        Dict: {project_id: {fingerprint, items_count, windows_count, generated_at}}
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('SELECT * FROM star_summary_state')
+        return {row['project_id']: dict(row) for row in cursor.fetchall()}
+    except Exception as e:
+        logger.error(f"Error getting STAR states: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def save_star_state(project_id: int, fingerprint: str, items_count: int, windows_count: int = 0) -> bool:
+    """
+    记录项目 STAR 总结生成时的工作项指纹。
+    
+    Args:
+        project_id: 项目 ID
+        fingerprint: 工作项指纹
+        items_count: 工作项数
+        windows_count: 分段总结的时间段数（0 表示未分段）
+        
+    Returns:
+        bool: True if successful
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO star_summary_state (project_id, fingerprint, items_count, windows_count, generated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(project_id) DO UPDATE SET
+                fingerprint = excluded.fingerprint,
+                items_count = excluded.items_count,
+                windows_count = excluded.windows_count,
+                generated_at = CURRENT_TIMESTAMP
+        ''', (project_id, fingerprint, items_count, windows_count))
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error saving STAR state: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def get_period_summaries(level: str, periods: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    获取已缓存的月度/季度总结。
+    
+    Args:
+        level: month 或 quarter
+        periods: 期间列表（如 2025-10、2025-Q4）
+        
+    Returns:
+        Dict: {period: {fingerprint, summary, sources, generated_at}}，只包含已缓存的
+    """
+    if not periods:
+        return {}
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        placeholders = ','.join('?' * len(periods))
+        cursor.execute(
+            f'SELECT * FROM period_summaries WHERE level = ? AND period IN ({placeholders})',
+            [level] + list(periods)
+        )
+        summaries = {}
+        for row in cursor.fetchall():
+            summary = dict(row)
+            summary['sources'] = json.loads(summary['sources'] or '{}')
+            summaries[summary['period']] = summary
+        return summaries
+    except Exception as e:
+        logger.error(f"Error getting period summaries: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def save_period_summary(level: str, period: str, fingerprint: str, summary: str, sources: Dict[str, Any]) -> bool:
+    """
+    保存月度/季度总结及其输入指纹。
+    
+    Args:
+        level: month 或 quarter
+        period: 期间（如 2025-10、2025-Q4）
+        fingerprint: 下一层内容的指纹
+        summary: 总结内容
+        sources: 输入概况（周数、工作项数等）
+        
+    Returns:
+        bool: True if successful
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO period_summaries (level, period, fingerprint, summary, sources, generated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(level, period) DO UPDATE SET
+                fingerprint = excluded.fingerprint,
+                summary = excluded.summary,
+                sources = excluded.sources,
+                generated_at = CURRENT_TIMESTAMP
+        ''', (level, period, fingerprint, summary, json.dumps(sources, ensure_ascii=False)))
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error saving period summary: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def get_star_partials(fingerprints: List[str]) -> Dict[str, str]:
+    """
+    按指纹获取已缓存的时间段总结。
+    
+    Args:
+        fingerprints: 时间段指纹列表
+        
+    Returns:
+        Dict: {fingerprint: summary}，只包含已缓存的
+    """
+    if not fingerprints:
+        return {}
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        placeholders = ','.join('?' * len(fingerprints))
+        cursor.execute(
+            f'SELECT fingerprint, summary FROM star_partial_summaries WHERE fingerprint IN ({placeholders})',
+            list(fingerprints)
+        )
+        return {row['fingerprint']: row['summary'] for row in cursor.fetchall()}
+    except Exception as e:
+        logger.error(f"Error getting STAR partial summaries: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def save_star_partials(project_id: int, partials: List[Dict]) -> int:
+    """
+    批量保存时间段总结，并清理该项目不再使用的旧总结。
+    
+    Args:
+        project_id: 项目 ID
+        partials: 当前全部时间段的 {fingerprint, window, summary}
+        
+    Returns:
+        int: 保存的条数
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.executemany('''
+            INSERT OR REPLACE INTO star_partial_summaries (fingerprint, project_id, window_label, summary, created_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', [(p['fingerprint'], project_id, p['window'], p['summary']) for p in partials])
+        keep = [p['fingerprint'] for p in partials]
+        placeholders = ','.join('?' * len(keep)) or "''"
+        cursor.execute(
+            f'DELETE FROM star_partial_summaries WHERE project_id = ? AND fingerprint NOT IN ({placeholders})',
+            [project_id] + keep
+        )
+        conn.commit()
+        return len(partials)
+    except Exception as e:
+        logger.error(f"Error saving STAR partial summaries: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        conn.close()
+
+
 # Initialize database on module import
 init_database()
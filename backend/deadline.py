@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+deadline.py - Per-request time budget for LLM-backed work
+
+A Deadline is created when a request comes in (Config.REQUEST_DEADLINE,
+kept below the gunicorn worker timeout) and passed down through generator
+functions into LLMClient. Each provider attempt gets at most the remaining
+budget as its timeout, retries whose backoff would not leave room for
+another attempt are skipped, and DeadlineExceeded is raised instead of
+letting the worker be killed mid-call.
+"""
+
+import time
+from typing import Optional
+
+from config import Config
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's time budget runs out before the LLM answered"""
+
+    def __init__(self, label: str, last_error: Optional[Exception] = None):
+        message = f"{label}: request deadline exceeded"
+        if last_error is not None:
+            message += f" (last error: {last_error})"
+        super().__init__(message)
+        self.label = label
+        self.last_error = last_error
+
+
+class Deadline:
+    """Absolute point in time (monotonic clock) by which a request must finish"""
+
+    def __init__(self, seconds: float):
+        """
+        Args:
+            seconds: Budget from now
+        """
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def can_fit(self, seconds: float) -> bool:
+        """Whether waiting `seconds` still leaves time for a useful attempt"""
+        return self.remaining() - seconds >= Config.LLM_MIN_ATTEMPT_TIMEOUT
+
+    def timeout(self, default: float) -> float:
+        """Timeout for the next attempt: default, shortened to the remaining budget"""
+        return min(default, self.remaining())
+
+    def check(self, label: str):
+        """
+        Raise if there is no longer room for an attempt.
+
+        Raises:
+            DeadlineExceeded: If less than LLM_MIN_ATTEMPT_TIMEOUT remains
+        """
+        if not self.can_fit(0):
+            raise DeadlineExceeded(label)
+
+
+def request_deadline(seconds: Optional[float] = None) -> Optional[Deadline]:
+    """
+    Deadline for an incoming HTTP request.
+
+    Args:
+        seconds: Budget (default Config.REQUEST_DEADLINE)
+
+    Returns:
+        Deadline, or None when the budget is 0 (disabled)
+    """
+    seconds = Config.REQUEST_DEADLINE if seconds is None else seconds
+    return Deadline(seconds) if seconds > 0 else None
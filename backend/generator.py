@@ -7,26 +7,44 @@ generator.py - Weekly report and OKR generation logic
 import logging
 import re
 import json
-from typing import Dict, Optional, List
+import hashlib
+import unicodedata
+from typing import Dict, Optional, List, Iterator, Tuple
 from parser import parse_and_categorize, get_current_week_range, format_date
 from llm_client import get_llm_client, LLMClient
+from circuit_breaker import CircuitOpenError
+from deadline import Deadline, DeadlineExceeded
+import json_repair
 from prompts import (
     get_weekly_report_system_prompt,
     get_weekly_report_user_prompt,
     get_okr_system_prompt,
-    get_okr_user_prompt
+    get_okr_user_prompt,
+    get_chunk_summary_system_prompt,
+    get_chunk_summary_user_prompt
 )
+from token_budget import estimate_tokens, get_model_limits, chunk_text
 from config import Config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEADLINE_ERROR = '请求超时：LLM 未能在时限内返回结果，请稍后重试或改用异步任务（"async": true）'
+
+
+def _deadline_error(e: DeadlineExceeded, **fields) -> Dict:
+    """Failed result for a request whose time budget ran out"""
+    logger.warning(f"Generation stopped at the request deadline: {e}")
+    return {'success': False, 'error': DEADLINE_ERROR, 'timeout': True, **fields}
+
 
 def generate_weekly_report(
     daily_content: str, 
     use_mock: bool = False,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
+    end_date: Optional[str] = None,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
 ) -> Dict:
     """
     Generate weekly report from daily report content.
@@ -36,6 +54,8 @@ def generate_weekly_report(
         use_mock: Whether to use mock LLM client
         start_date: Optional start date (YYYY-MM-DD format)
         end_date: Optional end date (YYYY-MM-DD format)
+        use_cache: Whether an identical earlier completion may be reused
+        deadline: Request time budget; when it runs out the result has timeout=True
         
     Returns:
         Dict with:
@@ -44,11 +64,11 @@ def generate_weekly_report(
         - parsed_data: parsed content info
         - error: error message (if failed)
     """
-    # Validate input length
-    if len(daily_content) > Config.MAX_INPUT_CHARS:
+    # Validate input length (longer than MAX_INPUT_CHARS is summarized in chunks)
+    if len(daily_content) > Config.MAX_TOTAL_INPUT_CHARS:
         return {
             'success': False,
-            'error': f'输入超过最大长度限制 ({Config.MAX_INPUT_CHARS} 字符)',
+            'error': f'输入超过最大长度限制 ({Config.MAX_TOTAL_INPUT_CHARS} 字符)',
             'parsed_data': None
         }
     
@@ -65,20 +85,51 @@ def generate_weekly_report(
             friday = parsed_data['week_range']['friday']
         
         # Get LLM client
-        llm_client = get_llm_client(use_mock=use_mock)
+        llm_client = get_llm_client(use_mock=use_mock, purpose='weekly_report')
+        
+        # Condense over-long input first (map-reduce)
+        material, reduction = reduce_long_input(
+            daily_content, 'weekly_report', llm_client, use_mock=use_mock, use_cache=use_cache, deadline=deadline
+        )
         
         # Generate prompts
         system_prompt = get_weekly_report_system_prompt()
-        user_prompt = get_weekly_report_user_prompt(monday, friday, daily_content)
+        user_prompt = get_weekly_report_user_prompt(monday, friday, material)
         
         # Call LLM
-        report = llm_client.call(user_prompt, system_prompt)
+        report = llm_client.call(
+            user_prompt, system_prompt, purpose='weekly_report', use_cache=use_cache, deadline=deadline
+        )
         
-        return {
+        result = {
             'success': True,
             'report': report,
             'parsed_data': parsed_data
         }
+        if reduction:
+            result['map_reduce'] = reduction
+        return result
+        
+    except CircuitOpenError as e:
+        logger.warning(f"Weekly report generation failed fast: {e}")
+        if not Config.LLM_DEGRADED_FALLBACK:
+            return {
+                'success': False,
+                'error': str(e),
+                'parsed_data': None,
+                'circuit_open': True,
+                'retry_after': e.retry_in
+            }
+        return {
+            'success': True,
+            'report': build_degraded_weekly_report(parsed_data, monday, friday),
+            'parsed_data': parsed_data,
+            'degraded': True,
+            'degraded_reason': str(e)
+        }
+        
+    except DeadlineExceeded as e:
+        return _deadline_error(e, parsed_data=None)
         
     except Exception as e:
         logger.error(f"Weekly report generation failed: {e}")
@@ -89,7 +140,13 @@ def generate_weekly_report(
         }
 
 
-def generate_okr(content: str, next_quarter: str = "2026第一季度", use_mock: bool = False) -> Dict:
+def generate_okr(
+    content: str,
+    next_quarter: str = "2026第一季度",
+    use_mock: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Dict:
     """
     Generate OKR from historical materials.
     
@@ -97,6 +154,8 @@ def generate_okr(content: str, next_quarter: str = "2026第一季度", use_mock:
         content: Historical materials, weekly reports, etc.
         next_quarter: Target quarter string
         use_mock: Whether to use mock LLM client
+        use_cache: Whether an identical earlier completion may be reused
+        deadline: Request time budget; when it runs out the result has timeout=True
         
     Returns:
         Dict with:
@@ -104,28 +163,48 @@ def generate_okr(content: str, next_quarter: str = "2026第一季度", use_mock:
         - okr: generated OKR string (if successful)
         - error: error message (if failed)
     """
-    # Validate input length
-    if len(content) > Config.MAX_INPUT_CHARS:
+    # Validate input length (longer than MAX_INPUT_CHARS is summarized in chunks)
+    if len(content) > Config.MAX_TOTAL_INPUT_CHARS:
         return {
             'success': False,
-            'error': f'输入超过最大长度限制 ({Config.MAX_INPUT_CHARS} 字符)'
+            'error': f'输入超过最大长度限制 ({Config.MAX_TOTAL_INPUT_CHARS} 字符)'
         }
     
     try:
         # Get LLM client
-        llm_client = get_llm_client(use_mock=use_mock)
+        llm_client = get_llm_client(use_mock=use_mock, purpose='okr')
+        
+        # Condense over-long input first (map-reduce)
+        material, reduction = reduce_long_input(
+            content, 'okr', llm_client, use_mock=use_mock, use_cache=use_cache, deadline=deadline
+        )
         
         # Generate prompts
         system_prompt = get_okr_system_prompt()
-        user_prompt = get_okr_user_prompt(content, next_quarter)
+        user_prompt = get_okr_user_prompt(material, next_quarter)
         
         # Call LLM
-        okr = llm_client.call(user_prompt, system_prompt)
+        okr = llm_client.call(user_prompt, system_prompt, purpose='okr', use_cache=use_cache, deadline=deadline)
         
-        return {
+        result = {
             'success': True,
             'okr': okr
         }
+        if reduction:
+            result['map_reduce'] = reduction
+        return result
+        
+    except CircuitOpenError as e:
+        logger.warning(f"OKR generation failed fast: {e}")
+        return {
+            'success': False,
+            'error': str(e),
+            'circuit_open': True,
+            'retry_after': e.retry_in
+        }
+        
+    except DeadlineExceeded as e:
+        return _deadline_error(e)
         
     except Exception as e:
         logger.error(f"OKR generation failed: {e}")
@@ -135,6 +214,167 @@ def generate_okr(content: str, next_quarter: str = "2026第一季度", use_mock:
         }
 
 
+# ========================================
+# Map-Reduce for Long Inputs
+# ========================================
+
+# 最多压缩轮数：一个季度的日报通常一轮即可
+MAX_REDUCE_ROUNDS = 3
+
+
+def needs_map_reduce(content: str, model: Optional[str]) -> bool:
+    """Check whether input is too long to send to the model in one prompt"""
+    limits = get_model_limits(model)
+    return (
+        len(content) > Config.MAX_INPUT_CHARS
+        or estimate_tokens(content) > limits['direct_input_tokens']
+    )
+
+
+def reduce_long_input(
+    content: str,
+    target: str,
+    llm_client,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Tuple[str, Optional[Dict]]:
+    """
+    Condense input that exceeds the model's direct budget (map step).
+    
+    The text is cut into chunks at day boundaries, each chunk is summarized
+    in parallel, and the summaries are joined. This repeats while the result
+    is still over budget (at most MAX_REDUCE_ROUNDS). The chunk summaries
+    run on the summarize tier, sized for that tier's model; the caller then
+    runs the normal weekly/OKR prompt on the target's tier over the
+    condensed material (reduce step).
+    
+    Args:
+        content: Raw input
+        target: weekly_report or okr (selects map prompt wording)
+        llm_client: Client used for the final prompt; its model sets the limits
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether identical earlier chunk summaries may be reused
+        deadline: Request time budget shared by the chunk summaries
+        
+    Returns:
+        (material, info) where info is None when the input was used as-is,
+        otherwise chunk/round/token statistics
+        
+    Raises:
+        RuntimeError: If a chunk summary fails
+        CircuitOpenError: If the provider's circuit breaker is open
+        DeadlineExceeded: If the deadline ran out during the map step
+    """
+    from async_llm_client import run_llm_batch
+    
+    model = getattr(llm_client, 'model', None) or 'mock'
+    if not needs_map_reduce(content, model):
+        return content, None
+    
+    # 分段摘要走 summarize 档位，分段大小按该档位的模型计算
+    map_model = getattr(get_llm_client(use_mock=use_mock, purpose='summarize'), 'model', None) or model
+    limits = get_model_limits(map_model)
+    system_prompt = get_chunk_summary_system_prompt(target)
+    info = {
+        'input_chars': len(content),
+        'input_tokens': estimate_tokens(content),
+        'chunks': [],
+        'rounds': 0
+    }
+    
+    material = content
+    while info['rounds'] < MAX_REDUCE_ROUNDS and needs_map_reduce(material, model):
+        if deadline:
+            deadline.check(f"map-reduce round {info['rounds'] + 1} for {target}")
+        chunks = chunk_text(material, limits['chunk_tokens'])
+        logger.info(f"Map-reduce round {info['rounds'] + 1}: {len(chunks)} chunks for {target}")
+        
+        responses = run_llm_batch([
+            {
+                'prompt': get_chunk_summary_user_prompt(chunk, i + 1, len(chunks)),
+                'system_prompt': system_prompt,
+                'purpose': 'chunk_summary',
+                'use_cache': use_cache,
+                'deadline': deadline
+            }
+            for i, chunk in enumerate(chunks)
+        ], use_mock=use_mock, purpose='summarize')
+        
+        for i, response in enumerate(responses):
+            if isinstance(response, (CircuitOpenError, DeadlineExceeded)):
+                raise response
+            if isinstance(response, Exception):
+                raise RuntimeError(f'第 {i + 1}/{len(chunks)} 段材料摘要失败: {response}')
+        
+        condensed = '\n\n'.join(r.strip() for r in responses if r and r.strip())
+        info['chunks'].append(len(chunks))
+        info['rounds'] += 1
+        if len(condensed) >= len(material):
+            # 摘要没有变短，继续压缩没有意义
+            break
+        material = condensed
+    
+    info['reduced_chars'] = len(material)
+    info['reduced_tokens'] = estimate_tokens(material)
+    return material, info
+
+
+# ========================================
+# Degraded Fallback (LLM circuit open)
+# ========================================
+
+def build_degraded_weekly_report(parsed_data: Dict, monday: str, friday: str) -> str:
+    """
+    Build a rule-based weekly report draft from parse_and_categorize output.
+    
+    Used while the LLM circuit breaker is open. Entries are grouped by the
+    keyword categories and deduplicated, not summarized; the draft keeps the
+    required section layout so it passes validate_weekly_report.
+    
+    Args:
+        parsed_data: Result of parse_and_categorize
+        monday: Week start date (YYYY-MM-DD)
+        friday: Week end date (YYYY-MM-DD)
+        
+    Returns:
+        Weekly report draft text
+    """
+    categories = parsed_data.get('categories', {})
+    blocks = parsed_data.get('blocks', [])
+    total = sum(len(entries) for entries in categories.values())
+    
+    def bullets(key: str) -> List[str]:
+        return [f"- {entry}" for entry in categories.get(key, [])]
+    
+    lines = [
+        f"周报（{monday} ~ {friday}）",
+        "",
+        f"本周一句话总结：本周记录{len(blocks)}天、{total}项工作（LLM 服务暂不可用，本稿按关键词自动整理，请人工润色）。",
+        "",
+        "1、手上项目、服务化能力建设、预研的主要进展",
+        "",
+        "手上项目",
+        *bullets('project'),
+        "",
+        "服务化能力建设",
+        *bullets('service'),
+        "",
+        "预研",
+        *bullets('research'),
+        "",
+        "2、是否有风险，哪些风险点？",
+        "- 自动草稿未做风险分析，请人工补充",
+        "",
+        "3、其他的事务性工作",
+        *bullets('other_affairs'),
+        "",
+        "4、下周大概的计划",
+        "- 待补充"
+    ]
+    return '\n'.join(lines)
+
+
 def validate_weekly_report(report: str) -> Dict:
     """
     Validate weekly report structure against requirements.
@@ -242,6 +482,282 @@ def validate_okr(okr: str) -> Dict:
     }
 
 
+# ========================================
+# Streaming Generation
+# ========================================
+#
+# Streaming variants yield event dicts instead of returning one result:
+# - {'event': 'meta', ...}: context known before the LLM call
+# - {'event': 'reduced', ...}: long input was condensed first (map-reduce stats)
+# - {'event': 'delta', 'content': str}: a chunk of generated text
+# - {'event': 'done', ...}: the final text plus validation
+# - {'event': 'error', 'error': str, 'partial': str}
+#
+# The request deadline covers the map step and opening the stream; once
+# text is flowing it runs to the end (stalls are bounded by the read timeout).
+
+def _stream_llm_text(
+    llm_client,
+    user_prompt: str,
+    system_prompt: str,
+    purpose: str,
+    use_cache: bool,
+    parts: List[str],
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """Relay LLM chunks as delta events, collecting them into parts"""
+    for chunk in llm_client.stream(user_prompt, system_prompt, purpose=purpose, use_cache=use_cache, deadline=deadline):
+        parts.append(chunk)
+        yield {'event': 'delta', 'content': chunk}
+
+
+def _stream_deadline_error(e: DeadlineExceeded, parts: List[str]) -> Dict:
+    """Error event for a stream whose time budget ran out before output started"""
+    logger.warning(f"Streaming generation stopped at the request deadline: {e}")
+    return {'event': 'error', 'error': DEADLINE_ERROR, 'partial': ''.join(parts), 'timeout': True}
+
+
+def stream_weekly_report(
+    daily_content: str,
+    use_mock: bool = False,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """
+    Stream weekly report generation (see generate_weekly_report).
+    
+    Yields:
+        meta (week_range, parsed_data), delta..., then done (report,
+        validation) or error
+    """
+    if len(daily_content) > Config.MAX_TOTAL_INPUT_CHARS:
+        yield {'event': 'error', 'error': f'输入超过最大长度限制 ({Config.MAX_TOTAL_INPUT_CHARS} 字符)', 'partial': ''}
+        return
+    
+    parts: List[str] = []
+    try:
+        parsed_data = parse_and_categorize(daily_content)
+        
+        if start_date and end_date:
+            monday = start_date
+            friday = end_date
+        else:
+            monday = parsed_data['week_range']['monday']
+            friday = parsed_data['week_range']['friday']
+        
+        yield {
+            'event': 'meta',
+            'week_range': {'monday': monday, 'friday': friday},
+            'parsed_data': parsed_data
+        }
+        
+        llm_client = get_llm_client(use_mock=use_mock, purpose='weekly_report')
+        material, reduction = reduce_long_input(
+            daily_content, 'weekly_report', llm_client, use_mock=use_mock, use_cache=use_cache, deadline=deadline
+        )
+        if reduction:
+            yield {'event': 'reduced', **reduction}
+        
+        system_prompt = get_weekly_report_system_prompt()
+        user_prompt = get_weekly_report_user_prompt(monday, friday, material)
+        
+        yield from _stream_llm_text(llm_client, user_prompt, system_prompt, 'weekly_report', use_cache, parts, deadline)
+        
+        report = ''.join(parts)
+        yield {'event': 'done', 'report': report, 'validation': validate_weekly_report(report)}
+        
+    except DeadlineExceeded as e:
+        yield _stream_deadline_error(e, parts)
+        
+    except CircuitOpenError as e:
+        logger.warning(f"Weekly report streaming failed fast: {e}")
+        if not Config.LLM_DEGRADED_FALLBACK:
+            yield {'event': 'error', 'error': str(e), 'partial': '', 'circuit_open': True}
+            return
+        report = build_degraded_weekly_report(parsed_data, monday, friday)
+        yield {'event': 'delta', 'content': report}
+        yield {
+            'event': 'done',
+            'report': report,
+            'validation': validate_weekly_report(report),
+            'degraded': True,
+            'degraded_reason': str(e)
+        }
+        
+    except Exception as e:
+        logger.error(f"Weekly report streaming failed: {e}")
+        yield {'event': 'error', 'error': str(e), 'partial': ''.join(parts)}
+
+
+def stream_okr(
+    content: str,
+    next_quarter: str = "2026第一季度",
+    use_mock: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """
+    Stream OKR generation (see generate_okr).
+    
+    Yields:
+        meta (next_quarter), delta..., then done (okr, validation) or error
+    """
+    if len(content) > Config.MAX_TOTAL_INPUT_CHARS:
+        yield {'event': 'error', 'error': f'输入超过最大长度限制 ({Config.MAX_TOTAL_INPUT_CHARS} 字符)', 'partial': ''}
+        return
+    
+    parts: List[str] = []
+    try:
+        yield {'event': 'meta', 'next_quarter': next_quarter}
+        
+        llm_client = get_llm_client(use_mock=use_mock, purpose='okr')
+        material, reduction = reduce_long_input(
+            content, 'okr', llm_client, use_mock=use_mock, use_cache=use_cache, deadline=deadline
+        )
+        if reduction:
+            yield {'event': 'reduced', **reduction}
+        
+        system_prompt = get_okr_system_prompt()
+        user_prompt = get_okr_user_prompt(material, next_quarter)
+        
+        yield from _stream_llm_text(llm_client, user_prompt, system_prompt, 'okr', use_cache, parts, deadline)
+        
+        okr = ''.join(parts)
+        yield {'event': 'done', 'okr': okr, 'validation': validate_okr(okr)}
+        
+    except DeadlineExceeded as e:
+        yield _stream_deadline_error(e, parts)
+        
+    except Exception as e:
+        logger.error(f"OKR streaming failed: {e}")
+        yield {'event': 'error', 'error': str(e), 'partial': ''.join(parts)}
+
+
+def stream_star_summary(
+    project_name: str,
+    work_items: list,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    window_summaries: Optional[List[Dict]] = None,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """
+    Stream STAR summary generation (see generate_star_summary).
+    
+    Yields:
+        meta (project_name), delta..., then done (summary) or error
+    """
+    if not work_items:
+        yield {'event': 'error', 'error': '没有工作项记录', 'partial': ''}
+        return
+    
+    parts: List[str] = []
+    try:
+        from prompts import get_star_summary_system_prompt
+        
+        yield {'event': 'meta', 'project_name': project_name}
+        
+        llm_client = get_llm_client(use_mock=use_mock, purpose='star')
+        system_prompt = get_star_summary_system_prompt()
+        user_prompt = _star_user_prompt(project_name, work_items, window_summaries)
+        
+        yield from _stream_llm_text(llm_client, user_prompt, system_prompt, 'star', use_cache, parts, deadline)
+        
+        yield {'event': 'done', 'summary': ''.join(parts)}
+        
+    except DeadlineExceeded as e:
+        yield _stream_deadline_error(e, parts)
+        
+    except Exception as e:
+        logger.error(f"STAR summary streaming failed: {e}")
+        yield {'event': 'error', 'error': str(e), 'partial': ''.join(parts)}
+
+
+# ========================================
+# Hierarchical Quarter Summaries (周 → 月 → 季度)
+# ========================================
+
+def summarize_months(
+    months: List[Dict],
+    use_mock: bool = False,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> List[str]:
+    """
+    Summarize months of weekly material and work items concurrently.
+    
+    Args:
+        months: Dicts with month, weeks and work_items (see quarterly_summaries.collect_month)
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether identical earlier completions may be reused
+        concurrency: Max concurrent LLM calls (default Config.LLM_CONCURRENCY)
+        deadline: Request time budget shared by the month summaries
+        
+    Returns:
+        One summary per month, in order
+        
+    Raises:
+        RuntimeError: If a month summary fails
+        CircuitOpenError: If the provider's circuit breaker is open
+        DeadlineExceeded: If the deadline ran out
+    """
+    from async_llm_client import run_llm_batch
+    from prompts import get_month_summary_system_prompt, get_month_summary_user_prompt
+    
+    system_prompt = get_month_summary_system_prompt()
+    responses = run_llm_batch([
+        {
+            'prompt': get_month_summary_user_prompt(m['month'], m['weeks'], m['work_items']),
+            'system_prompt': system_prompt,
+            'purpose': 'month_summary',
+            'use_cache': use_cache,
+            'deadline': deadline
+        }
+        for m in months
+    ], use_mock=use_mock, concurrency=concurrency)
+    
+    summaries = []
+    for month, response in zip(months, responses):
+        if isinstance(response, (CircuitOpenError, DeadlineExceeded)):
+            raise response
+        if isinstance(response, Exception):
+            raise RuntimeError(f"{month['month']} 月度总结失败: {response}")
+        summaries.append(response)
+    return summaries
+
+
+def summarize_quarter(
+    quarter: str,
+    month_summaries: List[Dict],
+    use_mock: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> str:
+    """
+    Combine month summaries into a compact quarter summary.
+    
+    Args:
+        quarter: Quarter label (YYYY-Qn)
+        month_summaries: Dicts with month and summary, oldest first
+        
+    Raises:
+        Exception: Whatever the LLM call raises
+    """
+    from prompts import get_quarter_summary_system_prompt, get_quarter_summary_user_prompt
+    
+    llm_client = get_llm_client(use_mock=use_mock, purpose='quarter_summary')
+    return llm_client.call(
+        get_quarter_summary_user_prompt(quarter, month_summaries),
+        get_quarter_summary_system_prompt(),
+        purpose='quarter_summary',
+        use_cache=use_cache,
+        deadline=deadline
+    )
+
+
 # ========================================
 # Career Asset Management: Entity Extraction
 # ========================================
@@ -315,7 +831,267 @@ def find_best_matching_project(project_name: str, existing_projects: List[Dict],
     return best_match
 
 
-def extract_work_items(log_content: str, log_date: str, use_mock: bool = False) -> Dict:
+def _load_extraction_json(response: str):
+    """
+    Pull the JSON object out of an extraction completion.
+    
+    Raises:
+        json.JSONDecodeError: If no valid JSON object can be found
+    """
+    # Try to extract JSON from response (may have markdown code blocks)
+    json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
+    if json_match:
+        return json.loads(json_match.group(1))
+    
+    # 从第一个 '{' 开始解码一个完整对象，忽略前后的说明文字
+    start = response.find('{')
+    if start == -1:
+        return json.loads(response)
+    parsed, _ = json.JSONDecoder().raw_decode(response, start)
+    return parsed
+
+
+EXTRACTION_QUALITIES = ('good', 'partial', 'insufficient')
+WORK_ITEM_TEXT_FIELDS = ('project', 'action', 'problem', 'result_metric')
+
+
+def _validate_work_item(item) -> Optional[Dict]:
+    """
+    Coerce one extracted work item to the expected shape.
+    
+    Text fields become str or None, skills a list of str (a comma
+    separated string is split). Items that are not objects or have no
+    action, problem or result_metric are rejected.
+    
+    Returns:
+        The validated item, or None if it should be dropped
+    """
+    if not isinstance(item, dict):
+        return None
+    
+    validated = {}
+    for field in WORK_ITEM_TEXT_FIELDS:
+        value = item.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        validated[field] = value.strip() if isinstance(value, str) and value.strip() else None
+    if not (validated['action'] or validated['problem'] or validated['result_metric']):
+        return None
+    
+    skills = item.get('skills')
+    if isinstance(skills, str):
+        skills = re.split(r'[,，、;；]', skills)
+    validated['skills'] = [
+        str(s).strip() for s in skills
+        if isinstance(s, (str, int, float)) and str(s).strip()
+    ] if isinstance(skills, list) else []
+    return validated
+
+
+def _normalize_work_item(item: Dict) -> Dict:
+    """Fix null projects and drop placeholder skills in one extracted work item"""
+    # 处理 project 为 null 或 "null" 的情况
+    if item.get('project') is None or str(item.get('project', '')).lower() in ['null', 'none', '']:
+        item['project'] = '日常工作'
+    
+    # 过滤 skills 中的 null 和 "待补充"
+    if 'skills' in item and item['skills']:
+        item['skills'] = [
+            s for s in item['skills'] 
+            if s and str(s).lower() not in ['null', 'none', '待补充', '']
+        ]
+    return item
+
+
+def _normalize_extraction(parsed, response: str) -> Dict:
+    """
+    Validate and post-process one day's parsed extraction into the
+    extract_work_items result shape.
+    
+    Raises:
+        json.JSONDecodeError: If parsed is neither an object nor a list of items
+    """
+    if isinstance(parsed, list):
+        parsed = {'work_items': parsed}
+    if not isinstance(parsed, dict):
+        raise json.JSONDecodeError('expected a JSON object', response, 0)
+    
+    work_items = parsed.get('work_items', [])
+    if isinstance(work_items, dict):
+        work_items = [work_items]
+    if not isinstance(work_items, list):
+        work_items = []
+    
+    # 结构校验后处理工作项：修复 null 值和过滤无效技能
+    processed_items = []
+    for item in work_items:
+        validated = _validate_work_item(item)
+        if validated is not None:
+            processed_items.append(_normalize_work_item(validated))
+    if len(processed_items) < len(work_items):
+        json_repair.bump('items_dropped', len(work_items) - len(processed_items))
+    
+    quality = parsed.get('extraction_quality')
+    notes = parsed.get('notes')
+    return {
+        'success': True,
+        'work_items': processed_items,
+        'extraction_quality': quality if quality in EXTRACTION_QUALITIES else 'partial',
+        'notes': notes if isinstance(notes, str) else '',
+        'raw_response': response
+    }
+
+
+def _fix_extraction_fragment(
+    fragment: str,
+    use_mock: bool,
+    use_cache: bool,
+    deadline: Optional[Deadline] = None
+) -> List:
+    """
+    Ask the model to repair only the broken tail of an extraction result.
+    
+    Returns:
+        Work items recovered from the fragment
+        
+    Raises:
+        json.JSONDecodeError: If the repair response is not usable either
+    """
+    from prompts import get_extraction_repair_system_prompt, get_extraction_repair_user_prompt
+    
+    llm_client = get_llm_client(use_mock=use_mock, purpose='extraction_repair')
+    response = llm_client.call(
+        get_extraction_repair_user_prompt(fragment),
+        get_extraction_repair_system_prompt(),
+        purpose='extraction_repair',
+        use_cache=use_cache,
+        deadline=deadline
+    )
+    try:
+        fixed = _load_extraction_json(response)
+    except json.JSONDecodeError:
+        fixed = json_repair.repair_json(response).value
+    if isinstance(fixed, dict):
+        fixed = fixed.get('work_items', [])
+    if not isinstance(fixed, list):
+        raise json.JSONDecodeError('expected work_items', response, 0)
+    return fixed
+
+
+def _recover_extraction(
+    response: str,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Dict:
+    """
+    Parse an extraction completion, repairing it instead of re-calling.
+    
+    1. Parse as-is.
+    2. Repair locally (prose, trailing commas, unclosed brackets).
+    3. If the output was truncated (or cannot be repaired), send only the
+       text after the last complete work item in a cheap "fix JSON"
+       request and merge its items with the complete ones.
+    
+    The result has repair = local / followup when it was repaired. When the
+    deadline has no room for the follow-up, the local repair is used.
+    
+    Raises:
+        json.JSONDecodeError: If nothing usable could be recovered
+    """
+    from json_stream import JSONArrayStreamParser
+    
+    try:
+        result = _normalize_extraction(_load_extraction_json(response), response)
+        json_repair.bump('parsed')
+        return result
+    except json.JSONDecodeError as e:
+        error = e
+    
+    try:
+        repaired = json_repair.repair_json(response)
+    except json.JSONDecodeError:
+        repaired = None
+    if repaired is not None and not repaired.truncated:
+        result = _normalize_extraction(repaired.value, response)
+        json_repair.bump('repaired_local')
+        return {**result, 'repair': 'local'}
+    
+    # 被截断或无法本地修复：完整的工作项直接保留，只把残缺的尾部发给模型
+    parser = JSONArrayStreamParser('work_items')
+    parser.feed(response)
+    fragment = response[parser.items_end:]
+    top_level = repaired.value if repaired is not None and isinstance(repaired.value, dict) else {}
+    if '{' in fragment:
+        try:
+            fixed_items = _fix_extraction_fragment(fragment, use_mock, use_cache, deadline)
+            result = _normalize_extraction({**top_level, 'work_items': parser.items + fixed_items}, response)
+            json_repair.bump('repaired_followup')
+            return {**result, 'repair': 'followup'}
+        except Exception as fix_error:
+            logger.warning(f"Extraction repair request failed: {fix_error}")
+            json_repair.bump('followup_failed')
+    
+    if repaired is not None:
+        result = _normalize_extraction(repaired.value, response)
+    elif parser.items:
+        result = _normalize_extraction({'work_items': parser.items}, response)
+    else:
+        json_repair.bump('failed')
+        raise error
+    json_repair.bump('repaired_local')
+    if result['extraction_quality'] == 'good':
+        result['extraction_quality'] = 'partial'
+    return {**result, 'repair': 'local'}
+
+
+def _split_packed_response(response: str, dates: List[str]) -> Dict[str, Dict]:
+    """
+    Demultiplex a packed (multi-day) extraction completion by date.
+    
+    Args:
+        response: Completion for get_packed_extraction_user_prompt
+        dates: Dates that were packed into the prompt
+        
+    Returns:
+        {log_date: extract_work_items-style result} for the dates that came
+        back well-formed; missing or malformed days (and the day a
+        truncated response was cut off in) are left out
+        
+    Raises:
+        json.JSONDecodeError: If no JSON object can be found or repaired
+    """
+    repaired = truncated = False
+    try:
+        parsed = _load_extraction_json(response)
+    except json.JSONDecodeError:
+        result = json_repair.repair_json(response)
+        parsed, repaired, truncated = result.value, result.repaired, result.truncated
+    days = parsed.get('days', parsed) if isinstance(parsed, dict) else {}
+    if not isinstance(days, dict):
+        return {}
+    if truncated and days:
+        # 截断处所在的那一天可能不完整，交给逐日重试
+        days = dict(list(days.items())[:-1])
+    
+    # 按天计数，只有本地修复确实改动了文本才记为 repaired_local
+    counter = 'repaired_local' if repaired else 'parsed'
+    results = {}
+    for log_date in dates:
+        day = days.get(log_date)
+        if isinstance(day, dict) and isinstance(day.get('work_items'), list):
+            json_repair.bump(counter)
+            results[log_date] = _normalize_extraction(day, json.dumps(day, ensure_ascii=False))
+    return results
+
+
+def extract_work_items(
+    log_content: str,
+    log_date: str,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Dict:
     """
     Extract structured work items from daily log content.
     
@@ -323,6 +1099,8 @@ def extract_work_items(log_content: str, log_date: str, use_mock: bool = False)
         log_content: Raw daily log text
         log_date: Date of the log (YYYY-MM-DD)
         use_mock: Whether to use mock LLM client
+        use_cache: Whether an identical earlier completion may be reused
+        deadline: Request time budget; when it runs out the result has timeout=True
         
     Returns:
         Dict with:
@@ -346,52 +1124,16 @@ def extract_work_items(log_content: str, log_date: str, use_mock: bool = False)
             get_work_item_extraction_user_prompt
         )
         
-        llm_client = get_llm_client(use_mock=use_mock)
+        llm_client = get_llm_client(use_mock=use_mock, purpose='extraction')
         
         system_prompt = get_work_item_extraction_system_prompt()
         user_prompt = get_work_item_extraction_user_prompt(log_content, log_date)
         
-        response = llm_client.call(user_prompt, system_prompt)
-        
-        # Parse JSON response
-        # Try to extract JSON from response (may have markdown code blocks)
-        json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # Try to find raw JSON
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                json_str = response
-        
-        parsed = json.loads(json_str)
-        
-        # 后处理工作项：修复 null 值和过滤无效技能
-        work_items = parsed.get('work_items', [])
-        processed_items = []
-        for item in work_items:
-            # 处理 project 为 null 或 "null" 的情况
-            if item.get('project') is None or str(item.get('project', '')).lower() in ['null', 'none', '']:
-                item['project'] = '日常工作'
-            
-            # 过滤 skills 中的 null 和 "待补充"
-            if 'skills' in item and item['skills']:
-                item['skills'] = [
-                    s for s in item['skills'] 
-                    if s and str(s).lower() not in ['null', 'none', '待补充', '']
-                ]
-            
-            processed_items.append(item)
+        response = llm_client.call(
+            user_prompt, system_prompt, purpose='extraction', use_cache=use_cache, deadline=deadline
+        )
         
-        return {
-            'success': True,
-            'work_items': processed_items,
-            'extraction_quality': parsed.get('extraction_quality', 'partial'),
-            'notes': parsed.get('notes', ''),
-            'raw_response': response
-        }
+        return _recover_extraction(response, use_mock=use_mock, use_cache=use_cache, deadline=deadline)
         
     except json.JSONDecodeError as e:
         logger.error(f"JSON parse error in extraction: {e}")
@@ -402,6 +1144,8 @@ def extract_work_items(log_content: str, log_date: str, use_mock: bool = False)
             'extraction_quality': 'insufficient',
             'raw_response': response if 'response' in dir() else None
         }
+    except DeadlineExceeded as e:
+        return _deadline_error(e, work_items=[], extraction_quality='insufficient')
     except Exception as e:
         logger.error(f"Work item extraction failed: {e}")
         return {
@@ -412,7 +1156,457 @@ def extract_work_items(log_content: str, log_date: str, use_mock: bool = False)
         }
 
 
-def generate_star_summary(project_name: str, work_items: list, use_mock: bool = False) -> Dict:
+def stream_extract_work_items(
+    log_content: str,
+    log_date: str,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """
+    Stream work item extraction, emitting each item as soon as it is complete.
+    
+    The completion is fed to an incremental JSON parser; every finished
+    element of work_items is normalized like extract_work_items does and
+    yielded before the response ends. Items that only the repair of a
+    truncated or malformed tail recovers are yielded just before done, so
+    the item events always add up to the done result, which is the same
+    result as extract_work_items.
+    
+    Args:
+        log_content: Raw daily log text
+        log_date: Date of the log (YYYY-MM-DD)
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether an identical earlier completion may be reused
+        deadline: Request time budget for opening the stream and the tail repair
+        
+    Yields:
+        meta (log_date), item (index, item) per work item, then done
+        (extract_work_items result) or error (error, items_count; timeout
+        when the deadline ran out)
+    """
+    from json_stream import JSONArrayStreamParser
+    from prompts import (
+        get_work_item_extraction_system_prompt,
+        get_work_item_extraction_user_prompt
+    )
+    
+    if not log_content or not log_content.strip():
+        yield {'event': 'error', 'error': '日志内容为空', 'items_count': 0}
+        return
+    
+    parser = JSONArrayStreamParser('work_items')
+    emitted: List[Dict] = []
+    try:
+        yield {'event': 'meta', 'log_date': log_date}
+        
+        llm_client = get_llm_client(use_mock=use_mock, purpose='extraction')
+        system_prompt = get_work_item_extraction_system_prompt()
+        user_prompt = get_work_item_extraction_user_prompt(log_content, log_date)
+        
+        for chunk in llm_client.stream(
+            user_prompt, system_prompt, purpose='extraction', use_cache=use_cache, deadline=deadline
+        ):
+            for item in parser.feed(chunk):
+                validated = _validate_work_item(item)
+                if validated is not None:
+                    item = _normalize_work_item(validated)
+                    yield {'event': 'item', 'index': len(emitted), 'item': item}
+                    emitted.append(item)
+        
+        try:
+            result = _recover_extraction(parser.text, use_mock=use_mock, use_cache=use_cache, deadline=deadline)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON parse error in streamed extraction: {e}")
+            yield {
+                'event': 'error',
+                'error': f'JSON解析失败: {str(e)}',
+                'items_count': len(emitted),
+                'raw_response': parser.text
+            }
+            return
+        
+        # 修复残缺尾部得到的工作项还没发出过，在 done 之前补发
+        pending = list(emitted)
+        for item in result['work_items']:
+            if item in pending:
+                pending.remove(item)
+            else:
+                yield {'event': 'item', 'index': len(emitted), 'item': item}
+                emitted.append(item)
+        yield {'event': 'done', **result}
+        
+    except DeadlineExceeded as e:
+        logger.warning(f"Streamed work item extraction stopped at the request deadline: {e}")
+        yield {'event': 'error', 'error': DEADLINE_ERROR, 'items_count': len(emitted), 'timeout': True}
+        
+    except Exception as e:
+        logger.error(f"Streamed work item extraction failed: {e}")
+        yield {'event': 'error', 'error': str(e), 'items_count': len(emitted)}
+
+
+def _extraction_result(
+    response,
+    log_date: str,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Dict:
+    """Turn one batch response (or exception) into an extract_work_items-style result"""
+    if isinstance(response, DeadlineExceeded):
+        return _deadline_error(response, work_items=[], extraction_quality='insufficient')
+    if isinstance(response, Exception):
+        logger.error(f"Work item extraction failed for {log_date}: {response}")
+        return {
+            'success': False,
+            'error': str(response),
+            'work_items': [],
+            'extraction_quality': 'insufficient'
+        }
+    try:
+        return _recover_extraction(response, use_mock=use_mock, use_cache=use_cache, deadline=deadline)
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON parse error in extraction: {e}")
+        return {
+            'success': False,
+            'error': f'JSON解析失败: {str(e)}',
+            'work_items': [],
+            'extraction_quality': 'insufficient',
+            'raw_response': response
+        }
+
+
+def pack_extraction_logs(logs: List[Dict], max_tokens: int, max_days: int) -> List[List[int]]:
+    """
+    Group logs, in order, into packs for multi-day extraction prompts.
+    
+    A pack holds at most max_days logs whose content fits in max_tokens,
+    and never two logs of the same date. A log over the budget on its own
+    forms a single-log pack.
+    
+    Args:
+        logs: List of dicts with log_date and log_content
+        max_tokens: Token budget for the packed log content
+        max_days: Max logs per pack
+        
+    Returns:
+        Lists of positions into logs
+    """
+    packs: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, log in enumerate(logs):
+        tokens = estimate_tokens(log['log_content'])
+        dates = {logs[j]['log_date'] for j in current}
+        if current and (
+            current_tokens + tokens > max_tokens
+            or len(current) >= max_days
+            or log['log_date'] in dates
+        ):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def _single_extraction_request(log: Dict, use_cache: bool, deadline: Optional[Deadline] = None) -> Dict:
+    from prompts import (
+        get_work_item_extraction_system_prompt,
+        get_work_item_extraction_user_prompt
+    )
+    return {
+        'prompt': get_work_item_extraction_user_prompt(log['log_content'], log['log_date']),
+        'system_prompt': get_work_item_extraction_system_prompt(),
+        'purpose': 'extraction',
+        'use_cache': use_cache,
+        'deadline': deadline
+    }
+
+
+def _packed_extraction_request(logs: List[Dict], use_cache: bool, deadline: Optional[Deadline] = None) -> Dict:
+    from prompts import get_packed_extraction_system_prompt, get_packed_extraction_user_prompt
+    return {
+        'prompt': get_packed_extraction_user_prompt(logs),
+        'system_prompt': get_packed_extraction_system_prompt(),
+        'purpose': 'extraction',
+        'use_cache': use_cache,
+        'deadline': deadline
+    }
+
+
+def _iter_extraction(
+    logs: List[Dict],
+    use_mock: bool,
+    use_cache: bool,
+    concurrency: Optional[int],
+    pack: bool,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Tuple[int, Dict]]:
+    """
+    Run extractions for logs, yielding (position, result) as they finish.
+    
+    With packing, short consecutive days share one prompt and the keyed
+    response is split back per date. Days a packed response leaves out or
+    garbles, and all days of a packed call that failed, are re-requested
+    individually in a second round.
+    """
+    from async_llm_client import iter_llm_batch
+    
+    pending = []
+    for i, log in enumerate(logs):
+        if (log.get('log_content') or '').strip():
+            pending.append(i)
+        else:
+            yield i, {
+                'success': False,
+                'error': '日志内容为空',
+                'work_items': [],
+                'extraction_quality': 'insufficient'
+            }
+    
+    if pack and Config.LLM_EXTRACTION_PACK_TOKENS > 0 and Config.LLM_EXTRACTION_PACK_MAX_DAYS > 1:
+        packs = pack_extraction_logs(
+            [logs[i] for i in pending],
+            Config.LLM_EXTRACTION_PACK_TOKENS,
+            Config.LLM_EXTRACTION_PACK_MAX_DAYS
+        )
+        groups = [[pending[j] for j in group] for group in packs]
+    else:
+        groups = [[i] for i in pending]
+    
+    requests_to_send = [
+        _single_extraction_request(logs[group[0]], use_cache, deadline) if len(group) == 1
+        else _packed_extraction_request([logs[i] for i in group], use_cache, deadline)
+        for group in groups
+    ]
+    
+    retry: List[int] = []
+    for index, response in iter_llm_batch(requests_to_send, use_mock=use_mock, concurrency=concurrency):
+        group = groups[index]
+        if len(group) == 1:
+            yield group[0], _extraction_result(response, logs[group[0]]['log_date'], use_mock, use_cache, deadline)
+            continue
+        
+        dates = [logs[i]['log_date'] for i in group]
+        if isinstance(response, (CircuitOpenError, DeadlineExceeded)):
+            # provider 不可用或时间预算已用完，逐日重试也只会立即失败
+            for i in group:
+                yield i, _extraction_result(response, logs[i]['log_date'])
+            continue
+        if isinstance(response, Exception):
+            logger.warning(f"Packed extraction of {len(group)} days failed, re-requesting individually: {response}")
+            retry.extend(group)
+            continue
+        
+        try:
+            split = _split_packed_response(response, dates)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Packed extraction response is not JSON ({e}), re-requesting {len(group)} days individually")
+            split = {}
+        missing = [i for i in group if logs[i]['log_date'] not in split]
+        if missing and split:
+            logger.info(f"Packed extraction returned {len(split)} of {len(group)} days, re-requesting the rest")
+        for i in group:
+            if logs[i]['log_date'] in split:
+                yield i, split[logs[i]['log_date']]
+        retry.extend(missing)
+    
+    if retry:
+        json_repair.bump('full_retries', len(retry))
+        requests_to_send = [_single_extraction_request(logs[i], use_cache, deadline) for i in retry]
+        for index, response in iter_llm_batch(requests_to_send, use_mock=use_mock, concurrency=concurrency):
+            i = retry[index]
+            yield i, _extraction_result(response, logs[i]['log_date'], use_mock, use_cache, deadline)
+
+
+def extract_work_items_batch(
+    logs: List[Dict],
+    use_mock: bool = False,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    pack: bool = True,
+    deadline: Optional[Deadline] = None
+) -> List[Dict]:
+    """
+    Extract work items from several daily logs concurrently.
+    
+    Uses the asyncio client behind a synchronous facade, so at most
+    `concurrency` LLM calls are in flight at once. Short days are packed
+    into multi-day prompts up to LLM_EXTRACTION_PACK_TOKENS.
+    
+    Args:
+        logs: List of dicts with log_date and log_content
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether identical earlier completions may be reused
+        concurrency: Max concurrent LLM calls (default Config.LLM_CONCURRENCY)
+        pack: Whether several days may share one prompt
+        deadline: Request time budget; days it cuts off have timeout=True
+        
+    Returns:
+        One extract_work_items-style result per input log, in order,
+        each with its log_date
+    """
+    results: List[Optional[Dict]] = [None] * len(logs)
+    for i, result in _iter_extraction(logs, use_mock, use_cache, concurrency, pack, deadline):
+        result['log_date'] = logs[i]['log_date']
+        results[i] = result
+    return results
+
+
+def iter_extract_work_items(
+    logs: List[Dict],
+    use_mock: bool = False,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    pack: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """
+    Like extract_work_items_batch, but yield each log's result as soon as
+    its extraction finishes (completion order, not input order).
+    
+    Yields:
+        extract_work_items-style result dicts with log_date
+    """
+    for i, result in _iter_extraction(logs, use_mock, use_cache, concurrency, pack, deadline):
+        result['log_date'] = logs[i]['log_date']
+        yield result
+
+
+STAR_FINGERPRINT_FIELDS = ('id', 'raw_log_date', 'action', 'problem', 'result_metric', 'skills_tags')
+
+
+def star_fingerprint(project_name: str, work_items: list, scope: str = '') -> str:
+    """
+    Fingerprint of the inputs of a STAR (or STAR window) summary.
+    
+    Independent of item order; changes when an item is added, removed or
+    edited, or when the project is renamed.
+    
+    Args:
+        project_name: Name of the project
+        work_items: Work item dicts
+        scope: Extra discriminator (e.g. the window label)
+    """
+    items = sorted(
+        ({field: item.get(field) for field in STAR_FINGERPRINT_FIELDS} for item in work_items),
+        key=lambda item: (item['raw_log_date'] or '', item['id'] or 0)
+    )
+    payload = json.dumps({'project': project_name, 'scope': scope, 'items': items}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def split_star_windows(project_name: str, work_items: list, max_items: Optional[int] = None) -> List[Dict]:
+    """
+    Split a project's work items into time windows for hierarchical STAR.
+    
+    Windows are calendar months (by raw_log_date), oldest first; a month
+    with more than max_items items is split into several windows. Adding
+    items to the latest month leaves earlier windows (and their
+    fingerprints) unchanged.
+    
+    Args:
+        project_name: Name of the project (part of each window fingerprint)
+        work_items: Work item dicts
+        max_items: Max items per window (default Config.STAR_MAX_ITEMS)
+        
+    Returns:
+        List of {window, items, fingerprint}
+    """
+    max_items = max(1, max_items or Config.STAR_MAX_ITEMS)
+    months: Dict[str, List[Dict]] = {}
+    for item in sorted(work_items, key=lambda i: (i.get('raw_log_date') or '', i.get('id') or 0)):
+        months.setdefault((item.get('raw_log_date') or '未知日期')[:7], []).append(item)
+    
+    windows = []
+    for month, items in months.items():
+        parts = [items[i:i + max_items] for i in range(0, len(items), max_items)]
+        for n, part in enumerate(parts, 1):
+            label = month if len(parts) == 1 else f"{month} #{n}"
+            windows.append({
+                'window': label,
+                'items': part,
+                'fingerprint': star_fingerprint(project_name, part, scope=label)
+            })
+    return windows
+
+
+def summarize_star_windows(
+    project_name: str,
+    windows: List[Dict],
+    use_mock: bool = False,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> List[Dict]:
+    """
+    Summarize time windows of a large project concurrently (map step).
+    
+    Args:
+        project_name: Name of the project
+        windows: From split_star_windows()
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether identical earlier completions may be reused
+        concurrency: Max concurrent LLM calls (default Config.LLM_CONCURRENCY)
+        deadline: Request time budget shared by the window summaries
+        
+    Returns:
+        {window, fingerprint, summary} per window, in order
+        
+    Raises:
+        RuntimeError: If a window summary fails
+        CircuitOpenError: If the provider's circuit breaker is open
+        DeadlineExceeded: If the deadline ran out
+    """
+    from async_llm_client import run_llm_batch
+    from prompts import get_star_window_summary_system_prompt, get_star_window_summary_user_prompt
+    
+    system_prompt = get_star_window_summary_system_prompt()
+    responses = run_llm_batch([
+        {
+            'prompt': get_star_window_summary_user_prompt(project_name, w['window'], w['items']),
+            'system_prompt': system_prompt,
+            'purpose': 'star_window',
+            'use_cache': use_cache,
+            'deadline': deadline
+        }
+        for w in windows
+    ], use_mock=use_mock, concurrency=concurrency)
+    
+    summaries = []
+    for window, response in zip(windows, responses):
+        if isinstance(response, (CircuitOpenError, DeadlineExceeded)):
+            raise response
+        if isinstance(response, Exception):
+            raise RuntimeError(f"时间段 {window['window']} 总结失败: {response}")
+        summaries.append({
+            'window': window['window'],
+            'fingerprint': window['fingerprint'],
+            'summary': response
+        })
+    return summaries
+
+
+def _star_user_prompt(project_name: str, work_items: list, window_summaries: Optional[List[Dict]]) -> str:
+    """Final STAR prompt: from the items directly, or from window summaries"""
+    from prompts import get_star_summary_user_prompt, get_star_summary_from_windows_user_prompt
+    
+    if window_summaries:
+        return get_star_summary_from_windows_user_prompt(project_name, window_summaries)
+    return get_star_summary_user_prompt(project_name, work_items)
+
+
+def generate_star_summary(
+    project_name: str,
+    work_items: list,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    window_summaries: Optional[List[Dict]] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict:
     """
     Generate STAR format summary for a project based on work items.
     
@@ -420,6 +1614,10 @@ def generate_star_summary(project_name: str, work_items: list, use_mock: bool =
         project_name: Name of the project
         work_items: List of work item dicts
         use_mock: Whether to use mock LLM client
+        use_cache: Whether an identical earlier completion may be reused
+        window_summaries: Per-window summaries (summarize_star_windows) to
+            build the summary from instead of the raw items
+        deadline: Request time budget; when it runs out the result has timeout=True
         
     Returns:
         Dict with:
@@ -435,23 +1633,23 @@ def generate_star_summary(project_name: str, work_items: list, use_mock: bool =
         }
     
     try:
-        from prompts import (
-            get_star_summary_system_prompt,
-            get_star_summary_user_prompt
-        )
+        from prompts import get_star_summary_system_prompt
         
-        llm_client = get_llm_client(use_mock=use_mock)
+        llm_client = get_llm_client(use_mock=use_mock, purpose='star')
         
         system_prompt = get_star_summary_system_prompt()
-        user_prompt = get_star_summary_user_prompt(project_name, work_items)
+        user_prompt = _star_user_prompt(project_name, work_items, window_summaries)
         
-        summary = llm_client.call(user_prompt, system_prompt)
+        summary = llm_client.call(user_prompt, system_prompt, purpose='star', use_cache=use_cache, deadline=deadline)
         
         return {
             'success': True,
             'summary': summary
         }
         
+    except DeadlineExceeded as e:
+        return _deadline_error(e, summary='')
+        
     except Exception as e:
         logger.error(f"STAR summary generation failed: {e}")
         return {
@@ -461,98 +1659,127 @@ def generate_star_summary(project_name: str, work_items: list, use_mock: bool =
         }
 
 
-def categorize_skills_with_llm(skills: List[Dict], use_mock: bool = False) -> Dict:
+SKILL_CATEGORIES = ('tech', 'soft', 'domain', 'other')
+
+
+def normalize_skill_name(name: str) -> str:
+    """Key for skill decisions: NFKC (full-width -> half-width), lower case, single spaces"""
+    return ' '.join(unicodedata.normalize('NFKC', name or '').lower().split())
+
+
+def _parse_skill_categories(response: str) -> Dict[str, str]:
+    """
+    Parse a categorization completion into {normalized name: category}.
+    
+    Raises:
+        json.JSONDecodeError: If no JSON object can be found
+    """
+    json_match = re.search(r'\{[\s\S]*\}', response)
+    categories_map = json.loads(json_match.group() if json_match else response)
+    if not isinstance(categories_map, dict):
+        raise json.JSONDecodeError('expected a JSON object', response, 0)
+    return {
+        normalize_skill_name(str(name)): category if category in SKILL_CATEGORIES else 'other'
+        for name, category in categories_map.items()
+    }
+
+
+def categorize_skills_with_llm(
+    skills: List[Dict],
+    use_mock: bool = False,
+    use_cache: bool = True,
+    chunk_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict:
     """
     使用 LLM 智能识别技能分类。
     
+    技能按 chunk_size 分块，各块并发请求（最多 concurrency 个同时进行），
+    单个块失败不影响其他块。
+    
     Args:
         skills: 技能列表，每个技能包含 id, name, category
         use_mock: 是否使用 mock LLM
+        use_cache: 是否允许复用相同请求的缓存结果
+        chunk_size: 每次请求的技能数（默认 Config.SKILL_CATEGORIZE_CHUNK_SIZE）
+        concurrency: 最大并发请求数（默认 Config.LLM_CONCURRENCY）
+        deadline: 请求的时间预算，超时的块计入 unresolved
         
     Returns:
-        Dict with success, categorized_skills, etc.
+        Dict with success, categorized_skills (只含 LLM 给出分类的技能),
+        unresolved (未返回分类的技能名), chunks, failed_chunks, model；
+        所有块都失败且有块超时时 timeout=True
     """
-    try:
-        if not skills:
-            return {
-                'success': True,
-                'message': '没有需要分类的技能',
-                'categorized_count': 0
-            }
-        
-        llm_client = get_llm_client(use_mock=use_mock)
-        
-        # 构建技能列表字符串
-        skill_names = [s['name'] for s in skills]
-        skills_text = '\n'.join([f"- {name}" for name in skill_names])
-        
-        system_prompt = """你是一个技能分类专家。你需要将技能分类到以下四个类别之一：
-
-1. tech（技术技能）：编程语言、框架、工具、数据库、云服务、DevOps、数据分析工具等技术相关技能
-2. soft（软技能）：沟通、协调、管理、领导力、团队协作、文档写作、演讲表达、项目管理等人际和管理技能
-3. domain（业务领域）：特定行业知识，如汽车、金融、制造、供应链、质量管理、财务、人力资源等业务知识
-4. other（其他）：无法明确归类到以上三类的技能
-
-请严格按照 JSON 格式返回结果，不要包含任何其他内容。"""
-
-        user_prompt = f"""请对以下技能进行分类：
-
-{skills_text}
-
-请返回 JSON 格式，每个技能对应一个分类：
-{{
-  "技能名1": "tech",
-  "技能名2": "soft",
-  "技能名3": "domain",
-  ...
-}}
-
-只返回 JSON，不要有其他文字。"""
-
-        response = llm_client.call(user_prompt, system_prompt)
-        
-        # 解析 LLM 返回的 JSON
+    from async_llm_client import run_llm_batch
+    from prompts import get_skill_categorization_system_prompt, get_skill_categorization_user_prompt
+    
+    if not skills:
+        return {
+            'success': True,
+            'message': '没有需要分类的技能',
+            'categorized_skills': [],
+            'categorized_count': 0
+        }
+    
+    chunk_size = max(1, chunk_size or Config.SKILL_CATEGORIZE_CHUNK_SIZE)
+    chunks = [skills[i:i + chunk_size] for i in range(0, len(skills), chunk_size)]
+    system_prompt = get_skill_categorization_system_prompt()
+    requests_to_send = [{
+        'prompt': get_skill_categorization_user_prompt([s['name'] for s in chunk]),
+        'system_prompt': system_prompt,
+        'purpose': 'skill_categorization',
+        'use_cache': use_cache,
+        'deadline': deadline
+    } for chunk in chunks]
+    
+    responses = run_llm_batch(requests_to_send, use_mock=use_mock, concurrency=concurrency)
+    
+    categorized_skills = []
+    unresolved = []
+    errors = []
+    timed_out = None
+    for chunk, response in zip(chunks, responses):
         try:
-            # 尝试提取 JSON
-            json_match = re.search(r'\{[\s\S]*\}', response)
-            if json_match:
-                categories_map = json.loads(json_match.group())
-            else:
-                categories_map = json.loads(response)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse LLM response as JSON: {e}")
-            logger.error(f"Response was: {response}")
-            return {
-                'success': False,
-                'error': f'LLM 返回格式错误: {str(e)}',
-                'raw_response': response
-            }
+            if isinstance(response, DeadlineExceeded):
+                timed_out = response
+            if isinstance(response, Exception):
+                raise response
+            categories_map = _parse_skill_categories(response)
+        except Exception as e:
+            logger.error(f"Skill categorization chunk of {len(chunk)} failed: {e}")
+            errors.append(str(e))
+            unresolved.extend(s['name'] for s in chunk)
+            continue
         
-        # 构建结果
-        categorized_skills = []
-        for skill in skills:
-            skill_name = skill['name']
-            new_category = categories_map.get(skill_name, 'other')
-            # 验证分类值
-            if new_category not in ['tech', 'soft', 'domain', 'other']:
-                new_category = 'other'
+        for skill in chunk:
+            new_category = categories_map.get(normalize_skill_name(skill['name']))
+            if new_category is None:
+                unresolved.append(skill['name'])
+                continue
             categorized_skills.append({
                 'id': skill['id'],
-                'name': skill_name,
+                'name': skill['name'],
                 'old_category': skill.get('category'),
                 'new_category': new_category
             })
-        
-        return {
-            'success': True,
-            'categorized_skills': categorized_skills,
-            'categorized_count': len(categorized_skills)
-        }
-        
-    except Exception as e:
-        logger.error(f"Skill categorization failed: {e}")
+    
+    if len(errors) == len(chunks):
+        if timed_out:
+            return _deadline_error(timed_out, unresolved=unresolved)
         return {
             'success': False,
-            'error': str(e)
+            'error': f'LLM 返回格式错误: {errors[0]}' if errors else '分类失败',
+            'unresolved': unresolved
         }
-
+    
+    model = getattr(get_llm_client(use_mock=use_mock, purpose='skill_categorization'), 'model', None) or 'mock'
+    return {
+        'success': True,
+        'categorized_skills': categorized_skills,
+        'categorized_count': len(categorized_skills),
+        'unresolved': unresolved,
+        'chunks': len(chunks),
+        'failed_chunks': len(errors),
+        'model': model
+    }
\ No newline at end of file
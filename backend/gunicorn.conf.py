@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+gunicorn.conf.py - gunicorn server hooks
+
+Background threads (job workers, pre-generation scheduler) are started in
+each worker process after the fork; threads started in the master would not
+survive it.
+"""
+
+
+def post_fork(server, worker):
+    from app import start_background_services
+    start_background_services()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+http_pool.py - Pooled keep-alive HTTP sessions with connect-time accounting
+
+Every LLM call used to go through module-level requests.post, which opens a
+fresh TCP/TLS connection each time. Sessions created here keep connections
+alive in a urllib3 pool and time every new connection, so callers can report
+how much handshake time was saved by reusing one.
+
+Requests made inside `with AbortHandle():` can be cut off from another
+thread: abort() shuts down the sockets they use, so a request still waiting
+for response headers or its next chunk fails at once instead of running to
+completion.
+"""
+
+import time
+import socket
+import threading
+import logging
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# 进程级连接统计
+_stats_lock = threading.Lock()
+_stats = {
+    'connections_opened': 0,
+    'total_connect_ms': 0.0,
+    'requests': 0,
+    'reused_requests': 0
+}
+
+# 当前线程内正在进行的请求所产生的建连耗时
+_local = threading.local()
+
+
+def _record_connect(elapsed: float):
+    """Record a freshly opened connection for the current thread and process"""
+    elapsed_ms = elapsed * 1000
+    _local.connect_ms = getattr(_local, 'connect_ms', 0.0) + elapsed_ms
+    _local.connections = getattr(_local, 'connections', 0) + 1
+    with _stats_lock:
+        _stats['connections_opened'] += 1
+        _stats['total_connect_ms'] += elapsed_ms
+
+
+class RequestAborted(Exception):
+    """A request was cut off by AbortHandle.abort()"""
+
+
+def _shutdown(conn):
+    """Shut down a connection's socket (wakes a thread blocked reading it), or close an SDK stream"""
+    if not hasattr(conn, 'sock'):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        return
+    sock = conn.sock
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class AbortHandle:
+    """
+    Lets another thread abort the requests this thread makes.
+
+    Usage (in the thread making requests):
+        with handle:
+            session.post(...)
+    and from any thread:
+        handle.abort()
+    """
+
+    def __init__(self):
+        self.aborted = False
+        self._connections = []
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def attach(self, conn):
+        """Track a connection (or an SDK stream with close()) used under this handle"""
+        with self._lock:
+            if not self.aborted:
+                self._connections.append(conn)
+                return
+        _shutdown(conn)
+
+    def detach(self, conn):
+        """Stop tracking a connection returned to the pool (another request may reuse it)"""
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+
+    def abort(self):
+        """Cut off every request made under this handle, now and later"""
+        with self._lock:
+            self.aborted = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            _shutdown(conn)
+
+    def __enter__(self):
+        self._previous = getattr(_local, 'abort', None)
+        _local.abort = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.abort = self._previous
+        with self._lock:
+            self._connections = []
+        return False
+
+
+def current_abort() -> Optional[AbortHandle]:
+    """The AbortHandle active on this thread, if any"""
+    return getattr(_local, 'abort', None)
+
+
+def is_aborted() -> bool:
+    """Whether this thread's AbortHandle was aborted"""
+    handle = current_abort()
+    return handle is not None and handle.aborted
+
+
+def check_aborted(label: str = 'request'):
+    """
+    Raises:
+        RequestAborted: If this thread's AbortHandle was aborted
+    """
+    if is_aborted():
+        raise RequestAborted(f"{label} aborted")
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _record_connect(time.perf_counter() - start)
+        handle = current_abort()
+        if handle is not None and handle.aborted:
+            _shutdown(self)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _record_connect(time.perf_counter() - start)
+        handle = current_abort()
+        if handle is not None and handle.aborted:
+            _shutdown(self)
+
+
+class _AbortableMixin:
+    """Attach connections in use by a request to the thread's AbortHandle"""
+
+    def _get_conn(self, *args, **kwargs):
+        conn = super()._get_conn(*args, **kwargs)
+        handle = current_abort()
+        if handle is not None:
+            handle.attach(conn)
+        return conn
+
+    def _put_conn(self, conn):
+        handle = current_abort()
+        if handle is not None and conn is not None:
+            handle.detach(conn)
+        return super()._put_conn(conn)
+
+
+class _TimedHTTPConnectionPool(_AbortableMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(_AbortableMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools time every new TCP/TLS connection"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool
+        }
+
+
+def create_session(pool_maxsize: int = 10) -> requests.Session:
+    """
+    Create a keep-alive session with a timed connection pool.
+
+    Args:
+        pool_maxsize: Max pooled connections per host
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = TimedHTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class ConnectTracker:
+    """
+    Context manager measuring connect time spent by requests on this thread.
+
+    Usage:
+        with ConnectTracker() as tracker:
+            session.post(...)
+        tracker.connect_ms, tracker.reused, tracker.saved_ms
+    """
+
+    def __init__(self):
+        self.connect_ms = 0.0
+        self.connections = 0
+
+    def __enter__(self):
+        _local.connect_ms = 0.0
+        _local.connections = 0
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connect_ms = getattr(_local, 'connect_ms', 0.0)
+        self.connections = getattr(_local, 'connections', 0)
+        with _stats_lock:
+            _stats['requests'] += 1
+            if self.connections == 0:
+                _stats['reused_requests'] += 1
+        return False
+
+    @property
+    def reused(self) -> bool:
+        """True if no new connection was opened"""
+        return self.connections == 0
+
+    @property
+    def saved_ms(self) -> float:
+        """Estimated handshake time saved (average connect time if reused)"""
+        if not self.reused:
+            return 0.0
+        return average_connect_ms()
+
+
+def average_connect_ms() -> float:
+    """Average observed time to open a new connection, in milliseconds"""
+    with _stats_lock:
+        opened = _stats['connections_opened']
+        return _stats['total_connect_ms'] / opened if opened else 0.0
+
+
+def get_connection_stats() -> Dict:
+    """
+    Get process-wide connection pool statistics.
+
+    Returns:
+        Dict with connections_opened, requests, reused_requests, reuse_rate,
+        avg_connect_ms and estimated_saved_ms
+    """
+    with _stats_lock:
+        opened = _stats['connections_opened']
+        requests_count = _stats['requests']
+        reused = _stats['reused_requests']
+        avg_connect = _stats['total_connect_ms'] / opened if opened else 0.0
+        return {
+            'connections_opened': opened,
+            'requests': requests_count,
+            'reused_requests': reused,
+            'reuse_rate': round(reused / requests_count, 4) if requests_count else 0.0,
+            'avg_connect_ms': round(avg_connect, 2),
+            'estimated_saved_ms': round(reused * avg_connect, 2)
+        }
+
+
+def reset_connection_stats():
+    """Reset process-wide connection statistics"""
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0 if isinstance(_stats[key], int) else 0.0
+
+
+def prewarm(session: requests.Session, url: str, timeout: Optional[float] = 5) -> bool:
+    """
+    Open a pooled connection to url ahead of the first real call.
+
+    Any HTTP status counts as success; only the handshake matters.
+
+    Returns:
+        True if a connection could be established
+    """
+    try:
+        session.head(url, timeout=timeout, allow_redirects=False)
+        return True
+    except requests.RequestException as e:
+        logger.warning(f"Prewarm of {url} failed: {e}")
+        return False
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+jobs.py - SQLite-backed background job queue for long-running LLM tasks
+
+Weekly/OKR/STAR generation, batch extraction and LLM skill
+categorization can run as jobs instead of inside the HTTP request:
+
+- submit_job() stores the job in the jobs table and returns at once;
+  clients poll /api/jobs/<id>
+- worker threads in every process claim jobs atomically, so several
+  gunicorn workers share one queue; they are started by the server entry
+  point (app.start_background_services), never on import
+- a running job holds a lease renewed by a heartbeat; when a process dies
+  the lease expires and another worker resumes the job from its last
+  checkpoint (up to JOB_MAX_ATTEMPTS claims)
+- jobs with the same dedup key share one queued/running job
+- cancellation stops queued jobs at once and running jobs at their next
+  progress update
+"""
+
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Any, Callable, List
+
+import database as db
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS: Dict[str, Callable[['JobContext'], Dict]] = {}
+
+# 唤醒本进程的空闲 worker（新任务提交时）
+_wakeup = threading.Event()
+_workers: List['JobWorker'] = []
+_workers_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job was cancelled"""
+
+
+def job_handler(kind: str):
+    """Register a function(ctx) -> result dict as the handler for a job kind"""
+    def register(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def default_dedup_key(kind: str, params: Dict) -> str:
+    """Same kind with the same parameters is the same job"""
+    payload = json.dumps({'kind': kind, 'params': params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def submit_job(kind: str, params: Dict, dedup_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Queue a job, or return the queued/running job with the same dedup key.
+
+    Args:
+        kind: Registered job kind
+        params: JSON-serializable handler parameters
+        dedup_key: Override the default key (kind + params)
+
+    Returns:
+        Job dict with deduplicated=True when an existing job was returned
+
+    Raises:
+        ValueError: Unknown job kind
+        RuntimeError: The job could not be stored
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"未知的任务类型: {kind}（可用: {', '.join(sorted(JOB_HANDLERS))}）")
+
+    job_id = uuid.uuid4().hex
+    job = db.create_job(job_id, kind, params, dedup_key or default_dedup_key(kind, params), time.time())
+    if job is None:
+        raise RuntimeError('任务保存失败')
+    job['deduplicated'] = job['id'] != job_id
+    if not job['deduplicated']:
+        logger.info(f"Job {job_id} ({kind}) queued")
+        _wakeup.set()
+    return job
+
+
+def request_cancel(job_id: str) -> Optional[Dict[str, Any]]:
+    """Cancel a queued job, or ask a running one to stop; None if unknown"""
+    job = db.cancel_job(job_id, time.time())
+    if job and job['status'] == 'cancelled':
+        logger.info(f"Job {job_id} cancelled")
+    return job
+
+
+class JobContext:
+    """What a handler sees of its job: params, checkpoint, progress reporting"""
+
+    def __init__(self, job: Dict[str, Any], worker_id: str, lease_seconds: float):
+        self.id = job['id']
+        self.kind = job['kind']
+        self.params: Dict[str, Any] = job.get('params') or {}
+        self.checkpoint: Dict[str, Any] = job.get('checkpoint') or {}
+        self.progress: Dict[str, Any] = job.get('progress') or {}
+        self.attempts = job.get('attempts', 1)
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.cancelled = threading.Event()
+        self.lost = threading.Event()
+
+    def touch(self, progress: Optional[Dict] = None, checkpoint: Optional[Dict] = None):
+        """Renew the lease, optionally saving progress and checkpoint"""
+        now = time.time()
+        job = db.touch_job(self.id, self.worker_id, now + self.lease_seconds, now, progress, checkpoint)
+        if job is None:
+            self.lost.set()
+        elif job['cancel_requested']:
+            self.cancelled.set()
+
+    def report(self, checkpoint: Optional[Dict] = None, **progress):
+        """
+        Save progress (merged into the previous progress) and an optional
+        checkpoint the handler can resume from after a restart.
+
+        Raises:
+            JobCancelled: The job was cancelled or taken over by another worker
+        """
+        self.progress.update(progress)
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        self.touch(self.progress, checkpoint)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set() or self.lost.is_set():
+            raise JobCancelled(self.id)
+
+
+class JobWorker(threading.Thread):
+    """Claims and runs jobs until stopped"""
+
+    def __init__(self, index: int):
+        super().__init__(name=f'job-worker-{index}', daemon=True)
+        self.worker_id = f"{uuid.uuid4().hex[:8]}-{index}"
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.is_set():
+            job = db.claim_job(
+                self.worker_id,
+                time.time(),
+                Config.JOB_LEASE_SECONDS,
+                Config.JOB_MAX_ATTEMPTS
+            )
+            if job is None:
+                _wakeup.wait(Config.JOB_POLL_INTERVAL)
+                _wakeup.clear()
+                continue
+            try:
+                self.execute(job)
+            except Exception as e:
+                logger.error(f"Job worker error on {job['id']}: {e}")
+
+    def execute(self, job: Dict[str, Any]):
+        """Run one claimed job with a lease heartbeat and record its outcome"""
+        ctx = JobContext(job, self.worker_id, Config.JOB_LEASE_SECONDS)
+        handler = JOB_HANDLERS.get(job['kind'])
+        if handler is None:
+            db.finish_job(ctx.id, self.worker_id, 'failed', time.time(), error=f"未知的任务类型: {job['kind']}")
+            return
+
+        if job['attempts'] > 1:
+            logger.info(f"Resuming job {ctx.id} ({ctx.kind}), attempt {job['attempts']}")
+        heartbeat_stop = threading.Event()
+
+        def heartbeat():
+            # 单次 LLM 调用可能超过租约，后台续约
+            while not heartbeat_stop.wait(max(1.0, Config.JOB_LEASE_SECONDS / 3)):
+                ctx.touch()
+
+        threading.Thread(target=heartbeat, name=f'job-heartbeat-{ctx.id[:8]}', daemon=True).start()
+        status, result, error = 'done', None, None
+        try:
+            result = handler(ctx)
+            ctx.touch()
+            if ctx.cancelled.is_set():
+                status, result = 'cancelled', None
+            elif result is not None and result.get('success') is False:
+                status, error = 'failed', result.get('error') or '任务失败'
+        except JobCancelled:
+            status = 'cancelled'
+        except Exception as e:
+            logger.exception(f"Job {ctx.id} ({ctx.kind}) failed")
+            status, error = 'failed', str(e)
+        finally:
+            heartbeat_stop.set()
+
+        if ctx.lost.is_set():
+            logger.warning(f"Job {ctx.id} was taken over by another worker, dropping this result")
+            return
+        db.finish_job(ctx.id, self.worker_id, status, time.time(), result=result, error=error)
+        logger.info(f"Job {ctx.id} ({ctx.kind}) {status}")
+
+
+def start_job_workers(count: Optional[int] = None) -> int:
+    """
+    Start this process's worker threads (idempotent).
+
+    Args:
+        count: Threads to run (default Config.JOB_WORKERS; 0 disables)
+
+    Returns:
+        Number of live worker threads
+    """
+    count = Config.JOB_WORKERS if count is None else count
+    with _workers_lock:
+        _workers[:] = [w for w in _workers if w.is_alive() and not w.stopping.is_set()]
+        while len(_workers) < count:
+            worker = JobWorker(len(_workers))
+            worker.start()
+            _workers.append(worker)
+        return len(_workers)
+
+
+def stop_job_workers(timeout: float = 5.0):
+    """Stop this process's worker threads after their current job"""
+    with _workers_lock:
+        workers = list(_workers)
+        _workers.clear()
+    for worker in workers:
+        worker.stopping.set()
+    _wakeup.set()
+    for worker in workers:
+        worker.join(timeout)
+
+
+def get_job_stats() -> Dict[str, Any]:
+    """Worker and queue summary for /api/jobs/stats"""
+    with _workers_lock:
+        workers = [w.worker_id for w in _workers if w.is_alive()]
+    jobs = db.list_jobs(limit=1000)
+    counts: Dict[str, int] = {}
+    for job in jobs:
+        counts[job['status']] = counts.get(job['status'], 0) + 1
+    return {'workers': workers, 'counts': counts, 'kinds': sorted(JOB_HANDLERS)}
+
+
+# ========================================
+# Handlers
+# ========================================
+
+def _use_mock(params: Dict) -> bool:
+    return bool(params.get('use_mock')) or not Config.is_llm_configured()
+
+
+@job_handler('weekly_report')
+def run_weekly_report_job(ctx: JobContext) -> Dict:
+    """Same result as POST /api/generate/weekly-report"""
+    from generator import generate_weekly_report, validate_weekly_report
+
+    params = ctx.params
+    ctx.report(stage='generating')
+    result = generate_weekly_report(
+        params['content'],
+        use_mock=_use_mock(params),
+        start_date=params.get('start_date'),
+        end_date=params.get('end_date'),
+        use_cache=not params.get('no_cache', False)
+    )
+    if result['success']:
+        result['validation'] = validate_weekly_report(result['report'])
+    return result
+
+
+@job_handler('weekly_report_range')
+def run_weekly_report_range_job(ctx: JobContext) -> Dict:
+    """Same result as POST /api/generate/weekly-report/range"""
+    from generator import validate_weekly_report
+    from weekly_reports import generate_weekly_for_range
+
+    params = ctx.params
+    ctx.report(stage='generating')
+    no_cache = bool(params.get('no_cache', False))
+    result = generate_weekly_for_range(
+        params['start_date'],
+        params['end_date'],
+        use_mock=_use_mock(params),
+        use_cache=not no_cache,
+        force=bool(params.get('force')) or no_cache
+    )
+    result.pop('status', None)
+    if result['success']:
+        result['validation'] = validate_weekly_report(result['report'])
+    return result
+
+
+@job_handler('weekly_pregen')
+def run_weekly_pregen_job(ctx: JobContext) -> Dict:
+    """Pre-generate a week's draft (see pregeneration.py)"""
+    from pregeneration import pregenerate_week
+
+    params = ctx.params
+    if not Config.is_llm_configured():
+        return {'success': True, 'skipped': 'llm_not_configured'}
+    ctx.report(stage='generating')
+    return pregenerate_week(params['start_date'], params['end_date'])
+
+
+@job_handler('okr')
+def run_okr_job(ctx: JobContext) -> Dict:
+    """Same result as POST /api/generate/okr"""
+    from generator import generate_okr, validate_okr
+
+    params = ctx.params
+    ctx.report(stage='generating')
+    result = generate_okr(
+        params['content'],
+        next_quarter=params.get('next_quarter', '2026第一季度'),
+        use_mock=_use_mock(params),
+        use_cache=not params.get('no_cache', False)
+    )
+    if result['success']:
+        result['validation'] = validate_okr(result['okr'])
+    return result
+
+
+@job_handler('okr_quarter')
+def run_okr_quarter_job(ctx: JobContext) -> Dict:
+    """Same result as POST /api/generate/okr/quarter"""
+    from generator import validate_okr
+    from quarterly_summaries import generate_quarter_okr
+
+    params = ctx.params
+    ctx.report(stage='summarizing')
+    no_cache = bool(params.get('no_cache', False))
+    result = generate_quarter_okr(
+        params['quarter'].strip().upper(),
+        next_quarter=params.get('next_quarter'),
+        extra_content=params.get('content') or '',
+        use_mock=_use_mock(params),
+        use_cache=not no_cache,
+        force=bool(params.get('force'))
+    )
+    result.pop('status', None)
+    if result['success']:
+        result['validation'] = validate_okr(result['okr'])
+    return result
+
+
+@job_handler('star')
+def run_star_job(ctx: JobContext) -> Dict:
+    """Generate and save a project's STAR summary (skipped if its work items are unchanged)"""
+    from star_summaries import refresh_project_star
+
+    params = ctx.params
+    ctx.report(stage='generating')
+    no_cache = bool(params.get('no_cache', False))
+    result = refresh_project_star(
+        params['project_id'],
+        use_mock=_use_mock(params),
+        use_cache=not no_cache,
+        force=bool(params.get('force')) or no_cache
+    )
+    if not result['success']:
+        return {'success': False, 'error': result.get('error', '生成失败')}
+    return {'success': True, 'summary': result['summary'], 'unchanged': result['unchanged']}
+
+
+@job_handler('star_refresh_all')
+def run_star_refresh_all_job(ctx: JobContext) -> Dict:
+    """
+    Regenerate all stale STAR summaries.
+
+    Checkpoint: done_ids, the projects finished so far (only matters with
+    force; without it finished projects are no longer stale anyway).
+    """
+    from star_summaries import refresh_all_star
+
+    params = ctx.params
+    done_ids = list(ctx.checkpoint.get('done_ids', []))
+    no_cache = bool(params.get('no_cache', False))
+
+    def on_progress(progress: Dict):
+        if progress['success']:
+            done_ids.append(progress['project_id'])
+        ctx.report(
+            checkpoint={'done_ids': done_ids},
+            completed=progress['completed'],
+            total=progress['total'],
+            failed=progress['completed'] - len(done_ids)
+        )
+
+    ctx.report(stage='generating')
+    return refresh_all_star(
+        use_mock=_use_mock(params),
+        use_cache=not no_cache,
+        force=bool(params.get('force')),
+        concurrency=params.get('concurrency'),
+        exclude=set(done_ids),
+        on_progress=on_progress
+    )
+
+
+@job_handler('extract_batch')
+def run_extract_batch_job(ctx: JobContext) -> Dict:
+    """
+    Batch work item extraction for a date range.
+
+    Finished days are persisted in work_item_extractions as they complete,
+    so a resumed job only extracts the days that are not done.
+    """
+    from batch_extraction import plan_batch, run_batch_extraction
+
+    params = ctx.params
+    done_dates = list(ctx.checkpoint.get('done_dates', []))
+    # 续跑时不重复已完成的日期（即使原请求是 force）
+    logs, skipped = plan_batch(
+        params['start_date'],
+        params['end_date'],
+        dates=params.get('dates'),
+        force=bool(params.get('force'))
+    )
+    logs = [log for log in logs if log['log_date'] not in done_dates]
+    events = run_batch_extraction(
+        logs,
+        skipped=skipped,
+        use_mock=_use_mock(params),
+        use_cache=not params.get('no_cache', False),
+        concurrency=params.get('concurrency')
+    )
+    failed: List[str] = []
+    summary: Dict[str, Any] = {}
+    try:
+        for event in events:
+            if event['event'] == 'meta':
+                ctx.report(total=event['total'] + len(done_dates), completed=len(done_dates), skipped=skipped)
+            elif event['event'] == 'progress':
+                if event['status'] == 'done':
+                    done_dates.append(event['log_date'])
+                else:
+                    failed.append(event['log_date'])
+                ctx.report(
+                    checkpoint={'done_dates': done_dates},
+                    completed=len(done_dates) + len(failed),
+                    failed=failed
+                )
+            elif event['event'] == 'done':
+                summary = event
+    finally:
+        events.close()
+
+    return {
+        'success': True,
+        'succeeded': len(done_dates),
+        'failed': sorted(failed),
+        'items_count': summary.get('items_count', 0),
+        'skipped': skipped
+    }
+
+
+@job_handler('skill_recategorize')
+def run_skill_recategorize_job(ctx: JobContext) -> Dict:
+    """Same result as POST /api/skills/recategorize-llm"""
+    from skill_categorization import recategorize_skills
+
+    ctx.report(stage='categorizing')
+    return recategorize_skills(use_mock=_use_mock(ctx.params), force=bool(ctx.params.get('force')))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+json_repair.py - Tolerant parsing of slightly malformed LLM JSON
+
+repair_json() fixes the usual ways a model breaks JSON without another
+LLM call: prose or a markdown fence around the object, trailing commas,
+and output cut off mid-way (open strings, arrays and objects are closed,
+a dangling key or comma is dropped). It reports whether the text was
+truncated so callers can decide to ask for the missing tail.
+
+Counters for how extraction responses were recovered are kept here and
+served at /api/metrics/extraction.
+"""
+
+import re
+import json
+import threading
+from typing import Any, Dict, NamedTuple
+
+_stats_lock = threading.Lock()
+_stats = {
+    'parsed': 0,  # 直接解析成功
+    'repaired_local': 0,  # 本地修复后解析成功
+    'repaired_followup': 0,  # 通过只发送残缺片段的修复请求补全
+    'followup_failed': 0,  # 修复请求失败，退回本地修复/已完成的工作项
+    'full_retries': 0,  # 整段日志重新请求
+    'failed': 0,  # 最终仍无法解析
+    'items_dropped': 0  # 不符合工作项结构被丢弃的条目
+}
+
+
+def bump(counter: str, amount: int = 1):
+    with _stats_lock:
+        _stats[counter] += amount
+
+
+def get_repair_stats() -> Dict[str, Any]:
+    """Counters for this worker, with repairs vs full re-calls"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['repairs'] = stats['repaired_local'] + stats['repaired_followup']
+    return stats
+
+
+def reset_repair_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+class RepairResult(NamedTuple):
+    value: Any
+    repaired: bool  # 文本经过了修改
+    truncated: bool  # 原文在对象闭合前就结束了
+
+
+def extract_json_text(text: str) -> str:
+    """The JSON part of a completion: a ```json fence's body, else from the first '{'"""
+    fence = re.search(r'```(?:json)?\s*(.*?)(?:```|$)', text, re.DOTALL)
+    if fence and '{' in fence.group(1):
+        text = fence.group(1)
+    start = text.find('{')
+    return text[start:] if start != -1 else text
+
+
+def repair_json(text: str) -> RepairResult:
+    """
+    Parse JSON, repairing prose, trailing commas and truncation.
+
+    Args:
+        text: Raw completion
+
+    Returns:
+        RepairResult
+
+    Raises:
+        json.JSONDecodeError: If the text cannot be repaired
+    """
+    candidate = extract_json_text(text).strip()
+    try:
+        value, _ = json.JSONDecoder().raw_decode(candidate)
+        return RepairResult(value, candidate != text.strip(), False)
+    except json.JSONDecodeError:
+        pass
+
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    closed = False
+    for ch in candidate:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                closed = True
+                break
+            continue
+        out.append(ch)
+
+    truncated = not closed
+    if truncated:
+        if in_string:
+            if escape:
+                out.pop()
+            out.append('"')
+        _drop_dangling(out, stack)
+        while stack:
+            _strip_trailing_comma(out)
+            out.append(stack.pop())
+
+    return RepairResult(json.loads(''.join(out)), True, truncated)
+
+
+def _strip_trailing_comma(out: list):
+    """Remove whitespace and one comma at the end of out"""
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+
+
+def _drop_dangling(out: list, stack: list):
+    """Drop an incomplete trailing member (key without value, half a literal)"""
+    text = ''.join(out).rstrip()
+    if stack and stack[-1] == '}':
+        # {"a": 1, "b"   /   {"a": 1, "b":
+        text = re.sub(r'(?:,|(?<=\{))\s*"(?:[^"\\]|\\.)*"\s*:?\s*$', '', text)
+    # 被截断的 true/false/null 或数字
+    text = re.sub(r'(?<=[:\[,])\s*(?:tru|tr|t|fals|fal|fa|f|nul|nu|n|-)$', '', text)
+    text = re.sub(r'(\d)[.eE+-]+$', r'\1', text)
+    text = re.sub(r':\s*$', ': null', text)
+    out[:] = list(text)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+json_stream.py - Incremental JSON parsing of streamed LLM output
+
+JSONArrayStreamParser is fed completion chunks as they arrive and returns
+each element of one array field (e.g. "work_items") as soon as its closing
+brace has been seen, without waiting for the rest of the response. Prose
+or a markdown fence before the JSON object is skipped.
+"""
+
+import json
+from typing import Any, List, Optional
+
+
+class JSONArrayStreamParser:
+    """
+    Emit the object elements of a top-level object's array field while streaming.
+
+    A light scanner runs once over each character (string/escape state and
+    nesting depth) and each element is decoded with json.loads when it is
+    complete, so the total work is linear in the response length.
+    """
+
+    def __init__(self, key: str):
+        """
+        Args:
+            key: Name of the array field in the top-level object
+        """
+        self.key = key
+        self.items: List[Any] = []
+        self.items_end = 0  # text 中最后一个完整元素之后的位置
+        self.text = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None  # 顶层对象中当前值所属的键
+        self._in_array = False
+        self._element_start = -1
+        self._done = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume the next chunk of the completion.
+
+        Args:
+            chunk: Next piece of streamed text
+
+        Returns:
+            Array elements completed by this chunk (possibly empty)
+        """
+        self.text += chunk
+        text = self.text
+        completed = []
+
+        for i in range(self._pos, len(text)):
+            if self._done:
+                break
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        try:
+                            self._last_string = json.loads(text[self._string_start:i + 1])
+                        except ValueError:
+                            self._last_string = None
+                continue
+
+            if self._depth == 0:
+                # 顶层对象之前的说明文字 / ```json 标记
+                if ch == '{':
+                    self._depth = 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ':' and self._depth == 1:
+                self._current_key = self._last_string
+            elif ch == ',' and self._depth == 1:
+                self._current_key = None
+            elif ch in '{[':
+                self._depth += 1
+                if self._depth == 2 and ch == '[' and self._current_key == self.key:
+                    self._in_array = True
+                elif self._depth == 3 and self._in_array and ch == '{':
+                    self._element_start = i
+            elif ch in '}]':
+                if self._depth == 3 and self._in_array and self._element_start != -1:
+                    try:
+                        item = json.loads(text[self._element_start:i + 1])
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        self.items.append(item)
+                        self.items_end = i + 1
+                        completed.append(item)
+                    self._element_start = -1
+                elif self._depth == 2:
+                    self._in_array = False
+                self._depth -= 1
+                if self._depth == 0:
+                    self._done = True
+
+        self._pos = len(text)
+        return completed
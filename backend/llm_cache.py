@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+llm_cache.py - Persistent deterministic LLM response cache
+
+Generation runs at temperature 0, so an identical request always deserves the
+same answer. Responses are stored in the SQLite database (shared by all
+gunicorn workers) keyed by a hash of model, normalized prompts and parameters,
+with TTL expiry and size-bounded LRU eviction.
+"""
+
+import re
+import json
+import time
+import hashlib
+import threading
+import logging
+from typing import Optional, Dict, Any
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'writes': 0, 'bypassed': 0}
+
+
+def normalize_prompt(text: Optional[str]) -> str:
+    """
+    Normalize a prompt for cache keying.
+
+    Only whitespace that cannot change the model's reading of the prompt is
+    touched: line endings, trailing spaces and runs of blank lines.
+    """
+    if not text:
+        return ''
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = [line.rstrip() for line in text.split('\n')]
+    text = '\n'.join(lines)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def make_cache_key(
+    model: str,
+    prompt: str,
+    system_prompt: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Build a cache key from model, normalized prompts and call parameters.
+
+    Returns:
+        Hex sha256 digest
+    """
+    material = json.dumps({
+        'model': model,
+        'system': normalize_prompt(system_prompt),
+        'user': normalize_prompt(prompt),
+        'params': params or {}
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def is_cacheable(purpose: Optional[str], temperature: float, use_cache: bool = True) -> bool:
+    """
+    Decide whether a call may be served from / written to the cache.
+
+    Args:
+        purpose: Call purpose (e.g. 'weekly_report'), checked against LLM_CACHE_BYPASS
+        temperature: Sampling temperature; only deterministic calls are cached
+        use_cache: Caller-level bypass flag
+    """
+    if not Config.LLM_CACHE_ENABLED or not use_cache or temperature != 0:
+        if Config.LLM_CACHE_ENABLED:
+            _bump('bypassed')
+        return False
+    if purpose and purpose in Config.LLM_CACHE_BYPASS:
+        _bump('bypassed')
+        return False
+    return True
+
+
+def get(cache_key: str) -> Optional[str]:
+    """Return a cached response or None"""
+    import database as db
+
+    response = db.get_llm_cache_entry(cache_key, time.time())
+    _bump('hits' if response is not None else 'misses')
+    return response
+
+
+def put(cache_key: str, response: str, model: str = None, purpose: str = None) -> bool:
+    """Store a response with the configured TTL and size bound"""
+    import database as db
+
+    if not response:
+        return False
+    now = time.time()
+    ok = db.save_llm_cache_entry(
+        cache_key,
+        response,
+        now=now,
+        expires_at=now + Config.LLM_CACHE_TTL,
+        max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+        model=model,
+        purpose=purpose
+    )
+    if ok:
+        _bump('writes')
+    return ok
+
+
+def clear() -> int:
+    """Remove every cached response"""
+    import database as db
+    return db.clear_llm_cache()
+
+
+def _bump(counter: str):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def get_cache_stats() -> Dict:
+    """
+    Get cache statistics: this worker's hit/miss counters plus shared table size.
+    """
+    import database as db
+
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    stats['enabled'] = Config.LLM_CACHE_ENABLED
+    stats['ttl_seconds'] = Config.LLM_CACHE_TTL
+    stats['max_entries'] = Config.LLM_CACHE_MAX_ENTRIES
+    stats['bypass_purposes'] = sorted(Config.LLM_CACHE_BYPASS)
+    stats.update(db.get_llm_cache_summary())
+    return stats
+
+
+def reset_cache_stats():
+    """Reset this worker's counters"""
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -4,11 +4,20 @@
 llm_client.py - LLM API client with retry and timeout handling
 """
 
+import json
 import time
 import logging
+import threading
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple, Iterator, Callable
 from config import Config
+from http_pool import create_session, ConnectTracker, prewarm, RequestAborted, current_abort, is_aborted, check_aborted
+import llm_cache
+import single_flight
+import telemetry
+from rate_control import get_rate_controller, classify_error, backoff_delay
+from circuit_breaker import breaker_for, CircuitOpenError
+from deadline import Deadline, DeadlineExceeded
 
 try:
     from openai import OpenAI
@@ -19,6 +28,21 @@ except ImportError:
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 当前线程最近一次真实 provider 调用的耗时（缓存命中或单飞合并时不记录）
+_call_timing = threading.local()
+
+
+def pop_provider_latency() -> Optional[float]:
+    """
+    Return and clear the duration (seconds) of this thread's last provider call.
+    
+    Used by the provider pool to feed latency statistics without counting
+    cache hits or coalesced calls.
+    """
+    latency = getattr(_call_timing, 'latency', None)
+    _call_timing.latency = None
+    return latency
+
 
 class LLMClient:
     """Client for OpenAI-like chat completions API"""
@@ -39,13 +63,20 @@ class LLMClient:
         self.temperature = self.config.get('temperature', 0)
         self.use_deepseek = self.config.get('use_deepseek', False)
         
+        # Keep-alive session: connections are reused across calls
+        self.session = create_session()
+        self.last_connect_info: Dict[str, Any] = {}
+        
         # Initialize DeepSeek client if needed
         self.deepseek_client = None
         if self.use_deepseek and HAS_OPENAI:
             try:
+                # 重试由 _with_retry 统一处理，关闭 SDK 自带重试
                 self.deepseek_client = OpenAI(
                     api_key=self.api_key,
-                    base_url=self.api_url
+                    base_url=self.api_url,
+                    timeout=self.timeout,
+                    max_retries=0
                 )
                 logger.info("Initialized DeepSeek client")
             except Exception as e:
@@ -56,127 +87,529 @@ class LLMClient:
         """Check if LLM client is properly configured"""
         return bool(self.api_url and self.api_key)
     
-    def call(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        purpose: Optional[str] = None,
+        use_cache: bool = True,
+        deadline: Optional[Deadline] = None
+    ) -> str:
         """
-        Call LLM API with retry and exponential backoff.
+        Call LLM API with response caching, retry and exponential backoff.
+        
+        Concurrent identical deterministic calls are coalesced into one
+        provider request (see single_flight.py).
         
         Args:
             prompt: User message/prompt
             system_prompt: Optional system message
+            purpose: What the call is for (weekly_report, okr, extraction, star,
+                skill_categorization); used for cache bypass rules and metrics
+            use_cache: Set False to force a fresh completion
+            deadline: Request time budget; attempts are shortened to fit it
             
         Returns:
             LLM response content string
             
         Raises:
             RuntimeError: If LLM is not configured
+            DeadlineExceeded: If the deadline ran out before an answer
             Exception: If all retries fail
         """
         if not self.is_configured():
             raise RuntimeError('LLM_API_URL or LLM_API_KEY not configured')
         
-        # Use DeepSeek client if configured
+        record = telemetry.start_call(purpose, self.api_url, self.model, prompt, system_prompt)
+        try:
+            content = self._call(prompt, system_prompt, purpose, use_cache, record, deadline)
+        except Exception as e:
+            telemetry.finish_call(record, error=e)
+            raise
+        telemetry.finish_call(record, response=content)
+        return content
+    
+    def _call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        purpose: Optional[str],
+        use_cache: bool,
+        record: Dict,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """call() without telemetry bookkeeping; marks cache hits and coalesced calls on record"""
+        cache_key = None
+        if llm_cache.is_cacheable(purpose, self.temperature, use_cache):
+            cache_key = llm_cache.make_cache_key(
+                self.model, prompt, system_prompt,
+                {'temperature': self.temperature}
+            )
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit ({purpose or 'default'}), response length: {len(cached)}")
+                record['outcome'] = 'cache_hit'
+                return cached
+        
+        def fetch() -> str:
+            content = self._call_provider(prompt, system_prompt, record, deadline)
+            if cache_key:
+                llm_cache.put(cache_key, content, model=self.model, purpose=purpose)
+            return content
+        
+        # 只合并确定性调用：temperature>0 时每次调用本应得到不同结果
+        if self.temperature != 0:
+            return fetch()
+        
+        content, shared = single_flight.run(self._flight_key(prompt, system_prompt), fetch, deadline)
+        if shared:
+            logger.info(f"LLM call coalesced with an identical in-flight request ({purpose or 'default'})")
+            record['outcome'] = 'coalesced'
+        return content
+    
+    def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        purpose: Optional[str] = None,
+        use_cache: bool = True,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[str]:
+        """
+        Call LLM API with stream=True and yield content chunks as they arrive.
+        
+        Retries only happen before the first chunk; once output has started a
+        failure is raised to the consumer. A cached response is yielded as a
+        single chunk, and a fully consumed stream is written to the cache.
+        
+        Args:
+            prompt: User message/prompt
+            system_prompt: Optional system message
+            purpose: What the call is for (see call())
+            use_cache: Set False to force a fresh completion
+            deadline: Request time budget for opening the stream (see call())
+            
+        Yields:
+            Response content chunks
+        """
+        if not self.is_configured():
+            raise RuntimeError('LLM_API_URL or LLM_API_KEY not configured')
+        
+        record = telemetry.start_call(purpose, self.api_url, self.model, prompt, system_prompt, stream=True)
+        cache_key = None
+        if llm_cache.is_cacheable(purpose, self.temperature, use_cache):
+            cache_key = llm_cache.make_cache_key(
+                self.model, prompt, system_prompt,
+                {'temperature': self.temperature}
+            )
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit ({purpose or 'default'}), streaming cached response")
+                telemetry.finish_call(record, response=cached, outcome='cache_hit')
+                yield cached
+                return
+        
+        start = time.monotonic()
         if self.use_deepseek and self.deepseek_client:
-            return self._call_deepseek(prompt, system_prompt)
+            chunks = self._stream_deepseek(prompt, system_prompt, record, deadline)
+        else:
+            chunks = self._stream_http(prompt, system_prompt, record, deadline)
         
-        url = f"{self.api_url}/chat/completions"
+        parts = []
+        try:
+            for chunk in chunks:
+                if not parts:
+                    telemetry.mark_first_byte(record)
+                parts.append(chunk)
+                yield chunk
+            # 中止的连接可能表现为流正常结束，不能当作完整回答缓存
+            check_aborted('LLM stream')
+        except GeneratorExit:
+            telemetry.finish_call(record, response=''.join(parts), outcome='cancelled')
+            raise
+        except Exception as e:
+            aborted = is_aborted()
+            telemetry.finish_call(record, response=''.join(parts), error=e, outcome='cancelled' if aborted else None)
+            if aborted and not isinstance(e, RequestAborted):
+                raise RequestAborted('LLM stream aborted') from e
+            raise
+        finally:
+            # 消费方提前关闭时立即断开 provider 连接
+            chunks.close()
         
+        _call_timing.latency = time.monotonic() - start
+        content = ''.join(parts)
+        logger.info(f"LLM stream finished, response length: {len(content)}")
+        telemetry.finish_call(record, response=content)
+        if cache_key:
+            llm_cache.put(cache_key, content, model=self.model, purpose=purpose)
+    
+    def _build_messages(self, prompt: str, system_prompt: Optional[str] = None) -> list:
         messages = []
         if system_prompt:
             messages.append({'role': 'system', 'content': system_prompt})
         messages.append({'role': 'user', 'content': prompt})
-        
-        payload = {
-            'model': self.model,
-            'messages': messages,
-            'temperature': self.temperature
-        }
-        
-        headers = {
+        return messages
+    
+    def _flight_key(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """Identity of a request for single-flight coalescing"""
+        return llm_cache.make_cache_key(
+            self.model, prompt, system_prompt,
+            {'temperature': self.temperature, 'api_url': self.api_url}
+        )
+    
+    def _build_headers(self) -> Dict[str, str]:
+        return {
             'Authorization': f"Bearer {self.api_key}",
             'Content-Type': 'application/json'
         }
+    
+    def _with_retry(
+        self,
+        label: str,
+        attempt_fn: Callable[[float], Any],
+        record: Optional[Dict] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Any:
+        """
+        Run attempt_fn under the process-wide rate controller, retrying
+        retryable failures with jittered backoff (honoring Retry-After).
+        Fatal errors such as 400/401/404 are raised immediately, and so is
+        CircuitOpenError once the provider's circuit breaker is open.
+        
+        With a deadline each attempt's timeout is cut to the remaining budget,
+        and a retry whose backoff would leave less than LLM_MIN_ATTEMPT_TIMEOUT
+        is not started: DeadlineExceeded is raised instead.
+        
+        For streams only opening the response holds a rate-controlled slot.
         
+        Args:
+            label: Provider label for log lines
+            attempt_fn: Callable performing one attempt with the given timeout (seconds)
+            record: Telemetry record counting attempts
+            deadline: Request time budget
+            
+        Returns:
+            Whatever attempt_fn returns
+        """
+        controller = get_rate_controller()
+        breaker = breaker_for(self.api_url)
         last_error = None
         
         for attempt in range(self.retry + 1):
+            check_aborted(label)
+            # 剩余时间不足以完成一次请求时不再发起
+            if deadline and not deadline.can_fit(0):
+                raise DeadlineExceeded(label, last_error)
+            # 等待限流名额的时间同样计入请求预算
+            if not controller.acquire(deadline.remaining() if deadline else None):
+                raise DeadlineExceeded(label, last_error)
+            probe = settled = False
             try:
-                logger.info(f"LLM API call attempt {attempt + 1}/{self.retry + 1}")
-                
-                resp = requests.post(
-                    url,
-                    headers=headers,
-                    json=payload,
-                    timeout=self.timeout
-                )
-                resp.raise_for_status()
-                
-                data = resp.json()
-                choices = data.get('choices', [])
-                
-                if choices:
-                    msg = choices[0].get('message', {})
-                    content = msg.get('content', '') or choices[0].get('text', '') or ''
-                    logger.info(f"LLM API call successful, response length: {len(content)}")
-                    return content
-                
-                return ''
-                
+                # 熔断打开时立即失败，不再等待超时和退避
+                if breaker:
+                    probe = breaker.before_call()
+                telemetry.add_attempt(record)
+                timeout = deadline.timeout(self.timeout) if deadline else self.timeout
+                logger.info(f"{label} call attempt {attempt + 1}/{self.retry + 1} (timeout {timeout:.1f}s)")
+                result = attempt_fn(timeout)
+            except CircuitOpenError:
+                raise
             except Exception as e:
+                # 调用方中止的请求（对冲落败）既不是 provider 故障，也不重试
+                check_aborted(label)
                 last_error = e
-                logger.warning(f"LLM API call attempt {attempt + 1} failed: {e}")
+                decision = classify_error(e)
+                controller.on_error(decision)
+                if breaker:
+                    breaker.record(decision)
+                settled = True
+                logger.warning(f"{label} call attempt {attempt + 1} failed ({decision.kind}): {e}")
                 
-                if attempt < self.retry:
-                    # Exponential backoff: 1s, 2s, 4s...
-                    wait_time = 2 ** attempt
-                    logger.info(f"Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
+                if not decision.retryable:
+                    raise
+            else:
+                controller.on_success()
+                if breaker:
+                    breaker.record_success()
+                settled = True
+                return result
+            finally:
+                controller.release()
+                # 被取消（CancelledError 等 BaseException）的探测既未成功也未失败，归还探测名额
+                if probe and not settled:
+                    breaker.release_probe()
+            
+            if attempt < self.retry:
+                wait_time = backoff_delay(attempt, decision.retry_after)
+                if deadline and not deadline.can_fit(wait_time):
+                    logger.warning(
+                        f"{label}: {deadline.remaining():.1f}s of the request budget left, "
+                        f"not retrying after a {wait_time:.1f}s backoff"
+                    )
+                    raise DeadlineExceeded(label, last_error)
+                logger.info(f"Retrying in {wait_time:.1f}s...")
+                time.sleep(wait_time)
         
-        raise last_error or Exception("LLM API call failed after all retries")
+        raise last_error or Exception(f"{label} call failed after all retries")
+    
+    def _post(
+        self,
+        payload: Dict,
+        stream: bool = False,
+        record: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> requests.Response:
+        """POST one chat completion request through the pooled session"""
+        url = f"{self.api_url}/chat/completions"
+        with ConnectTracker() as tracker:
+            resp = self.session.post(
+                url,
+                headers=self._build_headers(),
+                json=payload,
+                timeout=timeout or self.timeout,
+                stream=stream
+            )
+        self._record_connect_info(tracker)
+        telemetry.add_connect(record, tracker.connect_ms, resp.elapsed.total_seconds() * 1000)
+        try:
+            resp.raise_for_status()
+        except Exception:
+            resp.close()
+            raise
+        return resp
     
-    def _call_deepseek(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def _call_provider(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        record: Optional[Dict] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Send the request to the configured provider (DeepSeek SDK or raw HTTP)"""
+        start = time.monotonic()
+        # Use DeepSeek client if configured
+        if self.use_deepseek and self.deepseek_client:
+            content = self._call_deepseek(prompt, system_prompt, record, deadline)
+        else:
+            content = self._with_retry(
+                'LLM API',
+                lambda timeout: self._attempt_http(prompt, system_prompt, record, timeout),
+                record,
+                deadline
+            )
+        _call_timing.latency = time.monotonic() - start
+        return content
+    
+    def _attempt(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        record: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> str:
+        """Perform exactly one provider request, without retry or rate control"""
+        if self.use_deepseek and self.deepseek_client:
+            return self._attempt_deepseek(prompt, system_prompt, record, timeout)
+        return self._attempt_http(prompt, system_prompt, record, timeout)
+    
+    def _attempt_http(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        record: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> str:
+        """One raw HTTP chat completion request"""
+        payload = {
+            'model': self.model,
+            'messages': self._build_messages(prompt, system_prompt),
+            'temperature': self.temperature
+        }
+        resp = self._post(payload, record=record, timeout=timeout)
+        data = resp.json()
+        telemetry.set_usage(record, data.get('usage'))
+        choices = data.get('choices', [])
+        
+        if choices:
+            msg = choices[0].get('message', {})
+            content = msg.get('content', '') or choices[0].get('text', '') or ''
+            info = self.last_connect_info
+            logger.info(
+                f"LLM API call successful, response length: {len(content)}, "
+                f"connection {'reused' if info.get('reused') else 'opened'} "
+                f"(connect {info.get('connect_ms', 0):.1f}ms, saved ~{info.get('saved_ms', 0):.1f}ms)"
+            )
+            return content
+        
+        return ''
+    
+    def _stream_http(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        record: Optional[Dict] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[str]:
+        """Stream a completion over raw HTTP (OpenAI-compatible SSE)"""
+        payload = {
+            'model': self.model,
+            'messages': self._build_messages(prompt, system_prompt),
+            'temperature': self.temperature,
+            'stream': True
+        }
+        resp = self._with_retry(
+            'LLM API stream',
+            lambda timeout: self._post(payload, stream=True, record=record, timeout=timeout),
+            record,
+            deadline
+        )
+        
+        try:
+            content_type = resp.headers.get('Content-Type', '')
+            if 'application/json' in content_type:
+                # Provider ignored stream=True and answered in one piece
+                choices = resp.json().get('choices', [])
+                if choices:
+                    msg = choices[0].get('message', {})
+                    content = msg.get('content', '') or choices[0].get('text', '') or ''
+                    if content:
+                        yield content
+                return
+            
+            for raw_line in resp.iter_lines():
+                if not raw_line:
+                    continue
+                line = raw_line.decode('utf-8', errors='replace')
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    continue
+                choices = event.get('choices') or []
+                if not choices:
+                    continue
+                delta = choices[0].get('delta') or {}
+                text = delta.get('content') or choices[0].get('text') or ''
+                if text:
+                    yield text
+        finally:
+            resp.close()
+    
+    def _record_connect_info(self, tracker: ConnectTracker):
+        """Remember connect timing of the most recent HTTP request"""
+        self.last_connect_info = {
+            'reused': tracker.reused,
+            'connect_ms': round(tracker.connect_ms, 2),
+            'saved_ms': round(tracker.saved_ms, 2)
+        }
+    
+    def prewarm(self) -> bool:
+        """Open a pooled connection to the provider before the first call"""
+        if not self.is_configured() or (self.use_deepseek and self.deepseek_client):
+            return False
+        return prewarm(self.session, self.api_url)
+    
+    def close(self):
+        """Release pooled connections"""
+        try:
+            self.session.close()
+        except Exception:
+            pass
+        if self.deepseek_client is not None:
+            try:
+                self.deepseek_client.close()
+            except Exception:
+                pass
+    
+    def _call_deepseek(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        record: Optional[Dict] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
         """
         Call DeepSeek API using OpenAI client library.
         
         Args:
             prompt: User message/prompt
             system_prompt: Optional system message
+            record: Telemetry record
+            deadline: Request time budget
             
         Returns:
             DeepSeek response content string
         """
-        messages = []
-        if system_prompt:
-            messages.append({'role': 'system', 'content': system_prompt})
-        messages.append({'role': 'user', 'content': prompt})
+        return self._with_retry(
+            'DeepSeek API',
+            lambda timeout: self._attempt_deepseek(prompt, system_prompt, record, timeout),
+            record,
+            deadline
+        )
+    
+    def _attempt_deepseek(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        record: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> str:
+        """One chat completion request through the OpenAI client library"""
+        response = self.deepseek_client.chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(prompt, system_prompt),
+            temperature=self.temperature,
+            stream=False,
+            timeout=timeout or self.timeout
+        )
         
-        last_error = None
+        telemetry.set_usage(record, getattr(response, 'usage', None))
+        content = response.choices[0].message.content
+        logger.info(f"DeepSeek API call successful, response length: {len(content)}")
+        return content
+    
+    def _stream_deepseek(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        record: Optional[Dict] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[str]:
+        """Stream a completion through the OpenAI client library"""
+        messages = self._build_messages(prompt, system_prompt)
         
-        for attempt in range(self.retry + 1):
-            try:
-                logger.info(f"DeepSeek API call attempt {attempt + 1}/{self.retry + 1}")
-                
-                response = self.deepseek_client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=self.temperature,
-                    stream=False
-                )
-                
-                content = response.choices[0].message.content
-                logger.info(f"DeepSeek API call successful, response length: {len(content)}")
-                return content
-                
-            except Exception as e:
-                last_error = e
-                logger.warning(f"DeepSeek API call attempt {attempt + 1} failed: {e}")
-                
-                if attempt < self.retry:
-                    wait_time = 2 ** attempt
-                    logger.info(f"Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
+        stream = self._with_retry(
+            'DeepSeek API stream',
+            lambda timeout: self.deepseek_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                stream=True,
+                timeout=timeout
+            ),
+            record,
+            deadline
+        )
+        abort = current_abort()
+        if abort is not None:
+            abort.attach(stream)
         
-        raise last_error or Exception("DeepSeek API call failed after all retries")
-
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield text
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
 
 
 # Mock LLM client for testing/demo without real API
@@ -189,7 +622,7 @@ class MockLLMClient:
     def is_configured(self) -> bool:
         return True
     
-    def call(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def call(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> str:
         """Return mock response based on prompt content"""
         
         # Combine prompt and system_prompt for checking
@@ -210,6 +643,12 @@ class MockLLMClient:
         
         return "Mock response: 收到您的请求，这是模拟响应。"
     
+    def stream(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """Yield the mock response line by line"""
+        content = self.call(prompt, system_prompt)
+        for line in content.splitlines(keepends=True):
+            yield line
+    
     def _mock_weekly_report(self, prompt: str) -> str:
         """Generate mock weekly report"""
         # Extract week range from prompt if possible
@@ -261,18 +700,115 @@ KR1：2026-02-01前完成服务接口化改造设计方案评审；2026-02-28前
 KR2：2026-01-20前完成服务器环境标准化配置，覆盖100%生产节点；2026-03-15前完成自动化部署流程，部署时间缩短≥50%；"""
 
 
-def get_llm_client(use_mock: bool = False) -> LLMClient:
+# ========================================
+# Process-wide client registry
+# ========================================
+
+_registry: Dict[Tuple, LLMClient] = {}
+_registry_lock = threading.Lock()
+_default_client = None
+
+
+def _registry_key(config: Dict) -> Tuple:
+    return (
+        bool(config.get('use_deepseek', False)),
+        (config.get('api_url') or '').rstrip('/'),
+        config.get('api_key') or '',
+        config.get('model') or ''
+    )
+
+
+def get_registered_client(config: Dict) -> LLMClient:
+    """
+    Get the shared LLMClient for a (url, key, model) combination.
+    
+    Clients keep their pooled session / OpenAI client for the life of the
+    process, so repeated calls reuse warm connections.
+    
+    Args:
+        config: LLM config dict (see Config.get_llm_config)
+        
+    Returns:
+        Shared LLMClient instance
+    """
+    key = _registry_key(config)
+    with _registry_lock:
+        client = _registry.get(key)
+        if client is None:
+            full_config = Config.get_llm_config().copy()
+            full_config.update(config)
+            client = LLMClient(full_config)
+            _registry[key] = client
+        return client
+
+
+def reset_llm_clients():
+    """
+    Drop all shared clients so the next call picks up new settings.
+    
+    Called when the LLM configuration is saved.
+    """
+    global _default_client
+    with _registry_lock:
+        clients = list(_registry.values())
+        _registry.clear()
+        _default_client = None
+    for client in clients:
+        client.close()
+    logger.info("LLM client registry reset")
+
+
+def prewarm_llm_client() -> bool:
+    """Build the default client and open a connection to its provider"""
+    if not Config.is_llm_configured():
+        return False
+    client = get_llm_client()
+    ok = client.prewarm()
+    logger.info(f"LLM client prewarm {'succeeded' if ok else 'skipped or failed'}")
+    return ok
+
+
+def get_llm_client(use_mock: bool = False, purpose: Optional[str] = None) -> LLMClient:
     """
     Get appropriate LLM client based on configuration.
     
+    The real client is shared process-wide and only rebuilt after
+    reset_llm_clients() (i.e. when the LLM settings change). When
+    LLM_PROVIDERS adds endpoints, a ProviderPool is returned instead.
+    
     Args:
         use_mock: Force use of mock client
+        purpose: What the client is for; a task with its own model tier
+            (Config.get_llm_tier) gets that tier's client
         
     Returns:
-        LLMClient or MockLLMClient instance
+        LLMClient, ProviderPool or MockLLMClient instance; in cassette
+        mode a RecordingLLMClient around it or a ReplayLLMClient
     """
+    global _default_client
+    
+    if Config.LLM_CASSETTE_MODE == 'replay' and not use_mock:
+        from cassette import ReplayLLMClient
+        return ReplayLLMClient()
+    
     if use_mock or not Config.is_llm_configured():
         logger.info("Using MockLLMClient (LLM not configured or mock requested)")
         return MockLLMClient()
     
-    return LLMClient()
+    from cassette import wrap_for_cassette
+    task = Config.task_for_purpose(purpose)
+    if task and Config.get_llm_tier(task):
+        return wrap_for_cassette(get_registered_client(Config.get_llm_config(task)))
+    
+    client = _default_client
+    if client is None:
+        configs = Config.get_provider_configs()
+        if len(configs) > 1:
+            # 配置了多个 provider：按延迟/错误率路由
+            from provider_pool import ProviderPool
+            client = ProviderPool(configs)
+            logger.info(f"Using ProviderPool with {len(configs)} endpoints")
+        else:
+            client = get_registered_client(Config.get_llm_config())
+        _default_client = client
+    return wrap_for_cassette(client)
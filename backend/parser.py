@@ -7,9 +7,14 @@ Handles:
 - Date block extraction (YYYYMMDD or YYYY-MM-DD formats)
 - Hours parsing (default 8h if not specified)
 - Entry categorization based on keywords
+- Content-hash memoization of the parse pipeline
 """
 
 import re
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from config import Config
@@ -36,6 +41,45 @@ def format_date(dt: datetime) -> str:
     return dt.strftime('%Y-%m-%d')
 
 
+# Date line patterns: "20251212 8h", "2025-12-12 8h", hours optional
+DATE_LINE_COMPACT = r'^\s*(\d{8})\s*(\d+(?:\.\d+)?\s*h)?\s*$'
+DATE_LINE_HYPHEN = r'^\s*(\d{4}-\d{2}-\d{2})\s*(\d+(?:\.\d+)?\s*h)?\s*$'
+
+
+def is_date_line(line: str) -> bool:
+    """Check whether a line starts a new day block (same rules as parse_date_block)"""
+    stripped = line.strip()
+    return bool(
+        re.match(DATE_LINE_COMPACT, stripped, re.IGNORECASE)
+        or re.match(DATE_LINE_HYPHEN, stripped, re.IGNORECASE)
+    )
+
+
+def split_day_sections(text: str) -> List[str]:
+    """
+    Split raw daily report text at day boundaries, keeping the original lines.
+    
+    Boundaries match parse_date_block: each section starts at a date line;
+    content before the first date line forms its own section.
+    
+    Args:
+        text: Raw daily report text
+        
+    Returns:
+        List of raw text sections (empty sections dropped)
+    """
+    sections = []
+    current: List[str] = []
+    for line in text.split('\n'):
+        if is_date_line(line) and current:
+            sections.append('\n'.join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append('\n'.join(current))
+    return [section for section in sections if section.strip()]
+
+
 def parse_date_block(text: str) -> List[Dict]:
     """
     Parse daily report text into date blocks.
@@ -52,8 +96,8 @@ def parse_date_block(text: str) -> List[Dict]:
         List of dicts with keys: date, hours, content
     """
     # Patterns for date line detection
-    pattern_compact = r'^\s*(\d{8})\s*(\d+(?:\.\d+)?\s*h)?\s*$'
-    pattern_hyphen = r'^\s*(\d{4}-\d{2}-\d{2})\s*(\d+(?:\.\d+)?\s*h)?\s*$'
+    pattern_compact = DATE_LINE_COMPACT
+    pattern_hyphen = DATE_LINE_HYPHEN
     
     lines = text.split('\n')
     blocks = []
@@ -240,10 +284,92 @@ def deduplicate_entries(entries: List[str]) -> List[str]:
     return result
 
 
+# ========================================
+# Parse Result Memoization
+# ========================================
+
+# LRU 缓存：key -> {'blocks', 'categories'}（不含 week_range，因为它依赖当前日期）
+_parse_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+_parse_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def get_keyword_config_version() -> str:
+    """
+    Return a short fingerprint of the active classification keywords.
+    
+    Keywords live on Config as mutable class attributes, so the version is
+    derived from their current contents rather than tracked by hand.
+    """
+    keyword_lists = (
+        Config.KEYWORDS_TEMPORARY,
+        Config.KEYWORDS_OPS,
+        Config.KEYWORDS_ADMIN,
+        Config.KEYWORDS_RESEARCH,
+        Config.KEYWORDS_SERVICE
+    )
+    raw = '\x1e'.join('\x1f'.join(keywords) for keywords in keyword_lists)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def _parse_cache_key(text: str) -> str:
+    """Build the memo key from the input text and keyword config version"""
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return f"{get_keyword_config_version()}:{digest}"
+
+
+def get_parse_cache_stats() -> Dict:
+    """
+    Get parse memo statistics.
+    
+    Returns:
+        Dict with hits, misses, evictions, size, max_size and hit_rate
+    """
+    with _parse_cache_lock:
+        hits = _parse_cache_stats['hits']
+        misses = _parse_cache_stats['misses']
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': _parse_cache_stats['evictions'],
+            'size': len(_parse_cache),
+            'max_size': Config.PARSE_CACHE_SIZE,
+            'hit_rate': round(hits / total, 4) if total else 0.0
+        }
+
+
+def clear_parse_cache():
+    """Drop all memoized parse results and reset statistics"""
+    with _parse_cache_lock:
+        _parse_cache.clear()
+        for key in _parse_cache_stats:
+            _parse_cache_stats[key] = 0
+
+
+def _parse_and_categorize_uncached(text: str) -> Dict:
+    """Run the date-independent part of the parsing pipeline"""
+    blocks = parse_date_block(text)
+    categories = categorize_entries(blocks)
+    
+    # Deduplicate each category
+    for cat in categories:
+        categories[cat] = deduplicate_entries(categories[cat])
+    
+    return {
+        'blocks': blocks,
+        'categories': categories
+    }
+
+
 def parse_and_categorize(text: str) -> Dict:
     """
     Full parsing pipeline: parse text, categorize entries, deduplicate.
     
+    Results are memoized by a hash of the text and the keyword config
+    version. week_range is always computed fresh so a cached entry never
+    reports a stale week.
+    
     Args:
         text: Raw daily report text
         
@@ -255,18 +381,33 @@ def parse_and_categorize(text: str) -> Dict:
     """
     monday, friday = get_current_week_range()
     
-    blocks = parse_date_block(text)
-    categories = categorize_entries(blocks)
-    
-    # Deduplicate each category
-    for cat in categories:
-        categories[cat] = deduplicate_entries(categories[cat])
+    result = None
+    if Config.PARSE_CACHE_SIZE > 0:
+        key = _parse_cache_key(text)
+        with _parse_cache_lock:
+            cached = _parse_cache.get(key)
+            if cached is not None:
+                _parse_cache.move_to_end(key)
+                _parse_cache_stats['hits'] += 1
+            else:
+                _parse_cache_stats['misses'] += 1
+        
+        if cached is None:
+            cached = _parse_and_categorize_uncached(text)
+            with _parse_cache_lock:
+                _parse_cache[key] = cached
+                _parse_cache.move_to_end(key)
+                while len(_parse_cache) > Config.PARSE_CACHE_SIZE:
+                    _parse_cache.popitem(last=False)
+                    _parse_cache_stats['evictions'] += 1
+        
+        # 返回副本，避免调用方修改污染缓存
+        result = copy.deepcopy(cached)
+    else:
+        result = _parse_and_categorize_uncached(text)
     
-    return {
-        'blocks': blocks,
-        'categories': categories,
-        'week_range': {
-            'monday': format_date(monday),
-            'friday': format_date(friday)
-        }
+    result['week_range'] = {
+        'monday': format_date(monday),
+        'friday': format_date(friday)
     }
+    return result
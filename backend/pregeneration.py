@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pregeneration.py - Scheduled pre-generation of weekly report drafts
+
+Instead of everyone asking the LLM for their weekly report on Friday
+afternoon, a scheduler thread in each server process (started by
+app.start_background_services) queues a weekly_pregen job for a week's
+Monday-Friday range:
+
+- a little while after the last workday's (Friday or later) daily report
+  is saved, or any daily report of a week that already has a
+  pre-generated draft changes, and
+- at a fixed time each week (WEEKLY_PREGEN_AT, e.g. "fri 16:00").
+
+Each run is delayed by a random jitter so that processes and users do not
+hit the provider at the same moment. The job goes through
+weekly_reports.generate_weekly_for_range, so the LLM is only called when
+the daily reports changed, and the draft is saved as the week's report
+that the generator page opens with. Reports saved or edited by hand are
+never overwritten.
+"""
+
+import re
+import time
+import heapq
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+
+import database as db
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+LAST_WORKDAY = 4  # 周五
+
+
+def parse_schedule(spec: str) -> Optional[Tuple[int, int, int]]:
+    """
+    Parse WEEKLY_PREGEN_AT.
+
+    Args:
+        spec: "<weekday> HH:MM", e.g. "fri 16:00"; empty disables the timed run
+
+    Returns:
+        (weekday 0=Monday, hour, minute) or None
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    spec = (spec or '').strip().lower()
+    if not spec:
+        return None
+    match = re.fullmatch(r'([a-z]{3})\w*\s+(\d{1,2}):(\d{2})', spec)
+    if not match or match.group(1) not in WEEKDAYS:
+        raise ValueError(f"Invalid WEEKLY_PREGEN_AT: {spec!r} (expected e.g. 'fri 16:00')")
+    hour, minute = int(match.group(2)), int(match.group(3))
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Invalid WEEKLY_PREGEN_AT time: {spec!r}")
+    return WEEKDAYS.index(match.group(1)), hour, minute
+
+
+def next_scheduled_run(schedule: Optional[Tuple[int, int, int]], now: datetime) -> Optional[datetime]:
+    """First time at or after now matching the weekly schedule"""
+    if schedule is None:
+        return None
+    weekday, hour, minute = schedule
+    candidate = (now + timedelta(days=(weekday - now.weekday()) % 7)).replace(
+        hour=hour, minute=minute, second=0, microsecond=0
+    )
+    if candidate < now:
+        candidate += timedelta(days=7)
+    return candidate
+
+
+def week_range_of(day: str) -> Tuple[str, str]:
+    """Monday and Friday (YYYY-MM-DD) of the week containing day"""
+    date = datetime.strptime(day, '%Y-%m-%d')
+    monday = date - timedelta(days=date.weekday())
+    return monday.strftime('%Y-%m-%d'), (monday + timedelta(days=4)).strftime('%Y-%m-%d')
+
+
+def pregenerate_week(start_date: str, end_date: str, use_mock: bool = False) -> Dict[str, Any]:
+    """
+    Generate the draft for a week unless it is up to date or maintained by hand.
+
+    Returns:
+        Dict with success, skipped (reason, if nothing was generated),
+        unchanged, or error
+    """
+    from weekly_reports import generate_weekly_for_range, get_freshness
+
+    saved = db.get_weekly_report(start_date, end_date)
+    if saved:
+        freshness = get_freshness(saved)
+        if freshness['stale'] is None or freshness['edited']:
+            # 手写或改过的周报不覆盖
+            return {'success': True, 'skipped': 'manual'}
+
+    result = generate_weekly_for_range(start_date, end_date, use_mock=use_mock)
+    if not result['success']:
+        if result.get('status') == 400:
+            return {'success': True, 'skipped': 'no_daily_reports'}
+        return {'success': False, 'error': result.get('error', '生成失败')}
+    logger.info(
+        f"Weekly draft for {start_date} ~ {end_date} "
+        f"{'already up to date' if result['unchanged'] else 'pre-generated'}"
+    )
+    return {'success': True, 'unchanged': result['unchanged'], 'degraded': bool(result.get('degraded'))}
+
+
+class PregenQueue:
+    """
+    Weeks waiting for their (jittered) due time.
+
+    Request handlers only add to it; the scheduler thread takes due weeks
+    off it, so weeks queued before the thread starts are not lost.
+    """
+
+    def __init__(self):
+        self.wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[float, str, str]] = []  # (due, start_date, end_date)
+
+    def enqueue(self, start_date: str, end_date: str, delay: float = 0.0) -> float:
+        """
+        Queue a pre-generation after delay plus a random jitter.
+
+        A week already pending keeps its earlier due time.
+
+        Returns:
+            Due time (epoch seconds)
+        """
+        due = time.time() + delay + random.uniform(0, max(0.0, Config.WEEKLY_PREGEN_JITTER))
+        with self._lock:
+            for pending_due, start, end in self._pending:
+                if (start, end) == (start_date, end_date):
+                    return pending_due
+            heapq.heappush(self._pending, (due, start_date, end_date))
+        self.wakeup.set()
+        return due
+
+    def pop_due(self, now: float) -> List[Tuple[float, str, str]]:
+        """Remove and return the weeks due at now"""
+        due_now = []
+        with self._lock:
+            while self._pending and self._pending[0][0] <= now:
+                due_now.append(heapq.heappop(self._pending))
+        return due_now
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return self._pending[0][0] if self._pending else None
+
+    def pending(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{'start_date': s, 'end_date': e, 'due': due} for due, s, e in sorted(self._pending)]
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+
+
+_queue = PregenQueue()
+
+
+class PregenScheduler(threading.Thread):
+    """Submits weekly_pregen jobs for the queued weeks at their due times"""
+
+    def __init__(self):
+        super().__init__(name='weekly-pregen', daemon=True)
+        self.stopping = threading.Event()
+        try:
+            self.schedule = parse_schedule(Config.WEEKLY_PREGEN_AT)
+        except ValueError as e:
+            logger.warning(f"{e}; timed pre-generation disabled")
+            self.schedule = None
+        self.next_run = next_scheduled_run(self.schedule, datetime.now())
+
+    def run(self):
+        while not self.stopping.is_set():
+            now = time.time()
+            if self.next_run and now >= self.next_run.timestamp():
+                start, end = week_range_of(self.next_run.strftime('%Y-%m-%d'))
+                _queue.enqueue(start, end)
+                self.next_run = next_scheduled_run(self.schedule, datetime.now() + timedelta(minutes=1))
+
+            for _, start, end in _queue.pop_due(now):
+                self._submit(start, end)
+
+            wait = 60.0
+            next_due = _queue.next_due()
+            if next_due is not None:
+                wait = min(wait, next_due - now)
+            if self.next_run:
+                wait = min(wait, self.next_run.timestamp() - now)
+            _queue.wakeup.wait(max(0.05, wait))
+            _queue.wakeup.clear()
+
+    def _submit(self, start_date: str, end_date: str):
+        from jobs import submit_job
+
+        try:
+            job = submit_job(
+                'weekly_pregen',
+                {'start_date': start_date, 'end_date': end_date},
+                dedup_key=f'weekly_pregen:{start_date}:{end_date}'
+            )
+            logger.info(f"Weekly pre-generation for {start_date} ~ {end_date} queued as job {job['id']}")
+        except Exception as e:
+            logger.error(f"Could not queue weekly pre-generation for {start_date} ~ {end_date}: {e}")
+
+
+_scheduler: Optional[PregenScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def start_pregen_scheduler() -> Optional[PregenScheduler]:
+    """Start this process's scheduler (idempotent); None when disabled"""
+    global _scheduler
+    if not Config.WEEKLY_PREGEN_ENABLED:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = PregenScheduler()
+            _scheduler.start()
+        return _scheduler
+
+
+def stop_pregen_scheduler():
+    """Stop the scheduler thread and drop queued weeks (tests)"""
+    global _scheduler
+    with _scheduler_lock:
+        scheduler, _scheduler = _scheduler, None
+    if scheduler:
+        scheduler.stopping.set()
+        _queue.wakeup.set()
+        scheduler.join(5)
+    _queue.clear()
+
+
+def notify_daily_report_changed(entry_date: str) -> Optional[float]:
+    """
+    Called after a daily report is saved or deleted.
+
+    Queues the week's pre-generation (after WEEKLY_PREGEN_DELAY + jitter)
+    when the entry is for the last workday or later, or the week already
+    has a pre-generated draft. Only the queue is touched here; the
+    scheduler thread that submits the job is started with the server.
+
+    Returns:
+        Due time, or None if nothing was queued
+    """
+    if not (Config.WEEKLY_PREGEN_ENABLED and Config.WEEKLY_PREGEN_ON_LAST_WORKDAY and Config.is_llm_configured()):
+        return None
+    try:
+        start_date, end_date = week_range_of(entry_date)
+        weekday = datetime.strptime(entry_date, '%Y-%m-%d').weekday()
+    except ValueError:
+        return None
+    if weekday < LAST_WORKDAY and db.get_weekly_report_state(start_date, end_date) is None:
+        return None
+    return _queue.enqueue(start_date, end_date, Config.WEEKLY_PREGEN_DELAY)
+
+
+def get_pregen_status() -> Dict[str, Any]:
+    """Scheduler state for /api/weekly-reports/pregeneration"""
+    scheduler = _scheduler if _scheduler is not None and _scheduler.is_alive() else None
+    return {
+        'enabled': Config.WEEKLY_PREGEN_ENABLED,
+        'schedule': Config.WEEKLY_PREGEN_AT,
+        'next_run': scheduler.next_run.isoformat() if scheduler and scheduler.next_run else None,
+        'running': scheduler is not None,
+        'pending': _queue.pending()
+    }
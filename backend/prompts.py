@@ -119,6 +119,121 @@ def get_okr_user_prompt(content: str, next_quarter: str = "2026第一季度") ->
 3. 关键KR包含阶段里程碑（M1/M2/M3）"""
 
 
+# ========================================
+# Map-Reduce Prompts (超长输入分块摘要)
+# ========================================
+
+def get_chunk_summary_system_prompt(target: str = 'weekly_report') -> str:
+    """
+    Get system prompt for condensing one chunk of long input (map step).
+    
+    Args:
+        target: What the condensed material feeds into: weekly_report or okr
+    """
+    goal = '周报' if target == 'weekly_report' else '季度OKR'
+    return f"""你是材料压缩助手。用户材料过长，需要先分段压缩，再统一生成{goal}。你只负责压缩其中一段。
+
+压缩规则：
+- 只保留材料中明确出现的信息，不得编造或推断
+- 保留日期（按天分组，日期行原样保留，如 20251212 或 2025-12-12）
+- 保留项目名称、关键进展、量化数据、风险和问题
+- 保留分类线索原词：临时工作、PoC、调研、服务化、接口化、运维、工单、会议、分享等
+- 合并同一天内的重复事项，删除寒暄和无信息内容
+- 输出纯文本，每天一个日期行加若干"- "开头的要点，不要输出标题或解释"""
+
+
+def get_chunk_summary_user_prompt(chunk: str, index: int, total: int) -> str:
+    """
+    Generate user prompt for condensing one chunk.
+    
+    Args:
+        chunk: Chunk text
+        index: 1-based chunk position
+        total: Number of chunks
+    """
+    return f"""以下是第 {index}/{total} 段材料，请按规则压缩：
+
+{chunk}"""
+
+
+# ========================================
+# Hierarchical Quarter Summary Prompts (周 → 月 → 季度)
+# ========================================
+
+def get_month_summary_system_prompt() -> str:
+    """Get system prompt for summarizing one month of weekly material and work items."""
+    return """你是月度总结助手。一个季度的周报和工作记录过多，需要先按月总结，再汇总为季度总结，最后用于制定下季度目标。你只负责总结其中一个月。
+
+总结规则：
+- 只使用提供的材料，不得编造或推断
+- 按项目/主题归并，保留关键进展、量化数据、里程碑日期、风险和未完成事项
+- 保留分类线索原词：临时工作、PoC、调研、服务化、接口化、运维等
+- 合并重复内容，删除会议、寒暄等无信息内容
+- 输出纯文本，5-12条"- "开头的要点，不要输出标题或解释"""
+
+
+def get_month_summary_user_prompt(month: str, weeks: list, work_items: list) -> str:
+    """
+    Generate user prompt for summarizing one month.
+    
+    Args:
+        month: Month label (YYYY-MM)
+        weeks: List of dicts with start_date, end_date and text, oldest first
+        work_items: Work item dicts (with project_name) of the month
+    """
+    sections = "\n\n".join(
+        f"【{w['start_date']} ~ {w['end_date']}】\n{w['text'].strip()}" for w in weeks
+    ) or '（无）'
+    items_text = "".join(
+        f"\n- {item.get('raw_log_date', '')} [{item.get('project_name') or '未归类'}] {item.get('action') or ''}"
+        + (f" | 结果：{item['result_metric']}" if item.get('result_metric') else '')
+        for item in work_items
+    ) or '（无）'
+    
+    return f"""月份：{month}
+
+各周工作材料（按时间顺序）：
+
+{sections}
+
+该月的结构化工作记录：{items_text}
+
+请按规则总结该月的工作。"""
+
+
+def get_quarter_summary_system_prompt() -> str:
+    """Get system prompt for combining month summaries into a quarter summary."""
+    return """你是季度总结助手。你需要把一个季度内各月的工作总结汇总为一份紧凑的季度总结，作为制定下季度目标的依据。
+
+总结规则：
+- 只使用提供的月度总结，不得编造或推断
+- 按项目/主题组织，体现整个季度的进展脉络
+- 保留量化成果、已达成的里程碑、仍存在的风险和未完成事项
+- 指出延续到下季度的重点工作
+- 输出纯文本，每个主题一行"主题："开头，后跟若干"- "要点，总长度不超过1500字"""
+
+
+def get_quarter_summary_user_prompt(quarter: str, month_summaries: list) -> str:
+    """
+    Generate user prompt for a quarter summary built from month summaries.
+    
+    Args:
+        quarter: Quarter label (YYYY-Qn)
+        month_summaries: List of dicts with month and summary, oldest first
+    """
+    sections = "\n\n".join(
+        f"【{m['month']}】\n{m['summary'].strip()}" for m in month_summaries
+    )
+    
+    return f"""季度：{quarter}
+
+各月工作总结（按时间顺序）：
+
+{sections}
+
+请按规则汇总为季度总结。"""
+
+
 # ========================================
 # Career Asset Management Prompts (实体提取)
 # ========================================
@@ -179,6 +294,93 @@ def get_work_item_extraction_user_prompt(log_content: str, log_date: str) -> str
 请严格按照JSON格式输出提取结果。只提取日志中明确提到的信息，不要编造。"""
 
 
+def get_packed_extraction_system_prompt() -> str:
+    """Get system prompt for extracting work items from several days' logs in one call."""
+    return """你是一个严格的多日信息提取助手。用户会一次提供多天的日志，你需要**按日期分别**从每一天的日志中**提取**结构化信息，而不是创造或扩写。
+
+**核心原则**：
+1. **只提取**：只输出日志中明确提到的内容，绝不编造
+2. **保持原意**：使用日志中的原话或近义词，不改变含义
+3. **标记不确定**：如果信息不明确或太简略，标记为 "待补充"
+4. **严禁幻觉**：如果日志中没有提到量化结果，result_metric 填 null
+5. **按日隔离**：每一天的工作项只能来自当天的日志，不要跨日合并
+
+**输出格式（JSON，days 的键为日期 YYYY-MM-DD，必须包含输入中的每一个日期）**：
+```json
+{
+  "days": {
+    "2025-12-08": {
+      "work_items": [
+        {
+          "project": "项目名称（如有明确提及）或 null",
+          "action": "具体做了什么（动词开头的短语）",
+          "problem": "遇到的问题（如有提及）或 null",
+          "result_metric": "量化结果（如：提升50%、完成3个接口）或 null",
+          "skills": ["技能标签1", "技能标签2"]
+        }
+      ],
+      "extraction_quality": "good | partial | insufficient",
+      "notes": "提取过程中的备注"
+    }
+  }
+}
+```
+
+**技能标签提取规则**：
+- 技术类：编程语言、框架、工具（如 Python, React, Redis, Docker）
+- 软技能：沟通协调、项目管理、文档编写
+- 业务领域：算法优化、性能调优、安全加固
+
+**重要**：
+- 一天的日志可能包含多个 work_item
+- 如果某天的日志很简略（如"修了个bug"），该日的 extraction_quality 设为 "insufficient"，但仍要输出该日期
+- 绝对不要编造日志中没有的数据或指标"""
+
+
+def get_packed_extraction_user_prompt(logs: list) -> str:
+    """
+    Generate user prompt for extracting several days in one call.
+
+    Args:
+        logs: List of dicts with log_date (YYYY-MM-DD) and log_content
+    """
+    sections = "\n\n".join(
+        f"=== 日期：{log['log_date']} ===\n{log['log_content'].strip()}"
+        for log in logs
+    )
+    dates = "、".join(log['log_date'] for log in logs)
+    return f"""请分别从以下 {len(logs)} 天的日志中提取结构化工作项。
+
+{sections}
+
+请严格按照JSON格式输出，days 中必须包含以下每个日期：{dates}。只提取日志中明确提到的信息，不要编造。"""
+
+
+def get_extraction_repair_system_prompt() -> str:
+    """Get system prompt for repairing a truncated or malformed extraction result."""
+    return """你是JSON修复助手。用户会给出一段工作项提取结果的片段，它被截断或格式有误。你需要把片段中能确认的工作项整理成合法的 JSON。
+
+规则：
+- 只使用片段中已有的内容，不得编造或补充新的工作项
+- 被截断的字段保留已有部分；无法确认的字段填 null
+- 每个工作项包含 project, action, problem, result_metric, skills 字段
+- 输出格式：{"work_items": [...]}，只输出 JSON，不要有其他文字"""
+
+
+def get_extraction_repair_user_prompt(fragment: str) -> str:
+    """
+    Generate user prompt for repairing an extraction result fragment.
+    
+    Args:
+        fragment: The broken tail of the completion (after the last complete work item)
+    """
+    return f"""以下是提取结果的残缺片段：
+
+{fragment}
+
+请输出修复后的 JSON。"""
+
+
 def get_star_summary_system_prompt() -> str:
     """Get system prompt for generating STAR summary from aggregated work items."""
     return """你是一个简历撰写助手。你需要根据提供的工作项记录，生成一段符合STAR法则的项目描述。
@@ -207,14 +409,8 @@ def get_star_summary_system_prompt() -> str:
 4. 语言简洁专业，适合放在简历中"""
 
 
-def get_star_summary_user_prompt(project_name: str, work_items: list) -> str:
-    """
-    Generate user prompt for STAR summary.
-    
-    Args:
-        project_name: Name of the project
-        work_items: List of work item dicts with action, problem, result_metric, skills
-    """
+def _format_star_items(work_items: list) -> str:
+    """Numbered work item lines shared by the STAR prompts"""
     items_text = ""
     for i, item in enumerate(work_items, 1):
         items_text += f"\n{i}. "
@@ -226,6 +422,18 @@ def get_star_summary_user_prompt(project_name: str, work_items: list) -> str:
             items_text += f" | 结果：{item['result_metric']}"
         if item.get('skills_tags'):
             items_text += f" | 技能：{item['skills_tags']}"
+    return items_text
+
+
+def get_star_summary_user_prompt(project_name: str, work_items: list) -> str:
+    """
+    Generate user prompt for STAR summary.
+    
+    Args:
+        project_name: Name of the project
+        work_items: List of work item dicts with action, problem, result_metric, skills
+    """
+    items_text = _format_star_items(work_items)
     
     return f"""请为以下项目生成一段 STAR 格式的简历描述。
 
@@ -234,3 +442,91 @@ def get_star_summary_user_prompt(project_name: str, work_items: list) -> str:
 相关工作记录：{items_text}
 
 请基于以上记录，生成一段专业、简洁的项目描述。"""
+
+
+def get_star_window_summary_system_prompt() -> str:
+    """Get system prompt for condensing one time window of a large project's work items."""
+    return """你是项目阶段总结助手。项目的工作记录过多，需要先按时间段分别总结，再统一撰写简历描述。你只负责总结其中一个时间段。
+
+总结规则：
+- 只使用提供的工作记录，不得编造或推断
+- 保留关键行动、遇到的问题、量化结果和用到的技能
+- 合并相似或重复的记录，删除无信息内容
+- 输出纯文本，3-8条"- "开头的要点，不要输出标题或解释"""
+
+
+def get_star_window_summary_user_prompt(project_name: str, window: str, work_items: list) -> str:
+    """
+    Generate user prompt for summarizing one time window of a project.
+    
+    Args:
+        project_name: Name of the project
+        window: Window label (e.g. 2025-12 or 2025-12 #2)
+        work_items: Work items in the window
+    """
+    items_text = _format_star_items(work_items)
+    
+    return f"""项目名称：{project_name}
+时间段：{window}
+
+该时间段的工作记录：{items_text}
+
+请按规则总结该时间段的工作。"""
+
+
+def get_star_summary_from_windows_user_prompt(project_name: str, window_summaries: list) -> str:
+    """
+    Generate user prompt for a STAR summary built from per-window summaries.
+    
+    Args:
+        project_name: Name of the project
+        window_summaries: List of dicts with window and summary, oldest first
+    """
+    sections = "\n\n".join(
+        f"【{w['window']}】\n{w['summary'].strip()}" for w in window_summaries
+    )
+    
+    return f"""请为以下项目生成一段 STAR 格式的简历描述。
+
+项目名称：{project_name}
+
+各时间段的工作总结（按时间顺序）：
+
+{sections}
+
+请基于以上总结，生成一段专业、简洁的项目描述，体现项目的整体脉络和最终成果。"""
+
+
+def get_skill_categorization_system_prompt() -> str:
+    """Get system prompt for categorizing skills into tech/soft/domain/other."""
+    return """你是一个技能分类专家。你需要将技能分类到以下四个类别之一：
+
+1. tech（技术技能）：编程语言、框架、工具、数据库、云服务、DevOps、数据分析工具等技术相关技能
+2. soft（软技能）：沟通、协调、管理、领导力、团队协作、文档写作、演讲表达、项目管理等人际和管理技能
+3. domain（业务领域）：特定行业知识，如汽车、金融、制造、供应链、质量管理、财务、人力资源等业务知识
+4. other（其他）：无法明确归类到以上三类的技能
+
+请严格按照 JSON 格式返回结果，不要包含任何其他内容。"""
+
+
+def get_skill_categorization_user_prompt(skill_names: list) -> str:
+    """
+    Generate user prompt for categorizing a list of skills.
+    
+    Args:
+        skill_names: Skill names, one per line in the prompt
+    """
+    skills_text = '\n'.join(f"- {name}" for name in skill_names)
+    return f"""请对以下技能进行分类：
+
+{skills_text}
+
+请返回 JSON 格式，每个技能对应一个分类：
+{{
+  "技能名1": "tech",
+  "技能名2": "soft",
+  "技能名3": "domain",
+  ...
+}}
+
+只返回 JSON，不要有其他文字。"""
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+provider_pool.py - Latency-aware routing across several LLM providers
+
+Config.get_llm_config() picks exactly one endpoint, so a slow provider makes
+every request slow. When LLM_PROVIDERS adds more OpenAI-compatible endpoints,
+ProviderPool tracks an EWMA of latency and error rate per endpoint and sends
+each call to the fastest healthy one, failing over to the next on error.
+
+With LLM_HEDGE_ENABLED, a second request goes to the runner-up endpoint if
+the first has not answered within its p95 latency; the first complete answer
+wins and the loser's connection is shut down, even while it is still waiting
+for headers or its first token.
+"""
+
+import time
+import queue
+import random
+import threading
+import logging
+from collections import deque
+from typing import Optional, Dict, Any, List, Iterator
+from config import Config
+from llm_client import LLMClient, pop_provider_latency
+from circuit_breaker import CircuitOpenError, breaker_for
+from deadline import Deadline, DeadlineExceeded
+from http_pool import AbortHandle
+
+logger = logging.getLogger(__name__)
+
+# 统计 p95 所用的最近样本数；少于 HEDGE_MIN_SAMPLES 时使用 LLM_HEDGE_DELAY
+LATENCY_WINDOW = 50
+HEDGE_MIN_SAMPLES = 5
+# 错误率超过该值的端点在冷却期内视为不健康
+UNHEALTHY_ERROR_RATE = 0.5
+
+
+class EndpointStats:
+    """EWMA latency / error rate and recent samples for one endpoint"""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.hedge_wins = 0
+        self.last_failure = 0.0
+        self.lock = threading.Lock()
+
+    def _observe_latency(self, latency: float):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+        self.samples.append(latency)
+
+    def record_success(self, latency: Optional[float]):
+        with self.lock:
+            self.requests += 1
+            self.error_rate = (1 - self.alpha) * self.error_rate
+            if latency is not None:
+                self._observe_latency(latency)
+
+    def record_failure(self):
+        with self.lock:
+            self.requests += 1
+            self.failures += 1
+            self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+            self.last_failure = time.time()
+
+    def record_cancelled(self, elapsed: float):
+        """A hedged loser was still running after `elapsed` seconds: a lower bound on its latency"""
+        with self.lock:
+            self.cancelled += 1
+            self._observe_latency(elapsed)
+
+    def p95(self) -> Optional[float]:
+        with self.lock:
+            if len(self.samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def is_healthy(self, now: float) -> bool:
+        return not (
+            self.error_rate >= UNHEALTHY_ERROR_RATE
+            and now - self.last_failure < Config.LLM_PROVIDER_COOLDOWN
+        )
+
+    def score(self) -> float:
+        """Lower is better; endpoints without samples score 0 so they get tried"""
+        latency = self.ewma_latency or 0.0
+        return latency * (1 + 4 * self.error_rate)
+
+
+class Endpoint:
+    """One provider: its client and statistics"""
+
+    def __init__(self, name: str, client: LLMClient, alpha: float):
+        self.name = name
+        self.client = client
+        self.stats = EndpointStats(alpha)
+
+    def is_available(self, now: float) -> bool:
+        """Healthy by recent stats and not behind an open circuit breaker"""
+        breaker = breaker_for(self.client.api_url)
+        return self.stats.is_healthy(now) and not (breaker and breaker.is_open())
+
+    def record_error(self, error: Exception):
+        """Count a failed call; fast-failed calls never reached the provider"""
+        if not isinstance(error, CircuitOpenError):
+            self.stats.record_failure()
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        stats = self.stats
+        p95 = stats.p95()
+        return {
+            'name': self.name,
+            'model': self.client.model,
+            'healthy': self.is_available(now),
+            'ewma_latency_ms': round(stats.ewma_latency * 1000, 1) if stats.ewma_latency is not None else None,
+            'p95_latency_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'error_rate': round(stats.error_rate, 4),
+            'requests': stats.requests,
+            'failures': stats.failures,
+            'cancelled': stats.cancelled,
+            'hedge_wins': stats.hedge_wins
+        }
+
+
+class ProviderPool:
+    """Routes calls across several LLM endpoints; same call()/stream() interface as LLMClient"""
+
+    def __init__(self, configs: List[Dict], hedge: Optional[bool] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            configs: Full LLM config dicts (see Config.get_provider_configs)
+            hedge: Enable hedged requests, defaults to Config.LLM_HEDGE_ENABLED
+        """
+        from llm_client import get_registered_client
+
+        self.endpoints: List[Endpoint] = []
+        for config in configs:
+            client = get_registered_client(config)
+            name = config.get('name') or f"{client.api_url} ({client.model})"
+            self.endpoints.append(Endpoint(name, client, Config.LLM_EWMA_ALPHA))
+        self.hedge = Config.LLM_HEDGE_ENABLED if hedge is None else hedge
+        self.hedged_requests = 0
+        # Interface parity with LLMClient (used for logging and cache keys)
+        self.model = self.endpoints[0].client.model if self.endpoints else ''
+
+    def is_configured(self) -> bool:
+        return any(endpoint.client.is_configured() for endpoint in self.endpoints)
+
+    def ranked(self, explore: bool = True) -> List[Endpoint]:
+        """Healthy endpoints by score, then unhealthy ones as a last resort"""
+        now = time.time()
+        healthy = sorted(
+            (e for e in self.endpoints if e.is_available(now)),
+            key=lambda e: e.stats.score()
+        )
+        unhealthy = sorted(
+            (e for e in self.endpoints if not e.is_available(now)),
+            key=lambda e: e.stats.score()
+        )
+        # 小比例随机探索，避免慢端点的统计永远不再更新
+        if explore and len(healthy) > 1 and random.random() < Config.LLM_PROVIDER_EXPLORE:
+            pick = random.randrange(1, len(healthy))
+            healthy[0], healthy[pick] = healthy[pick], healthy[0]
+        return healthy + unhealthy
+
+    @staticmethod
+    def call_budget(endpoint: Endpoint) -> float:
+        """Longest a hedged runner may take: every attempt's timeout plus the backoffs between them"""
+        client = endpoint.client
+        return client.timeout * (client.retry + 1) + Config.LLM_BACKOFF_MAX * client.retry
+
+    def hedge_delay(self, endpoint: Endpoint) -> float:
+        """Wait this long for the primary before sending the hedge"""
+        p95 = endpoint.stats.p95()
+        delay = p95 if p95 is not None else Config.LLM_HEDGE_DELAY
+        return max(Config.LLM_HEDGE_MIN_DELAY, delay)
+
+    def call(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        purpose: Optional[str] = None,
+        use_cache: bool = True,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Call the best endpoint, failing over (or hedging) to the others.
+
+        Args:
+            prompt: User message/prompt
+            system_prompt: Optional system message
+            purpose: What the call is for (see LLMClient.call)
+            use_cache: Set False to force a fresh completion
+            deadline: Request time budget shared by all endpoints tried
+
+        Returns:
+            LLM response content string
+
+        Raises:
+            DeadlineExceeded: If the deadline ran out first (no further failover)
+            Exception: The last error if every endpoint failed
+        """
+        ranked = self.ranked()
+        now = time.time()
+        if self.hedge and len(ranked) > 1 and ranked[1].is_available(now):
+            return self._hedged_call(ranked, prompt, system_prompt, purpose, use_cache, deadline)
+
+        last_error = None
+        for endpoint in ranked:
+            pop_provider_latency()
+            try:
+                content = endpoint.client.call(
+                    prompt, system_prompt, purpose=purpose, use_cache=use_cache, deadline=deadline
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                last_error = e
+                endpoint.record_error(e)
+                logger.warning(f"LLM provider {endpoint.name} failed, trying next: {e}")
+                continue
+            endpoint.stats.record_success(pop_provider_latency())
+            return content
+
+        raise last_error or RuntimeError('No LLM provider configured')
+
+    def _hedged_call(
+        self,
+        ranked: List[Endpoint],
+        prompt: str,
+        system_prompt: Optional[str],
+        purpose: Optional[str],
+        use_cache: bool,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Race the primary against the runner-up once the primary exceeds its
+        hedge delay. Both run as streams under an AbortHandle so the loser's
+        connection can be shut down wherever it is waiting; the same happens
+        to every runner when the deadline passes or no runner answers within
+        its call budget.
+        """
+        results: queue.Queue = queue.Queue()
+        cancel = threading.Event()
+        candidates = list(ranked)
+        handles: Dict[str, AbortHandle] = {}
+
+        def run(endpoint: Endpoint, handle: AbortHandle):
+            start = time.monotonic()
+            pop_provider_latency()
+            parts = []
+            with handle:
+                chunks = endpoint.client.stream(
+                    prompt, system_prompt, purpose=purpose, use_cache=use_cache, deadline=deadline
+                )
+                try:
+                    for chunk in chunks:
+                        if cancel.is_set():
+                            break
+                        parts.append(chunk)
+                except Exception as e:
+                    if not cancel.is_set():
+                        results.put((endpoint, None, e))
+                        return
+                finally:
+                    chunks.close()
+            if cancel.is_set():
+                endpoint.stats.record_cancelled(time.monotonic() - start)
+                return
+            results.put((endpoint, ''.join(parts), pop_provider_latency()))
+
+        def launch() -> Optional[Endpoint]:
+            nonlocal give_up_at
+            if not candidates:
+                return None
+            endpoint = candidates.pop(0)
+            handles[endpoint.name] = AbortHandle()
+            give_up_at = max(give_up_at, time.monotonic() + self.call_budget(endpoint))
+            threading.Thread(target=run, args=(endpoint, handles[endpoint.name]), daemon=True).start()
+            return endpoint
+
+        def stop_all():
+            cancel.set()
+            for handle in handles.values():
+                handle.abort()
+
+        give_up_at = 0.0
+        primary = launch()
+        running = 1
+        last_error = None
+        delay = self.hedge_delay(primary)
+
+        while running:
+            # 对冲发出后不再有触发点，但仍以调用预算为上限，避免两端都卡住时永久等待
+            wait = delay if delay is not None else max(0.0, give_up_at - time.monotonic())
+            if deadline:
+                wait = min(wait, deadline.remaining())
+            try:
+                endpoint, content, extra = results.get(timeout=wait)
+            except queue.Empty:
+                if deadline and deadline.expired():
+                    stop_all()
+                    raise DeadlineExceeded('LLM provider pool', last_error)
+                if delay is None:
+                    stop_all()
+                    raise TimeoutError(
+                        f"LLM provider pool: no provider answered within its call budget "
+                        f"({self.call_budget(primary):.0f}s)"
+                    )
+                # 主端点超过 p95 仍未返回：发出对冲请求
+                if launch() is not None:
+                    running += 1
+                    self.hedged_requests += 1
+                    logger.info(f"LLM hedge: {primary.name} slower than {delay:.2f}s, racing next provider")
+                delay = None
+                continue
+
+            running -= 1
+            if isinstance(extra, DeadlineExceeded):
+                stop_all()
+                raise extra
+            if content is None:
+                last_error = extra
+                endpoint.record_error(extra)
+                logger.warning(f"LLM provider {endpoint.name} failed: {extra}")
+                if launch() is not None:
+                    running += 1
+                continue
+
+            stop_all()
+            endpoint.stats.record_success(extra)
+            if endpoint is not primary:
+                endpoint.stats.hedge_wins += 1
+            return content
+
+        raise last_error or RuntimeError('No LLM provider configured')
+
+    def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        purpose: Optional[str] = None,
+        use_cache: bool = True,
+        deadline: Optional[Deadline] = None
+    ) -> Iterator[str]:
+        """
+        Stream from the best endpoint. Failover only happens before the first
+        chunk; streams are not hedged.
+        """
+        last_error = None
+        for endpoint in self.ranked():
+            pop_provider_latency()
+            started = False
+            try:
+                for chunk in endpoint.client.stream(
+                    prompt, system_prompt, purpose=purpose, use_cache=use_cache, deadline=deadline
+                ):
+                    started = True
+                    yield chunk
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                endpoint.record_error(e)
+                if started:
+                    raise
+                last_error = e
+                logger.warning(f"LLM provider {endpoint.name} stream failed, trying next: {e}")
+                continue
+            endpoint.stats.record_success(pop_provider_latency())
+            return
+
+        raise last_error or RuntimeError('No LLM provider configured')
+
+    def prewarm(self) -> bool:
+        return any([endpoint.client.prewarm() for endpoint in self.endpoints])
+
+    def close(self):
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-endpoint routing statistics"""
+        now = time.time()
+        ranked = self.ranked(explore=False)
+        return {
+            'enabled': True,
+            'hedge_enabled': self.hedge,
+            'hedged_requests': self.hedged_requests,
+            'preferred': ranked[0].name if ranked else None,
+            'endpoints': [endpoint.to_dict(now) for endpoint in self.endpoints]
+        }
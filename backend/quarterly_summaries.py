@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+quarterly_summaries.py - Hierarchical quarter summaries feeding OKR generation
+
+A quarter of weekly reports and work items is far larger than the OKR
+prompt's input. It is condensed level by level:
+
+- week: a saved weekly report (weekly_reports), or that week's daily
+  reports when none was saved; a week belongs to the month of its Thursday
+- month: the month's weeks plus its work items, summarized by the LLM
+- quarter: the three month summaries, summarized once more
+
+Month and quarter summaries are stored in period_summaries with the
+fingerprint of their inputs; a level is regenerated only when its
+children's fingerprints changed, so OKR generation for a quarter whose
+history is unchanged needs only the final OKR call.
+"""
+
+import re
+import json
+import hashlib
+import logging
+from datetime import date, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+
+import database as db
+from deadline import Deadline, DeadlineExceeded
+from circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+QUARTER_NAMES = '一二三四'
+WORK_ITEM_FIELDS = ('id', 'raw_log_date', 'project_name', 'action', 'problem', 'result_metric')
+
+
+def parse_quarter(quarter: str) -> Tuple[int, int]:
+    """
+    Args:
+        quarter: "YYYY-Qn", e.g. "2025-Q4"
+
+    Returns:
+        (year, quarter number)
+
+    Raises:
+        ValueError: If the label is malformed
+    """
+    match = re.fullmatch(r'(\d{4})-Q([1-4])', (quarter or '').strip().upper())
+    if not match:
+        raise ValueError(f"季度格式错误: {quarter!r}（应为 YYYY-Qn，如 2025-Q4）")
+    return int(match.group(1)), int(match.group(2))
+
+
+def quarter_months(quarter: str) -> List[str]:
+    """The quarter's months as YYYY-MM"""
+    year, q = parse_quarter(quarter)
+    return [f"{year}-{month:02d}" for month in range(3 * q - 2, 3 * q + 1)]
+
+
+def next_quarter_label(quarter: str) -> str:
+    """OKR target label for the quarter after, e.g. 2025-Q4 -> 2026第一季度"""
+    year, q = parse_quarter(quarter)
+    year, q = (year + 1, 1) if q == 4 else (year, q + 1)
+    return f"{year}第{QUARTER_NAMES[q - 1]}季度"
+
+
+def _month_bounds(month: str) -> Tuple[date, date]:
+    year, m = int(month[:4]), int(month[5:7])
+    first = date(year, m, 1)
+    following = date(year + 1, 1, 1) if m == 12 else date(year, m + 1, 1)
+    return first, following - timedelta(days=1)
+
+
+def month_weeks(month: str) -> List[date]:
+    """Mondays of the weeks whose Thursday falls in the month"""
+    first, last = _month_bounds(month)
+    monday = first - timedelta(days=first.weekday())
+    mondays = []
+    while monday <= last:
+        if first <= monday + timedelta(days=3) <= last:
+            mondays.append(monday)
+        monday += timedelta(days=7)
+    return mondays
+
+
+def _fingerprint(payload: Any) -> str:
+    material = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def collect_month(month: str, weekly_reports: List[Dict], daily_reports: List[Dict], work_items: List[Dict]) -> Dict:
+    """
+    Gather a month's inputs.
+
+    Args:
+        month: YYYY-MM
+        weekly_reports / daily_reports / work_items: Records around the
+            quarter (filtered to the month here)
+
+    Returns:
+        Dict with month, weeks ({start_date, end_date, source, text}),
+        work_items and fingerprint
+    """
+    from weekly_reports import format_daily_reports
+
+    weeks = []
+    used = set()
+    for monday in month_weeks(month):
+        thursday = (monday + timedelta(days=3)).isoformat()
+        saved = next((r for r in weekly_reports if r['start_date'] <= thursday <= r['end_date']), None)
+        if saved:
+            key = (saved['start_date'], saved['end_date'])
+            if key not in used:
+                used.add(key)
+                weeks.append({'start_date': key[0], 'end_date': key[1], 'source': 'weekly_report', 'text': saved['content']})
+            continue
+        sunday = (monday + timedelta(days=6)).isoformat()
+        daily = [d for d in daily_reports if monday.isoformat() <= d['entry_date'] <= sunday]
+        if daily:
+            friday = (monday + timedelta(days=4)).isoformat()
+            weeks.append({
+                'start_date': monday.isoformat(),
+                'end_date': max(friday, daily[-1]['entry_date']),
+                'source': 'daily_reports',
+                'text': format_daily_reports(daily)
+            })
+
+    first, last = _month_bounds(month)
+    items = sorted(
+        (i for i in work_items if first.isoformat() <= (i.get('raw_log_date') or '') <= last.isoformat()),
+        key=lambda i: (i['raw_log_date'], i['id'])
+    )
+    return {
+        'month': month,
+        'weeks': weeks,
+        'work_items': items,
+        'fingerprint': _fingerprint({
+            'month': month,
+            'weeks': [[w['start_date'], w['end_date'], w['source'], w['text']] for w in weeks],
+            'items': [[i.get(field) for field in WORK_ITEM_FIELDS] for i in items]
+        })
+    }
+
+
+def collect_quarter(quarter: str) -> List[Dict]:
+    """The quarter's months that have any weekly material or work items (see collect_month)"""
+    months = quarter_months(quarter)
+    first, _ = _month_bounds(months[0])
+    _, last = _month_bounds(months[-1])
+    # 跨季度边界的周最多向外延伸 3 天
+    start, end = (first - timedelta(days=3)).isoformat(), (last + timedelta(days=3)).isoformat()
+
+    weekly = [r for r in db.get_all_weekly_reports() if r['end_date'] >= start and r['start_date'] <= end]
+    daily = db.get_daily_reports_by_range(start, end)
+    items = db.get_work_items_by_date_range(first.isoformat(), last.isoformat())
+    collected = [collect_month(m, weekly, daily, items) for m in months]
+    return [m for m in collected if m['weeks'] or m['work_items']]
+
+
+def quarter_fingerprint(quarter: str, months: List[Dict]) -> str:
+    return _fingerprint({'quarter': quarter, 'months': [[m['month'], m['fingerprint']] for m in months]})
+
+
+def prepare_quarter(
+    quarter: str,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    force: bool = False,
+    concurrency: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Bring the month and quarter summaries of a quarter up to date.
+
+    Args:
+        quarter: YYYY-Qn
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether stored summaries and LLM completions may be reused
+        force: Regenerate every level even if its inputs are unchanged
+        concurrency: Max concurrent month summaries
+        deadline: Request time budget
+
+    Returns:
+        Dict with quarter, summary, fingerprint, months ({month, summary,
+        cached, weeks_count, items_count}), months_cached, quarter_cached;
+        None when the quarter has no material
+
+    Raises:
+        ValueError: Malformed quarter
+        RuntimeError / CircuitOpenError / DeadlineExceeded: If a summary fails
+    """
+    from generator import summarize_months, summarize_quarter
+
+    months = collect_quarter(quarter)
+    if not months:
+        return None
+    reuse = use_cache and not force
+
+    stored = db.get_period_summaries('month', [m['month'] for m in months]) if reuse else {}
+    missing = [m for m in months if stored.get(m['month'], {}).get('fingerprint') != m['fingerprint']]
+    logger.info(f"Quarter {quarter}: {len(months)} months, {len(months) - len(missing)} cached, {len(missing)} to summarize")
+
+    fresh = {}
+    if missing:
+        for month, summary in zip(missing, summarize_months(
+            missing, use_mock=use_mock, use_cache=use_cache, concurrency=concurrency, deadline=deadline
+        )):
+            fresh[month['month']] = summary
+            db.save_period_summary('month', month['month'], month['fingerprint'], summary, {
+                'weeks': len(month['weeks']), 'work_items': len(month['work_items'])
+            })
+
+    month_summaries = [{
+        'month': m['month'],
+        'summary': fresh[m['month']] if m['month'] in fresh else stored[m['month']]['summary'],
+        'cached': m['month'] not in fresh,
+        'weeks_count': len(m['weeks']),
+        'items_count': len(m['work_items'])
+    } for m in months]
+
+    fingerprint = quarter_fingerprint(quarter, months)
+    stored_quarter = db.get_period_summaries('quarter', [quarter]).get(quarter) if reuse else None
+    quarter_cached = bool(stored_quarter and stored_quarter['fingerprint'] == fingerprint)
+    if quarter_cached:
+        summary = stored_quarter['summary']
+    else:
+        summary = summarize_quarter(quarter, month_summaries, use_mock=use_mock, use_cache=use_cache, deadline=deadline)
+        db.save_period_summary('quarter', quarter, fingerprint, summary, {'months': [m['month'] for m in months]})
+
+    return {
+        'quarter': quarter,
+        'summary': summary,
+        'fingerprint': fingerprint,
+        'months': month_summaries,
+        'months_cached': len(months) - len(missing),
+        'quarter_cached': quarter_cached
+    }
+
+
+def okr_context(prepared: Dict[str, Any], extra_content: str = '') -> str:
+    """OKR input: the quarter summary plus optional material from the user"""
+    context = f"【{prepared['quarter']} 季度工作总结】\n{prepared['summary'].strip()}"
+    if extra_content and extra_content.strip():
+        context += f"\n\n【补充材料】\n{extra_content.strip()}"
+    return context
+
+
+def generate_quarter_okr(
+    quarter: str,
+    next_quarter: Optional[str] = None,
+    extra_content: str = '',
+    use_mock: bool = False,
+    use_cache: bool = True,
+    force: bool = False,
+    concurrency: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """
+    Generate next quarter's OKR from a quarter's stored history.
+
+    Args:
+        quarter: Quarter whose history is used (YYYY-Qn)
+        next_quarter: Target label (default: the quarter after)
+        extra_content: Additional material appended to the quarter summary
+
+    Returns:
+        generate_okr's result plus quarter, quarter_summary,
+        months_cached and quarter_cached; on failure success False with
+        error (status 400 for a bad or empty quarter, 504 at the
+        deadline, circuit_open/retry_after when the provider is down)
+    """
+    from generator import generate_okr, DEADLINE_ERROR
+
+    try:
+        target = next_quarter or next_quarter_label(quarter)
+        prepared = prepare_quarter(
+            quarter, use_mock=use_mock, use_cache=use_cache, force=force,
+            concurrency=concurrency, deadline=deadline
+        )
+    except ValueError as e:
+        return {'success': False, 'error': str(e), 'status': 400}
+    except DeadlineExceeded as e:
+        logger.warning(f"Quarter {quarter} summaries stopped at the deadline: {e}")
+        return {'success': False, 'error': DEADLINE_ERROR, 'status': 504}
+    except CircuitOpenError as e:
+        return {'success': False, 'error': str(e), 'circuit_open': True, 'retry_after': e.retry_in}
+    except Exception as e:
+        logger.error(f"Quarter {quarter} summaries failed: {e}")
+        return {'success': False, 'error': str(e)}
+
+    if prepared is None:
+        return {'success': False, 'error': f'{quarter} 没有周报、日报或工作记录', 'status': 400}
+
+    result = generate_okr(
+        okr_context(prepared, extra_content), next_quarter=target,
+        use_mock=use_mock, use_cache=use_cache, deadline=deadline
+    )
+    result.update({
+        'quarter': quarter,
+        'next_quarter': target,
+        'quarter_summary': prepared['summary'],
+        'months_cached': prepared['months_cached'],
+        'quarter_cached': prepared['quarter_cached']
+    })
+    return result
+
+
+def get_quarter_status(quarter: str) -> Dict[str, Any]:
+    """
+    Which summaries of a quarter are stored and up to date (no LLM calls).
+
+    Raises:
+        ValueError: Malformed quarter
+    """
+    months = collect_quarter(quarter)
+    stored = db.get_period_summaries('month', [m['month'] for m in months])
+    stored_quarter = db.get_period_summaries('quarter', [quarter]).get(quarter)
+    return {
+        'quarter': quarter,
+        'months': [{
+            'month': m['month'],
+            'weeks_count': len(m['weeks']),
+            'items_count': len(m['work_items']),
+            'summary': stored.get(m['month'], {}).get('summary'),
+            'stale': stored.get(m['month'], {}).get('fingerprint') != m['fingerprint']
+        } for m in months],
+        'summary': stored_quarter['summary'] if stored_quarter else None,
+        'stale': bool(months) and (
+            not stored_quarter or stored_quarter['fingerprint'] != quarter_fingerprint(quarter, months)
+        ),
+        'generated_at': stored_quarter['generated_at'] if stored_quarter else None
+    }
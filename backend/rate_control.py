@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+rate_control.py - Process-wide rate control for LLM provider calls
+
+Three parts:
+- classify_error(): decide whether a failed call is worth retrying
+- backoff_delay(): jittered exponential backoff that honors Retry-After
+- RateController: token bucket + AIMD concurrency limit shared by every
+  LLM caller in the process (sync and async clients alike)
+"""
+
+import time
+import random
+import threading
+import logging
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, NamedTuple
+
+import requests
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# HTTP 状态码中可重试的部分（其余 4xx 重试也不会成功）
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class ErrorDecision(NamedTuple):
+    """Outcome of classifying a failed provider call"""
+    retryable: bool
+    throttled: bool
+    retry_after: Optional[float]
+    kind: str
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta-seconds or HTTP-date) into seconds.
+
+    Returns:
+        Seconds to wait, or None if absent/invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_and_headers(error: Exception):
+    """Pull HTTP status and headers out of requests or openai exceptions"""
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None)
+    if status is None and response is not None:
+        status = getattr(response, 'status_code', None)
+    headers = getattr(response, 'headers', None) or {}
+    return status, headers
+
+
+def classify_error(error: Exception) -> ErrorDecision:
+    """
+    Classify a provider error as retryable or fatal.
+
+    - 429: retryable, throttled, honors Retry-After
+    - 408/409/425/5xx: retryable
+    - other 4xx (bad request, auth, not found...): fatal
+    - timeouts and connection errors: retryable
+    - anything else: retryable (keeps the previous retry-everything behavior)
+    """
+    status, headers = _status_and_headers(error)
+
+    if status is not None:
+        retry_after = parse_retry_after(headers.get('Retry-After') or headers.get('retry-after'))
+        if status == 429:
+            return ErrorDecision(True, True, retry_after, 'rate_limited')
+        if status in RETRYABLE_STATUS:
+            return ErrorDecision(True, status == 503 and retry_after is not None, retry_after, f'http_{status}')
+        if 400 <= status < 500:
+            return ErrorDecision(False, False, None, f'http_{status}')
+
+    name = type(error).__name__
+    if isinstance(error, requests.Timeout) or 'Timeout' in name:
+        return ErrorDecision(True, False, None, 'timeout')
+    if isinstance(error, requests.ConnectionError) or 'Connection' in name:
+        return ErrorDecision(True, False, None, 'connection')
+    if isinstance(error, RuntimeError) and 'not configured' in str(error):
+        return ErrorDecision(False, False, None, 'not_configured')
+
+    return ErrorDecision(True, False, None, 'unknown')
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Delay before the next attempt.
+
+    Retry-After wins when present (capped at LLM_BACKOFF_MAX); otherwise
+    exponential backoff with equal jitter: half fixed, half random.
+
+    Args:
+        attempt: Zero-based index of the attempt that just failed
+        retry_after: Server-requested delay in seconds
+    """
+    if retry_after is not None:
+        return min(retry_after, Config.LLM_BACKOFF_MAX)
+    ceiling = min(Config.LLM_BACKOFF_MAX, Config.LLM_BACKOFF_BASE * (2 ** attempt))
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; rate <= 0 means unlimited"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if available.
+
+        Returns:
+            0 on success, otherwise seconds until a token will be available
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit with additive increase / multiplicative decrease.
+
+    Each success raises the limit by 1/limit (about +1 per full window);
+    each throttle halves it, never below min_limit.
+    """
+
+    def __init__(self, initial: float, min_limit: int, max_limit: int):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self.cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.cond.notify()
+
+    def on_success(self):
+        with self.cond:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self.cond.notify_all()
+
+    def on_throttle(self):
+        with self.cond:
+            self.limit = max(self.min_limit, self.limit / 2)
+
+
+class RateController:
+    """Token bucket + AIMD limiter + shared Retry-After cool-down"""
+
+    def __init__(self):
+        self.bucket = TokenBucket(Config.LLM_RATE_LIMIT, Config.LLM_RATE_BURST)
+        self.limiter = AIMDLimiter(
+            initial=Config.LLM_MAX_CONCURRENCY,
+            min_limit=Config.LLM_MIN_CONCURRENCY,
+            max_limit=Config.LLM_MAX_CONCURRENCY
+        )
+        self.lock = threading.Lock()
+        self.cooldown_until = 0.0
+        self.stats = {
+            'requests': 0,
+            'successes': 0,
+            'throttled': 0,
+            'fatal_errors': 0,
+            'retryable_errors': 0,
+            'bucket_wait_ms': 0.0,
+            'cooldown_wait_ms': 0.0
+        }
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the call may proceed: cool-down over, token taken, slot free.
+
+        Returns:
+            False if timeout expired first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else deadline - time.monotonic()
+
+        # 等待 Retry-After 冷却期结束（由任一调用方的 429 触发）
+        wait = self.cooldown_until - time.time()
+        if wait > 0:
+            if remaining() is not None and remaining() < wait:
+                return False
+            time.sleep(wait)
+            self._add('cooldown_wait_ms', wait * 1000)
+
+        while True:
+            wait = self.bucket.try_acquire()
+            if wait <= 0:
+                break
+            if remaining() is not None and remaining() < wait:
+                return False
+            time.sleep(wait)
+            self._add('bucket_wait_ms', wait * 1000)
+
+        if not self.limiter.acquire(remaining()):
+            return False
+        self._add('requests', 1)
+        return True
+
+    def release(self):
+        self.limiter.release()
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """Hold a rate-controlled slot for the duration of one provider request"""
+        if not self.acquire(timeout):
+            raise TimeoutError('LLM rate limiter: no capacity before timeout')
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self):
+        self.limiter.on_success()
+        self._add('successes', 1)
+
+    def on_error(self, decision: ErrorDecision):
+        """Feed a classified failure back into the limits"""
+        if decision.throttled:
+            self.limiter.on_throttle()
+            self._add('throttled', 1)
+            if decision.retry_after:
+                with self.lock:
+                    self.cooldown_until = max(self.cooldown_until, time.time() + decision.retry_after)
+            logger.warning(
+                f"LLM provider throttled ({decision.kind}), concurrency limit now "
+                f"{int(self.limiter.limit)}, retry after {decision.retry_after}"
+            )
+        self._add('retryable_errors' if decision.retryable else 'fatal_errors', 1)
+
+    def _add(self, key: str, amount):
+        with self.lock:
+            self.stats[key] += amount
+
+    def get_stats(self) -> Dict:
+        """Current limits and counters"""
+        with self.lock:
+            stats = dict(self.stats)
+            cooldown = max(0.0, self.cooldown_until - time.time())
+        stats['bucket_wait_ms'] = round(stats['bucket_wait_ms'], 2)
+        stats['cooldown_wait_ms'] = round(stats['cooldown_wait_ms'], 2)
+        stats.update({
+            'concurrency_limit': int(self.limiter.limit),
+            'concurrency_limit_exact': round(self.limiter.limit, 3),
+            'in_flight': self.limiter.in_flight,
+            'rate_limit_per_sec': self.bucket.rate,
+            'burst': self.bucket.capacity,
+            'cooldown_remaining_sec': round(cooldown, 2)
+        })
+        return stats
+
+
+_controller: Optional[RateController] = None
+_controller_lock = threading.Lock()
+
+
+def get_rate_controller() -> RateController:
+    """Get the process-wide rate controller"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = RateController()
+    return _controller
+
+
+def reset_rate_controller():
+    """Rebuild the controller from current Config values"""
+    global _controller
+    with _controller_lock:
+        _controller = None
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+single_flight.py - Coalesce identical in-flight LLM requests
+
+A double-clicked "生成" button or two tabs regenerating the same week send the
+same prompt twice while the first call is still running. The response cache
+cannot help (nothing is cached yet), so concurrent identical requests are
+collapsed here instead: one caller (the leader) hits the provider and every
+other caller waits for and shares its result. A follower waits at most until
+its own request deadline, not for the leader's retries and deadline; when
+the leader runs out of its deadline, followers with time left run the call
+again (one of them becomes the new leader).
+
+Modes (Config.LLM_SINGLE_FLIGHT):
+- off:    no coalescing
+- local:  threads within one worker share a call
+- shared: additionally coalesce across gunicorn workers through the
+          llm_inflight SQLite table (leases, polled by followers)
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import threading
+import logging
+from typing import Any, Callable, Awaitable, Dict, Tuple, Optional
+from config import Config
+from deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# 跨 worker 模式下跟随者轮询结果的间隔（秒）
+SHARED_POLL_INTERVAL = 0.1
+
+_stats_lock = threading.Lock()
+_stats = {'leaders': 0, 'coalesced_local': 0, 'coalesced_shared': 0, 'shared_failures': 0}
+
+
+def _bump(counter: str):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+class _Flight:
+    """One in-flight call and its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-level single-flight: one call per key at a time"""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any], deadline: Optional[Deadline] = None) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Request identity (e.g. prompt hash)
+            fn: Callable performing the real work
+            deadline: This caller's time budget; bounds a follower's wait
+
+        Returns:
+            (result, shared) where shared is True for callers that waited on
+            another caller's execution
+
+        Raises:
+            DeadlineExceeded: If this caller's deadline ran out first
+            Whatever fn raised, re-raised in every waiting caller (except
+            the leader's DeadlineExceeded, see below)
+        """
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _Flight()
+                    self._flights[key] = flight
+            if leader:
+                break
+            
+            if not flight.done.wait(deadline.remaining() if deadline else None):
+                raise DeadlineExceeded('LLM single flight (waiting for an identical call)')
+            if isinstance(flight.error, DeadlineExceeded) and not (deadline and deadline.expired()):
+                # leader 的时间预算用完不影响还有预算的跟随者：重新发起
+                continue
+            _bump('coalesced_local')
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        _bump('leaders')
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+class AsyncSingleFlight:
+    """asyncio variant, scoped to one event loop"""
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Future] = {}
+
+    async def do(
+        self,
+        key: str,
+        coro_fn: Callable[[], Awaitable[Any]],
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[Any, bool]:
+        """Await coro_fn once for all concurrent awaiters with the same key (see SingleFlight.do)"""
+        while key in self._flights:
+            future = self._flights[key]
+            # shield: 跟随者被取消或超时不影响 leader
+            waiter = asyncio.shield(future)
+            if deadline is not None:
+                waiter = asyncio.wait_for(waiter, deadline.remaining())
+            try:
+                result = await waiter
+            except DeadlineExceeded:
+                if future.done() and not future.cancelled() and not (deadline and deadline.expired()):
+                    # leader 的时间预算用完，本调用还有预算：重新发起
+                    continue
+                raise
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded('LLM single flight (waiting for an identical call)')
+            _bump('coalesced_local')
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._flights[key] = future
+        _bump('leaders')
+        try:
+            result = await coro_fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 标记为已读取，避免无人等待时的告警
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            self._flights.pop(key, None)
+        return result, False
+
+
+class SharedFlightError(RuntimeError):
+    """The leader in another worker failed; its error message is carried along"""
+
+
+_owner_prefix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def run_shared(
+    key: str,
+    fn: Callable[[], str],
+    lease_seconds: float = None,
+    deadline: Optional[Deadline] = None
+) -> Tuple[str, bool]:
+    """
+    Coalesce a string-returning call across processes via the llm_inflight table.
+
+    The first worker to claim the key runs fn and publishes the result; other
+    workers poll until it is done. A crashed leader's lease expires and a
+    waiting worker takes over. A leader whose own deadline ran out releases
+    the claim instead of publishing the failure, so a waiting worker with
+    time left takes over at once.
+
+    Args:
+        key: Request identity
+        fn: Callable performing the real work (must return str)
+        lease_seconds: How long a claim stays valid, default LLM_SINGLE_FLIGHT_LEASE
+        deadline: This caller's time budget; bounds the polling of a follower
+
+    Returns:
+        (result, shared)
+
+    Raises:
+        DeadlineExceeded: If the deadline ran out while following another worker
+    """
+    import database as db
+
+    lease = lease_seconds if lease_seconds is not None else Config.LLM_SINGLE_FLIGHT_LEASE
+    owner = f"{_owner_prefix}-{uuid.uuid4().hex[:8]}"
+
+    # 数据库异常时 claim 与 get 都会失败，限制尝试次数后直接调用
+    for _ in range(5):
+        if db.claim_llm_flight(key, owner, time.time(), lease):
+            try:
+                result = fn()
+            except DeadlineExceeded:
+                db.release_llm_flight(key, owner)
+                raise
+            except Exception as e:
+                db.finish_llm_flight(key, owner, time.time(), error=f"{type(e).__name__}: {e}")
+                raise
+            db.finish_llm_flight(key, owner, time.time(), response=result)
+            return result, False
+
+        row = db.get_llm_flight(key)
+        if row is None:
+            continue
+        leader = row['owner']
+
+        while row is not None and row['owner'] == leader:
+            if row['status'] == 'done':
+                _bump('coalesced_shared')
+                return row['response'] or '', True
+            if row['status'] == 'failed':
+                _bump('shared_failures')
+                raise SharedFlightError(f"Shared LLM call failed in another worker: {row['error']}")
+            if row['lease_expires'] <= time.time():
+                logger.warning(f"LLM flight lease expired (owner {leader}), taking over")
+                break
+            if deadline and deadline.expired():
+                raise DeadlineExceeded('LLM single flight (waiting for another worker)')
+            time.sleep(min(SHARED_POLL_INTERVAL, deadline.remaining()) if deadline else SHARED_POLL_INTERVAL)
+            row = db.get_llm_flight(key)
+
+    logger.warning("Could not coordinate LLM flight through the database, calling directly")
+    return fn(), False
+
+
+_local = SingleFlight()
+
+
+def run(key: str, fn: Callable[[], str], deadline: Optional[Deadline] = None) -> Tuple[str, bool]:
+    """
+    Run fn with the configured single-flight mode.
+
+    Args:
+        key: Request identity (see LLMClient._flight_key)
+        fn: Callable performing the provider call
+        deadline: This caller's time budget; a follower gives up when it runs out
+
+    Returns:
+        (result, shared)
+
+    Raises:
+        DeadlineExceeded: If a follower's deadline ran out before the leader finished
+    """
+    mode = Config.LLM_SINGLE_FLIGHT
+    if mode == 'off':
+        return fn(), False
+    if mode == 'shared':
+        # 先在本 worker 内合并，再由 leader 参与跨 worker 合并
+        result, shared_local = _local.do(key, lambda: run_shared(key, fn, deadline=deadline), deadline)
+        value, shared_remote = result
+        return value, shared_local or shared_remote
+    return _local.do(key, fn, deadline)
+
+
+def get_single_flight_stats() -> Dict:
+    """Counters for this worker"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['mode'] = Config.LLM_SINGLE_FLIGHT
+    stats['in_flight'] = _local.in_flight()
+    return stats
+
+
+def reset_single_flight_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+skill_categorization.py - Incremental LLM skill categorization
+
+Every category the LLM assigns is remembered in skill_category_cache under
+the normalized skill name, so a later run only sends skills that were never
+categorized (new skills, or ones the LLM skipped last time). Skills that
+differ only in case, width or spacing share one decision and one prompt line.
+"""
+
+import logging
+from typing import Optional, Dict, Any, List
+
+import database as db
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+MOCK_MODEL = 'mock'
+
+
+def recategorize_skills(
+    use_mock: bool = False,
+    force: bool = False,
+    use_cache: bool = True,
+    chunk_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """
+    Categorize all skills, asking the LLM only about undecided ones.
+
+    Args:
+        use_mock: Whether to use mock LLM client
+        force: Ignore cached decisions and re-ask the LLM about every skill
+        use_cache: Whether identical earlier completions may be reused
+        chunk_size: Skills per LLM request (default Config.SKILL_CATEGORIZE_CHUNK_SIZE)
+        concurrency: Max concurrent LLM calls (default Config.LLM_CONCURRENCY)
+        deadline: Request time budget; skills it cuts off stay undecided
+
+    Returns:
+        Dict with success, message, updated_count, llm_count (skills sent to
+        the LLM), cached_count, unresolved, failed_chunks and details
+        (timeout=True when the deadline ran out before any chunk finished)
+    """
+    from generator import categorize_skills_with_llm, normalize_skill_name
+
+    skills = db.get_all_skills_for_categorization()
+    if not skills:
+        return {'success': True, 'message': '没有需要分类的技能', 'updated_count': 0}
+
+    decisions = {} if force else db.get_skill_category_decisions()
+    # mock 给出的分类不能代替真实模型的判断
+    decisions = {
+        name: d for name, d in decisions.items()
+        if use_mock or d.get('model') != MOCK_MODEL
+    }
+
+    details: List[Dict] = []
+    pending: Dict[str, List[Dict]] = {}
+    for skill in skills:
+        key = normalize_skill_name(skill['name'])
+        if key in decisions:
+            details.append({
+                'id': skill['id'],
+                'name': skill['name'],
+                'old_category': skill.get('category'),
+                'new_category': decisions[key]['category'],
+                'source': 'cache'
+            })
+        else:
+            pending.setdefault(key, []).append(skill)
+    cached_count = len(details)
+
+    result: Dict[str, Any] = {'success': True, 'categorized_skills': [], 'unresolved': [], 'failed_chunks': 0}
+    if pending:
+        # 同名（规范化后）技能只发送一次
+        representatives = [group[0] for group in pending.values()]
+        result = categorize_skills_with_llm(
+            representatives,
+            use_mock=use_mock,
+            use_cache=use_cache,
+            chunk_size=chunk_size,
+            concurrency=concurrency,
+            deadline=deadline
+        )
+
+        new_decisions = {}
+        for categorized in result.get('categorized_skills', []):
+            key = normalize_skill_name(categorized['name'])
+            new_decisions[key] = categorized['new_category']
+            for skill in pending[key]:
+                details.append({
+                    'id': skill['id'],
+                    'name': skill['name'],
+                    'old_category': skill.get('category'),
+                    'new_category': categorized['new_category'],
+                    'source': 'llm'
+                })
+        db.save_skill_category_decisions(new_decisions, model=result.get('model'))
+
+    # 缓存命中的部分即使 LLM 全部失败也照常应用
+    update_result = db.update_skill_categories(details)
+    if not update_result['success']:
+        return update_result
+    if not result['success']:
+        return {**result, 'updated_count': update_result['updated_count'], 'cached_count': cached_count}
+
+    llm_count = len(pending)
+    message = f"已使用 AI 更新 {update_result['updated_count']} 个技能的分类"
+    if cached_count:
+        message += f"（{cached_count} 个沿用已有分类，{llm_count} 个由 AI 新识别）"
+    logger.info(
+        f"Skill categorization: {cached_count} cached, {llm_count} sent to LLM, "
+        f"{len(result.get('unresolved', []))} unresolved, {update_result['updated_count']} updated"
+    )
+    return {
+        'success': True,
+        'message': message,
+        'updated_count': update_result['updated_count'],
+        'llm_count': llm_count,
+        'cached_count': cached_count,
+        'unresolved': result.get('unresolved', []),
+        'failed_chunks': result.get('failed_chunks', 0),
+        'details': details
+    }
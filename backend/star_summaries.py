@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+star_summaries.py - Incremental and bulk STAR summary generation
+
+A project's STAR summary is regenerated only when the fingerprint of its
+work items differs from the one recorded when the summary was last
+generated (star_summary_state). Projects with more than STAR_MAX_ITEMS
+items are summarized per month first; those window summaries are cached
+by the fingerprint of the window's items (star_partial_summaries), so new
+items in the current month only re-summarize that month.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, List, Iterator, Callable
+
+import database as db
+from config import Config
+from deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_star(
+    project: Dict,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    concurrency: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """
+    Work out the inputs of a project's STAR summary.
+
+    For large projects this summarizes the windows that have no cached
+    summary yet and saves them.
+
+    Args:
+        project: Project dict with work_items
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether cached window summaries and LLM completions may be reused
+        concurrency: Max concurrent window summaries
+        deadline: Request time budget for the window summaries
+
+    Returns:
+        Dict with fingerprint, items_count, window_summaries (None when the
+        items go into the prompt directly), windows_count, windows_cached
+
+    Raises:
+        RuntimeError / CircuitOpenError / DeadlineExceeded: If a window summary fails
+    """
+    from generator import star_fingerprint, split_star_windows, summarize_star_windows
+
+    work_items = project.get('work_items', [])
+    prepared = {
+        'fingerprint': star_fingerprint(project['name'], work_items),
+        'items_count': len(work_items),
+        'window_summaries': None,
+        'windows_count': 0,
+        'windows_cached': 0
+    }
+    if len(work_items) <= Config.STAR_MAX_ITEMS:
+        return prepared
+
+    windows = split_star_windows(project['name'], work_items)
+    cached = db.get_star_partials([w['fingerprint'] for w in windows]) if use_cache else {}
+    missing = [w for w in windows if w['fingerprint'] not in cached]
+    logger.info(
+        f"STAR for project {project['id']}: {len(windows)} windows, "
+        f"{len(windows) - len(missing)} cached, {len(missing)} to summarize"
+    )
+
+    fresh = {}
+    if missing:
+        for summary in summarize_star_windows(
+            project['name'], missing, use_mock=use_mock, use_cache=use_cache,
+            concurrency=concurrency, deadline=deadline
+        ):
+            fresh[summary['fingerprint']] = summary['summary']
+
+    window_summaries = [{
+        'window': w['window'],
+        'fingerprint': w['fingerprint'],
+        'summary': fresh.get(w['fingerprint']) or cached[w['fingerprint']]
+    } for w in windows]
+    db.save_star_partials(project['id'], window_summaries)
+
+    prepared.update({
+        'window_summaries': window_summaries,
+        'windows_count': len(windows),
+        'windows_cached': len(windows) - len(missing)
+    })
+    return prepared
+
+
+def save_star(project_id: int, summary: str, prepared: Dict[str, Any]) -> None:
+    """Save a generated summary and the fingerprint it was generated from"""
+    db.update_project(project_id, star_summary=summary)
+    db.save_star_state(project_id, prepared['fingerprint'], prepared['items_count'], prepared['windows_count'])
+
+
+def is_star_stale(project: Dict, states: Optional[Dict[int, Dict]] = None) -> bool:
+    """
+    Whether a project's STAR summary is missing or older than its work items.
+
+    Args:
+        project: Project dict with work_items
+        states: From db.get_star_states() (loaded when omitted)
+    """
+    from generator import star_fingerprint
+
+    if not project.get('work_items'):
+        return False
+    if not project.get('star_summary'):
+        return True
+    state = (states if states is not None else db.get_star_states()).get(project['id'])
+    return not state or state['fingerprint'] != star_fingerprint(project['name'], project['work_items'])
+
+
+def refresh_project_star(
+    project_id: int,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    force: bool = False,
+    concurrency: Optional[int] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """
+    Generate a project's STAR summary unless its work items are unchanged.
+
+    Args:
+        project_id: Project ID
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether cached window summaries and LLM completions may be reused
+        force: Regenerate even if the work items are unchanged
+        concurrency: Max concurrent window summaries
+        deadline: Request time budget
+
+    Returns:
+        Dict with success, summary, unchanged, windows_count, windows_cached
+        or success False with error (and status 404/400 for bad projects,
+        504 when the deadline ran out)
+    """
+    from generator import generate_star_summary
+
+    project = db.get_project_with_work_items(project_id)
+    if not project:
+        return {'success': False, 'error': '项目不存在', 'status': 404}
+    if not project.get('work_items'):
+        return {'success': False, 'error': '项目没有工作记录，无法生成 STAR 总结', 'status': 400}
+
+    if not force and not is_star_stale(project):
+        return {'success': True, 'summary': project['star_summary'], 'unchanged': True}
+
+    try:
+        prepared = prepare_star(
+            project, use_mock=use_mock, use_cache=use_cache, concurrency=concurrency, deadline=deadline
+        )
+    except DeadlineExceeded as e:
+        from generator import DEADLINE_ERROR
+        logger.warning(f"STAR window summaries for project {project_id} stopped at the deadline: {e}")
+        return {'success': False, 'error': DEADLINE_ERROR, 'status': 504}
+    except Exception as e:
+        logger.error(f"STAR window summaries failed for project {project_id}: {e}")
+        return {'success': False, 'error': str(e)}
+
+    result = generate_star_summary(
+        project['name'],
+        project['work_items'],
+        use_mock=use_mock,
+        use_cache=use_cache,
+        window_summaries=prepared['window_summaries'],
+        deadline=deadline
+    )
+    if not result['success']:
+        return {'success': False, 'error': result.get('error', '生成失败'), 'status': 504 if result.get('timeout') else 500}
+
+    save_star(project_id, result['summary'], prepared)
+    return {
+        'success': True,
+        'summary': result['summary'],
+        'unchanged': False,
+        'windows_count': prepared['windows_count'],
+        'windows_cached': prepared['windows_cached']
+    }
+
+
+def stream_project_star(
+    project: Dict,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """
+    Stream a project's STAR summary (always regenerated) and save it.
+
+    Large projects first emit a progress event while their windows are
+    summarized.
+
+    Yields:
+        [progress], meta, delta..., then done (summary) or error
+    """
+    from generator import stream_star_summary, DEADLINE_ERROR
+
+    if len(project.get('work_items', [])) > Config.STAR_MAX_ITEMS:
+        yield {'event': 'progress', 'stage': 'windows', 'items_count': len(project['work_items'])}
+    try:
+        prepared = prepare_star(project, use_mock=use_mock, use_cache=use_cache, deadline=deadline)
+    except DeadlineExceeded as e:
+        logger.warning(f"STAR window summaries for project {project['id']} stopped at the deadline: {e}")
+        yield {'event': 'error', 'error': DEADLINE_ERROR, 'partial': '', 'timeout': True}
+        return
+    except Exception as e:
+        logger.error(f"STAR window summaries failed for project {project['id']}: {e}")
+        yield {'event': 'error', 'error': str(e), 'partial': ''}
+        return
+
+    for event in stream_star_summary(
+        project['name'],
+        project['work_items'],
+        use_mock=use_mock,
+        use_cache=use_cache,
+        window_summaries=prepared['window_summaries'],
+        deadline=deadline
+    ):
+        if event['event'] == 'done':
+            save_star(project['id'], event['summary'], prepared)
+        yield event
+
+
+def get_stale_star_projects() -> List[Dict]:
+    """Projects with work items whose STAR summary is missing or out of date"""
+    states = db.get_star_states()
+    stale = []
+    for project in db.get_all_projects():
+        project = db.get_project_with_work_items(project['id'])
+        if project and is_star_stale(project, states):
+            stale.append(project)
+    return stale
+
+
+def refresh_all_star(
+    use_mock: bool = False,
+    use_cache: bool = True,
+    force: bool = False,
+    concurrency: Optional[int] = None,
+    exclude: Optional[set] = None,
+    on_progress: Optional[Callable[[Dict], None]] = None
+) -> Dict[str, Any]:
+    """
+    Regenerate the STAR summaries of all stale projects.
+
+    Runs up to concurrency projects at a time. A project that fails does
+    not stop the others; since finished projects are no longer stale,
+    running again only retries the failed ones.
+
+    Args:
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether cached window summaries and LLM completions may be reused
+        force: Regenerate every project with work items
+        concurrency: Projects at a time (default Config.STAR_REFRESH_CONCURRENCY)
+        exclude: Project ids to leave alone (e.g. done before a job resumed)
+        on_progress: Called after each project with {project_id, success,
+            error, completed, total}; an exception it raises stops the run
+            after the projects in progress
+
+    Returns:
+        Dict with success, total, succeeded (project ids), failed ({id: error})
+    """
+    if force:
+        projects = [p for p in (db.get_project_with_work_items(p['id']) for p in db.get_all_projects())
+                    if p and p.get('work_items')]
+    else:
+        projects = get_stale_star_projects()
+    if exclude:
+        projects = [p for p in projects if p['id'] not in exclude]
+
+    concurrency = max(1, concurrency or Config.STAR_REFRESH_CONCURRENCY)
+    succeeded: List[int] = []
+    failed: Dict[int, str] = {}
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='star-refresh')
+    try:
+        futures = {
+            executor.submit(refresh_project_star, p['id'], use_mock, use_cache, True): p['id']
+            for p in projects
+        }
+        for future in as_completed(futures):
+            project_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            if result['success']:
+                succeeded.append(project_id)
+            else:
+                failed[project_id] = result.get('error', '生成失败')
+            if on_progress:
+                on_progress({
+                    'project_id': project_id,
+                    'success': result['success'],
+                    'error': result.get('error'),
+                    'completed': len(succeeded) + len(failed),
+                    'total': len(projects)
+                })
+    finally:
+        # 被取消时不再启动排队中的项目
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    logger.info(f"STAR refresh finished: {len(succeeded)} done, {len(failed)} failed of {len(projects)}")
+    return {
+        'success': not failed,
+        'total': len(projects),
+        'succeeded': sorted(succeeded),
+        'failed': failed
+    }
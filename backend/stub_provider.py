@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+stub_provider.py - Local OpenAI-compatible stub LLM provider
+
+MockLLMClient bypasses HTTP entirely. This stub serves /chat/completions
+(JSON and SSE streaming) over real sockets so LLMClient, the rate limiter
+and the Flask app can be exercised under realistic provider behavior:
+- latency drawn from a configurable distribution
+- injected 5xx errors, 429s with Retry-After and hung requests (timeouts)
+- canned responses chosen by prompt type (weekly report, OKR, extraction,
+  STAR, skill categorization, chunk, month and quarter summary)
+
+Usage:
+    python stub_provider.py --port 8001 --latency lognormal:0.8,0.5 --rate-limit-rate 0.05
+    # then point LLM_API_URL at http://127.0.0.1:8001/v1
+"""
+
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from typing import Callable, Dict, List, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prompt types recognized from the system prompt (see prompts.py / generator.py)
+PROMPT_KINDS = [
+    ('weekly_report', '周报生成助手'),
+    ('okr', 'OKR生成助手'),
+    ('chunk_summary', '材料压缩助手'),
+    ('extraction_repair', 'JSON修复助手'),
+    ('packed_extraction', '多日信息提取助手'),
+    ('extraction', '信息提取助手'),
+    ('star_window', '项目阶段总结助手'),
+    ('month_summary', '月度总结助手'),
+    ('quarter_summary', '季度总结助手'),
+    ('star', 'STAR'),
+    ('skill_categorization', '技能分类专家'),
+]
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution spec into a sampler (seconds).
+
+    Supported specs:
+        fixed:0.3
+        uniform:0.1,0.5
+        normal:0.5,0.1        (mean, stddev; clamped at 0)
+        lognormal:0.8,0.5     (median, sigma; long right tail)
+        exponential:0.5       (mean)
+    """
+    name, _, args = (spec or 'fixed:0').partition(':')
+    values = [float(v) for v in args.split(',') if v.strip()] if args else []
+    name = name.strip().lower()
+
+    if name == 'fixed':
+        value = values[0] if values else 0.0
+        return lambda rng: value
+    if name == 'uniform':
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if name == 'normal':
+        mean, stddev = values
+        return lambda rng: max(0.0, rng.gauss(mean, stddev))
+    if name == 'lognormal':
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    if name == 'exponential':
+        mean = values[0]
+        return lambda rng: rng.expovariate(1.0 / mean)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def classify_prompt(messages: List[Dict]) -> str:
+    """Guess which generator prompt a request came from"""
+    system = ''.join(m.get('content', '') for m in messages if m.get('role') == 'system')
+    for kind, marker in PROMPT_KINDS:
+        if marker in system:
+            return kind
+    return 'default'
+
+
+def _user_prompt(messages: List[Dict]) -> str:
+    return ''.join(m.get('content', '') for m in messages if m.get('role') == 'user')
+
+
+def _usage(messages: List[Dict], content: str) -> Dict[str, int]:
+    """OpenAI-style usage block using the shared token estimate"""
+    from token_budget import estimate_tokens
+
+    prompt_tokens = estimate_tokens(''.join(m.get('content', '') for m in messages))
+    completion_tokens = estimate_tokens(content)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens
+    }
+
+
+def canned_response(kind: str, messages: List[Dict]) -> str:
+    """Return a well-formed response for the given prompt type"""
+    from llm_client import MockLLMClient
+
+    prompt = _user_prompt(messages)
+    mock = MockLLMClient()
+
+    if kind == 'weekly_report':
+        return mock._mock_weekly_report(prompt)
+    if kind == 'okr':
+        return mock._mock_okr(prompt)
+    if kind == 'chunk_summary':
+        # 保留日期行和每天第一条要点，模拟压缩
+        body = prompt.split('请按规则压缩：', 1)[-1]
+        kept, first_bullet = [], False
+        for line in body.split('\n'):
+            stripped = line.strip()
+            if re.match(r'^(\d{8}|\d{4}-\d{2}-\d{2})', stripped):
+                kept.append(stripped)
+                first_bullet = True
+            elif stripped and first_bullet:
+                kept.append(stripped)
+                first_bullet = False
+        return '\n'.join(kept) or '无有效内容'
+    if kind == 'extraction_repair':
+        return json.dumps({'work_items': []})
+    if kind in ('extraction', 'packed_extraction'):
+        day = {
+            'work_items': [{
+                'project': '文档智能提取',
+                'action': '完成O类文档生产环境部署与联调',
+                'problem': None,
+                'result_metric': '准确率提升至92%',
+                'skills': ['Python', 'Docker', '沟通协调']
+            }],
+            'extraction_quality': 'good',
+            'notes': ''
+        }
+        if kind == 'packed_extraction':
+            dates = re.findall(r'=== 日期：(\S+) ===', prompt)
+            return json.dumps({'days': {d: day for d in dates}}, ensure_ascii=False)
+        return json.dumps(day, ensure_ascii=False)
+    if kind == 'star_window':
+        return '- 完成文档提取服务部署与联调\n- 修复解析规则，准确率回升至92%'
+    if kind == 'month_summary':
+        month = re.search(r'月份：(\S+)', prompt)
+        return f"- {month.group(1) if month else ''} 完成文档提取服务部署，准确率提升至92%\n- 服务化接口开发进度60%"
+    if kind == 'quarter_summary':
+        return '文档提取：\n- 完成生产部署，准确率从85%提升到92%\n服务化：\n- 接口开发进度60%，下季度继续'
+    if kind == 'star':
+        return ('【情境】业务方反馈文档提取准确率下降。【任务】定位根因并恢复准确率。'
+                '【行动】梳理样本、修复解析规则并完成生产部署。【结果】准确率回升至92%，上线零故障。')
+    if kind == 'skill_categorization':
+        skills = re.findall(r'^-\s*(.+)$', prompt, re.MULTILINE)
+        return json.dumps({name.strip(): 'tech' for name in skills}, ensure_ascii=False)
+    return 'stub response'
+
+
+class StubProvider:
+    """
+    In-process stub provider. Use as a context manager or call start()/stop().
+
+    Example:
+        with StubProvider(latency='lognormal:0.5,0.4', rate_limit_rate=0.1) as stub:
+            client = LLMClient({'api_url': stub.base_url, 'api_key': 'x'})
+    """
+
+    def __init__(
+        self,
+        latency: str = 'fixed:0',
+        stream_chunk_delay: float = 0.01,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        timeout_rate: float = 0.0,
+        hang_seconds: float = 60.0,
+        responses: Optional[Dict[str, str]] = None,
+        seed: Optional[int] = None,
+        host: str = '127.0.0.1',
+        port: int = 0
+    ):
+        """
+        Args:
+            latency: Latency spec (see parse_latency); for streams, time to first chunk
+            stream_chunk_delay: Delay between streamed chunks (seconds)
+            error_rate: Share of requests answered with HTTP 500
+            rate_limit_rate: Share answered with HTTP 429 + Retry-After
+            retry_after: Retry-After value for injected 429s (seconds)
+            timeout_rate: Share of requests that hang for hang_seconds
+            hang_seconds: How long a hung request stalls before answering
+            responses: Optional {prompt kind: response} overrides
+            seed: Random seed for reproducible runs
+        """
+        self.sample_latency = parse_latency(latency)
+        self.stream_chunk_delay = stream_chunk_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.responses = responses or {}
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.host = host
+        self.port = port
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.server.server_address[1]}/v1"
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {'requests': 0, 'by_kind': {}, 'by_outcome': {}}
+
+    def _record(self, kind: str, outcome: str):
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['by_kind'][kind] = self.stats['by_kind'].get(kind, 0) + 1
+            self.stats['by_outcome'][outcome] = self.stats['by_outcome'].get(outcome, 0) + 1
+
+    def _draw(self):
+        """Pick an outcome and latency for one request"""
+        with self.rng_lock:
+            roll = self.rng.random()
+            latency = self.sample_latency(self.rng)
+        if roll < self.rate_limit_rate:
+            return 'rate_limited', 0.0
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            return 'error', latency
+        roll -= self.error_rate
+        if roll < self.timeout_rate:
+            return 'timeout', self.hang_seconds
+        return 'ok', latency
+
+    def _make_handler(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_GET(self):
+                body = json.dumps({'data': [{'id': 'stub-model', 'object': 'model'}]}).encode('utf-8')
+                self._send_json(200, body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._send_json(400, b'{"error": {"message": "invalid JSON"}}')
+                    return
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send_json(404, b'{"error": {"message": "not found"}}')
+                    return
+
+                messages = payload.get('messages') or []
+                kind = classify_prompt(messages)
+                outcome, delay = provider._draw()
+                provider._record(kind, outcome)
+
+                if outcome == 'rate_limited':
+                    body = b'{"error": {"message": "rate limited", "type": "rate_limit"}}'
+                    self._send_json(429, body, {'Retry-After': f"{provider.retry_after:g}"})
+                    return
+                time.sleep(delay)
+                if outcome == 'error':
+                    self._send_json(500, b'{"error": {"message": "injected server error"}}')
+                    return
+
+                content = provider.responses.get(kind) or canned_response(kind, messages)
+                if payload.get('stream'):
+                    self._send_stream(content)
+                    return
+                body = json.dumps({
+                    'id': 'stub',
+                    'object': 'chat.completion',
+                    'model': payload.get('model', 'stub-model'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                    'usage': _usage(messages, content)
+                }, ensure_ascii=False).encode('utf-8')
+                self._send_json(200, body)
+
+            def _send_json(self, status: int, body: bytes, headers: Optional[Dict] = None):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, content: str):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                try:
+                    for i in range(0, len(content), 20):
+                        event = {'choices': [{'index': 0, 'delta': {'content': content[i:i + 20]}}]}
+                        self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+                        self.wfile.flush()
+                        if provider.stream_chunk_delay:
+                            time.sleep(provider.stream_chunk_delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> str:
+        """Start serving in a background thread; returns base_url"""
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible stub LLM provider')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', default='lognormal:0.8,0.5', help='e.g. fixed:0.3, uniform:0.1,0.5, lognormal:0.8,0.5')
+    parser.add_argument('--stream-chunk-delay', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--hang-seconds', type=float, default=60.0)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    stub = StubProvider(
+        latency=args.latency,
+        stream_chunk_delay=args.stream_chunk_delay,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        timeout_rate=args.timeout_rate,
+        hang_seconds=args.hang_seconds,
+        seed=args.seed,
+        host=args.host,
+        port=args.port
+    )
+    stub.start()
+    print(f"Stub provider listening on {stub.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+telemetry.py - Per-call LLM telemetry with a background SQLite writer
+
+Each LLMClient / AsyncLLMClient call builds one record: purpose, endpoint,
+model, prompt/response sizes, token usage (from the provider's `usage`
+block, estimated when absent), connect / first-byte / total latency,
+attempts and outcome. Records are queued and written in batches by a
+daemon thread so the request path never waits on the database; the table
+is capped at LLM_TELEMETRY_MAX_ROWS.
+
+first_byte_ms is the time to response headers for plain calls and the time
+to the first content chunk for streams.
+"""
+
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+
+from config import Config
+from token_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 不计入延迟分位数的结果（没有真正请求 provider）
+NON_PROVIDER_OUTCOMES = {'cache_hit', 'coalesced', 'circuit_open'}
+
+
+def start_call(
+    purpose: Optional[str],
+    endpoint: str,
+    model: str,
+    prompt: str,
+    system_prompt: Optional[str] = None,
+    stream: bool = False
+) -> Dict[str, Any]:
+    """
+    Begin a telemetry record for one LLM call.
+
+    Lower layers fill in attempts, connect_ms, first_byte_ms and usage;
+    finish_call() completes and queues it.
+    """
+    return {
+        '_start': time.monotonic(),
+        '_prompt_text': (system_prompt or '') + prompt,
+        'ts': time.time(),
+        'purpose': purpose or 'default',
+        'endpoint': endpoint,
+        'model': model,
+        'stream': 1 if stream else 0,
+        'prompt_chars': len(prompt) + len(system_prompt or ''),
+        'attempts': 0,
+        'connect_ms': 0.0,
+        'first_byte_ms': None,
+        'prompt_tokens': None,
+        'completion_tokens': None,
+        'total_tokens': None,
+        'tokens_estimated': 0,
+        'outcome': None
+    }
+
+
+def set_usage(record: Optional[Dict], usage: Any):
+    """Copy a provider usage block (dict or SDK object) into the record"""
+    if record is None or usage is None:
+        return
+    for field in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+        value = usage.get(field) if isinstance(usage, dict) else getattr(usage, field, None)
+        if value is not None:
+            record[field] = int(value)
+
+
+def add_attempt(record: Optional[Dict]):
+    if record is not None:
+        record['attempts'] += 1
+
+
+def add_connect(record: Optional[Dict], connect_ms: float, first_byte_ms: Optional[float] = None):
+    """Accumulate connect time over attempts; keep the last attempt's first byte"""
+    if record is None:
+        return
+    record['connect_ms'] += connect_ms
+    if first_byte_ms is not None:
+        record['first_byte_ms'] = first_byte_ms
+
+
+def mark_first_byte(record: Optional[Dict]):
+    """Stamp time-to-first-chunk for a stream"""
+    if record is not None:
+        record['first_byte_ms'] = (time.monotonic() - record['_start']) * 1000
+
+
+def finish_call(
+    record: Dict[str, Any],
+    response: Optional[str] = None,
+    error: Optional[Exception] = None,
+    outcome: Optional[str] = None
+):
+    """
+    Complete a record and queue it for writing.
+
+    Args:
+        record: Record from start_call()
+        response: Response text on success
+        error: Exception on failure (classified into error_kind)
+        outcome: Override: cache_hit, coalesced, cancelled...
+    """
+    if not Config.LLM_TELEMETRY_ENABLED:
+        return
+
+    prompt_text = record.pop('_prompt_text', '')
+    start = record.pop('_start')
+    record['total_ms'] = round((time.monotonic() - start) * 1000, 2)
+    record['day'] = datetime.fromtimestamp(record['ts']).strftime('%Y-%m-%d')
+    record['response_chars'] = len(response or '')
+    record['retries'] = max(0, record['attempts'] - 1)
+    record['connect_ms'] = round(record['connect_ms'], 2)
+    if record['first_byte_ms'] is not None:
+        record['first_byte_ms'] = round(record['first_byte_ms'], 2)
+
+    if error is not None:
+        from rate_control import classify_error
+        from circuit_breaker import CircuitOpenError
+        record['outcome'] = outcome or ('circuit_open' if isinstance(error, CircuitOpenError) else 'error')
+        record['error_kind'] = classify_error(error).kind
+    else:
+        record['outcome'] = outcome or record['outcome'] or 'ok'
+
+    # provider 未返回 usage 时（流式、部分兼容接口）按字符估算
+    if record['attempts'] and record['prompt_tokens'] is None and record['outcome'] == 'ok':
+        record['prompt_tokens'] = estimate_tokens(prompt_text)
+        record['completion_tokens'] = estimate_tokens(response or '')
+        record['total_tokens'] = record['prompt_tokens'] + record['completion_tokens']
+        record['tokens_estimated'] = 1
+
+    get_writer().submit(record)
+
+
+class TelemetryWriter:
+    """Bounded queue drained in batches by a daemon thread"""
+
+    def __init__(self, queue_size: int, flush_interval: float, batch_size: int = 200):
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.flush_lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.thread_lock = threading.Lock()
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0}
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue a record; drops it (and counts the drop) when the queue is full"""
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(record)
+            self.stats['queued'] += 1
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+
+    def _ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.thread_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='llm-telemetry', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"LLM telemetry flush failed: {e}")
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of records written"""
+        import database as db
+
+        written = 0
+        with self.flush_lock:
+            while True:
+                batch: List[Dict] = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    break
+                written += db.insert_llm_telemetry(batch, Config.LLM_TELEMETRY_MAX_ROWS)
+        self.stats['written'] += written
+        return written
+
+
+_writer: Optional[TelemetryWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> TelemetryWriter:
+    """Get the process-wide telemetry writer"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = TelemetryWriter(Config.LLM_TELEMETRY_QUEUE_SIZE, Config.LLM_TELEMETRY_FLUSH_INTERVAL)
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def flush():
+    """Write queued records now (tests, metrics reads)"""
+    return get_writer().flush()
+
+
+# ========================================
+# Aggregation
+# ========================================
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return round(ordered[index], 1)
+
+
+def _summarize(rows: List[Dict]) -> Dict[str, Any]:
+    """Totals and latency percentiles for a group of records"""
+    outcomes: Dict[str, int] = {}
+    for row in rows:
+        outcomes[row['outcome']] = outcomes.get(row['outcome'], 0) + 1
+
+    provider_rows = [r for r in rows if r['outcome'] not in NON_PROVIDER_OUTCOMES]
+    ok_rows = [r for r in provider_rows if r['outcome'] == 'ok']
+    total_ms = [r['total_ms'] for r in ok_rows if r['total_ms'] is not None]
+    first_byte = [r['first_byte_ms'] for r in ok_rows if r['first_byte_ms'] is not None]
+    connect = [r['connect_ms'] for r in provider_rows if r['connect_ms']]
+    errors = outcomes.get('error', 0) + outcomes.get('circuit_open', 0)
+
+    return {
+        'calls': len(rows),
+        'provider_calls': len(provider_rows),
+        'errors': errors,
+        'error_rate': round(errors / len(rows), 4) if rows else 0.0,
+        'outcomes': outcomes,
+        'retries': sum(r['retries'] or 0 for r in rows),
+        'prompt_tokens': sum(r['prompt_tokens'] or 0 for r in rows),
+        'completion_tokens': sum(r['completion_tokens'] or 0 for r in rows),
+        'total_tokens': sum(r['total_tokens'] or 0 for r in rows),
+        'estimated_token_calls': sum(1 for r in rows if r['tokens_estimated']),
+        'latency_ms': {
+            'p50': _percentile(total_ms, 50),
+            'p95': _percentile(total_ms, 95),
+            'p99': _percentile(total_ms, 99)
+        },
+        'first_byte_ms': {
+            'p50': _percentile(first_byte, 50),
+            'p95': _percentile(first_byte, 95)
+        },
+        'avg_connect_ms': round(sum(connect) / len(connect), 2) if connect else 0.0
+    }
+
+
+def get_llm_metrics(days: int = 7, purpose: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Aggregate telemetry per purpose, per model tier and per day.
+
+    Latency percentiles only cover successful provider calls; cache hits and
+    coalesced calls are counted but not timed. by_tier groups calls by the
+    task whose tier they ran on (Config.task_for_purpose, 'default' for the
+    rest) and then by model, so a cheaper model for a task can be compared
+    with the one it replaced.
+
+    Args:
+        days: How many days back to include (today counts as one)
+        purpose: Restrict to one purpose
+
+    Returns:
+        Dict with totals, by_purpose, by_tier, by_day and writer stats
+    """
+    import database as db
+
+    flush()
+    since = (datetime.now() - timedelta(days=max(1, days) - 1)).strftime('%Y-%m-%d')
+    rows = db.get_llm_telemetry(since_day=since, purpose=purpose)
+
+    by_purpose: Dict[str, List[Dict]] = {}
+    by_tier: Dict[str, Dict[str, List[Dict]]] = {}
+    by_day: Dict[str, List[Dict]] = {}
+    for row in rows:
+        by_purpose.setdefault(row['purpose'] or 'default', []).append(row)
+        task = Config.task_for_purpose(row['purpose']) or 'default'
+        by_tier.setdefault(task, {}).setdefault(row['model'] or 'unknown', []).append(row)
+        by_day.setdefault(row['day'], []).append(row)
+
+    return {
+        'since': since,
+        'days': days,
+        'totals': _summarize(rows),
+        'by_purpose': {name: _summarize(group) for name, group in sorted(by_purpose.items())},
+        'by_tier': {
+            task: {model: _summarize(group) for model, group in sorted(models.items())}
+            for task, models in sorted(by_tier.items())
+        },
+        'by_day': {day: _summarize(group) for day, group in sorted(by_day.items())},
+        'writer': dict(get_writer().stats),
+        'enabled': Config.LLM_TELEMETRY_ENABLED,
+        'max_rows': Config.LLM_TELEMETRY_MAX_ROWS
+    }
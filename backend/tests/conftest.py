@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+conftest.py - Suite-wide test setup
+
+database.py creates its tables on import and the telemetry writer flushes in
+the background, so the database is pointed at a temporary file before any
+backend module is imported. Nothing the suite does touches data/reports.db.
+Background job workers and the pre-generation scheduler are off by default.
+
+Shared fixtures:
+- isolated_state: fresh database, LLM clients, rate controller and circuit
+  breakers, response cache off
+- mock_llm: isolated_state with no provider configured (endpoints use MockLLMClient)
+- no_job_workers: job workers stopped; tests run jobs themselves
+- fake_llm: scripted MockLLMClient answers (see FakeLLM)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from typing import List, Optional, Tuple
+
+_DB_DIR = tempfile.mkdtemp(prefix='reports-test-')
+os.environ['REPORTS_DB_PATH'] = os.path.join(_DB_DIR, 'reports.db')
+# 后台 worker 由测试按需启动（start_job_workers / stop_job_workers）
+os.environ['JOB_WORKERS'] = '0'
+os.environ['WEEKLY_PREGEN_ENABLED'] = 'false'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import database
+from config import Config
+from llm_client import MockLLMClient, reset_llm_clients
+from rate_control import reset_rate_controller
+from circuit_breaker import reset_circuit_breakers
+
+
+def pytest_unconfigure(config):
+    """Write out queued telemetry while the temporary database still exists, then remove it"""
+    try:
+        import telemetry
+        telemetry.flush()
+    except Exception:
+        pass
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def isolated_state(tmp_path, monkeypatch):
+    """Fresh database, LLM clients, rate controller and circuit breakers; no response cache"""
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'test.db'))
+    database.init_database()
+    monkeypatch.setattr(Config, 'LLM_CACHE_ENABLED', False)
+    reset_llm_clients()
+    reset_rate_controller()
+    reset_circuit_breakers()
+    yield
+    reset_llm_clients()
+    reset_circuit_breakers()
+
+
+@pytest.fixture
+def mock_llm(isolated_state, monkeypatch):
+    """isolated_state with no provider configured, so endpoints fall back to MockLLMClient"""
+    monkeypatch.setattr(Config, 'is_llm_configured', classmethod(lambda cls: False))
+
+
+@pytest.fixture
+def no_job_workers(monkeypatch):
+    """No background job workers; tests claim and execute jobs themselves"""
+    from jobs import stop_job_workers
+    stop_job_workers()
+    monkeypatch.setattr(Config, 'JOB_WORKERS', 0)
+
+
+class FakeLLM:
+    """
+    Scripted MockLLMClient.call recording every request.
+
+    answer(llm, prompt, system_prompt) returns the completion; it comes from
+    the test module's llm_answer function. Prompts containing a string in
+    failing raise RuntimeError('provider unavailable') after being recorded.
+    MockLLMClient.stream goes through call, so streams are scripted too.
+    """
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls: List[Tuple[str, Optional[str]]] = []
+        self.failing: set = set()
+
+    def __call__(self, client, prompt, system_prompt=None, **kwargs):
+        self.calls.append((prompt, system_prompt))
+        if any(name in prompt for name in self.failing):
+            raise RuntimeError('provider unavailable')
+        return self.answer(self, prompt, system_prompt)
+
+    def prompts(self, marker: Optional[str] = None, exclude: Optional[str] = None) -> List[str]:
+        """Prompts sent so far, optionally only those whose system prompt contains (or lacks) a marker"""
+        return [
+            prompt for prompt, system_prompt in self.calls
+            if (marker is None or marker in (system_prompt or ''))
+            and (exclude is None or exclude not in (system_prompt or ''))
+        ]
+
+
+@pytest.fixture
+def fake_llm(request, monkeypatch):
+    """FakeLLM answering with the test module's llm_answer"""
+    llm = FakeLLM(request.module.llm_answer)
+    monkeypatch.setattr(MockLLMClient, 'call', lambda self, prompt, system_prompt=None, **kwargs: llm(
+        self, prompt, system_prompt, **kwargs
+    ))
+    return llm
@@ -12,6 +12,7 @@ import json
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import database
 from app import app
 
 
@@ -139,6 +140,86 @@ class TestOKREndpoint:
         assert response.status_code == 200
 
 
+class TestStreamingEndpoints:
+    """Tests for SSE streaming generation endpoints"""
+    
+    @pytest.fixture(autouse=True)
+    def isolated_db(self, tmp_path, monkeypatch):
+        """Keep drafts out of the real database"""
+        monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'test.db'))
+        database.init_database()
+    
+    @staticmethod
+    def _parse_events(body: str):
+        events = []
+        for block in body.strip().split('\n\n'):
+            lines = block.split('\n')
+            name = lines[0][len('event: '):]
+            payload = json.loads(lines[1][len('data: '):])
+            events.append((name, payload))
+        return events
+    
+    def test_stream_weekly_report(self, client):
+        """Stream should deliver deltas followed by a validated report"""
+        response = client.post(
+            '/api/generate/weekly-report/stream',
+            json={
+                'content': '20251211 8h\n完成部署',
+                'use_mock': True,
+                'start_date': '2025-12-08',
+                'end_date': '2025-12-12'
+            }
+        )
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        
+        events = self._parse_events(response.get_data(as_text=True))
+        names = [name for name, _ in events]
+        assert names[0] == 'meta'
+        assert names[-1] == 'done'
+        assert 'delta' in names
+        
+        streamed = ''.join(p['content'] for name, p in events if name == 'delta')
+        done = events[-1][1]
+        assert done['report'] == streamed
+        assert 'validation' in done
+        
+        draft = database.get_generation_draft('weekly_report', '2025-12-08~2025-12-12')
+        assert draft['status'] == 'complete'
+        assert draft['content'] == streamed
+    
+    def test_stream_okr(self, client):
+        """OKR stream should end with a validated OKR"""
+        response = client.post(
+            '/api/generate/okr/stream',
+            json={'content': '历史材料内容', 'use_mock': True}
+        )
+        events = self._parse_events(response.get_data(as_text=True))
+        assert events[-1][0] == 'done'
+        assert 'validation' in events[-1][1]
+    
+    def test_disconnect_saves_partial(self, client):
+        """Closing the stream early should persist the partial output"""
+        response = client.post(
+            '/api/generate/okr/stream',
+            json={'content': '历史材料内容', 'use_mock': True, 'next_quarter': '2026第二季度'},
+            buffered=False
+        )
+        chunks = iter(response.response)
+        next(chunks)  # meta
+        next(chunks)  # first delta
+        response.close()
+        
+        draft = database.get_generation_draft('okr', '2026第二季度')
+        assert draft['status'] == 'partial'
+        assert draft['content']
+    
+    def test_stream_missing_content(self, client):
+        """Missing content should be rejected before streaming"""
+        response = client.post('/api/generate/okr/stream', json={})
+        assert response.status_code == 400
+
+
 class TestValidationEndpoints:
     """Tests for validation endpoints"""
     
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_batch_extraction.py - Tests for server-side batch work item extraction
+"""
+
+import pytest
+import sys
+import os
+import re
+import json
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from llm_client import MockLLMClient
+from async_llm_client import iter_llm_batch
+from batch_extraction import plan_batch, run_batch_extraction, get_batch_status
+
+DAYS = ['2025-12-08', '2025-12-09', '2025-12-10']
+
+
+@pytest.fixture(autouse=True)
+def daily_logs(mock_llm):
+    """Three daily logs to extract"""
+    for day in DAYS:
+        database.save_daily_report(day, f'- 完成O类文档部署 {day}')
+
+
+def _dates(prompt):
+    return list(dict.fromkeys(re.findall(r'日期：(\d{4}-\d{2}-\d{2})', prompt)))
+
+
+def llm_answer(llm, prompt, system_prompt):
+    """One work item per day; packed prompts get a days object"""
+    def day_result(date):
+        return {
+            'work_items': [{'project': 'O类文档', 'action': f'部署 {date}', 'skills': ['Docker']}],
+            'extraction_quality': 'good'
+        }
+
+    dates = _dates(prompt)
+    if len(dates) > 1:
+        return json.dumps({'days': {d: day_result(d) for d in dates}}, ensure_ascii=False)
+    return json.dumps(day_result(dates[0]), ensure_ascii=False)
+
+
+def _calls(fake_llm):
+    """Dates of each request sent"""
+    return [tuple(_dates(prompt)) for prompt in fake_llm.prompts()]
+
+
+def _run(**kwargs):
+    logs, skipped = plan_batch(DAYS[0], DAYS[-1], **kwargs)
+    return list(run_batch_extraction(logs, skipped=skipped, use_mock=True, concurrency=2))
+
+
+class TestIterLLMBatch:
+    """Results as they complete"""
+
+    def test_yields_every_index(self, fake_llm):
+        requests = [{'prompt': f'日期：{day}'} for day in DAYS]
+        results = dict(iter_llm_batch(requests, use_mock=True, concurrency=2))
+        assert sorted(results) == [0, 1, 2]
+        assert '部署 2025-12-09' in results[1]
+
+    def test_exceptions_are_returned(self, fake_llm):
+        fake_llm.failing.add(DAYS[0])
+        results = dict(iter_llm_batch([{'prompt': f'日期：{DAYS[0]}'}], use_mock=True))
+        assert isinstance(results[0], RuntimeError)
+
+    def test_closing_stops_remaining_calls(self, monkeypatch):
+        calls = []
+
+        def slow_call(self, prompt, system_prompt=None, **kwargs):
+            calls.append(prompt)
+            time.sleep(0.05)
+            return '{}'
+
+        monkeypatch.setattr(MockLLMClient, 'call', slow_call)
+        batch = iter_llm_batch([{'prompt': str(i)} for i in range(10)], use_mock=True, concurrency=1)
+        next(batch)
+        batch.close()
+        time.sleep(0.3)
+        assert len(calls) <= 2
+
+
+class TestBatchRun:
+    """Incremental persistence and retry"""
+
+    def test_saves_each_day(self, fake_llm):
+        events = _run()
+        assert [e['event'] for e in events] == ['meta', 'progress', 'progress', 'progress', 'done']
+        assert events[-1]['succeeded'] == 3
+        assert events[-2]['completed'] == 3
+        items = database.get_work_items_by_date_range(DAYS[0], DAYS[-1])
+        assert len(items) == 3
+        # 同一批次中新建的项目被后续日期复用
+        assert len(database.get_all_projects()) == 1
+        assert get_batch_status(DAYS[0], DAYS[-1])['counts'] == {'done': 3}
+
+    def test_retry_only_failed_days(self, fake_llm):
+        fake_llm.failing.add(DAYS[1])
+        events = _run()
+        assert events[-1]['failed'] == [DAYS[1]]
+        status = get_batch_status(DAYS[0], DAYS[-1])
+        assert status['counts'] == {'done': 2, 'failed': 1}
+
+        fake_llm.failing.clear()
+        fake_llm.calls.clear()
+        events = _run()
+        assert _calls(fake_llm) == [(DAYS[1],)]
+        assert sorted(events[0]['skipped']['done']) == [DAYS[0], DAYS[2]]
+        assert len(database.get_work_items_by_date_range(DAYS[0], DAYS[-1])) == 3
+
+    def test_deadline_fails_remaining_days(self, fake_llm, monkeypatch):
+        """Days the deadline cuts off fail at once (no per-day retry) and are redone later"""
+        from deadline import Deadline, DeadlineExceeded
+        from generator import DEADLINE_ERROR
+
+        original = MockLLMClient.call
+
+        def timed_call(self, prompt, system_prompt=None, **kwargs):
+            if kwargs['deadline'] and kwargs['deadline'].expired():
+                raise DeadlineExceeded('LLM API')
+            return original(self, prompt, system_prompt, **kwargs)
+
+        monkeypatch.setattr(MockLLMClient, 'call', timed_call)
+        logs, skipped = plan_batch(DAYS[0], DAYS[-1])
+        events = list(run_batch_extraction(logs, skipped=skipped, use_mock=True, deadline=Deadline(0)))
+        assert sorted(events[-1]['failed']) == DAYS
+        assert {e['error'] for e in events if e['event'] == 'progress'} == {DEADLINE_ERROR}
+        assert get_batch_status(DAYS[0], DAYS[-1])['counts'] == {'failed': 3}
+
+        _run()
+        assert get_batch_status(DAYS[0], DAYS[-1])['counts'] == {'done': 3}
+
+    def test_force_replaces_items(self, fake_llm):
+        _run()
+        _run(force=True)
+        assert sorted(d for call in _calls(fake_llm) for d in call) == sorted(DAYS * 2)
+        assert len(database.get_work_items_by_date_range(DAYS[0], DAYS[-1])) == 3
+
+
+class TestBatchAPI:
+    """/api/extract-work-items/batch SSE"""
+
+    def test_stream_and_status(self, fake_llm):
+        from app import app
+        client = app.test_client()
+        resp = client.post('/api/extract-work-items/batch', json={
+            'start_date': DAYS[0], 'end_date': DAYS[-1], 'dates': DAYS[:2]
+        })
+        assert resp.mimetype == 'text/event-stream'
+        body = resp.get_data(as_text=True)
+        assert body.count('event: progress') == 2
+        assert 'event: done' in body
+
+        status = client.get(f'/api/extract-work-items/status?start_date={DAYS[0]}&end_date={DAYS[-1]}')
+        counts = status.get_json()['data']['counts']
+        assert counts == {'done': 2, 'pending': 1}
+
+    def test_missing_range(self):
+        from app import app
+        resp = app.test_client().post('/api/extract-work-items/batch', json={})
+        assert resp.status_code == 400
+
+    def test_stream_single_day(self, fake_llm):
+        from app import app
+        resp = app.test_client().post('/api/extract-work-items/stream', json={
+            'log_content': '- 完成部署', 'log_date': DAYS[0], 'auto_save': True
+        })
+        assert resp.mimetype == 'text/event-stream'
+        body = resp.get_data(as_text=True)
+        assert body.count('event: item') == 1
+        assert '"saved_count": 1' in body
+        assert len(database.get_work_items_by_date_range(DAYS[0], DAYS[0])) == 1
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_cassette.py - Tests for recording and replaying LLM interactions
+"""
+
+import gzip
+import json
+import time
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from config import Config, reload_db_config
+from llm_client import get_llm_client, reset_llm_clients
+from cassette import Cassette, CassetteMiss, ReplayLLMClient, RecordingLLMClient, reset_cassettes
+from stub_provider import StubProvider
+
+SAMPLE_DAILY = """20251208 8h
+- 完成O类文档生产环境部署
+20251209 8h
+- 排查准确率下降原因"""
+
+
+@pytest.fixture(autouse=True)
+def fresh_cassettes(isolated_state, tmp_path, monkeypatch):
+    """Cassettes under tmp_path; only the database configures providers"""
+    monkeypatch.setattr(Config, 'LLM_PROVIDERS', [])
+    monkeypatch.setattr(Config, 'LLM_CASSETTE_PATH', str(tmp_path / 'cassettes' / 'llm.jsonl.gz'))
+    reload_db_config()
+    reset_llm_clients()
+    reset_cassettes()
+    yield
+    reload_db_config()
+    reset_cassettes()
+
+
+def _record(monkeypatch):
+    """Run weekly (plain + streamed) and extraction against the stub with recording on"""
+    from generator import generate_weekly_report, stream_weekly_report, extract_work_items
+
+    monkeypatch.setattr(Config, 'LLM_CASSETTE_MODE', 'record')
+    with StubProvider(latency='fixed:0.05') as stub:
+        database.save_config('llm', {'api_url': stub.base_url, 'api_key': 'test-key', 'model': 'stub-model'})
+        reload_db_config()
+        reset_llm_clients()
+        assert isinstance(get_llm_client(), RecordingLLMClient)
+
+        weekly = generate_weekly_report(SAMPLE_DAILY)
+        streamed = list(stream_weekly_report(SAMPLE_DAILY + '\n- 补充'))
+        extracted = extract_work_items(SAMPLE_DAILY, '2025-12-08')
+        calls = stub.stats['requests']
+    return weekly, streamed, extracted, calls
+
+
+class TestRecordReplay:
+    """Record against the stub, replay with no provider"""
+
+    def test_round_trip(self, monkeypatch):
+        from generator import generate_weekly_report, stream_weekly_report, extract_work_items
+
+        weekly, streamed, extracted, calls = _record(monkeypatch)
+        assert weekly['success'] and extracted['success']
+        with gzip.open(Config.LLM_CASSETTE_PATH, 'rt', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        assert len(entries) == calls
+        assert [e['stream'] for e in entries].count(True) == 1
+        assert all(e['model'] == 'stub-model' and e['latency_s'] > 0 for e in entries)
+
+        # 回放：provider 已关闭，模型配置也被清空
+        database.save_config('llm', {})
+        reload_db_config()
+        reset_llm_clients()
+        reset_cassettes()
+        monkeypatch.setattr(Config, 'LLM_CASSETTE_MODE', 'replay')
+        client = get_llm_client(purpose='weekly_report')
+        assert isinstance(client, ReplayLLMClient) and client.model == 'stub-model'
+
+        assert generate_weekly_report(SAMPLE_DAILY)['report'] == weekly['report']
+        replayed = list(stream_weekly_report(SAMPLE_DAILY + '\n- 补充'))
+        assert [e['event'] for e in replayed] == [e['event'] for e in streamed]
+        assert replayed[-1]['report'] == streamed[-1]['report']
+        assert extract_work_items(SAMPLE_DAILY, '2025-12-08')['work_items'] == extracted['work_items']
+
+        result = generate_weekly_report('20251210 8h\n- 没有录制过的日志')
+        assert not result['success']
+
+
+class TestReplayClient:
+    """ReplayLLMClient on a hand-written cassette"""
+
+    def _cassette(self, tmp_path):
+        cassette = Cassette(str(tmp_path / 'hand.jsonl.gz'))
+        base = {'purpose': 'okr', 'model': 'm', 'system_prompt': 'sys', 'prompt': 'p', 'stream': False, 'chunks': None}
+        from cassette import interaction_key
+        key = interaction_key('p', 'sys')
+        cassette.append({**base, 'key': key, 'response': 'first', 'latency_s': 0.2})
+        cassette.append({**base, 'key': key, 'response': 'second', 'latency_s': 0.2,
+                         'stream': True, 'chunks': [[0.1, 'sec'], [0.2, 'ond']]})
+        return Cassette(cassette.path)  # 从磁盘重新读取
+
+    def test_order_and_miss(self, tmp_path):
+        client = ReplayLLMClient(self._cassette(tmp_path), simulate_latency=False)
+        # 空白差异按归一化后的 prompt 匹配
+        assert client.call('p ', 'sys') == 'first'
+        assert list(client.stream('p', 'sys')) == ['sec', 'ond']
+        assert client.call('p', 'sys') == 'second'  # 用完后重复最后一条
+        with pytest.raises(CassetteMiss):
+            client.call('other', 'sys')
+
+    def test_simulated_latency(self, tmp_path):
+        client = ReplayLLMClient(self._cassette(tmp_path), simulate_latency=True, speed=2)
+        start = time.monotonic()
+        assert client.call('p', 'sys') == 'first'
+        assert time.monotonic() - start >= 0.1
+        start = time.monotonic()
+        assert ''.join(client.stream('p', 'sys')) == 'second'
+        assert time.monotonic() - start >= 0.1
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_circuit_breaker.py - Tests for the LLM circuit breaker and degraded fallback
+"""
+
+import pytest
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from llm_client import LLMClient
+from rate_control import ErrorDecision
+from circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker, get_circuit_states
+from generator import generate_weekly_report, generate_okr, stream_weekly_report, validate_weekly_report
+from stub_provider import StubProvider
+
+SAMPLE_DAILY = """20251208 8h
+- 完成O类文档生产环境部署与联调
+- 服务化：完成接口化改造方案评审
+20251209 8h
+- PoC：调研向量检索方案
+- 临时工作：支持业务方数据统计"""
+
+
+@pytest.fixture(autouse=True)
+def fast_breakers(isolated_state, monkeypatch):
+    """Fast backoff and a low failure threshold"""
+    monkeypatch.setattr(Config, 'LLM_BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(Config, 'LLM_BREAKER_FAILURE_THRESHOLD', 3)
+    monkeypatch.setattr(Config, 'LLM_BREAKER_RECOVERY_TIMEOUT', 30)
+
+
+@pytest.fixture
+def failing_provider(monkeypatch):
+    """A provider answering 500 to everything, wired in as the default LLM"""
+    with StubProvider(error_rate=1.0) as stub:
+        config = {
+            'api_url': stub.base_url,
+            'api_key': 'test-key',
+            'model': 'stub-model',
+            'timeout': 5,
+            'retry': 2,
+            'temperature': 0,
+            'use_deepseek': False
+        }
+        monkeypatch.setattr(Config, 'get_llm_config', classmethod(lambda cls, task=None: dict(config)))
+        monkeypatch.setattr(Config, 'get_provider_configs', classmethod(lambda cls: [dict(config)]))
+        monkeypatch.setattr(Config, 'is_llm_configured', classmethod(lambda cls: True))
+        yield stub, config
+
+
+class TestCircuitBreakerStates:
+    """closed -> open -> half_open -> closed/open"""
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker('p', failure_threshold=2, recovery_timeout=30)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        assert breaker.get_state()['state'] == 'open'
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker('p', failure_threshold=2, recovery_timeout=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.before_call()
+        assert breaker.get_state()['state'] == 'closed'
+
+    def test_half_open_probe_closes(self):
+        breaker = CircuitBreaker('p', failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        breaker.before_call()
+        assert breaker.get_state()['state'] == 'half_open'
+        # 探测期间其他调用仍被拒绝
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        assert breaker.get_state()['state'] == 'closed'
+
+    def test_half_open_probe_failure_reopens(self):
+        breaker = CircuitBreaker('p', failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.is_open()
+        assert breaker.get_state()['opened'] == 2
+
+    def test_cancelled_probe_frees_its_slot(self):
+        """A probe cancelled mid-call must not leave the breaker stuck half open"""
+        import asyncio
+        from async_llm_client import AsyncLLMClient
+
+        client = AsyncLLMClient({'api_url': 'http://probe.invalid/v1', 'api_key': 'k', 'retry': 0})
+        breaker = get_circuit_breaker(client.api_url)
+        breaker.recovery_timeout = 0.05
+        breaker.failure_threshold = 1
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        async def hang():
+            await asyncio.sleep(30)
+
+        async def run():
+            task = asyncio.create_task(client._with_retry(hang))
+            await asyncio.sleep(0.05)
+            assert breaker.get_state()['state'] == 'half_open'
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        # 名额已归还：下一次调用可以作为探测放行
+        assert breaker.before_call() is True
+        breaker.record_success()
+        assert breaker.get_state()['state'] == 'closed'
+
+    def test_throttling_is_not_an_outage(self):
+        breaker = CircuitBreaker('p', failure_threshold=1, recovery_timeout=30)
+        breaker.record(ErrorDecision(True, True, 1.0, 'rate_limited'))
+        breaker.record(ErrorDecision(False, False, None, 'http_401'))
+        assert breaker.get_state()['state'] == 'closed'
+        breaker.record(ErrorDecision(True, False, None, 'http_502'))
+        assert breaker.get_state()['state'] == 'open'
+
+
+class TestClientFailFast:
+    """LLMClient stops calling a provider whose breaker is open"""
+
+    def test_open_breaker_skips_provider(self, failing_provider):
+        stub, config = failing_provider
+        client = LLMClient(config)
+        with pytest.raises(Exception):
+            client.call('hello')
+        # retry=2 -> 3 次失败达到阈值
+        assert stub.stats['requests'] == 3
+
+        start = time.monotonic()
+        with pytest.raises(CircuitOpenError):
+            client.call('hello again')
+        assert time.monotonic() - start < 0.5
+        assert stub.stats['requests'] == 3
+
+    def test_breaker_disabled(self, failing_provider, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_BREAKER_ENABLED', False)
+        stub, config = failing_provider
+        client = LLMClient(config)
+        for _ in range(2):
+            with pytest.raises(Exception) as exc:
+                client.call('hello')
+            assert not isinstance(exc.value, CircuitOpenError)
+        assert stub.stats['requests'] == 6
+
+    def test_health_reports_state(self, failing_provider):
+        stub, config = failing_provider
+        with pytest.raises(Exception):
+            LLMClient(config).call('hello')
+        states = get_circuit_states()
+        assert states['state'] == 'open'
+        assert states['providers'][0]['name'] == stub.base_url
+
+
+class TestDegradedFallback:
+    """Rule-based draft while the breaker is open"""
+
+    def _open(self, config):
+        breaker = get_circuit_breaker(config['api_url'])
+        for _ in range(Config.LLM_BREAKER_FAILURE_THRESHOLD):
+            breaker.record_failure()
+
+    def test_weekly_report_draft(self, failing_provider):
+        stub, config = failing_provider
+        self._open(config)
+        result = generate_weekly_report(SAMPLE_DAILY, start_date='2025-12-08', end_date='2025-12-12')
+        assert result['success']
+        assert result['degraded']
+        assert stub.stats['requests'] == 0
+        report = result['report']
+        assert validate_weekly_report(report)['valid']
+        assert '完成O类文档生产环境部署与联调' in report
+        # 分类按关键词：临时工作归入事务性工作段
+        assert report.index('临时工作：支持业务方数据统计') > report.index('3、其他的事务性工作')
+
+    def test_fallback_disabled_fails_fast(self, failing_provider, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_DEGRADED_FALLBACK', False)
+        stub, config = failing_provider
+        self._open(config)
+        result = generate_weekly_report(SAMPLE_DAILY)
+        assert not result['success']
+        assert result['circuit_open']
+
+    def test_okr_fails_fast(self, failing_provider):
+        stub, config = failing_provider
+        self._open(config)
+        result = generate_okr('材料')
+        assert not result['success']
+        assert result['circuit_open']
+        assert stub.stats['requests'] == 0
+
+    def test_stream_draft(self, failing_provider):
+        stub, config = failing_provider
+        self._open(config)
+        events = list(stream_weekly_report(SAMPLE_DAILY))
+        assert [e['event'] for e in events] == ['meta', 'delta', 'done']
+        assert events[-1]['degraded']
+        assert events[-1]['validation']['valid']
+
+    def test_api_returns_503_without_fallback(self, failing_provider, monkeypatch):
+        from app import app
+        stub, config = failing_provider
+        self._open(config)
+        client = app.test_client()
+        resp = client.post('/api/generate/okr', json={'content': '材料'})
+        assert resp.status_code == 503
+        assert int(resp.headers['Retry-After']) >= 1
+        health = client.get('/api/health').get_json()
+        assert health['llm_circuit']['state'] == 'open'
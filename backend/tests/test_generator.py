@@ -16,8 +16,14 @@ from generator import (
     generate_weekly_report,
     generate_okr,
     validate_weekly_report,
-    validate_okr
+    validate_okr,
+    extract_work_items_batch,
+    stream_extract_work_items,
+    pack_extraction_logs,
+    reduce_long_input,
+    DEADLINE_ERROR
 )
+from config import Config
 
 
 class TestWeeklyReportGeneration:
@@ -78,7 +84,7 @@ class TestWeeklyReportGeneration:
     
     def test_weekly_report_input_too_long(self):
         """Test input length validation"""
-        long_content = "x" * 25000  # Exceeds MAX_INPUT_CHARS
+        long_content = "x" * (Config.MAX_TOTAL_INPUT_CHARS + 1)
         result = generate_weekly_report(long_content, use_mock=True)
         
         assert result['success'] is False
@@ -205,7 +211,7 @@ class TestOKRGeneration:
     
     def test_okr_input_too_long(self):
         """Test input length validation"""
-        long_content = "x" * 25000
+        long_content = "x" * (Config.MAX_TOTAL_INPUT_CHARS + 1)
         result = generate_okr(long_content, use_mock=True)
         
         assert result['success'] is False
@@ -242,5 +248,335 @@ KR1：完成一些工作"""
         assert validation['objectives_valid'] is False
 
 
+class TestBatchExtraction:
+    """Tests for concurrent work item extraction"""
+    
+    def test_batch_results_keep_order(self, monkeypatch):
+        """Each result should line up with its input log"""
+        from llm_client import MockLLMClient
+        
+        def fake_call(self, prompt, system_prompt=None, **kwargs):
+            date = re.search(r'日期：(\S+)', prompt).group(1)
+            return '{"work_items": [{"project": null, "action": "%s"}], "extraction_quality": "good"}' % date
+        
+        monkeypatch.setattr(MockLLMClient, 'call', fake_call)
+        logs = [
+            {'log_date': '2025-12-10', 'log_content': '完成部署'},
+            {'log_date': '2025-12-11', 'log_content': '   '},
+            {'log_date': '2025-12-12', 'log_content': '修复问题'}
+        ]
+        
+        results = extract_work_items_batch(logs, use_mock=True, concurrency=2)
+        
+        assert [r['log_date'] for r in results] == ['2025-12-10', '2025-12-11', '2025-12-12']
+        assert results[0]['work_items'][0]['action'] == '2025-12-10'
+        assert results[0]['work_items'][0]['project'] == '日常工作'
+        assert results[1]['success'] is False
+        assert results[2]['work_items'][0]['action'] == '2025-12-12'
+    
+    def test_pack_respects_budget(self):
+        """Packs stop at the token budget, the day limit and repeated dates"""
+        logs = [{'log_date': f'2025-12-{d:02d}', 'log_content': '部署' * 50} for d in range(1, 6)]
+        assert pack_extraction_logs(logs, max_tokens=10000, max_days=2) == [[0, 1], [2, 3], [4]]
+        assert pack_extraction_logs(logs, max_tokens=1, max_days=7) == [[0], [1], [2], [3], [4]]
+        repeated = [logs[0], logs[0]]
+        assert pack_extraction_logs(repeated, max_tokens=10000, max_days=7) == [[0], [1]]
+    
+    def test_packed_prompt_is_split_per_date(self, monkeypatch):
+        """Several days share one call; days the response leaves out are re-requested alone"""
+        import json
+        from llm_client import MockLLMClient
+        
+        calls = []
+        
+        def fake_call(self, prompt, system_prompt=None, **kwargs):
+            dates = re.findall(r'(?:=== )?日期：(\d{4}-\d{2}-\d{2})(?: ===|\n)', prompt)
+            calls.append(dates)
+            day = lambda d: {'work_items': [{'project': None, 'action': d}], 'extraction_quality': 'good'}
+            if len(dates) > 1:
+                # 模型漏掉了最后一天
+                return json.dumps({'days': {d: day(d) for d in dates[:-1]}})
+            return json.dumps(day(dates[0]))
+        
+        monkeypatch.setattr(MockLLMClient, 'call', fake_call)
+        logs = [{'log_date': f'2025-12-{d:02d}', 'log_content': '完成部署'} for d in (8, 9, 10)]
+        
+        results = extract_work_items_batch(logs, use_mock=True)
+        
+        assert calls == [['2025-12-08', '2025-12-09', '2025-12-10'], ['2025-12-10']]
+        assert [r['work_items'][0]['action'] for r in results] == ['2025-12-08', '2025-12-09', '2025-12-10']
+        assert all(r['success'] for r in results)
+    
+    def test_pack_disabled(self, monkeypatch):
+        """LLM_EXTRACTION_PACK_TOKENS=0 sends one call per day"""
+        from llm_client import MockLLMClient
+        
+        calls = []
+        
+        def fake_call(self, prompt, system_prompt=None, **kwargs):
+            calls.append(prompt)
+            return '{"work_items": [], "extraction_quality": "insufficient"}'
+        
+        monkeypatch.setattr(MockLLMClient, 'call', fake_call)
+        monkeypatch.setattr(Config, 'LLM_EXTRACTION_PACK_TOKENS', 0)
+        logs = [{'log_date': f'2025-12-{d:02d}', 'log_content': '完成部署'} for d in (8, 9)]
+        
+        extract_work_items_batch(logs, use_mock=True)
+        
+        assert len(calls) == 2
+
+
+class TestStreamingExtraction:
+    """Tests for emitting work items while the completion streams"""
+    
+    RESPONSE = (
+        '以下是提取结果：\n```json\n'
+        '{"work_items": [{"project": null, "action": "部署", "skills": ["Docker", "待补充"]},'
+        ' {"project": "O类文档", "action": "修复 {bug}", "skills": []}],'
+        ' "extraction_quality": "good", "notes": ""}\n```'
+    )
+    
+    def test_items_before_done(self, monkeypatch):
+        """Each item is emitted as soon as it closes, normalized like extract_work_items"""
+        from llm_client import MockLLMClient
+        
+        chunks = [self.RESPONSE[i:i + 7] for i in range(0, len(self.RESPONSE), 7)]
+        monkeypatch.setattr(MockLLMClient, 'stream', lambda self, prompt, system_prompt=None, **kw: iter(chunks))
+        
+        events = list(stream_extract_work_items('完成部署', '2025-12-08', use_mock=True))
+        
+        assert [e['event'] for e in events] == ['meta', 'item', 'item', 'done']
+        assert events[1]['item'] == {
+            'project': '日常工作', 'action': '部署', 'problem': None, 'result_metric': None, 'skills': ['Docker']
+        }
+        assert events[2]['item']['action'] == '修复 {bug}'
+        assert events[3]['work_items'] == [events[1]['item'], events[2]['item']]
+        assert events[3]['extraction_quality'] == 'good'
+    
+    def test_truncated_response(self, monkeypatch):
+        """Items finished before the cut are emitted; the rest is recovered without a full re-call"""
+        from llm_client import MockLLMClient
+        
+        truncated = self.RESPONSE[:self.RESPONSE.index('{"project": "O类文档"') + 10]
+        monkeypatch.setattr(MockLLMClient, 'stream', lambda self, prompt, system_prompt=None, **kw: iter([truncated]))
+        monkeypatch.setattr(MockLLMClient, 'call', lambda self, prompt, system_prompt=None, **kw: '无法修复')
+        
+        events = list(stream_extract_work_items('完成部署', '2025-12-08', use_mock=True))
+        
+        assert [e['event'] for e in events] == ['meta', 'item', 'done']
+        assert len(events[-1]['work_items']) == 1
+        assert events[-1]['extraction_quality'] == 'partial'
+    
+    def test_repaired_tail_items_emitted_before_done(self, monkeypatch):
+        """Items recovered by the follow-up repair still go out as item events"""
+        from llm_client import MockLLMClient
+        
+        truncated = self.RESPONSE[:self.RESPONSE.index('{"project": "O类文档"') + 10]
+        monkeypatch.setattr(MockLLMClient, 'stream', lambda self, prompt, system_prompt=None, **kw: iter([truncated]))
+        monkeypatch.setattr(MockLLMClient, 'call', lambda self, prompt, system_prompt=None, **kw: (
+            '{"work_items": [{"project": "O类文档", "action": "修复 {bug}"}]}'))
+        
+        events = list(stream_extract_work_items('完成部署', '2025-12-08', use_mock=True))
+        
+        assert [e['event'] for e in events] == ['meta', 'item', 'item', 'done']
+        assert events[2] == {'event': 'item', 'index': 1, 'item': events[-1]['work_items'][1]}
+        assert [e['item'] for e in events[1:3]] == events[-1]['work_items']
+    
+    def test_deadline_reaches_stream_and_repair(self, monkeypatch):
+        """The stream and the tail repair share the request deadline"""
+        from llm_client import MockLLMClient
+        from deadline import Deadline, DeadlineExceeded
+        
+        truncated = self.RESPONSE[:self.RESPONSE.index('{"project": "O类文档"') + 10]
+        deadlines = []
+        
+        def fake_stream(self, prompt, system_prompt=None, **kw):
+            deadlines.append(kw.get('deadline'))
+            return iter([truncated])
+        
+        def fake_call(self, prompt, system_prompt=None, **kw):
+            deadlines.append(kw.get('deadline'))
+            raise DeadlineExceeded('LLM API')
+        
+        monkeypatch.setattr(MockLLMClient, 'stream', fake_stream)
+        monkeypatch.setattr(MockLLMClient, 'call', fake_call)
+        deadline = Deadline(30)
+        
+        events = list(stream_extract_work_items('完成部署', '2025-12-08', use_mock=True, deadline=deadline))
+        
+        assert deadlines == [deadline, deadline]
+        # 修复请求超时时退回本地修复
+        assert [e['event'] for e in events] == ['meta', 'item', 'done']
+        assert events[-1]['repair'] == 'local'
+    
+    def test_deadline_while_opening_stream(self, monkeypatch):
+        from llm_client import MockLLMClient
+        from deadline import DeadlineExceeded
+        
+        def fake_stream(self, prompt, system_prompt=None, **kw):
+            raise DeadlineExceeded('LLM stream')
+        
+        monkeypatch.setattr(MockLLMClient, 'stream', fake_stream)
+        
+        events = list(stream_extract_work_items('完成部署', '2025-12-08', use_mock=True))
+        
+        assert events[-1] == {'event': 'error', 'error': DEADLINE_ERROR, 'items_count': 0, 'timeout': True}
+
+
+class TestExtractionRepair:
+    """Tests for repairing malformed extraction output instead of re-calling"""
+    
+    @pytest.fixture(autouse=True)
+    def reset_stats(self):
+        from json_repair import reset_repair_stats
+        reset_repair_stats()
+    
+    @staticmethod
+    def _mock(monkeypatch, extraction, repair='{"work_items": []}'):
+        from llm_client import MockLLMClient
+        calls = []
+        
+        def fake_call(self, prompt, system_prompt=None, **kwargs):
+            calls.append(kwargs.get('purpose'))
+            return repair if 'JSON修复助手' in (system_prompt or '') else extraction
+        
+        monkeypatch.setattr(MockLLMClient, 'call', fake_call)
+        return calls
+    
+    def test_local_repair(self, monkeypatch):
+        """Trailing commas and prose are fixed without another call"""
+        from generator import extract_work_items
+        from json_repair import get_repair_stats
+        
+        calls = self._mock(monkeypatch, '结果如下 {"work_items": [{"action": "部署", "skills": "Docker、K8s",},], "extraction_quality": "good",} 以上')
+        
+        result = extract_work_items('完成部署', '2025-12-08', use_mock=True)
+        
+        assert result['success'] and result['repair'] == 'local'
+        assert result['work_items'][0]['skills'] == ['Docker', 'K8s']
+        assert calls == ['extraction']
+        assert get_repair_stats()['repaired_local'] == 1
+    
+    def test_truncated_tail_followup(self, monkeypatch):
+        """Only the text after the last complete item is sent for repair"""
+        from generator import extract_work_items
+        from json_repair import get_repair_stats
+        from llm_client import MockLLMClient
+        
+        prompts = []
+        truncated = '{"work_items": [{"action": "部署"}, {"action": "修复登录'
+        calls = self._mock(monkeypatch, truncated, repair='{"work_items": [{"action": "修复登录"}]}')
+        original = MockLLMClient.call
+        monkeypatch.setattr(MockLLMClient, 'call', lambda self, prompt, system_prompt=None, **kw: (
+            prompts.append(prompt), original(self, prompt, system_prompt, **kw))[1])
+        
+        result = extract_work_items('完成部署\n修复登录问题', '2025-12-08', use_mock=True)
+        
+        assert [i['action'] for i in result['work_items']] == ['部署', '修复登录']
+        assert result['repair'] == 'followup'
+        assert calls == ['extraction', 'extraction_repair']
+        assert '{"action": "修复登录' in prompts[1] and '部署' not in prompts[1]
+        assert get_repair_stats()['repaired_followup'] == 1
+    
+    def test_schema_drops_invalid_items(self, monkeypatch):
+        """Items without content are dropped; bad field types are coerced"""
+        from generator import extract_work_items
+        
+        self._mock(monkeypatch, '{"work_items": [{"action": 3}, {"project": "x"}, "text"], "extraction_quality": "great"}')
+        
+        result = extract_work_items('完成部署', '2025-12-08', use_mock=True)
+        
+        assert result['work_items'] == [
+            {'project': '日常工作', 'action': '3', 'problem': None, 'result_metric': None, 'skills': []}
+        ]
+        assert result['extraction_quality'] == 'partial'
+    
+    def test_unrecoverable(self, monkeypatch):
+        """Output with no JSON at all still fails"""
+        from generator import extract_work_items
+        from json_repair import get_repair_stats
+        
+        self._mock(monkeypatch, '抱歉，我无法处理', repair='抱歉')
+        
+        result = extract_work_items('完成部署', '2025-12-08', use_mock=True)
+        
+        assert not result['success'] and 'JSON解析失败' in result['error']
+        assert get_repair_stats()['failed'] == 1
+    
+    def test_packed_counts_per_day(self):
+        """A clean packed response is not counted as a repair"""
+        from generator import _split_packed_response
+        from json_repair import get_repair_stats
+        
+        dates = ['2025-12-08', '2025-12-09']
+        days = '"2025-12-08": {"work_items": [{"action": "部署"}]}, "2025-12-09": {"work_items": [{"action": "测试"}]}'
+        
+        assert sorted(_split_packed_response('{"days": {' + days + '}}', dates)) == dates
+        assert get_repair_stats()['parsed'] == 2
+        assert get_repair_stats()['repaired_local'] == 0
+        
+        assert sorted(_split_packed_response('{"days": {' + days + ',},}', dates)) == dates
+        assert get_repair_stats()['parsed'] == 2
+        assert get_repair_stats()['repaired_local'] == 2
+
+
+class TestMapReduce:
+    """Tests for summarizing over-long input in chunks"""
+    
+    @staticmethod
+    def _long_logs(days=130):
+        from datetime import date, timedelta
+        start = date(2025, 10, 1)
+        lines = []
+        for i in range(days):
+            lines.append((start + timedelta(days=i)).strftime('%Y%m%d') + ' 8h')
+            lines.append(f'- 完成O类文档提取服务第{i}次迭代，修复字段解析问题，准确率提升到9{i % 10}%')
+            lines.append('- 参加项目周会，同步进展与风险，整理会议纪要并跟进待办事项')
+            lines.append('- 处理服务器迁移与配置工单，配合运维完成权限申请')
+            lines.append('- 调研PoC方案：对比三种版面分析模型在扫描件上的效果，整理评估报告')
+            lines.append('- 服务化能力建设：梳理接口化改造清单，完成两个核心接口的设计评审')
+        return '\n'.join(lines)
+    
+    def test_short_input_used_as_is(self):
+        """Input within the direct budget should not be chunked"""
+        from llm_client import MockLLMClient
+        
+        material, info = reduce_long_input('20251212 8h\n- 完成部署', 'weekly_report', MockLLMClient())
+        
+        assert material == '20251212 8h\n- 完成部署'
+        assert info is None
+    
+    def test_long_input_chunked_at_day_boundaries(self, monkeypatch):
+        """Every chunk sent to the map step should start at a date line"""
+        from llm_client import MockLLMClient
+        
+        prompts = []
+        
+        def fake_call(self, prompt, system_prompt=None, **kwargs):
+            prompts.append(prompt)
+            return '摘要'
+        
+        monkeypatch.setattr(MockLLMClient, 'call', fake_call)
+        content = self._long_logs()
+        assert len(content) > Config.MAX_INPUT_CHARS
+        
+        material, info = reduce_long_input(content, 'okr', MockLLMClient(), use_mock=True)
+        
+        assert info['rounds'] == 1
+        assert info['chunks'][0] == len(prompts) > 1
+        for prompt in prompts:
+            chunk = prompt.split('请按规则压缩：\n\n', 1)[1]
+            assert re.match(r'\d{8} 8h', chunk)
+        assert material == '\n\n'.join(['摘要'] * len(prompts))
+    
+    def test_weekly_report_over_limit_succeeds(self):
+        """Input beyond MAX_INPUT_CHARS should now be generated via map-reduce"""
+        result = generate_weekly_report(self._long_logs(), use_mock=True)
+        
+        assert result['success'] is True
+        assert result['map_reduce']['input_chars'] > Config.MAX_INPUT_CHARS
+        assert result['map_reduce']['reduced_chars'] < result['map_reduce']['input_chars']
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
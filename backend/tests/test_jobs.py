@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_jobs.py - Tests for the background job queue and /api/jobs
+"""
+
+import pytest
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import jobs
+from config import Config
+from jobs import JobWorker, submit_job, request_cancel, stop_job_workers
+
+SAMPLE_DAILY = """20251208 8h
+- 完成O类文档生产环境部署与联调
+20251209 8h
+- PoC：调研向量检索方案"""
+
+# 任务由测试自己执行，不启动后台 worker
+pytestmark = pytest.mark.usefixtures('no_job_workers', 'mock_llm')
+
+
+@pytest.fixture
+def steps_handler(monkeypatch):
+    """A job that does params['steps'] steps, checkpointing after each"""
+    seen = {'resumed_from': []}
+
+    def run(ctx):
+        start = ctx.checkpoint.get('step', 0)
+        seen['resumed_from'].append(start)
+        for step in range(start, ctx.params['steps']):
+            if step == ctx.params.get('crash_at') and ctx.attempts == 1:
+                raise SystemExit('worker died')
+            ctx.report(checkpoint={'step': step + 1}, completed=step + 1)
+        return {'success': True, 'steps': ctx.params['steps']}
+
+    monkeypatch.setitem(jobs.JOB_HANDLERS, 'steps', run)
+    return seen
+
+
+def _run_next(lease=60):
+    """Claim and run one job like a worker thread would"""
+    worker = JobWorker(0)
+    job = database.claim_job(worker.worker_id, time.time(), lease, Config.JOB_MAX_ATTEMPTS)
+    if job:
+        worker.execute(job)
+    return job
+
+
+class TestQueue:
+    """Submission, dedup, cancellation, resume"""
+
+    def test_run_to_completion(self, steps_handler):
+        job = submit_job('steps', {'steps': 3})
+        assert job['status'] == 'queued'
+        _run_next()
+        done = database.get_job(job['id'])
+        assert done['status'] == 'done'
+        assert done['result'] == {'success': True, 'steps': 3}
+        assert done['progress']['completed'] == 3
+        assert _run_next() is None
+
+    def test_dedup_while_active(self, steps_handler):
+        first = submit_job('steps', {'steps': 1})
+        second = submit_job('steps', {'steps': 1})
+        assert second['id'] == first['id'] and second['deduplicated']
+        assert submit_job('steps', {'steps': 2})['id'] != first['id']
+        _run_next()
+        _run_next()
+        # 已完成的任务不再拦截相同请求
+        assert submit_job('steps', {'steps': 1})['id'] != first['id']
+
+    def test_cancel_queued(self, steps_handler):
+        job = submit_job('steps', {'steps': 1})
+        assert request_cancel(job['id'])['status'] == 'cancelled'
+        assert _run_next() is None
+
+    def test_cancel_running(self, steps_handler, monkeypatch):
+        job = submit_job('steps', {'steps': 5})
+        original = jobs.JobContext.report
+
+        def report_then_cancel(ctx, checkpoint=None, **progress):
+            if progress.get('completed') == 2:
+                request_cancel(ctx.id)
+            original(ctx, checkpoint=checkpoint, **progress)
+
+        monkeypatch.setattr(jobs.JobContext, 'report', report_then_cancel)
+        _run_next()
+        cancelled = database.get_job(job['id'])
+        assert cancelled['status'] == 'cancelled'
+        assert cancelled['checkpoint'] == {'step': 2}
+
+    def test_resume_after_worker_loss(self, steps_handler):
+        job = submit_job('steps', {'steps': 4, 'crash_at': 2})
+        # 第一次执行在第 2 步“进程退出”：租约未续，任务仍是 running
+        worker = JobWorker(0)
+        claimed = database.claim_job(worker.worker_id, time.time(), 0.01, 3)
+        with pytest.raises(SystemExit):
+            jobs.JOB_HANDLERS['steps'](jobs.JobContext(claimed, worker.worker_id, 0.01))
+        time.sleep(0.02)
+
+        resumed = _run_next()
+        assert resumed['attempts'] == 2
+        assert steps_handler['resumed_from'] == [0, 2]
+        assert database.get_job(job['id'])['status'] == 'done'
+
+    def test_gives_up_after_max_attempts(self, steps_handler, monkeypatch):
+        monkeypatch.setattr(Config, 'JOB_MAX_ATTEMPTS', 1)
+        job = submit_job('steps', {'steps': 1})
+        database.claim_job('dead-worker', time.time(), 0.01, 1)
+        time.sleep(0.02)
+        assert _run_next() is None
+        assert database.get_job(job['id'])['status'] == 'failed'
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError, match='okr_quarter'):
+            submit_job('nope', {})
+
+
+class TestWorkerThreads:
+    """Workers only run when started explicitly"""
+
+    def test_started_by_entry_point_not_import(self, steps_handler):
+        import threading
+        import app  # noqa: F401
+        assert not [t for t in threading.enumerate() if t.name.startswith('job-worker')]
+        job = submit_job('steps', {'steps': 2})
+        assert database.get_job(job['id'])['status'] == 'queued'
+
+        jobs.start_job_workers(1)
+        try:
+            for _ in range(100):
+                if database.get_job(job['id'])['status'] == 'done':
+                    break
+                time.sleep(0.05)
+            assert database.get_job(job['id'])['status'] == 'done'
+        finally:
+            stop_job_workers()
+        assert not [t for t in threading.enumerate() if t.name.startswith('job-worker') and t.is_alive()]
+
+
+class TestAsyncEndpoints:
+    """Existing endpoints in async mode"""
+
+    def test_weekly_report_job(self):
+        from app import app
+        client = app.test_client()
+        resp = client.post('/api/generate/weekly-report', json={'content': SAMPLE_DAILY, 'async': True})
+        assert resp.status_code == 202
+        job_id = resp.get_json()['data']['id']
+
+        _run_next()
+        job = client.get(f'/api/jobs/{job_id}').get_json()['data']
+        assert job['status'] == 'done'
+        assert job['kind'] == 'weekly_report'
+        assert job['result']['validation']['valid']
+        assert 'async' not in job['params']
+
+    def test_extract_batch_job(self, monkeypatch):
+        import json
+        from llm_client import MockLLMClient
+        monkeypatch.setattr(MockLLMClient, 'call', lambda self, prompt, system_prompt=None, **kw: json.dumps(
+            {'work_items': [{'project': None, 'action': '部署'}], 'extraction_quality': 'good'}
+        ))
+        monkeypatch.setattr(Config, 'LLM_EXTRACTION_PACK_TOKENS', 0)
+        database.save_daily_report('2025-12-08', '- 完成部署')
+        database.save_daily_report('2025-12-09', '- 修复问题')
+
+        from app import app
+        client = app.test_client()
+        resp = client.post('/api/extract-work-items/batch?async=1', json={
+            'start_date': '2025-12-08', 'end_date': '2025-12-09'
+        })
+        assert resp.status_code == 202
+        job_id = resp.get_json()['data']['id']
+
+        _run_next()
+        job = client.get(f'/api/jobs/{job_id}').get_json()['data']
+        assert job['status'] == 'done'
+        assert job['result']['succeeded'] == 2
+        assert sorted(job['checkpoint']['done_dates']) == ['2025-12-08', '2025-12-09']
+        assert len(database.get_work_items_by_date_range('2025-12-08', '2025-12-09')) == 2
+
+    def test_jobs_api(self, steps_handler):
+        from app import app
+        client = app.test_client()
+        assert client.post('/api/jobs', json={'kind': 'nope'}).status_code == 400
+        resp = client.post('/api/jobs', json={'kind': 'steps', 'params': {'steps': 1}})
+        assert resp.status_code == 202
+        job_id = resp.get_json()['data']['id']
+
+        listed = client.get('/api/jobs?status=queued').get_json()['data']
+        assert [j['id'] for j in listed] == [job_id]
+        cancelled = client.post(f'/api/jobs/{job_id}/cancel').get_json()['data']
+        assert cancelled['status'] == 'cancelled'
+        assert client.get('/api/jobs/missing').status_code == 404
@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_llm_client.py - Tests for LLM client connection handling
+"""
+
+import pytest
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import llm_cache
+from config import Config
+from llm_client import LLMClient, get_registered_client, reset_llm_clients
+from http_pool import get_connection_stats, reset_connection_stats
+from async_llm_client import AsyncLLMClient
+from rate_control import reset_rate_controller
+from circuit_breaker import reset_circuit_breakers
+from deadline import Deadline, DeadlineExceeded
+import single_flight
+
+
+class _CompletionHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive /chat/completions endpoint"""
+    protocol_version = 'HTTP/1.1'
+    request_count = 0
+    latency = 0.0
+    echo = False
+    # Scripted error responses: list of (status, headers) served before succeeding
+    failures = []
+
+    def do_POST(self):
+        _CompletionHandler.request_count += 1
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if _CompletionHandler.failures:
+            status, headers = _CompletionHandler.failures.pop(0)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if payload.get('stream'):
+            self._send_stream(['你', '好', '!'])
+            return
+        if _CompletionHandler.latency:
+            time.sleep(_CompletionHandler.latency)
+        content = payload['messages'][-1]['content'] if _CompletionHandler.echo else 'ok'
+        body = json.dumps({
+            'choices': [{'message': {'content': content}}]
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, pieces):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for piece in pieces:
+            event = {'choices': [{'delta': {'content': piece}}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def isolated_db(tmp_path, monkeypatch):
+    """Keep cache writes out of the real database"""
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'test.db'))
+    database.init_database()
+    llm_cache.reset_cache_stats()
+
+
+@pytest.fixture
+def provider_url():
+    """Start a local provider and yield its base URL"""
+    _CompletionHandler.request_count = 0
+    _CompletionHandler.latency = 0.0
+    _CompletionHandler.echo = False
+    _CompletionHandler.failures = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _CompletionHandler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_controller():
+    """Start each test with default limits"""
+    reset_rate_controller()
+    reset_circuit_breakers()
+    yield
+    reset_rate_controller()
+    reset_circuit_breakers()
+
+
+def _config(url, model='stub-model'):
+    return {
+        'api_url': url,
+        'api_key': 'test-key',
+        'model': model,
+        'timeout': 5,
+        'retry': 0,
+        'temperature': 0,
+        'use_deepseek': False
+    }
+
+
+class TestConnectionPooling:
+    """Tests for keep-alive session reuse"""
+
+    def setup_method(self):
+        reset_connection_stats()
+        reset_llm_clients()
+
+    def test_connection_reused_across_calls(self, provider_url):
+        """Only the first call should open a connection"""
+        client = LLMClient(_config(provider_url))
+
+        assert client.call('hello') == 'ok'
+        assert client.last_connect_info['reused'] is False
+
+        assert client.call('hello again') == 'ok'
+        assert client.last_connect_info['reused'] is True
+
+        stats = get_connection_stats()
+        assert stats['connections_opened'] == 1
+        assert stats['reused_requests'] == 1
+        client.close()
+
+    def test_registry_shares_clients(self, provider_url):
+        """Same (url, key, model) should map to one shared client"""
+        first = get_registered_client(_config(provider_url))
+        second = get_registered_client(_config(provider_url + '/'))
+        other = get_registered_client(_config(provider_url, model='other'))
+
+        assert first is second
+        assert first is not other
+
+    def test_reset_rebuilds_clients(self, provider_url):
+        """reset_llm_clients should drop registered clients"""
+        first = get_registered_client(_config(provider_url))
+        reset_llm_clients()
+        second = get_registered_client(_config(provider_url))
+
+        assert first is not second
+
+
+class TestResponseCache:
+    """Tests for the persistent LLM response cache"""
+
+    def test_identical_prompt_served_from_cache(self, provider_url):
+        """Second identical call should not reach the provider"""
+        client = LLMClient(_config(provider_url))
+
+        assert client.call('周报内容', 'system', purpose='weekly_report') == 'ok'
+        assert client.call('周报内容', 'system', purpose='weekly_report') == 'ok'
+
+        assert _CompletionHandler.request_count == 1
+        assert llm_cache.get_cache_stats()['hits'] == 1
+
+    def test_normalized_whitespace_shares_entry(self, provider_url):
+        """Trailing spaces and CRLF should not defeat the cache"""
+        client = LLMClient(_config(provider_url))
+
+        client.call('第一行  \r\n第二行\n\n\n\n', 'system')
+        client.call('第一行\n第二行', 'system')
+
+        assert _CompletionHandler.request_count == 1
+
+    def test_use_cache_false_bypasses(self, provider_url):
+        """use_cache=False must always reach the provider"""
+        client = LLMClient(_config(provider_url))
+
+        client.call('prompt', use_cache=False)
+        client.call('prompt', use_cache=False)
+
+        assert _CompletionHandler.request_count == 2
+
+    def test_purpose_bypass(self, provider_url, monkeypatch):
+        """Purposes listed in LLM_CACHE_BYPASS skip the cache"""
+        monkeypatch.setattr(Config, 'LLM_CACHE_BYPASS', {'okr'})
+        client = LLMClient(_config(provider_url))
+
+        client.call('prompt', purpose='okr')
+        client.call('prompt', purpose='okr')
+        client.call('prompt', purpose='star')
+        client.call('prompt', purpose='star')
+
+        assert _CompletionHandler.request_count == 3
+
+    def test_expired_entry_refetched(self, provider_url, monkeypatch):
+        """Entries past their TTL should not be served"""
+        monkeypatch.setattr(Config, 'LLM_CACHE_TTL', -1)
+        client = LLMClient(_config(provider_url))
+
+        client.call('prompt')
+        client.call('prompt')
+
+        assert _CompletionHandler.request_count == 2
+
+    def test_lru_eviction(self, monkeypatch):
+        """Table should stay within LLM_CACHE_MAX_ENTRIES"""
+        monkeypatch.setattr(Config, 'LLM_CACHE_MAX_ENTRIES', 2)
+        for i in range(3):
+            llm_cache.put(llm_cache.make_cache_key('m', f'p{i}'), f'r{i}')
+
+        assert database.get_llm_cache_summary()['entries'] == 2
+        assert llm_cache.get(llm_cache.make_cache_key('m', 'p0')) is None
+        assert llm_cache.get(llm_cache.make_cache_key('m', 'p2')) == 'r2'
+
+
+class TestStreaming:
+    """Tests for streamed completions"""
+
+    def test_stream_yields_chunks(self, provider_url):
+        """SSE deltas should be yielded in order"""
+        client = LLMClient(_config(provider_url))
+
+        assert list(client.stream('prompt', use_cache=False)) == ['你', '好', '!']
+
+    def test_completed_stream_is_cached(self, provider_url):
+        """A fully consumed stream should populate the response cache"""
+        client = LLMClient(_config(provider_url))
+
+        list(client.stream('prompt'))
+        assert client.call('prompt') == '你好!'
+        assert _CompletionHandler.request_count == 1
+
+
+class TestRetryClassification:
+    """Tests for retry behavior driven by error classification"""
+
+    def test_fatal_error_not_retried(self, provider_url):
+        """A 400 should fail after a single request"""
+        _CompletionHandler.failures = [(400, {})]
+        config = _config(provider_url)
+        config['retry'] = 2
+        client = LLMClient(config)
+
+        with pytest.raises(requests.HTTPError):
+            client.call('prompt', use_cache=False)
+        assert _CompletionHandler.request_count == 1
+
+    def test_429_honors_retry_after(self, provider_url):
+        """A 429 should be retried after the server-requested delay"""
+        _CompletionHandler.failures = [(429, {'Retry-After': '0.3'})]
+        config = _config(provider_url)
+        config['retry'] = 1
+        client = LLMClient(config)
+
+        start = time.monotonic()
+        assert client.call('prompt', use_cache=False) == 'ok'
+        assert time.monotonic() - start >= 0.3
+        assert _CompletionHandler.request_count == 2
+
+
+class TestSingleFlight:
+    """Tests for coalescing identical in-flight requests"""
+
+    def _run_concurrently(self, fn, count):
+        results = [None] * count
+        errors = []
+
+        def worker(index):
+            try:
+                results[index] = fn(index)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        return results
+
+    def test_identical_calls_share_one_request(self, provider_url):
+        """Concurrent identical calls in one worker should hit the provider once"""
+        _CompletionHandler.latency = 0.3
+        client = LLMClient(_config(provider_url))
+
+        results = self._run_concurrently(lambda i: client.call('同一周', use_cache=False), 4)
+
+        assert results == ['ok'] * 4
+        assert _CompletionHandler.request_count == 1
+
+    def test_follower_keeps_its_own_deadline(self, provider_url):
+        """A late follower gives up at its deadline instead of waiting out the leader"""
+        _CompletionHandler.latency = 1.0
+        client = LLMClient(_config(provider_url))
+        leader = threading.Thread(target=client.call, args=('同一周',), kwargs={'use_cache': False})
+        leader.start()
+        time.sleep(0.1)
+
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            client.call('同一周', use_cache=False, deadline=Deadline(0.2))
+        assert time.monotonic() - start < 0.5
+        leader.join()
+        assert _CompletionHandler.request_count == 1
+
+    def test_leader_deadline_not_imposed_on_followers(self):
+        """A follower with time left re-runs the call when the leader ran out of its deadline"""
+        flights = single_flight.SingleFlight()
+
+        def slow_leader():
+            time.sleep(0.2)
+            raise DeadlineExceeded('LLM API')
+
+        leader = threading.Thread(target=lambda: pytest.raises(DeadlineExceeded, flights.do, 'key', slow_leader))
+        leader.start()
+        time.sleep(0.05)
+        assert flights.do('key', lambda: 'mine', Deadline(5)) == ('mine', False)
+        leader.join()
+
+    def test_async_leader_deadline_not_imposed_on_followers(self):
+        flights = single_flight.AsyncSingleFlight()
+
+        async def slow_leader():
+            await asyncio.sleep(0.1)
+            raise DeadlineExceeded('LLM API')
+
+        async def follower():
+            await asyncio.sleep(0.02)
+            return await flights.do('key', lambda: asyncio.sleep(0, 'mine'), Deadline(5))
+
+        async def run():
+            return await asyncio.gather(flights.do('key', slow_leader), follower(), return_exceptions=True)
+
+        leader_result, follower_result = asyncio.run(run())
+        assert isinstance(leader_result, DeadlineExceeded)
+        assert follower_result == ('mine', False)
+
+    def test_different_prompts_not_coalesced(self, provider_url):
+        _CompletionHandler.latency = 0.2
+        client = LLMClient(_config(provider_url))
+
+        self._run_concurrently(lambda i: client.call(f'prompt {i}', use_cache=False), 3)
+
+        assert _CompletionHandler.request_count == 3
+
+    def test_off_mode_sends_every_call(self, provider_url, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_SINGLE_FLIGHT', 'off')
+        _CompletionHandler.latency = 0.2
+        client = LLMClient(_config(provider_url))
+
+        self._run_concurrently(lambda i: client.call('same', use_cache=False), 3)
+
+        assert _CompletionHandler.request_count == 3
+
+    def test_shared_flight_across_workers(self, provider_url, monkeypatch):
+        """run_shared coordinates through SQLite, as separate workers would"""
+        monkeypatch.setattr(single_flight, 'SHARED_POLL_INTERVAL', 0.02)
+        _CompletionHandler.latency = 0.3
+        clients = [LLMClient(_config(provider_url)) for _ in range(3)]
+
+        results = self._run_concurrently(
+            lambda i: single_flight.run_shared('key', lambda: clients[i]._call_provider('p')),
+            3
+        )
+
+        assert [value for value, _ in results] == ['ok'] * 3
+        assert sorted(shared for _, shared in results) == [False, True, True]
+        assert _CompletionHandler.request_count == 1
+
+    def test_shared_failure_propagates(self, monkeypatch):
+        """Followers should see the leader's failure"""
+        monkeypatch.setattr(single_flight, 'SHARED_POLL_INTERVAL', 0.02)
+        database.claim_llm_flight('key', 'other-worker', time.time(), 60)
+        timer = threading.Timer(
+            0.1, database.finish_llm_flight, args=('key', 'other-worker', time.time()),
+            kwargs={'error': 'boom'}
+        )
+        timer.start()
+
+        with pytest.raises(single_flight.SharedFlightError):
+            single_flight.run_shared('key', lambda: 'never')
+        timer.join()
+
+    def test_shared_leader_deadline_releases_claim(self, monkeypatch):
+        """A leader out of time releases the key instead of failing the other workers"""
+        monkeypatch.setattr(single_flight, 'SHARED_POLL_INTERVAL', 0.02)
+
+        def slow_leader():
+            time.sleep(0.1)
+            raise DeadlineExceeded('LLM API')
+
+        leader = threading.Thread(
+            target=lambda: pytest.raises(DeadlineExceeded, single_flight.run_shared, 'key', slow_leader)
+        )
+        leader.start()
+        time.sleep(0.03)
+        assert single_flight.run_shared('key', lambda: 'mine', deadline=Deadline(5)) == ('mine', False)
+        leader.join()
+
+    def test_finished_record_replaced(self):
+        """A finished flight is not a cache: the next caller runs again"""
+        database.claim_llm_flight('key', 'other-worker', time.time(), 60)
+        database.finish_llm_flight('key', 'other-worker', time.time(), response='old')
+
+        assert single_flight.run_shared('key', lambda: 'fresh') == ('fresh', False)
+
+    def test_expired_lease_taken_over(self, monkeypatch):
+        """A crashed leader's lease should not block other workers forever"""
+        monkeypatch.setattr(single_flight, 'SHARED_POLL_INTERVAL', 0.02)
+        database.claim_llm_flight('key', 'crashed-worker', time.time(), 0.2)
+
+        start = time.monotonic()
+        assert single_flight.run_shared('key', lambda: 'mine') == ('mine', False)
+        assert time.monotonic() - start >= 0.15
+
+
+class TestAsyncClient:
+    """Tests for the asyncio client"""
+
+    def test_gather_respects_concurrency(self, provider_url):
+        """No more than `concurrency` requests should be in flight"""
+        _CompletionHandler.latency = 0.1
+        _CompletionHandler.echo = True
+
+        async def run():
+            client = AsyncLLMClient(_config(provider_url), concurrency=2)
+            try:
+                results = await client.gather(
+                    [{'prompt': f'p{i}', 'use_cache': False} for i in range(6)]
+                )
+            finally:
+                await client.aclose()
+            return client, results
+
+        client, results = asyncio.run(run())
+
+        assert results == [f'p{i}' for i in range(6)]
+        assert client.max_in_flight == 2
+
+    def test_gather_returns_failures_in_place(self, monkeypatch):
+        """A failing call should not abort the batch"""
+        client = AsyncLLMClient(_config('http://127.0.0.1:9/v1'), concurrency=2)
+
+        async def fake_provider(prompt, system_prompt=None, record=None):
+            if prompt == 'bad':
+                raise ValueError('boom')
+            return prompt
+
+        monkeypatch.setattr(client, '_call_provider', fake_provider)
+        results = asyncio.run(client.gather([
+            {'prompt': 'good', 'use_cache': False},
+            {'prompt': 'bad', 'use_cache': False}
+        ]))
+
+        assert results[0] == 'good'
+        assert isinstance(results[1], ValueError)
+
+
+class TestDeadline:
+    """Tests for the per-request deadline"""
+
+    @pytest.fixture(autouse=True)
+    def short_min_attempt(self, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_MIN_ATTEMPT_TIMEOUT', 0.1)
+
+    def test_attempt_timeout_cut_to_budget(self, provider_url):
+        """A slow provider is abandoned when the budget, not LLM_TIMEOUT, runs out"""
+        _CompletionHandler.latency = 1.5
+        config = _config(provider_url)
+        config['retry'] = 2
+        client = LLMClient(config)
+
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            client.call('prompt', use_cache=False, deadline=Deadline(0.5))
+        assert time.monotonic() - start < 1.2
+        assert _CompletionHandler.request_count == 1
+
+    def test_retry_skipped_when_backoff_does_not_fit(self, provider_url):
+        """A retry whose backoff outlasts the budget is not started"""
+        _CompletionHandler.failures = [(429, {'Retry-After': '2'})]
+        config = _config(provider_url)
+        config['retry'] = 1
+        client = LLMClient(config)
+
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded) as exc:
+            client.call('prompt', use_cache=False, deadline=Deadline(1))
+        assert time.monotonic() - start < 0.5
+        assert _CompletionHandler.request_count == 1
+        assert isinstance(exc.value.last_error, requests.HTTPError)
+
+    def test_expired_deadline_sends_nothing(self, provider_url):
+        client = LLMClient(_config(provider_url))
+        with pytest.raises(DeadlineExceeded):
+            client.call('prompt', use_cache=False, deadline=Deadline(0))
+        assert _CompletionHandler.request_count == 0
+
+    def test_endpoint_returns_504(self, monkeypatch):
+        """Generation endpoints answer 504 with a clear error"""
+        from llm_client import MockLLMClient
+
+        def fake_call(self, prompt, system_prompt=None, **kwargs):
+            assert isinstance(kwargs.get('deadline'), Deadline)
+            raise DeadlineExceeded('LLM API')
+
+        monkeypatch.setattr(MockLLMClient, 'call', fake_call)
+        monkeypatch.setattr(Config, 'is_llm_configured', classmethod(lambda cls: False))
+        monkeypatch.setattr(Config, 'LLM_CACHE_ENABLED', False)
+        reset_llm_clients()
+        from app import app
+        resp = app.test_client().post('/api/generate/okr', json={'content': '完成部署'})
+        assert resp.status_code == 504
+        assert resp.get_json()['timeout'] is True
+
+    def test_stream_endpoint_reports_timeout(self, monkeypatch):
+        """Streaming endpoints pass the deadline on and end with a timeout error event"""
+        from llm_client import MockLLMClient
+
+        def fake_stream(self, prompt, system_prompt=None, **kwargs):
+            assert isinstance(kwargs.get('deadline'), Deadline)
+            raise DeadlineExceeded('LLM stream')
+            yield
+
+        monkeypatch.setattr(MockLLMClient, 'stream', fake_stream)
+        monkeypatch.setattr(Config, 'is_llm_configured', classmethod(lambda cls: False))
+        reset_llm_clients()
+        from app import app
+        resp = app.test_client().post('/api/generate/okr/stream', json={'content': '完成部署'})
+        last = resp.get_data(as_text=True).strip().split('\n\n')[-1]
+        assert last.startswith('event: error')
+        assert json.loads(last.split('data: ', 1)[1])['timeout'] is True
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_model_tiers.py - Tests for per-task model tiers
+"""
+
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import telemetry
+from config import Config, reload_db_config
+from llm_client import get_llm_client, reset_llm_clients
+from stub_provider import StubProvider
+
+
+@pytest.fixture(autouse=True)
+def fresh_config(monkeypatch):
+    """A new telemetry writer; only the database configures providers"""
+    if telemetry._writer is not None:
+        while not telemetry._writer.queue.empty():
+            telemetry._writer.queue.get_nowait()
+    monkeypatch.setattr(telemetry, '_writer', None)
+    monkeypatch.setattr(Config, 'LLM_PROVIDERS', [])
+
+
+@pytest.fixture(autouse=True)
+def db_config(isolated_state):
+    """Tier settings are re-read from each test's database"""
+    reload_db_config()
+    reset_llm_clients()
+    yield
+    reload_db_config()
+
+
+def _configure(url, tiers=None):
+    database.save_config('llm', {'api_url': url, 'api_key': 'test-key', 'model': 'big-model'})
+    if tiers is not None:
+        database.save_config('llm_tiers', tiers)
+    reload_db_config()
+    reset_llm_clients()
+
+
+class TestTierSelection:
+    """Config.get_llm_config(task) and get_llm_client(purpose)"""
+
+    def test_overrides_and_aliases(self):
+        _configure('http://127.0.0.1:9/v1', {
+            'extraction': {'model': 'small-model'},
+            'star': {'model': 'mid-model', 'api_url': 'http://127.0.0.1:8/v1'}
+        })
+        assert Config.get_llm_config('extraction')['model'] == 'small-model'
+        assert Config.get_llm_config('extraction')['api_url'] == 'http://127.0.0.1:9/v1'
+        assert Config.get_llm_config('okr')['model'] == 'big-model'
+
+        assert get_llm_client(purpose='extraction').model == 'small-model'
+        assert get_llm_client(purpose='extraction_repair').model == 'small-model'
+        assert get_llm_client(purpose='star_window').api_url == 'http://127.0.0.1:8/v1'
+        assert get_llm_client(purpose='weekly_report') is get_llm_client()
+        assert get_llm_client(purpose='chunk_summary').model == 'big-model'
+
+    def test_calls_and_metrics_per_tier(self):
+        from generator import extract_work_items, generate_okr
+        from app import app
+
+        with StubProvider() as stub:
+            _configure(stub.base_url, {'extraction': {'model': 'small-model'}})
+            assert extract_work_items('完成部署', '2025-12-08')['success']
+            assert generate_okr('完成部署')['success']
+
+            data = app.test_client().get('/api/metrics/llm?days=1').get_json()['data']
+
+        assert list(data['by_tier']['extraction']) == ['small-model']
+        assert list(data['by_tier']['okr']) == ['big-model']
+        assert data['by_tier']['extraction']['small-model']['calls'] == 1
+
+    def test_map_step_on_summarize_tier(self):
+        """Chunk summaries use the summarize tier, not the target's"""
+        from generator import reduce_long_input
+        from app import app
+
+        content = '\n'.join(
+            f'202510{day:02d} 8h\n' + '- 完成O类文档提取服务迭代，修复字段解析问题\n' * 40
+            for day in range(1, 29)
+        )
+        assert len(content) > Config.MAX_INPUT_CHARS
+        with StubProvider() as stub:
+            _configure(stub.base_url, {'summarize': {'model': 'small-model'}, 'okr': {'model': 'okr-model'}})
+            _, info = reduce_long_input(content, 'okr', get_llm_client(purpose='okr'))
+            data = app.test_client().get('/api/metrics/llm?days=1').get_json()['data']
+
+        assert info['rounds'] >= 1
+        assert list(data['by_tier']) == ['summarize']
+        assert list(data['by_tier']['summarize']) == ['small-model']
+
+
+class TestTierEndpoint:
+    """/api/config/llm/tiers"""
+
+    def test_save_and_load(self):
+        _configure('http://127.0.0.1:9/v1')
+        from app import app
+        client = app.test_client()
+
+        resp = client.post('/api/config/llm/tiers', json={'tiers': {
+            'extraction': {'model': ' small-model ', 'api_key': 'secret-extraction-key'},
+            'okr': {'model': ''}
+        }})
+        assert resp.get_json()['success']
+        assert database.get_config('llm_tiers') == {
+            'extraction': {'model': 'small-model', 'api_key': 'secret-extraction-key'}
+        }
+        assert get_llm_client(purpose='extraction').model == 'small-model'
+
+        data = client.get('/api/config/llm/tiers').get_json()['data']
+        assert data['default_model'] == 'big-model'
+        assert data['tiers']['extraction']['effective_model'] == 'small-model'
+        assert data['tiers']['okr']['effective_model'] == 'big-model'
+        masked = data['tiers']['extraction']['api_key']
+        assert masked.startswith('secr') and 'secret' not in masked
+
+        # 回传掩码的 Key 时保留原值
+        client.post('/api/config/llm/tiers', json={'tiers': {'extraction': data['tiers']['extraction']}})
+        assert database.get_config('llm_tiers')['extraction']['api_key'] == 'secret-extraction-key'
+
+    def test_partial_update_and_short_key(self):
+        """Tasks missing from the body keep their tiers; a short key's mask is not saved as the key"""
+        _configure('http://127.0.0.1:9/v1', tiers={
+            'extraction': {'model': 'small-model', 'api_key': 'short-key1'},
+            'okr': {'model': 'okr-model'}
+        })
+        from app import app
+        client = app.test_client()
+        data = client.get('/api/config/llm/tiers').get_json()['data']
+        masked = data['tiers']['extraction']['api_key']
+        assert masked and masked != 'short-key1'
+
+        client.post('/api/config/llm/tiers', json={'tiers': {'extraction': {'model': 'tiny-model', 'api_key': masked}}})
+        assert database.get_config('llm_tiers') == {
+            'extraction': {'model': 'tiny-model', 'api_key': 'short-key1'},
+            'okr': {'model': 'okr-model'}
+        }
+
+        client.post('/api/config/llm/tiers', json={'tiers': {'okr': {'model': ''}}})
+        assert 'okr' not in database.get_config('llm_tiers')
+
+    def test_unknown_task(self):
+        from app import app
+        resp = app.test_client().post('/api/config/llm/tiers', json={'tiers': {'poetry': {'model': 'x'}}})
+        assert resp.status_code == 400
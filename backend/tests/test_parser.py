@@ -18,8 +18,11 @@ from parser import (
     deduplicate_entries,
     parse_and_categorize,
     get_current_week_range,
-    format_date
+    format_date,
+    get_parse_cache_stats,
+    clear_parse_cache
 )
+from config import Config
 
 
 class TestDateBlockParsing:
@@ -209,5 +212,71 @@ class TestWeekRange:
         assert monday_str[7] == '-'
 
 
+class TestParseCache:
+    """Tests for parse_and_categorize memoization"""
+    
+    def setup_method(self):
+        clear_parse_cache()
+    
+    def test_repeated_parse_hits_cache(self):
+        """Second parse of the same text should be served from the memo"""
+        text = "20251212 8h\n完成部署工作"
+        first = parse_and_categorize(text)
+        second = parse_and_categorize(text)
+        
+        assert first == second
+        stats = get_parse_cache_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+    
+    def test_cached_result_is_isolated(self):
+        """Mutating a returned result must not leak into the memo"""
+        text = "20251212 8h\n完成部署工作"
+        first = parse_and_categorize(text)
+        first['categories']['project'].append('污染')
+        
+        second = parse_and_categorize(text)
+        assert '污染' not in second['categories']['project']
+    
+    def test_week_range_not_cached(self, monkeypatch):
+        """week_range follows the current date even on a cache hit"""
+        from datetime import datetime
+        import parser as parser_module
+        
+        text = "20251212 8h\n完成部署工作"
+        parse_and_categorize(text)
+        
+        monkeypatch.setattr(
+            parser_module, 'get_current_week_range',
+            lambda: (datetime(2030, 1, 7), datetime(2030, 1, 11))
+        )
+        result = parse_and_categorize(text)
+        
+        assert get_parse_cache_stats()['hits'] == 1
+        assert result['week_range'] == {'monday': '2030-01-07', 'friday': '2030-01-11'}
+    
+    def test_keyword_change_invalidates(self, monkeypatch):
+        """Changing the keyword config must not reuse stale categories"""
+        text = "20251212 8h\n整理周报模板"
+        assert parse_and_categorize(text)['categories']['project'] == ['整理周报模板']
+        
+        monkeypatch.setattr(Config, 'KEYWORDS_ADMIN', Config.KEYWORDS_ADMIN + ['周报'])
+        result = parse_and_categorize(text)
+        
+        assert result['categories']['other_affairs'] == ['整理周报模板']
+        assert get_parse_cache_stats()['hits'] == 0
+    
+    def test_lru_eviction(self, monkeypatch):
+        """Memo should stay within PARSE_CACHE_SIZE"""
+        monkeypatch.setattr(Config, 'PARSE_CACHE_SIZE', 2)
+        for i in range(3):
+            parse_and_categorize(f"20251212 8h\n任务{i}")
+        
+        stats = get_parse_cache_stats()
+        assert stats['size'] == 2
+        assert stats['evictions'] == 1
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
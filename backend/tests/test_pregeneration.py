@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_pregeneration.py - Tests for scheduled weekly report pre-generation
+"""
+
+import time
+import pytest
+import sys
+import os
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from config import Config
+from pregeneration import (
+    parse_schedule, next_scheduled_run, pregenerate_week, notify_daily_report_changed,
+    start_pregen_scheduler, stop_pregen_scheduler
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated(no_job_workers, mock_llm):
+    """Mock LLM, no job workers; the scheduler is stopped afterwards"""
+    yield
+    stop_pregen_scheduler()
+
+
+def llm_answer(llm, prompt, system_prompt):
+    """Numbered weekly drafts"""
+    return f'周报草稿 #{len(llm.calls)}'
+
+
+class TestSchedule:
+    """WEEKLY_PREGEN_AT"""
+
+    def test_parse(self):
+        assert parse_schedule('fri 16:00') == (4, 16, 0)
+        assert parse_schedule('Friday 9:30') == (4, 9, 30)
+        assert parse_schedule('') is None
+        with pytest.raises(ValueError):
+            parse_schedule('someday 16:00')
+        with pytest.raises(ValueError):
+            parse_schedule('fri 25:00')
+
+    def test_next_run(self):
+        wednesday = datetime(2025, 12, 10, 12, 0)
+        assert next_scheduled_run((4, 16, 0), wednesday) == datetime(2025, 12, 12, 16, 0)
+        friday_evening = datetime(2025, 12, 12, 17, 0)
+        assert next_scheduled_run((4, 16, 0), friday_evening) == datetime(2025, 12, 19, 16, 0)
+        assert next_scheduled_run(None, wednesday) is None
+
+
+class TestPregenerate:
+    """pregenerate_week"""
+
+    def test_only_on_change_and_never_over_manual(self, fake_llm):
+        database.save_daily_report('2025-12-08', '- 完成部署')
+        assert pregenerate_week('2025-12-08', '2025-12-12', use_mock=True) == {
+            'success': True, 'unchanged': False, 'degraded': False
+        }
+        assert pregenerate_week('2025-12-08', '2025-12-12', use_mock=True)['unchanged']
+        assert len(fake_llm.calls) == 1
+
+        database.save_daily_report('2025-12-12', '- 周五上线')
+        assert not pregenerate_week('2025-12-08', '2025-12-12', use_mock=True)['unchanged']
+        assert len(fake_llm.calls) == 2
+
+        database.save_weekly_report('2025-12-08', '2025-12-12', '我改过的周报')
+        database.save_daily_report('2025-12-11', '- 周四')
+        assert pregenerate_week('2025-12-08', '2025-12-12', use_mock=True)['skipped'] == 'manual'
+        assert database.get_weekly_report('2025-12-08', '2025-12-12')['content'] == '我改过的周报'
+
+        assert pregenerate_week('2025-12-01', '2025-12-05', use_mock=True)['skipped'] == 'no_daily_reports'
+
+
+class TestTrigger:
+    """Saving the last workday's daily report queues a job"""
+
+    def test_friday_entry_queues_job(self, monkeypatch):
+        monkeypatch.setattr(Config, 'WEEKLY_PREGEN_ENABLED', True)
+        monkeypatch.setattr(Config, 'WEEKLY_PREGEN_AT', '')
+        monkeypatch.setattr(Config, 'WEEKLY_PREGEN_DELAY', 0)
+        monkeypatch.setattr(Config, 'WEEKLY_PREGEN_JITTER', 0.2)
+        monkeypatch.setattr(Config, 'is_llm_configured', classmethod(lambda cls: True))
+        from app import app
+        client = app.test_client()
+
+        client.post('/api/daily-reports', json={'entry_date': '2025-12-10', 'content': '- 周三'})
+        assert client.get('/api/weekly-reports/pregeneration').get_json()['data']['pending'] == []
+
+        before = time.time()
+        client.post('/api/daily-reports', json={'entry_date': '2025-12-12', 'content': '- 周五'})
+        status = client.get('/api/weekly-reports/pregeneration').get_json()['data']
+        pending = status['pending']
+        assert [(p['start_date'], p['end_date']) for p in pending] == [('2025-12-08', '2025-12-12')]
+        assert before <= pending[0]['due'] <= time.time() + 0.2
+        # 同一周只排队一次
+        assert notify_daily_report_changed('2025-12-13') == pending[0]['due']
+        # 请求只负责排队，调度线程随服务启动
+        assert status['running'] is False
+
+        start_pregen_scheduler()
+        for _ in range(50):
+            jobs = database.list_jobs(kind='weekly_pregen')
+            if jobs:
+                break
+            time.sleep(0.05)
+        assert len(jobs) == 1
+        assert jobs[0]['params'] == {'start_date': '2025-12-08', 'end_date': '2025-12-12'}
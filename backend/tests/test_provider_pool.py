@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_provider_pool.py - Tests for multi-provider routing and hedged requests
+"""
+
+import pytest
+import sys
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_cache
+from config import Config
+import config as config_module
+from llm_client import get_llm_client
+from provider_pool import ProviderPool
+
+
+def _make_handler(latency, status=200, header_delay=0):
+    """Build a provider handler with its own latency profile and counters"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        requests = 0
+        cancelled = 0
+
+        def do_POST(self):
+            Handler.requests += 1
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if status != 200:
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if payload.get('stream'):
+                self._send_stream()
+                return
+            time.sleep(latency)
+            body = json.dumps({'choices': [{'message': {'content': f'ok {latency}'}}]}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_stream(self):
+            time.sleep(header_delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            pieces = ['ok', f' {latency}']
+            try:
+                for piece in pieces:
+                    time.sleep(latency / len(pieces))
+                    event = {'choices': [{'delta': {'content': piece}}]}
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                Handler.cancelled += 1
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture(autouse=True)
+def routing_knobs(isolated_state, monkeypatch):
+    """No exploration, fresh cache stats"""
+    llm_cache.reset_cache_stats()
+    monkeypatch.setattr(Config, 'LLM_PROVIDER_EXPLORE', 0)
+
+
+@pytest.fixture
+def start_provider():
+    """Start stub providers; yields a factory returning (config, handler)"""
+    servers = []
+
+    def start(name, latency, status=200, header_delay=0):
+        handler = _make_handler(latency, status, header_delay)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        config = {
+            'name': name,
+            'api_url': f"http://127.0.0.1:{server.server_address[1]}/v1",
+            'api_key': 'test-key',
+            'model': 'stub-model',
+            'timeout': 5,
+            'retry': 0,
+            'temperature': 0,
+            'use_deepseek': False
+        }
+        return config, handler
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestRouting:
+    """Tests for latency-aware endpoint selection"""
+
+    def test_prefers_faster_endpoint(self, start_provider):
+        """After one sample each, calls should go to the faster endpoint"""
+        slow_config, slow = start_provider('slow', 0.3)
+        fast_config, fast = start_provider('fast', 0.02)
+        pool = ProviderPool([slow_config, fast_config], hedge=False)
+
+        for i in range(6):
+            pool.call(f'prompt {i}', use_cache=False)
+
+        assert slow.requests == 1
+        assert fast.requests == 5
+        assert pool.get_stats()['preferred'] == 'fast'
+
+    def test_fails_over_to_healthy_endpoint(self, start_provider):
+        """A failing endpoint should be skipped once its error rate is high"""
+        broken_config, broken = start_provider('broken', 0, status=503)
+        good_config, good = start_provider('good', 0.02)
+        pool = ProviderPool([broken_config, good_config], hedge=False)
+
+        for i in range(4):
+            assert pool.call(f'prompt {i}', use_cache=False) == 'ok 0.02'
+
+        stats = {e['name']: e for e in pool.get_stats()['endpoints']}
+        assert stats['broken']['healthy'] is False
+        assert broken.requests <= 2
+        assert good.requests == 4
+
+    def test_get_llm_client_builds_pool(self, start_provider, monkeypatch):
+        """Extra LLM_PROVIDERS entries should turn the default client into a pool"""
+        first, _ = start_provider('first', 0)
+        second, _ = start_provider('second', 0)
+        monkeypatch.setattr(config_module, '_db_config_cache', None)
+        monkeypatch.setattr(config_module, '_db_config_loaded', True)
+        monkeypatch.setattr(Config, 'DEEPSEEK_API_KEY', '')
+        monkeypatch.setattr(Config, 'LLM_API_URL', '')
+        monkeypatch.setattr(Config, 'LLM_PROVIDERS', [first, second])
+
+        client = get_llm_client()
+
+        assert isinstance(client, ProviderPool)
+        assert [e.name for e in client.endpoints] == ['first', 'second']
+
+    def test_batches_route_through_pool(self, start_provider, monkeypatch):
+        """run_llm_batch fails over like single calls and updates the pool's stats"""
+        from async_llm_client import run_llm_batch
+        broken, _ = start_provider('broken', 0, status=503)
+        good, good_handler = start_provider('good', 0.02)
+        monkeypatch.setattr(config_module, '_db_config_cache', None)
+        monkeypatch.setattr(config_module, '_db_config_loaded', True)
+        monkeypatch.setattr(Config, 'DEEPSEEK_API_KEY', '')
+        monkeypatch.setattr(Config, 'LLM_API_URL', '')
+        monkeypatch.setattr(Config, 'LLM_PROVIDERS', [broken, good])
+        monkeypatch.setattr(Config, 'LLM_HEDGE_ENABLED', False)
+
+        results = run_llm_batch([{'prompt': f'p{i}', 'use_cache': False} for i in range(4)], concurrency=2)
+
+        assert results == ['ok 0.02'] * 4
+        assert good_handler.requests == 4
+        stats = {e['name']: e for e in get_llm_client().get_stats()['endpoints']}
+        assert stats['good']['requests'] == 4 and stats['broken']['failures'] >= 1
+
+
+class TestHedging:
+    """Tests for hedged requests"""
+
+    def test_hedge_beats_slow_primary(self, start_provider, monkeypatch):
+        """A hedge to the fast endpoint should win and cut off the slow one"""
+        monkeypatch.setattr(Config, 'LLM_HEDGE_DELAY', 0.1)
+        monkeypatch.setattr(Config, 'LLM_HEDGE_MIN_DELAY', 0.1)
+        slow_config, slow = start_provider('slow', 1.0)
+        fast_config, fast = start_provider('fast', 0.05)
+        pool = ProviderPool([slow_config, fast_config], hedge=True)
+
+        start = time.monotonic()
+        assert pool.call('prompt', use_cache=False) == 'ok 0.05'
+        assert time.monotonic() - start < 0.6
+
+        assert pool.hedged_requests == 1
+        stats = {e['name']: e for e in pool.get_stats()['endpoints']}
+        assert stats['fast']['hedge_wins'] == 1
+
+        # 被取消的慢请求立即断开，不必等到下一个分片
+        deadline = time.monotonic() + 2
+        while stats['slow']['cancelled'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            stats = {e['name']: e for e in pool.get_stats()['endpoints']}
+        assert stats['slow']['cancelled'] == 1
+
+    def test_loser_cut_off_before_headers(self, start_provider, monkeypatch):
+        """A loser still waiting for response headers is aborted, not left running"""
+        monkeypatch.setattr(Config, 'LLM_HEDGE_DELAY', 0.1)
+        monkeypatch.setattr(Config, 'LLM_HEDGE_MIN_DELAY', 0.1)
+        hung_config, hung = start_provider('hung', 0.05, header_delay=3)
+        fast_config, fast = start_provider('fast', 0.05)
+        pool = ProviderPool([hung_config, fast_config], hedge=True)
+
+        assert pool.call('prompt', use_cache=False) == 'ok 0.05'
+        won_at = time.monotonic()
+        stats = {e['name']: e for e in pool.get_stats()['endpoints']}
+        while stats['hung']['cancelled'] == 0 and time.monotonic() - won_at < 1:
+            time.sleep(0.02)
+            stats = {e['name']: e for e in pool.get_stats()['endpoints']}
+        assert stats['hung']['cancelled'] == 1
+        # 中止不算 provider 故障
+        assert stats['hung']['failures'] == 0
+
+    def test_bounded_when_every_runner_hangs(self, start_provider, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_HEDGE_DELAY', 0.1)
+        monkeypatch.setattr(Config, 'LLM_HEDGE_MIN_DELAY', 0.1)
+        monkeypatch.setattr(ProviderPool, 'call_budget', staticmethod(lambda endpoint: 0.4))
+        first_config, _ = start_provider('first', 0.05, header_delay=3)
+        second_config, _ = start_provider('second', 0.05, header_delay=3)
+        pool = ProviderPool([first_config, second_config], hedge=True)
+
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            pool.call('prompt', use_cache=False)
+        assert time.monotonic() - start < 1.5
+
+    def test_no_hedge_when_primary_fast(self, start_provider, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_HEDGE_DELAY', 0.5)
+        fast_config, fast = start_provider('fast', 0.02)
+        other_config, other = start_provider('other', 0.02)
+        pool = ProviderPool([fast_config, other_config], hedge=True)
+
+        pool.call('prompt', use_cache=False)
+
+        assert pool.hedged_requests == 0
+        assert other.requests == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_quarterly_summaries.py - Tests for week -> month -> quarter summaries feeding OKR generation
+"""
+
+import pytest
+import sys
+import os
+from datetime import date
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from quarterly_summaries import month_weeks, next_quarter_label, parse_quarter, generate_quarter_okr
+
+
+pytestmark = pytest.mark.usefixtures('mock_llm')
+
+MONTH_MARKER = '月度总结助手'
+QUARTER_MARKER = '季度总结助手'
+
+
+def llm_answer(llm, prompt, system_prompt):
+    """Month summaries name their month, quarter summaries are numbered, anything else is an OKR"""
+    if MONTH_MARKER in (system_prompt or ''):
+        month = prompt.split('月份：')[1].split('\n')[0]
+        return f'- {month} 的进展'
+    if QUARTER_MARKER in (system_prompt or ''):
+        return f'部署：\n- 季度总结 #{len(llm.prompts(QUARTER_MARKER))}'
+    return '## O1: 提升部署效率\n- KR1: 部署时间缩短 50%'
+
+
+def _levels(fake_llm):
+    """Prompts sent per level"""
+    return {
+        'months': fake_llm.prompts(MONTH_MARKER),
+        'quarters': fake_llm.prompts(QUARTER_MARKER),
+        'okr': fake_llm.prompts(exclude='总结助手')
+    }
+
+
+def _quarter():
+    database.save_weekly_report('2025-10-06', '2025-10-10', '十月第二周：完成部署')
+    database.save_daily_report('2025-11-04', '- 排查准确率')
+    project = database.create_project(name='部署平台')
+    item = database.create_work_item(raw_log_date='2025-12-03', project_id=project['id'], action='上线灰度')
+    return item['id']
+
+
+class TestPeriods:
+    """Quarter labels and week-to-month assignment"""
+
+    def test_labels(self):
+        assert parse_quarter('2025-q4') == (2025, 4)
+        assert next_quarter_label('2025-Q4') == '2026第一季度'
+        assert next_quarter_label('2026-Q2') == '2026第三季度'
+        with pytest.raises(ValueError):
+            parse_quarter('2025Q4')
+
+    def test_week_belongs_to_month_of_its_thursday(self):
+        # 2025-09-29 ~ 10-05 的周四是 10-02，归入十月；10-27 ~ 11-02 的周四是 10-30
+        assert month_weeks('2025-10')[0] == date(2025, 9, 29)
+        assert month_weeks('2025-10')[-1] == date(2025, 10, 27)
+        assert month_weeks('2025-11')[0] == date(2025, 11, 3)
+
+
+class TestQuarterOKR:
+    """generate_quarter_okr"""
+
+    def test_levels_are_cached_and_invalidated_by_children(self, fake_llm):
+        item_id = _quarter()
+        first = generate_quarter_okr('2025-Q4', use_mock=True)
+        assert first['success'] and first['next_quarter'] == '2026第一季度'
+        assert len(_levels(fake_llm)['months']) == 3 and len(_levels(fake_llm)['quarters']) == 1
+        assert '十月第二周' in _levels(fake_llm)['months'][0] and '20251104 8h' in _levels(fake_llm)['months'][1]
+        assert '上线灰度' in _levels(fake_llm)['months'][2]
+        assert '季度总结 #1' in _levels(fake_llm)['okr'][0] and '十月第二周' not in _levels(fake_llm)['okr'][0]
+
+        second = generate_quarter_okr('2025-Q4', use_mock=True)
+        assert second['months_cached'] == 3 and second['quarter_cached']
+        assert len(_levels(fake_llm)['months']) == 3 and len(_levels(fake_llm)['quarters']) == 1
+        assert len(_levels(fake_llm)['okr']) == 2
+
+        database.update_work_item(item_id, action='全量上线')
+        third = generate_quarter_okr('2025-Q4', use_mock=True)
+        assert third['months_cached'] == 2 and not third['quarter_cached']
+        assert '全量上线' in _levels(fake_llm)['months'][3] and len(_levels(fake_llm)['months']) == 4
+        assert len(_levels(fake_llm)['quarters']) == 2
+
+        generate_quarter_okr('2025-Q4', use_mock=True, force=True)
+        assert len(_levels(fake_llm)['months']) == 7 and len(_levels(fake_llm)['quarters']) == 3
+
+    def test_empty_quarter(self, fake_llm):
+        result = generate_quarter_okr('2025-Q3', use_mock=True)
+        assert not result['success'] and result['status'] == 400
+        assert fake_llm.calls == []
+
+
+class TestEndpoints:
+    """/api/generate/okr/quarter and /api/quarter-summaries"""
+
+    def test_generate_and_status(self, fake_llm):
+        _quarter()
+        from app import app
+        client = app.test_client()
+
+        status = client.get('/api/quarter-summaries/2025-Q4').get_json()['data']
+        assert status['stale'] and status['summary'] is None
+
+        resp = client.post('/api/generate/okr/quarter', json={'quarter': '2025-Q4', 'content': '下季度重点：稳定性'})
+        data = resp.get_json()
+        assert resp.status_code == 200 and data['success'] and 'validation' in data
+        assert '下季度重点：稳定性' in _levels(fake_llm)['okr'][0]
+
+        status = client.get('/api/quarter-summaries/2025-Q4').get_json()['data']
+        assert not status['stale'] and [m['stale'] for m in status['months']] == [False] * 3
+
+        assert client.post('/api/generate/okr/quarter', json={'quarter': 'Q4'}).status_code == 400
+        assert client.post('/api/generate/okr/quarter', json={'quarter': '2025-Q3'}).status_code == 400
+        assert client.get('/api/quarter-summaries/bad').status_code == 400
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_rate_control.py - Tests for LLM error classification, backoff and rate limiting
+"""
+
+import pytest
+import sys
+import os
+import time
+import threading
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from config import Config
+from rate_control import (
+    classify_error,
+    parse_retry_after,
+    backoff_delay,
+    TokenBucket,
+    AIMDLimiter,
+    RateController
+)
+
+
+def _http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(f"{status} error", response=response)
+
+
+class TestErrorClassification:
+    """Tests for retryable vs fatal classification"""
+    
+    def test_429_is_throttled_with_retry_after(self):
+        decision = classify_error(_http_error(429, {'Retry-After': '3'}))
+        assert decision.retryable is True
+        assert decision.throttled is True
+        assert decision.retry_after == 3.0
+    
+    def test_client_errors_are_fatal(self):
+        for status in (400, 401, 403, 404, 422):
+            assert classify_error(_http_error(status)).retryable is False
+    
+    def test_server_errors_are_retryable(self):
+        for status in (500, 502, 503, 504):
+            assert classify_error(_http_error(status)).retryable is True
+    
+    def test_timeouts_are_retryable(self):
+        assert classify_error(requests.Timeout('slow')).kind == 'timeout'
+        assert classify_error(requests.ConnectionError('down')).kind == 'connection'
+    
+    def test_retry_after_http_date(self):
+        from email.utils import formatdate
+        value = formatdate(time.time() + 10, usegmt=True)
+        assert 8 <= parse_retry_after(value) <= 10
+
+
+class TestBackoff:
+    """Tests for jittered backoff"""
+    
+    def test_retry_after_wins(self):
+        assert backoff_delay(0, retry_after=5) == 5
+    
+    def test_retry_after_capped(self, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_BACKOFF_MAX', 10)
+        assert backoff_delay(0, retry_after=120) == 10
+    
+    def test_jitter_range(self, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_BACKOFF_BASE', 1)
+        for attempt in range(3):
+            ceiling = 2 ** attempt
+            delay = backoff_delay(attempt)
+            assert ceiling / 2 <= delay <= ceiling
+
+
+class TestLimiters:
+    """Tests for token bucket and AIMD concurrency limit"""
+    
+    def test_token_bucket_burst(self):
+        bucket = TokenBucket(rate=1, burst=2)
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() > 0
+    
+    def test_unlimited_bucket(self):
+        bucket = TokenBucket(rate=0, burst=1)
+        assert all(bucket.try_acquire() == 0 for _ in range(100))
+    
+    def test_aimd_halves_and_grows(self):
+        limiter = AIMDLimiter(initial=8, min_limit=1, max_limit=8)
+        limiter.on_throttle()
+        assert limiter.limit == 4
+        limiter.on_throttle()
+        limiter.on_throttle()
+        limiter.on_throttle()
+        assert limiter.limit == 1
+        for _ in range(3):
+            limiter.on_success()
+        assert 2 <= limiter.limit < 3
+    
+    def test_aimd_blocks_at_limit(self):
+        limiter = AIMDLimiter(initial=1, min_limit=1, max_limit=1)
+        assert limiter.acquire(timeout=0.1) is True
+        assert limiter.acquire(timeout=0.05) is False
+        limiter.release()
+        assert limiter.acquire(timeout=0.1) is True
+    
+    def test_controller_cooldown_shared(self, monkeypatch):
+        """A Retry-After seen by one caller should delay the next caller"""
+        monkeypatch.setattr(Config, 'LLM_RATE_LIMIT', 0)
+        controller = RateController()
+        controller.on_error(classify_error(_http_error(429, {'Retry-After': '0.2'})))
+        
+        start = time.monotonic()
+        with controller.slot():
+            pass
+        assert time.monotonic() - start >= 0.15
+        
+        stats = controller.get_stats()
+        assert stats['throttled'] == 1
+        assert stats['concurrency_limit'] == Config.LLM_MAX_CONCURRENCY // 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_skill_categorization.py - Tests for chunked, incremental LLM skill categorization
+"""
+
+import pytest
+import sys
+import os
+import re
+import json
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from llm_client import MockLLMClient
+from generator import categorize_skills_with_llm, normalize_skill_name
+from skill_categorization import recategorize_skills
+
+CATEGORIES = {'python': 'tech', 'docker': 'tech', '沟通协调': 'soft', '供应链': 'domain'}
+
+pytestmark = pytest.mark.usefixtures('mock_llm')
+
+
+def _names(prompt):
+    return re.findall(r'^-\s*(.+)$', prompt, re.MULTILINE)
+
+
+def llm_answer(llm, prompt, system_prompt):
+    """Categorize the listed skills"""
+    return json.dumps({
+        name: CATEGORIES.get(normalize_skill_name(name), 'other') for name in _names(prompt)
+    }, ensure_ascii=False)
+
+
+def _calls(fake_llm):
+    """Skill names of each request sent"""
+    return [_names(prompt) for prompt in fake_llm.prompts()]
+
+
+def _skills(*names):
+    for name in names:
+        database.upsert_skill(name)
+    return {s['name']: s['category'] for s in database.get_all_skills_for_categorization()}
+
+
+class TestChunking:
+    """categorize_skills_with_llm"""
+
+    def test_chunks_and_partial_failure(self, fake_llm):
+        skills = [{'id': i, 'name': name, 'category': 'other'} for i, name in enumerate(['Python', 'Docker', '供应链'])]
+        fake_llm.failing.add('供应链')
+        result = categorize_skills_with_llm(skills, use_mock=True, chunk_size=2, concurrency=2)
+        assert result['success']
+        assert sorted(len(c) for c in _calls(fake_llm)) == [1, 2]
+        assert {s['name']: s['new_category'] for s in result['categorized_skills']} == {'Python': 'tech', 'Docker': 'tech'}
+        assert result['unresolved'] == ['供应链']
+        assert result['failed_chunks'] == 1
+
+    def test_all_chunks_fail(self, fake_llm):
+        fake_llm.failing.add('Python')
+        result = categorize_skills_with_llm([{'id': 1, 'name': 'Python', 'category': 'other'}], use_mock=True)
+        assert not result['success']
+
+    def test_normalize(self):
+        assert normalize_skill_name('  Ｐｙｔｈｏｎ ') == 'python'
+        assert normalize_skill_name('Spring   Boot') == 'spring boot'
+
+
+class TestIncremental:
+    """Decision cache and batched updates"""
+
+    def test_only_new_skills_go_to_llm(self, fake_llm):
+        _skills('Python', '沟通协调')
+        first = recategorize_skills(use_mock=True)
+        assert first['llm_count'] == 2 and first['cached_count'] == 0
+
+        fake_llm.calls.clear()
+        categories = _skills('Docker')
+        second = recategorize_skills(use_mock=True)
+        assert _calls(fake_llm) == [['Docker']]
+        assert second['cached_count'] == 2 and second['llm_count'] == 1
+        assert categories['沟通协调'] == 'soft'
+
+        fake_llm.calls.clear()
+        third = recategorize_skills(use_mock=True)
+        assert _calls(fake_llm) == []
+        assert third['updated_count'] == 0
+
+    def test_unresolved_skills_retried(self, fake_llm):
+        _skills('Python', '供应链')
+        # 模型的回答漏掉了供应链
+        fake_llm.answer = lambda llm, prompt, system_prompt: json.dumps({'Python': 'tech'})
+        assert recategorize_skills(use_mock=True)['unresolved'] == ['供应链']
+
+        fake_llm.answer = llm_answer
+        fake_llm.calls.clear()
+        recategorize_skills(use_mock=True)
+        assert _calls(fake_llm) == [['供应链']]
+        assert database.get_skill_category_decisions()[normalize_skill_name('供应链')]['category'] == 'domain'
+
+    def test_force_resends_everything(self, fake_llm):
+        _skills('Python', 'Docker')
+        recategorize_skills(use_mock=True)
+        fake_llm.calls.clear()
+        result = recategorize_skills(use_mock=True, force=True)
+        assert sorted(_calls(fake_llm)[0]) == ['Docker', 'Python']
+        assert result['cached_count'] == 0
+
+    def test_mock_decisions_not_reused_for_real_model(self, fake_llm):
+        _skills('Python')
+        recategorize_skills(use_mock=True)
+        assert database.get_skill_category_decisions()['python']['model'] == 'mock'
+        fake_llm.calls.clear()
+        recategorize_skills(use_mock=False)
+        assert _calls(fake_llm) == [['Python']]
+
+    def test_batched_update_counts_changes(self):
+        _skills('Python', 'Docker')
+        skills = database.get_all_skills_for_categorization()
+        result = database.update_skill_categories([
+            {'id': s['id'], 'new_category': 'tech'} for s in skills
+        ])
+        changed = sum(1 for s in skills if s['category'] != 'tech')
+        assert result['updated_count'] == changed
+        assert database.update_skill_categories([
+            {'id': s['id'], 'new_category': 'tech'} for s in skills
+        ])['updated_count'] == 0
+
+
+class TestEndpoint:
+    """/api/skills/recategorize-llm"""
+
+    def test_endpoint(self, fake_llm):
+        _skills('Python', '沟通协调')
+        from app import app
+        client = app.test_client()
+        data = client.post('/api/skills/recategorize-llm').get_json()
+        assert data['success'] and data['llm_count'] == 2
+        data = client.post('/api/skills/recategorize-llm', json={'force': True}).get_json()
+        assert data['cached_count'] == 0
+
+    def test_endpoint_deadline(self, monkeypatch):
+        """Chunks get the request deadline; running out of it answers 504"""
+        from deadline import Deadline, DeadlineExceeded
+
+        def fake_call(self, prompt, system_prompt=None, **kwargs):
+            assert isinstance(kwargs.get('deadline'), Deadline)
+            raise DeadlineExceeded('LLM API')
+
+        monkeypatch.setattr(MockLLMClient, 'call', fake_call)
+        _skills('Python')
+        from app import app
+        resp = app.test_client().post('/api/skills/recategorize-llm')
+        assert resp.status_code == 504
+        assert resp.get_json()['timeout'] is True and resp.get_json()['unresolved'] == ['Python']
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_star_summaries.py - Tests for incremental, hierarchical and bulk STAR summaries
+"""
+
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from config import Config
+from generator import star_fingerprint, split_star_windows
+from star_summaries import refresh_project_star, refresh_all_star, get_stale_star_projects
+
+
+pytestmark = pytest.mark.usefixtures('mock_llm')
+
+WINDOW_MARKER = '项目阶段总结助手'
+
+
+def llm_answer(llm, prompt, system_prompt):
+    """Window summaries name their window; final STAR summaries are numbered"""
+    if WINDOW_MARKER in (system_prompt or ''):
+        return f'- {_window(prompt)} 的进展'
+    return f'**STAR** #{len(llm.prompts(exclude=WINDOW_MARKER))}'
+
+
+def _window(prompt):
+    return prompt.split('时间段：')[1].split('\n')[0]
+
+
+def _windows(fake_llm):
+    """Windows summarized so far"""
+    return [_window(prompt) for prompt in fake_llm.prompts(WINDOW_MARKER)]
+
+
+def _project(name, dates):
+    project = database.create_project(name=name)
+    for i, day in enumerate(dates):
+        database.create_work_item(raw_log_date=day, project_id=project['id'], action=f'部署 {i}')
+    return project['id']
+
+
+class TestFingerprint:
+    """Fingerprint and windows"""
+
+    def test_order_independent_and_sensitive(self):
+        items = [
+            {'id': 1, 'raw_log_date': '2025-12-01', 'action': 'a'},
+            {'id': 2, 'raw_log_date': '2025-12-02', 'action': 'b'}
+        ]
+        assert star_fingerprint('P', items) == star_fingerprint('P', items[::-1])
+        assert star_fingerprint('P', items) != star_fingerprint('P', items[:1])
+        assert star_fingerprint('P', items) != star_fingerprint('Q', items)
+        edited = [{**items[0], 'action': 'c'}, items[1]]
+        assert star_fingerprint('P', items) != star_fingerprint('P', edited)
+
+    def test_monthly_windows(self):
+        items = [{'id': i, 'raw_log_date': f'2025-{m:02d}-01'} for i, m in enumerate([11, 11, 11, 12])]
+        windows = split_star_windows('P', items, max_items=2)
+        assert [w['window'] for w in windows] == ['2025-11 #1', '2025-11 #2', '2025-12']
+
+
+class TestIncremental:
+    """Regenerate only on change"""
+
+    def test_unchanged_is_skipped(self, fake_llm):
+        project_id = _project('文档提取', ['2025-12-01', '2025-12-02'])
+        first = refresh_project_star(project_id, use_mock=True)
+        assert not first['unchanged']
+        second = refresh_project_star(project_id, use_mock=True)
+        assert second['unchanged'] and second['summary'] == first['summary']
+        assert len(fake_llm.prompts(exclude=WINDOW_MARKER)) == 1
+
+        database.create_work_item(raw_log_date='2025-12-03', project_id=project_id, action='上线')
+        assert get_stale_star_projects()[0]['id'] == project_id
+        assert not refresh_project_star(project_id, use_mock=True)['unchanged']
+        assert refresh_project_star(project_id, use_mock=True, force=True)['summary'] == '**STAR** #3'
+
+    def test_hierarchical_reuses_windows(self, fake_llm, monkeypatch):
+        monkeypatch.setattr(Config, 'STAR_MAX_ITEMS', 2)
+        project_id = _project('大项目', ['2025-10-01', '2025-11-01', '2025-12-01'])
+        result = refresh_project_star(project_id, use_mock=True)
+        assert result['windows_count'] == 3 and result['windows_cached'] == 0
+        assert sorted(_windows(fake_llm)) == ['2025-10', '2025-11', '2025-12']
+        assert '【2025-10】' in fake_llm.prompts(exclude=WINDOW_MARKER)[-1]
+
+        fake_llm.calls.clear()
+        database.create_work_item(raw_log_date='2025-12-15', project_id=project_id, action='上线')
+        result = refresh_project_star(project_id, use_mock=True)
+        assert _windows(fake_llm) == ['2025-12']
+        assert result['windows_cached'] == 2
+
+
+class TestBulk:
+    """refresh_all_star and the job"""
+
+    def test_only_stale_projects(self, fake_llm):
+        fresh = _project('项目A', ['2025-12-01'])
+        stale = _project('项目B', ['2025-12-01'])
+        _project('项目C', [])
+        refresh_project_star(fresh, use_mock=True)
+        fake_llm.failing.add('项目B')
+
+        progress = []
+        result = refresh_all_star(use_mock=True, concurrency=2, on_progress=progress.append)
+        assert result['total'] == 1 and list(result['failed']) == [stale]
+        assert progress[-1]['completed'] == 1
+
+        fake_llm.failing.clear()
+        result = refresh_all_star(use_mock=True)
+        assert result['succeeded'] == [stale]
+        assert get_stale_star_projects() == []
+
+    def test_refresh_all_job(self, fake_llm, no_job_workers):
+        import time
+        from jobs import JobWorker
+        project_id = _project('项目A', ['2025-12-01'])
+
+        from app import app
+        client = app.test_client()
+        resp = client.post('/api/projects/star/refresh-all', json={'concurrency': 2})
+        assert resp.status_code == 202
+        job_id = resp.get_json()['data']['id']
+
+        worker = JobWorker(0)
+        worker.execute(database.claim_job(worker.worker_id, time.time(), 60, Config.JOB_MAX_ATTEMPTS))
+        job = database.get_job(job_id)
+        assert job['status'] == 'done'
+        assert job['result']['succeeded'] == [project_id]
+        assert job['checkpoint'] == {'done_ids': [project_id]}
+        assert client.get('/api/projects/star/stale').get_json()['data'] == []
+
+
+class TestEndpoint:
+    """/api/projects/<id>/star"""
+
+    def test_unchanged_flag(self, fake_llm):
+        project_id = _project('项目A', ['2025-12-01'])
+        from app import app
+        client = app.test_client()
+        assert client.post(f'/api/projects/{project_id}/star').get_json()['unchanged'] is False
+        assert client.post(f'/api/projects/{project_id}/star').get_json()['unchanged'] is True
+        assert client.post(f'/api/projects/{project_id}/star', json={'force': True}).get_json()['unchanged'] is False
+        assert client.post('/api/projects/999/star').status_code == 404
+        empty = _project('空项目', [])
+        assert client.post(f'/api/projects/{empty}/star').status_code == 400
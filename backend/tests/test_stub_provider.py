@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_stub_provider.py - Tests for the local stub LLM provider
+"""
+
+import pytest
+import sys
+import os
+import json
+import random
+import requests
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_client import LLMClient
+from prompts import get_weekly_report_system_prompt, get_work_item_extraction_system_prompt
+from stub_provider import StubProvider, parse_latency, classify_prompt
+
+
+pytestmark = pytest.mark.usefixtures('isolated_state')
+
+
+def _client(stub, retry=0):
+    return LLMClient({
+        'api_url': stub.base_url,
+        'api_key': 'test-key',
+        'model': 'stub-model',
+        'timeout': 5,
+        'retry': retry,
+        'temperature': 0,
+        'use_deepseek': False
+    })
+
+
+class TestLatencySpec:
+    """Latency distribution parsing"""
+
+    def test_fixed(self):
+        assert parse_latency('fixed:0.25')(random.Random(1)) == 0.25
+
+    def test_distributions_sample_non_negative(self):
+        rng = random.Random(7)
+        for spec in ['uniform:0.1,0.2', 'normal:0.1,0.5', 'lognormal:0.2,0.5', 'exponential:0.1']:
+            sampler = parse_latency(spec)
+            assert all(sampler(rng) >= 0 for _ in range(50))
+
+    def test_uniform_bounds(self):
+        sampler = parse_latency('uniform:0.1,0.2')
+        rng = random.Random(3)
+        assert all(0.1 <= sampler(rng) <= 0.2 for _ in range(50))
+
+    def test_unknown_distribution(self):
+        with pytest.raises(ValueError):
+            parse_latency('pareto:1')
+
+
+class TestCannedResponses:
+    """Responses keyed by prompt type, through the real client"""
+
+    def test_classify_prompt(self):
+        assert classify_prompt([{'role': 'system', 'content': get_weekly_report_system_prompt()}]) == 'weekly_report'
+        assert classify_prompt([{'role': 'user', 'content': 'hi'}]) == 'default'
+
+    def test_weekly_report(self):
+        with StubProvider() as stub:
+            content = _client(stub).call('日报内容', get_weekly_report_system_prompt())
+            assert '本周一句话总结' in content
+            assert stub.stats['by_kind'] == {'weekly_report': 1}
+
+    def test_extraction_is_json(self):
+        with StubProvider() as stub:
+            content = _client(stub).call('日志', get_work_item_extraction_system_prompt())
+            data = json.loads(content)
+            assert data['work_items'][0]['action']
+
+    def test_override(self):
+        with StubProvider(responses={'default': 'custom'}) as stub:
+            assert _client(stub).call('hello') == 'custom'
+
+    def test_stream(self):
+        with StubProvider(stream_chunk_delay=0) as stub:
+            chunks = list(_client(stub).stream('日报内容', get_weekly_report_system_prompt()))
+            assert len(chunks) > 1
+            assert '本周一句话总结' in ''.join(chunks)
+
+
+class TestErrorInjection:
+    """429 / 500 injection"""
+
+    def test_rate_limit_has_retry_after(self):
+        with StubProvider(rate_limit_rate=1.0, retry_after=2) as stub:
+            resp = requests.post(stub.base_url + '/chat/completions', json={'messages': []}, timeout=5)
+            assert resp.status_code == 429
+            assert resp.headers['Retry-After'] == '2'
+            assert stub.stats['by_outcome'] == {'rate_limited': 1}
+
+    def test_server_error(self):
+        with StubProvider(error_rate=1.0) as stub:
+            with pytest.raises(Exception):
+                _client(stub).call('hello')
+            assert stub.stats['by_outcome'] == {'error': 1}
+
+    def test_seed_is_reproducible(self):
+        outcomes = []
+        for _ in range(2):
+            with StubProvider(error_rate=0.5, seed=11) as stub:
+                for _ in range(10):
+                    requests.post(stub.base_url + '/chat/completions', json={'messages': []}, timeout=5)
+                outcomes.append(stub.stats['by_outcome'])
+        assert outcomes[0] == outcomes[1]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_telemetry.py - Tests for LLM call telemetry and /api/metrics/llm
+"""
+
+import pytest
+import sys
+import os
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import telemetry
+from config import Config
+from llm_client import LLMClient
+from stub_provider import StubProvider
+
+
+@pytest.fixture(autouse=True)
+def fresh_writer(monkeypatch):
+    """A new telemetry writer per test; fast backoff"""
+    if telemetry._writer is not None:
+        # 丢弃其他测试排队的记录，避免被旧写入线程刷进本测试的数据库
+        while not telemetry._writer.queue.empty():
+            telemetry._writer.queue.get_nowait()
+    monkeypatch.setattr(telemetry, '_writer', None)
+    monkeypatch.setattr(Config, 'LLM_BACKOFF_BASE', 0.01)
+
+
+pytestmark = pytest.mark.usefixtures('isolated_state')
+
+
+def _client(stub, retry=0):
+    return LLMClient({
+        'api_url': stub.base_url,
+        'api_key': 'test-key',
+        'model': 'stub-model',
+        'timeout': 5,
+        'retry': retry,
+        'temperature': 0,
+        'use_deepseek': False
+    })
+
+
+def _rows():
+    telemetry.flush()
+    return database.get_llm_telemetry()
+
+
+class TestCallRecords:
+    """What LLMClient records per call"""
+
+    def test_successful_call(self):
+        with StubProvider(latency='fixed:0.05') as stub:
+            _client(stub).call('日志内容', '你是一个严格的信息提取助手', purpose='extraction')
+            base_url = stub.base_url
+        row = _rows()[0]
+        assert row['purpose'] == 'extraction'
+        assert row['endpoint'] == base_url
+        assert row['model'] == 'stub-model'
+        assert row['outcome'] == 'ok'
+        assert row['attempts'] == 1 and row['retries'] == 0
+        assert row['prompt_tokens'] > 0 and row['completion_tokens'] > 0
+        assert row['tokens_estimated'] == 0
+        assert row['total_ms'] >= 50
+        assert row['first_byte_ms'] is not None
+        assert row['response_chars'] > 0
+
+    def test_retries_and_error_kind(self):
+        with StubProvider(error_rate=1.0) as stub:
+            with pytest.raises(Exception):
+                _client(stub, retry=1).call('hello', purpose='star')
+        row = _rows()[0]
+        assert row['outcome'] == 'error'
+        assert row['error_kind'] == 'http_500'
+        assert row['attempts'] == 2 and row['retries'] == 1
+
+    def test_stream_estimates_tokens(self):
+        with StubProvider(stream_chunk_delay=0) as stub:
+            list(_client(stub).stream('日报', '你是周报生成助手', purpose='weekly_report'))
+        row = _rows()[0]
+        assert row['stream'] == 1
+        assert row['outcome'] == 'ok'
+        assert row['tokens_estimated'] == 1
+        assert row['first_byte_ms'] is not None
+
+    def test_cache_hit(self, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_CACHE_ENABLED', True)
+        with StubProvider() as stub:
+            client = _client(stub)
+            client.call('same prompt', purpose='okr')
+            client.call('same prompt', purpose='okr')
+        outcomes = [r['outcome'] for r in _rows()]
+        assert outcomes == ['ok', 'cache_hit']
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_TELEMETRY_ENABLED', False)
+        with StubProvider() as stub:
+            _client(stub).call('hello')
+        assert _rows() == []
+
+
+class TestWriter:
+    """Background writer and bounded table"""
+
+    def test_table_is_bounded(self):
+        records = [{'ts': time.time(), 'day': '2025-12-08', 'outcome': 'ok', 'total_ms': i} for i in range(10)]
+        database.insert_llm_telemetry(records, max_rows=3)
+        rows = database.get_llm_telemetry()
+        assert [r['total_ms'] for r in rows] == [7, 8, 9]
+
+    def test_full_queue_drops(self):
+        writer = telemetry.TelemetryWriter(queue_size=2, flush_interval=60)
+        results = [writer.submit({'ts': time.time(), 'day': '2025-12-08', 'outcome': 'ok'}) for _ in range(3)]
+        assert results == [True, True, False]
+        assert writer.stats['dropped'] == 1
+        assert writer.flush() == 2
+
+    def test_background_flush(self, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_TELEMETRY_FLUSH_INTERVAL', 0.05)
+        with StubProvider() as stub:
+            _client(stub).call('hello')
+        deadline = time.time() + 2
+        while time.time() < deadline and not database.get_llm_telemetry():
+            time.sleep(0.05)
+        assert len(database.get_llm_telemetry()) == 1
+
+
+class TestMetricsEndpoint:
+    """/api/metrics/llm aggregation"""
+
+    def test_per_purpose_and_day(self):
+        from app import app
+        with StubProvider(latency='fixed:0.02') as stub:
+            client = _client(stub)
+            for i in range(4):
+                client.call(f'周报 {i}', '你是周报生成助手', purpose='weekly_report')
+            client.call('STAR', purpose='star')
+
+        resp = app.test_client().get('/api/metrics/llm?days=1')
+        data = resp.get_json()['data']
+        assert data['totals']['calls'] == 5
+        weekly = data['by_purpose']['weekly_report']
+        assert weekly['calls'] == 4
+        assert weekly['latency_ms']['p50'] >= 20
+        assert weekly['latency_ms']['p99'] >= weekly['latency_ms']['p50']
+        assert weekly['total_tokens'] > 0
+        assert data['by_purpose']['star']['calls'] == 1
+        assert list(data['by_day'].values())[0]['calls'] == 5
+
+    def test_purpose_filter(self):
+        from app import app
+        with StubProvider() as stub:
+            client = _client(stub)
+            client.call('a', purpose='okr')
+            client.call('b', purpose='star')
+        data = app.test_client().get('/api/metrics/llm?purpose=okr').get_json()['data']
+        assert list(data['by_purpose']) == ['okr']
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_token_budget.py - Tests for token estimation and day-aware chunking
+"""
+
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from token_budget import estimate_tokens, get_model_limits, chunk_text
+
+
+class TestEstimateTokens:
+    """Tests for the mixed Chinese/English token estimator"""
+    
+    def test_empty(self):
+        assert estimate_tokens('') == 0
+    
+    def test_chinese_denser_than_english(self):
+        """A Chinese character costs more than an ASCII character"""
+        assert estimate_tokens('完成部署' * 10) > estimate_tokens('done' * 10)
+    
+    def test_whitespace_ignored(self):
+        assert estimate_tokens('a b c') == estimate_tokens('abc')
+    
+    def test_mixed_text(self):
+        # 6 CJK chars * 0.6 + 14 non-space ASCII chars / 3.5 = 7.6
+        assert estimate_tokens('完成文档部署' + 'fix parser bug!!') == 8
+
+
+class TestModelLimits:
+    """Tests for per-model limits"""
+    
+    def test_longest_match_wins(self):
+        assert get_model_limits('default/deepseek-v3-2')['context_tokens'] == 64000
+        assert get_model_limits('unknown-model') == get_model_limits(None)
+    
+    def test_env_override(self, monkeypatch):
+        monkeypatch.setattr(Config, 'LLM_MODEL_LIMITS', {'deepseek': {'chunk_tokens': 100}})
+        limits = get_model_limits('deepseek-chat')
+        
+        assert limits['chunk_tokens'] == 100
+        assert limits['context_tokens'] == 64000
+
+
+class TestChunkText:
+    """Tests for chunking at day boundaries"""
+    
+    def test_days_never_split(self):
+        days = [f'2025121{i} 8h\n- 工作内容{i}\n- 更多内容{i}' for i in range(6)]
+        text = '\n'.join(days)
+        
+        chunks = chunk_text(text, max_tokens=estimate_tokens(days[0]) * 2)
+        
+        assert len(chunks) == 3
+        assert ''.join(chunks).count('8h') == 6
+        for chunk in chunks:
+            assert chunk.startswith('2025121')
+    
+    def test_oversized_day_split_by_lines(self):
+        text = '20251212 8h\n' + '\n'.join(f'- 第{i}项工作内容' for i in range(50))
+        
+        chunks = chunk_text(text, max_tokens=30)
+        
+        assert len(chunks) > 1
+        assert all(estimate_tokens(c) <= 30 for c in chunks)
+    
+    def test_undated_material_split_by_paragraph(self):
+        text = '\n\n'.join(f'第{i}周周报：完成若干工作' for i in range(4))
+        
+        chunks = chunk_text(text, max_tokens=estimate_tokens('第0周周报：完成若干工作') * 2)
+        
+        assert len(chunks) == 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_weekly_reports.py - Tests for range-based weekly generation and freshness
+"""
+
+import pytest
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from weekly_reports import generate_weekly_for_range, stream_weekly_for_range, format_daily_reports
+
+
+pytestmark = pytest.mark.usefixtures('mock_llm')
+
+
+def llm_answer(llm, prompt, system_prompt):
+    """Numbered weekly reports"""
+    return f'## 本周工作\n周报 #{len(llm.calls)}'
+
+
+def _week():
+    database.save_daily_report('2025-12-08', '- 完成部署')
+    database.save_daily_report('2025-12-09', '- 排查准确率')
+    database.save_daily_report('2025-12-15', '- 下周的日报')
+
+
+class TestRangeGeneration:
+    """generate_weekly_for_range"""
+
+    def test_reads_daily_reports_and_reuses_saved(self, fake_llm):
+        _week()
+        first = generate_weekly_for_range('2025-12-08', '2025-12-12', use_mock=True)
+        assert first['success'] and not first['unchanged']
+        assert first['daily_dates'] == ['2025-12-08', '2025-12-09']
+        assert '20251208 8h\n- 完成部署' in fake_llm.prompts()[0] and '下周的日报' not in fake_llm.prompts()[0]
+        assert database.get_weekly_report('2025-12-08', '2025-12-12')['content'] == first['report']
+
+        second = generate_weekly_for_range('2025-12-08', '2025-12-12', use_mock=True)
+        assert second['unchanged'] and second['report'] == first['report']
+        assert len(fake_llm.calls) == 1
+
+        database.save_daily_report('2025-12-09', '- 排查准确率，已修复')
+        third = generate_weekly_for_range('2025-12-08', '2025-12-12', use_mock=True)
+        assert not third['unchanged'] and len(fake_llm.calls) == 2
+        assert generate_weekly_for_range('2025-12-08', '2025-12-12', use_mock=True, force=True)['report'] == '## 本周工作\n周报 #3'
+
+    def test_empty_range(self, fake_llm):
+        result = generate_weekly_for_range('2025-12-01', '2025-12-05', use_mock=True)
+        assert not result['success'] and result['status'] == 400
+        assert fake_llm.calls == []
+
+    def test_stream_unchanged(self, fake_llm):
+        _week()
+        events = list(stream_weekly_for_range('2025-12-08', '2025-12-12', use_mock=True))
+        assert events[-1]['event'] == 'done' and not events[-1]['unchanged']
+        events = list(stream_weekly_for_range('2025-12-08', '2025-12-12', use_mock=True))
+        assert [e['event'] for e in events] == ['meta', 'delta', 'done']
+        assert events[-1]['unchanged'] and events[-1]['report'] == '## 本周工作\n周报 #1'
+        assert len(fake_llm.calls) == 1
+
+    def test_format(self):
+        text = format_daily_reports([{'entry_date': '2025-12-08', 'content': 'a'}, {'entry_date': '2025-12-09', 'content': 'b'}])
+        assert text == '20251208 8h\na\n\n20251209 8h\nb'
+
+
+class TestFreshnessEndpoints:
+    """Range endpoint and stale flags on saved reports"""
+
+    def test_stale_after_daily_edit(self, fake_llm):
+        _week()
+        from app import app
+        client = app.test_client()
+        database.save_weekly_report('2025-12-01', '2025-12-05', '手写的周报')
+
+        resp = client.post('/api/generate/weekly-report/range', json={'start_date': '2025-12-08', 'end_date': '2025-12-12'})
+        assert resp.status_code == 200 and resp.get_json()['unchanged'] is False
+
+        reports = {r['start_date']: r for r in client.get('/api/weekly-reports').get_json()['data']}
+        assert reports['2025-12-08']['freshness']['stale'] is False
+        assert reports['2025-12-01']['freshness']['stale'] is None
+
+        client.post('/api/daily-reports', json={'entry_date': '2025-12-10', 'content': '- 补记'})
+        query = client.get('/api/weekly-reports/query?start_date=2025-12-08&end_date=2025-12-12').get_json()['data']
+        assert query['freshness']['stale'] is True and not query['freshness']['edited']
+
+        client.post('/api/weekly-reports', json={'start_date': '2025-12-08', 'end_date': '2025-12-12', 'content': '改过'})
+        query = client.get('/api/weekly-reports/query?start_date=2025-12-08&end_date=2025-12-12').get_json()['data']
+        assert query['freshness']['edited']
+
+    def test_bad_ranges(self):
+        from app import app
+        client = app.test_client()
+        assert client.post('/api/generate/weekly-report/range', json={'start_date': '2025-12-08'}).status_code == 400
+        assert client.post('/api/generate/weekly-report/range', json={
+            'start_date': '2025-12-12', 'end_date': '2025-12-08'
+        }).status_code == 400
+        assert client.post('/api/generate/weekly-report/range', json={
+            'start_date': '2025-12-01', 'end_date': '2025-12-05'
+        }).status_code == 400
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+token_budget.py - Token estimation, per-model limits and day-aware chunking
+
+Daily logs mix Chinese and English. Common BPE tokenizers (DeepSeek, Qwen,
+GPT-4o) spend roughly 0.6 tokens per CJK character and about one token per
+3.5 characters of ASCII text, so counting characters alone is off by 2-3x.
+The estimate here is deliberately a little pessimistic.
+"""
+
+import re
+import math
+from typing import Dict, List
+from config import Config
+from parser import split_day_sections
+
+# 估算系数：中文字符按 0.6 token/字，其余非空白字符按 3.5 字符/token
+CJK_TOKENS_PER_CHAR = 0.6
+ASCII_CHARS_PER_TOKEN = 3.5
+
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+_SPACE_RE = re.compile(r'\s+')
+
+# 按模型名匹配（子串，取最长匹配）；direct_input_tokens 以内直接生成，
+# 超出则分块摘要后再生成，chunk_tokens 为每个分块的大小
+DEFAULT_MODEL_LIMITS: Dict[str, Dict[str, int]] = {
+    'default': {'context_tokens': 32000, 'direct_input_tokens': 12000, 'chunk_tokens': 4000},
+    'deepseek': {'context_tokens': 64000, 'direct_input_tokens': 16000, 'chunk_tokens': 6000},
+    'qwen': {'context_tokens': 32000, 'direct_input_tokens': 12000, 'chunk_tokens': 4000},
+    'gpt-4o': {'context_tokens': 128000, 'direct_input_tokens': 24000, 'chunk_tokens': 8000},
+    'mock': {'context_tokens': 32000, 'direct_input_tokens': 12000, 'chunk_tokens': 4000},
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of mixed Chinese/English text.
+
+    Args:
+        text: Any prompt text
+
+    Returns:
+        Estimated token count (rounded up)
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(_SPACE_RE.sub('', text)) - cjk
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + other / ASCII_CHARS_PER_TOKEN)
+
+
+def get_model_limits(model: str) -> Dict[str, int]:
+    """
+    Get token limits for a model.
+
+    Args:
+        model: Model name, e.g. 'default/deepseek-v3-2'
+
+    Returns:
+        Dict with context_tokens, direct_input_tokens and chunk_tokens
+    """
+    table = dict(DEFAULT_MODEL_LIMITS)
+    for key, value in Config.LLM_MODEL_LIMITS.items():
+        table[key.lower()] = {**table.get(key.lower(), table['default']), **value}
+
+    name = (model or '').lower()
+    matches = [key for key in table if key != 'default' and key in name]
+    key = max(matches, key=len) if matches else 'default'
+    return dict(table[key])
+
+
+def _split_oversized(section: str, max_tokens: int) -> List[str]:
+    """Split one day that alone exceeds the budget, at line boundaries"""
+    pieces = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in section.split('\n'):
+        line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > max_tokens:
+            pieces.append('\n'.join(current))
+            current = []
+            current_tokens = 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        pieces.append('\n'.join(current))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Pack text into chunks of at most max_tokens, never splitting a day.
+
+    Day boundaries follow parse_date_block. Material without date lines
+    (e.g. OKR history) is split at blank-line paragraphs instead. Only a
+    single day larger than the budget is split further, by lines.
+
+    Args:
+        text: Raw daily report or material text
+        max_tokens: Token budget per chunk
+
+    Returns:
+        List of chunk texts in original order
+    """
+    sections = split_day_sections(text)
+    if len(sections) <= 1:
+        sections = [p for p in re.split(r'\n\s*\n', text) if p.strip()]
+
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for section in sections:
+        section_tokens = estimate_tokens(section)
+        if section_tokens > max_tokens:
+            if current:
+                chunks.append('\n\n'.join(current))
+                current = []
+                current_tokens = 0
+            chunks.extend(_split_oversized(section, max_tokens))
+            continue
+        if current and current_tokens + section_tokens > max_tokens:
+            chunks.append('\n\n'.join(current))
+            current = []
+            current_tokens = 0
+        current.append(section)
+        current_tokens += section_tokens
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+weekly_reports.py - Weekly reports generated from stored daily reports
+
+generate_weekly_for_range() reads the daily reports of a date range itself
+instead of taking text assembled by the browser, saves the report and
+records the fingerprint of the daily entries it was built from
+(weekly_report_state). Asking again while those entries are unchanged
+returns the saved report without an LLM call; editing, adding or deleting
+a daily report in the range marks the saved report as stale.
+"""
+
+import json
+import hashlib
+import logging
+from typing import Optional, Dict, Any, List, Iterator
+
+import database as db
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+def format_daily_reports(reports: List[Dict]) -> str:
+    """Daily reports as generator input, in the format of the generator page's import"""
+    return '\n\n'.join(
+        f"{report['entry_date'].replace('-', '')} 8h\n{report['content']}"
+        for report in reports
+    )
+
+
+def weekly_fingerprint(start_date: str, end_date: str, reports: List[Dict]) -> str:
+    """Fingerprint of the daily reports a weekly report for the range is built from"""
+    payload = json.dumps({
+        'range': [start_date, end_date],
+        'daily': sorted((r['entry_date'], r['content']) for r in reports)
+    }, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def prepare_range(start_date: str, end_date: str) -> Dict[str, Any]:
+    """
+    Read the daily reports of a range.
+
+    Returns:
+        Dict with reports, content (generator input), fingerprint, daily_dates
+    """
+    reports = db.get_daily_reports_by_range(start_date, end_date)
+    return {
+        'reports': reports,
+        'content': format_daily_reports(reports),
+        'fingerprint': weekly_fingerprint(start_date, end_date, reports),
+        'daily_dates': [r['entry_date'] for r in reports]
+    }
+
+
+def get_freshness(
+    report: Dict,
+    state: Optional[Dict] = None,
+    fingerprint: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Whether a saved weekly report still matches its daily reports.
+
+    Args:
+        report: Saved weekly report (start_date, end_date, content)
+        state: Its weekly_report_state row (loaded when omitted)
+        fingerprint: Current fingerprint of the range (computed when omitted)
+
+    Returns:
+        Dict with stale (None when the report was not generated from
+        stored daily reports), edited (changed by hand after generation),
+        daily_dates and generated_at
+    """
+    if state is None:
+        state = db.get_weekly_report_state(report['start_date'], report['end_date'])
+    if not state:
+        return {'stale': None, 'edited': False, 'daily_dates': [], 'generated_at': None}
+    if fingerprint is None:
+        fingerprint = prepare_range(report['start_date'], report['end_date'])['fingerprint']
+    return {
+        'stale': state['fingerprint'] != fingerprint,
+        'edited': state['report_hash'] != content_hash(report['content']),
+        'daily_dates': state['daily_dates'],
+        'generated_at': state['generated_at']
+    }
+
+
+def annotate_freshness(reports: List[Dict]) -> List[Dict]:
+    """Add a freshness dict (see get_freshness) to each saved weekly report"""
+    states = db.get_weekly_report_states()
+    tracked = [r for r in reports if (r['start_date'], r['end_date']) in states]
+    daily: List[Dict] = []
+    if tracked:
+        # 一次读取所有相关日期的日报，而不是每份周报查询一次
+        daily = db.get_daily_reports_by_range(
+            min(r['start_date'] for r in tracked), max(r['end_date'] for r in tracked)
+        )
+    for report in reports:
+        key = (report['start_date'], report['end_date'])
+        fingerprint = None
+        if key in states:
+            in_range = [d for d in daily if report['start_date'] <= d['entry_date'] <= report['end_date']]
+            fingerprint = weekly_fingerprint(report['start_date'], report['end_date'], in_range)
+        report['freshness'] = get_freshness(report, states.get(key, {}), fingerprint)
+    return reports
+
+
+def save_generated(start_date: str, end_date: str, report: str, prepared: Dict[str, Any]) -> None:
+    """Save a generated report and the fingerprint of its daily reports"""
+    db.save_weekly_report(start_date, end_date, report)
+    db.save_weekly_report_state(
+        start_date, end_date, prepared['fingerprint'], prepared['daily_dates'], content_hash(report)
+    )
+
+
+def _cached_report(start_date: str, end_date: str, prepared: Dict[str, Any]) -> Optional[Dict]:
+    """The saved report when it was generated from exactly these daily reports"""
+    saved = db.get_weekly_report(start_date, end_date)
+    state = db.get_weekly_report_state(start_date, end_date)
+    if saved and state and state['fingerprint'] == prepared['fingerprint']:
+        return saved
+    return None
+
+
+def generate_weekly_for_range(
+    start_date: str,
+    end_date: str,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    force: bool = False,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """
+    Generate (or return the up-to-date saved) weekly report for a date range.
+
+    Args:
+        start_date: Range start (YYYY-MM-DD)
+        end_date: Range end (YYYY-MM-DD)
+        use_mock: Whether to use mock LLM client
+        use_cache: Whether an identical earlier completion may be reused
+        force: Regenerate even if the daily reports are unchanged
+        deadline: Request time budget
+
+    Returns:
+        generate_weekly_report's result plus unchanged and daily_dates, or
+        success False with error (status 400 when the range has no daily
+        reports)
+    """
+    from generator import generate_weekly_report
+
+    prepared = prepare_range(start_date, end_date)
+    if not prepared['reports']:
+        return {'success': False, 'error': '该日期范围内没有日报', 'status': 400}
+
+    if not force:
+        saved = _cached_report(start_date, end_date, prepared)
+        if saved:
+            return {
+                'success': True,
+                'report': saved['content'],
+                'unchanged': True,
+                'daily_dates': prepared['daily_dates']
+            }
+
+    result = generate_weekly_report(
+        prepared['content'],
+        use_mock=use_mock,
+        start_date=start_date,
+        end_date=end_date,
+        use_cache=use_cache,
+        deadline=deadline
+    )
+    if result['success'] and not result.get('degraded'):
+        # 降级生成的草稿不保存，服务恢复后会重新生成
+        save_generated(start_date, end_date, result['report'], prepared)
+    result.update({'unchanged': False, 'daily_dates': prepared['daily_dates']})
+    return result
+
+
+def stream_weekly_for_range(
+    start_date: str,
+    end_date: str,
+    use_mock: bool = False,
+    use_cache: bool = True,
+    force: bool = False,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """
+    Stream generate_weekly_for_range; an unchanged saved report is sent as one delta.
+
+    Yields:
+        meta, delta..., then done (report, validation, unchanged, daily_dates) or error
+    """
+    from generator import stream_weekly_report, validate_weekly_report
+
+    prepared = prepare_range(start_date, end_date)
+    if not prepared['reports']:
+        yield {'event': 'error', 'error': '该日期范围内没有日报', 'partial': ''}
+        return
+
+    saved = None if force else _cached_report(start_date, end_date, prepared)
+    if saved:
+        yield {'event': 'meta', 'week_range': {'monday': start_date, 'friday': end_date}, 'unchanged': True}
+        yield {'event': 'delta', 'content': saved['content']}
+        yield {
+            'event': 'done',
+            'report': saved['content'],
+            'validation': validate_weekly_report(saved['content']),
+            'unchanged': True,
+            'daily_dates': prepared['daily_dates']
+        }
+        return
+
+    for event in stream_weekly_report(
+        prepared['content'], use_mock=use_mock, start_date=start_date, end_date=end_date,
+        use_cache=use_cache, deadline=deadline
+    ):
+        if event['event'] == 'done':
+            if not event.get('degraded'):
+                save_generated(start_date, end_date, event['report'], prepared)
+            event = {**event, 'unchanged': False, 'daily_dates': prepared['daily_dates']}
+        yield event
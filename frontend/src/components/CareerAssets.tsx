@@ -44,6 +44,7 @@ const CareerAssets: React.FC = () => {
   const [extracting, setExtracting] = useState<boolean>(false);
   const [extractResult, setExtractResult] = useState<ExtractionResult | null>(null);
   const [extractStep, setExtractStep] = useState<'select' | 'result'>('select');
+  const [extractProgress, setExtractProgress] = useState<{ completed: number; total: number } | null>(null);
   
   // Delete confirmation
   const [showDeleteConfirm, setShowDeleteConfirm] = useState<boolean>(false);
@@ -210,7 +211,7 @@ const CareerAssets: React.FC = () => {
           ...selectedProject,
           star_summary: response.summary
         });
-        setSuccessMessage('STAR 摘要生成成功');
+        setSuccessMessage(response.unchanged ? '工作记录未变化，沿用已有 STAR 摘要' : 'STAR 摘要生成成功');
       } else {
         setError(response.error || '生成 STAR 总结失败');
       }
@@ -267,49 +268,52 @@ const CareerAssets: React.FC = () => {
     setExtractResult(null);
     
     try {
-      // 获取选中日期的日报内容
+      // 服务端读取日报并发提取，逐天保存；已提取过的日期会被跳过
       const sortedDates = [...selectedDates].sort();
       const startDate = sortedDates[0];
       const endDate = sortedDates[sortedDates.length - 1];
       
-      const reportsResponse = await apiService.getDailyReportsByRange(startDate, endDate);
-      
-      if (!reportsResponse.success || !reportsResponse.data || reportsResponse.data.length === 0) {
-        setError('未找到选中日期的日报内容');
-        setExtracting(false);
-        return;
-      }
-      
-      // 过滤只保留选中的日期
-      const selectedReports = reportsResponse.data.filter(r => selectedDates.includes(r.entry_date));
-      
-      if (selectedReports.length === 0) {
-        setError('选中的日期没有日报内容');
-        setExtracting(false);
-        return;
-      }
-      
-      // 合并所有日报内容并提取
       let allResults: ExtractedWorkItem[] = [];
       let overallQuality: 'good' | 'partial' | 'insufficient' = 'good';
+      let skippedDone = 0;
+      let failedDates: string[] = [];
+      let streamError = '';
       
-      for (const report of selectedReports) {
-        const result = await apiService.extractWorkItems(report.content, report.entry_date, true);
-        if (result.success) {
-          allResults = [...allResults, ...result.work_items];
-          if (result.extraction_quality === 'insufficient') {
-            overallQuality = 'insufficient';
-          } else if (result.extraction_quality === 'partial' && overallQuality !== 'insufficient') {
-            overallQuality = 'partial';
+      await apiService.streamBatchExtraction(startDate, endDate, (event) => {
+        if (event.event === 'meta') {
+          skippedDone = event.data.skipped?.done?.length || 0;
+          setExtractProgress({ completed: 0, total: event.data.total });
+        } else if (event.event === 'progress') {
+          setExtractProgress({ completed: event.data.completed, total: event.data.total });
+          if (event.data.status === 'done') {
+            allResults = [...allResults, ...(event.data.work_items || [])];
+            if (event.data.extraction_quality === 'insufficient') {
+              overallQuality = 'insufficient';
+            } else if (event.data.extraction_quality === 'partial' && overallQuality !== 'insufficient') {
+              overallQuality = 'partial';
+            }
           }
+        } else if (event.event === 'done') {
+          failedDates = event.data.failed || [];
+        } else if (event.event === 'error') {
+          streamError = event.data.error || '提取工作项失败';
         }
+      }, { dates: sortedDates });
+      
+      if (streamError) {
+        setError(streamError);
+        return;
       }
       
+      const notes = [`从 ${sortedDates.length - skippedDone} 天的日报中提取`];
+      if (skippedDone > 0) notes.push(`${skippedDone} 天已提取过，已跳过`);
+      if (failedDates.length > 0) notes.push(`${failedDates.length} 天提取失败（${failedDates.join('、')}），可重新提取`);
+      
       setExtractResult({
         success: true,
         work_items: allResults,
         extraction_quality: overallQuality,
-        notes: `从 ${selectedReports.length} 天的日报中提取`
+        notes: notes.join('；')
       });
       setExtractStep('result');
       loadProjects(); // 刷新项目列表
@@ -318,6 +322,7 @@ const CareerAssets: React.FC = () => {
       setError('提取工作项失败');
     } finally {
       setExtracting(false);
+      setExtractProgress(null);
     }
   };
 
@@ -1085,7 +1090,9 @@ const CareerAssets: React.FC = () => {
                     onClick={handleExtract}
                     disabled={extracting || selectedDates.length === 0}
                   >
-                    {extracting ? '提取中...' : `提取 ${selectedDates.length} 天的工作项`}
+                    {extracting
+                      ? (extractProgress ? `提取中 ${extractProgress.completed}/${extractProgress.total}...` : '提取中...')
+                      : `提取 ${selectedDates.length} 天的工作项`}
                   </button>
                 </>
               )}
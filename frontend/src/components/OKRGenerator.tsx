@@ -58,10 +58,57 @@ const OKRGenerator: React.FC = () => {
     setSaveMessage(null);
 
     try {
-      const response = await apiService.generateOKR(content, nextQuarter);
-      setResult(response);
-      if (!response.success) {
-        setError(response.error || '生成失败');
+      // Stream tokens so the OKR appears while it is being generated
+      let streamed = '';
+      await apiService.streamOKR(
+        content,
+        ({ event, data }) => {
+          if (event === 'delta') {
+            streamed += data.content;
+            setResult({ success: true, okr: streamed });
+          } else if (event === 'done') {
+            setResult({ success: true, okr: data.okr, validation: data.validation });
+          } else if (event === 'error') {
+            setResult({ success: false, error: data.error, okr: data.partial || streamed || undefined });
+            setError(data.error || '生成失败');
+          }
+        },
+        nextQuarter
+      );
+    } catch (err) {
+      setError('网络错误，请检查后端服务是否启动');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // '2026第一季度' -> '2025-Q4': the quarter whose records feed the target quarter
+  const previousQuarter = (label: string): string | null => {
+    const match = label.match(/^(\d{4})第(一|二|三|四)季度$/);
+    if (!match) return null;
+    const year = Number(match[1]);
+    const q = '一二三四'.indexOf(match[2]) + 1;
+    return q === 1 ? `${year - 1}-Q4` : `${year}-Q${q - 1}`;
+  };
+
+  const handleGenerateFromRecords = async () => {
+    const quarter = previousQuarter(nextQuarter);
+    if (!quarter) {
+      setError('无法识别目标季度');
+      return;
+    }
+
+    setLoading(true);
+    setError('');
+    setResult(null);
+    setSaveMessage(null);
+
+    try {
+      // Built from stored weekly reports and work items; the textarea is extra material
+      const data = await apiService.generateQuarterOKR(quarter, nextQuarter, content);
+      setResult(data);
+      if (!data.success) {
+        setError(data.error || '生成失败');
       }
     } catch (err) {
       setError('网络错误，请检查后端服务是否启动');
@@ -275,7 +322,7 @@ const OKRGenerator: React.FC = () => {
               rows={12}
             />
             <div className="char-count">
-              {content.length} / 20000 字符
+              {content.length} 字符{content.length > 20000 ? '（超过 20000 字符，将先分段摘要再生成）' : ''}
             </div>
           </div>
 
@@ -286,6 +333,14 @@ const OKRGenerator: React.FC = () => {
           >
             {loading ? '生成中...' : '生成 OKR'}
           </button>
+          <button 
+            className="generate-btn"
+            onClick={handleGenerateFromRecords}
+            disabled={loading}
+            title="使用上一季度已保存的周报、日报和工作记录，逐级总结后生成；输入框内容作为补充材料"
+          >
+            按上季度记录生成
+          </button>
 
           {error && (
             <div className="error-message">
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import apiService from '../services/api';
+import apiService, { LLMTask, LLMTier } from '../services/api';
 import './Settings.css';
 
 interface LLMConfig {
@@ -8,6 +8,23 @@ interface LLMConfig {
   model: string;
 }
 
+const TASK_LABELS: Record<LLMTask, string> = {
+  weekly_report: '周报生成',
+  okr: 'OKR 生成',
+  extraction: '工作项提取',
+  star: 'STAR 总结',
+  skill_categorization: '技能分类',
+  summarize: '长文分段摘要'
+};
+
+const formatLatency = (tier: LLMTier): string => {
+  if (!tier.latency || tier.latency.p50_ms === null) {
+    return '近 7 天无调用';
+  }
+  const seconds = (ms: number | null) => (ms === null ? '-' : `${(ms / 1000).toFixed(1)}s`);
+  return `近 7 天 ${tier.latency.calls} 次 · p50 ${seconds(tier.latency.p50_ms)} · p95 ${seconds(tier.latency.p95_ms)}`;
+};
+
 interface SettingsProps {
   onLLMConfigured?: () => void;
 }
@@ -24,10 +41,13 @@ const Settings: React.FC<SettingsProps> = ({ onLLMConfigured }) => {
   const [showApiKey, setShowApiKey] = useState<boolean>(false);
   const [testing, setTesting] = useState<boolean>(false);
   const [testResult, setTestResult] = useState<{ success: boolean; message: string } | null>(null);
+  const [tiers, setTiers] = useState<Record<LLMTask, LLMTier> | null>(null);
+  const [savingTiers, setSavingTiers] = useState<boolean>(false);
 
   // Load current config on mount
   useEffect(() => {
     loadConfig();
+    loadTiers();
   }, []);
 
   // Auto-hide message after 3 seconds
@@ -57,6 +77,46 @@ const Settings: React.FC<SettingsProps> = ({ onLLMConfigured }) => {
     }
   };
 
+  const loadTiers = async () => {
+    try {
+      const response = await apiService.getLLMTiers();
+      if (response.success && response.data) {
+        setTiers(response.data.tiers);
+      }
+    } catch (error) {
+      console.error('Failed to load model tiers:', error);
+    }
+  };
+
+  const updateTier = (task: LLMTask, field: 'api_url' | 'api_key' | 'model', value: string) => {
+    if (!tiers) return;
+    setTiers({ ...tiers, [task]: { ...tiers[task], [field]: value } });
+  };
+
+  const handleSaveTiers = async () => {
+    if (!tiers) return;
+    setSavingTiers(true);
+    setMessage(null);
+    try {
+      const payload: Record<string, { api_url: string; api_key: string; model: string }> = {};
+      (Object.keys(tiers) as LLMTask[]).forEach((task) => {
+        const { api_url, api_key, model } = tiers[task];
+        payload[task] = { api_url, api_key, model };
+      });
+      const response = await apiService.saveLLMTiers(payload);
+      if (response.success) {
+        setMessage({ type: 'success', text: '任务模型配置保存成功！' });
+        loadTiers();
+      } else {
+        setMessage({ type: 'error', text: response.error || '保存失败' });
+      }
+    } catch (error) {
+      setMessage({ type: 'error', text: '保存失败，请检查网络连接' });
+    } finally {
+      setSavingTiers(false);
+    }
+  };
+
   const handleSave = async () => {
     if (!config.api_url.trim()) {
       setMessage({ type: 'error', text: '请填写 API URL' });
@@ -239,6 +299,59 @@ const Settings: React.FC<SettingsProps> = ({ onLLMConfigured }) => {
         </div>
       </div>
 
+      {tiers && (
+        <div className="settings-card">
+          <div className="settings-card-header">
+            <h3>🧭 按任务选择模型</h3>
+            <span className="settings-hint">留空则使用上方的默认配置</span>
+          </div>
+
+          <div className="settings-form">
+            {(Object.keys(TASK_LABELS) as LLMTask[]).filter((task) => tiers[task]).map((task) => (
+              <div className="tier-row" key={task}>
+                <div className="tier-row-header">
+                  <label htmlFor={`tier-${task}-model`}>{TASK_LABELS[task]}</label>
+                  <span className="form-hint">
+                    当前模型 {tiers[task].effective_model} · {formatLatency(tiers[task])}
+                  </span>
+                </div>
+                <div className="tier-row-fields">
+                  <input
+                    id={`tier-${task}-model`}
+                    type="text"
+                    value={tiers[task].model}
+                    onChange={(e) => updateTier(task, 'model', e.target.value)}
+                    placeholder="模型名称"
+                  />
+                  <input
+                    type="text"
+                    value={tiers[task].api_url}
+                    onChange={(e) => updateTier(task, 'api_url', e.target.value)}
+                    placeholder="API URL（可选）"
+                  />
+                  <input
+                    type="password"
+                    value={tiers[task].api_key}
+                    onChange={(e) => updateTier(task, 'api_key', e.target.value)}
+                    placeholder="API Key（可选）"
+                  />
+                </div>
+              </div>
+            ))}
+          </div>
+
+          <div className="settings-actions">
+            <button
+              className="btn btn-primary"
+              onClick={handleSaveTiers}
+              disabled={savingTiers}
+            >
+              {savingTiers ? '保存中...' : '💾 保存任务模型'}
+            </button>
+          </div>
+        </div>
+      )}
+
       <div className="settings-info">
         <h4>📝 配置说明</h4>
         <ul>
@@ -251,6 +364,9 @@ const Settings: React.FC<SettingsProps> = ({ onLLMConfigured }) => {
           <li>
             <strong>模型名称：</strong>指定要使用的模型，如 gpt-4、deepseek-v3 等。
           </li>
+          <li>
+            <strong>按任务选择模型：</strong>工作项提取、技能分类等高频任务可以使用更快更便宜的模型，延迟统计用于对比效果。
+          </li>
         </ul>
         <p className="settings-warning">
           ⚠️ 注意：API Key 是敏感信息，请确保不要泄露给他人。
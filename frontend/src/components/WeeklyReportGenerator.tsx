@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useCallback } from 'react';
-import apiService, { WeeklyReportResponse, ValidationResult, DailyReport, WeekRange } from '../services/api';
+import apiService, { WeeklyReportResponse, ValidationResult, DailyReport, WeekRange, StreamEventHandler } from '../services/api';
 import './WeeklyReportGenerator.css';
 
 const WeeklyReportGenerator: React.FC = () => {
@@ -16,6 +16,9 @@ const WeeklyReportGenerator: React.FC = () => {
   // Store the actual imported date range for report generation
   const [importedStartDate, setImportedStartDate] = useState<string>('');
   const [importedEndDate, setImportedEndDate] = useState<string>('');
+  // Text imported from every daily report of the range; while unedited, generation reads them server-side
+  const [importedRangeContent, setImportedRangeContent] = useState<string>('');
+  const [unchanged, setUnchanged] = useState<boolean>(false);
   const [availableDates, setAvailableDates] = useState<string[]>([]);
   const [selectedDates, setSelectedDates] = useState<string[]>([]);
   const [dailyReportsMap, setDailyReportsMap] = useState<Record<string, DailyReport>>({});
@@ -37,11 +40,26 @@ const WeeklyReportGenerator: React.FC = () => {
     try {
       const range = await apiService.getWeekRange();
       setWeekRange(range);
+      loadPregeneratedDraft(range);
     } catch (err) {
       console.error('Failed to load week range:', err);
     }
   };
 
+  // Show this week's draft if it was pre-generated from the current daily reports
+  const loadPregeneratedDraft = async (range: WeekRange) => {
+    try {
+      const response = await apiService.getWeeklyReportByDate(range.monday, range.friday);
+      const report = response.data;
+      if (response.success && report && report.freshness?.stale === false && !report.freshness.edited) {
+        setResult(prev => prev || { success: true, report: report.content });
+        setSaveMessage(prev => prev || { type: 'success', text: '已根据本周日报预生成周报草稿' });
+      }
+    } catch (err) {
+      console.error('Failed to load pre-generated weekly report:', err);
+    }
+  };
+
   const loadAvailableDates = async () => {
     try {
       const response = await apiService.getDailyReportDates();
@@ -116,6 +134,8 @@ const WeeklyReportGenerator: React.FC = () => {
     // Store the imported date range for report generation
     setImportedStartDate(modalStartDate);
     setImportedEndDate(modalEndDate);
+    const wholeRange = sortedDates.length === Object.keys(dailyReportsMap).length;
+    setImportedRangeContent(wholeRange ? importedContent : '');
     
     setDailyContent(importedContent);
     setShowDailyModal(false);
@@ -145,7 +165,7 @@ const WeeklyReportGenerator: React.FC = () => {
     return `${date.getMonth() + 1}月${date.getDate()}日 ${weekdays[date.getDay()]}`;
   };
 
-  const handleGenerate = async () => {
+  const handleGenerate = async (force: boolean = false) => {
     if (!dailyContent.trim()) {
       setError('请输入日报内容');
       return;
@@ -155,21 +175,42 @@ const WeeklyReportGenerator: React.FC = () => {
     setError('');
     setResult(null);
     setSaveMessage(null);
+    setUnchanged(false);
 
     try {
       // Use imported date range if available, otherwise use current week range
       const startDate = importedStartDate || weekRange?.monday;
       const endDate = importedEndDate || weekRange?.friday;
       
-      const response = await apiService.generateWeeklyReport(
-        dailyContent, 
-        false, 
-        startDate, 
-        endDate
-      );
-      setResult(response);
-      if (!response.success) {
-        setError(response.error || '生成失败');
+      // Stream tokens so the report appears while it is being generated
+      let streamed = '';
+      const onEvent: StreamEventHandler = ({ event, data }) => {
+        if (event === 'meta') {
+          setResult({ success: true, report: '', parsed_data: data.parsed_data });
+        } else if (event === 'delta') {
+          streamed += data.content;
+          setResult(prev => ({ ...(prev || { success: true }), report: streamed }));
+        } else if (event === 'done') {
+          setResult(prev => ({ ...(prev || { success: true }), report: data.report, validation: data.validation, degraded: data.degraded }));
+          if (data.degraded) {
+            setSaveMessage({ type: 'error', text: 'LLM 服务暂不可用，已按关键词生成草稿，请人工完善' });
+          } else if (data.unchanged) {
+            setUnchanged(true);
+            setSaveMessage({ type: 'success', text: '日报未变化，已显示保存的周报' });
+          } else if (data.daily_dates) {
+            setSaveMessage({ type: 'success', text: '周报已生成并保存' });
+          }
+        } else if (event === 'error') {
+          setResult({ success: false, error: data.error, report: data.partial || streamed || undefined });
+          setError(data.error || '生成失败');
+        }
+      };
+
+      if (importedStartDate && importedEndDate && importedRangeContent && dailyContent === importedRangeContent) {
+        // Unedited import of the whole range: the backend reads the daily reports and reuses an up-to-date report
+        await apiService.streamWeeklyReportRange(importedStartDate, importedEndDate, onEvent, force);
+      } else {
+        await apiService.streamWeeklyReport(dailyContent, onEvent, startDate, endDate);
       }
     } catch (err) {
       setError('网络错误，请检查后端服务是否启动');
@@ -335,17 +376,22 @@ const WeeklyReportGenerator: React.FC = () => {
           rows={12}
         />
         <div className="char-count">
-          {dailyContent.length} / 20000 字符
+          {dailyContent.length} 字符{dailyContent.length > 20000 ? '（超过 20000 字符，将先分段摘要再生成）' : ''}
         </div>
       </div>
 
       <button 
         className="generate-btn"
-        onClick={handleGenerate}
+        onClick={() => handleGenerate()}
         disabled={loading}
       >
         {loading ? '生成中...' : '生成周报'}
       </button>
+      {unchanged && !loading && (
+        <button className="sample-btn" onClick={() => handleGenerate(true)}>
+          重新生成
+        </button>
+      )}
 
       {error && (
         <div className="error-message">
@@ -228,6 +228,9 @@ const WeeklyReportQuery: React.FC = () => {
                 <tr key={`${report.start_date}-${report.end_date}`}>
                   <td className="date-cell">
                     {formatDateRange(report.start_date, report.end_date)}
+                    {report.freshness?.stale && (
+                      <span className="stale-badge" title="生成后相关日报有修改，可在周报生成页重新生成">日报已更新</span>
+                    )}
                   </td>
                   <td className="preview-cell" title={report.content.substring(0, 200)}>
                     {getPreview(report.content)}
@@ -39,6 +39,7 @@ export interface WeeklyReportResponse {
   parsed_data?: ParsedData;
   validation?: ValidationResult;
   error?: string;
+  degraded?: boolean;
 }
 
 export interface OKRResponse {
@@ -48,10 +49,29 @@ export interface OKRResponse {
   error?: string;
 }
 
+export interface QuarterOKRResponse extends OKRResponse {
+  quarter?: string;
+  next_quarter?: string;
+  quarter_summary?: string;
+  months_cached?: number;
+  quarter_cached?: boolean;
+}
+
 export interface HealthResponse {
   status: string;
   llm_configured: boolean;
   max_input_chars: number;
+  max_total_input_chars?: number;
+  llm_circuit?: {
+    enabled: boolean;
+    state: 'closed' | 'open' | 'degraded';
+    providers: Array<{
+      name: string;
+      state: 'closed' | 'open' | 'half_open';
+      consecutive_failures: number;
+      retry_in_sec: number;
+    }>;
+  };
 }
 
 // Database record interfaces
@@ -62,12 +82,20 @@ export interface DailyReport {
   updated_at?: string;
 }
 
+export interface WeeklyReportFreshness {
+  stale: boolean | null;  // null: not generated from stored daily reports
+  edited: boolean;
+  daily_dates: string[];
+  generated_at: string | null;
+}
+
 export interface WeeklyReport {
   start_date: string;
   end_date: string;
   content: string;
   created_at?: string;
   updated_at?: string;
+  freshness?: WeeklyReportFreshness;
 }
 
 export interface OKRReport {
@@ -86,6 +114,13 @@ export interface TodoItem {
   updated_at?: string;
 }
 
+export interface StreamEvent {
+  event: 'meta' | 'reduced' | 'delta' | 'progress' | 'item' | 'done' | 'error';
+  data: any;
+}
+
+export type StreamEventHandler = (event: StreamEvent) => void;
+
 export interface ApiResponse<T> {
   success: boolean;
   data?: T;
@@ -158,6 +193,146 @@ class ApiService {
     return response.json();
   }
 
+  // Generate next quarter's OKR from a quarter's stored weekly reports and work items
+  async generateQuarterOKR(quarter: string, nextQuarter: string, content: string = ''): Promise<QuarterOKRResponse> {
+    const response = await fetch(`${this.baseUrl}/api/generate/okr/quarter`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        quarter,
+        next_quarter: nextQuarter,
+        content,
+      }),
+    });
+    return response.json();
+  }
+
+  // Read a text/event-stream response and dispatch each event
+  private async readEventStream(response: Response, onEvent: StreamEventHandler): Promise<void> {
+    if (!response.ok || !response.body) {
+      const body = await response.json().catch(() => ({}));
+      onEvent({ event: 'error', data: { error: body.error || `HTTP ${response.status}` } });
+      return;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let eventName = 'message';
+        let data = '';
+        for (const line of block.split('\n')) {
+          if (line.startsWith('event: ')) eventName = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (data) {
+          onEvent({ event: eventName as StreamEvent['event'], data: JSON.parse(data) });
+        }
+        boundary = buffer.indexOf('\n\n');
+      }
+    }
+  }
+
+  async streamWeeklyReport(
+    content: string,
+    onEvent: StreamEventHandler,
+    startDate?: string,
+    endDate?: string,
+    signal?: AbortSignal
+  ): Promise<void> {
+    const requestBody: any = { content };
+    if (startDate && endDate) {
+      requestBody.start_date = startDate;
+      requestBody.end_date = endDate;
+    }
+
+    const response = await fetch(`${this.baseUrl}/api/generate/weekly-report/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify(requestBody),
+      signal,
+    });
+    await this.readEventStream(response, onEvent);
+  }
+
+  // Generate from the stored daily reports of a range; an unchanged saved report comes back at once
+  async streamWeeklyReportRange(
+    startDate: string,
+    endDate: string,
+    onEvent: StreamEventHandler,
+    force: boolean = false,
+    signal?: AbortSignal
+  ): Promise<void> {
+    const response = await fetch(`${this.baseUrl}/api/generate/weekly-report/range/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        start_date: startDate,
+        end_date: endDate,
+        force,
+      }),
+      signal,
+    });
+    await this.readEventStream(response, onEvent);
+  }
+
+  async streamOKR(
+    content: string,
+    onEvent: StreamEventHandler,
+    nextQuarter: string = '2026第一季度',
+    signal?: AbortSignal
+  ): Promise<void> {
+    const response = await fetch(`${this.baseUrl}/api/generate/okr/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        content,
+        next_quarter: nextQuarter,
+      }),
+      signal,
+    });
+    await this.readEventStream(response, onEvent);
+  }
+
+  async streamProjectStar(projectId: number, onEvent: StreamEventHandler, signal?: AbortSignal): Promise<void> {
+    const response = await fetch(`${this.baseUrl}/api/projects/${projectId}/star/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({}),
+      signal,
+    });
+    await this.readEventStream(response, onEvent);
+  }
+
+  async getGenerationDraft(
+    kind: 'weekly_report' | 'okr' | 'star',
+    scope: string
+  ): Promise<ApiResponse<{ kind: string; scope: string; content: string; status: 'partial' | 'complete'; updated_at?: string } | null>> {
+    const response = await fetch(
+      `${this.baseUrl}/api/generation-drafts?kind=${kind}&scope=${encodeURIComponent(scope)}`
+    );
+    return response.json();
+  }
+
   async parseContent(content: string): Promise<{ success: boolean; data?: ParsedData; error?: string }> {
     const response = await fetch(`${this.baseUrl}/api/parse`, {
       method: 'POST',
@@ -398,9 +573,24 @@ class ApiService {
     return response.json();
   }
 
-  async generateProjectStar(projectId: number): Promise<{ success: boolean; summary?: string; error?: string }> {
+  async generateProjectStar(
+    projectId: number,
+    force = false
+  ): Promise<{ success: boolean; summary?: string; unchanged?: boolean; error?: string }> {
     const response = await fetch(`${this.baseUrl}/api/projects/${projectId}/star`, {
       method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ force }),
+    });
+    return response.json();
+  }
+
+  // 后台重新生成所有过期的 STAR 摘要，返回任务（用 waitForJob 轮询）
+  async refreshAllProjectStars(force = false): Promise<ApiResponse<Job>> {
+    const response = await fetch(`${this.baseUrl}/api/projects/star/refresh-all`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ force }),
     });
     return response.json();
   }
@@ -498,6 +688,109 @@ class ApiService {
     return response.json();
   }
 
+  // Extract one daily log; each work item arrives as an 'item' event as soon as it is complete.
+  async streamExtractWorkItems(
+    logContent: string,
+    logDate: string,
+    onEvent: StreamEventHandler,
+    autoSave: boolean = false,
+    signal?: AbortSignal
+  ): Promise<void> {
+    const response = await fetch(`${this.baseUrl}/api/extract-work-items/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        log_content: logContent,
+        log_date: logDate,
+        auto_save: autoSave,
+      }),
+      signal,
+    });
+    await this.readEventStream(response, onEvent);
+  }
+
+  // Extract every daily log in a range server-side; progress arrives per day.
+  // The batch keeps running if the stream is aborted; re-run to retry failed days.
+  async streamBatchExtraction(
+    startDate: string,
+    endDate: string,
+    onEvent: StreamEventHandler,
+    options: { dates?: string[]; force?: boolean } = {},
+    signal?: AbortSignal
+  ): Promise<void> {
+    const response = await fetch(`${this.baseUrl}/api/extract-work-items/batch`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        start_date: startDate,
+        end_date: endDate,
+        dates: options.dates,
+        force: options.force || false,
+      }),
+      signal,
+    });
+    await this.readEventStream(response, onEvent);
+  }
+
+  async getBatchExtractionStatus(startDate: string, endDate: string): Promise<ApiResponse<BatchExtractionStatus>> {
+    const response = await fetch(
+      `${this.baseUrl}/api/extract-work-items/status?start_date=${startDate}&end_date=${endDate}`
+    );
+    return response.json();
+  }
+
+  // --- Background Jobs API ---
+
+  async submitJob(kind: JobKind, params: Record<string, any> = {}, dedupKey?: string): Promise<ApiResponse<Job>> {
+    const response = await fetch(`${this.baseUrl}/api/jobs`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ kind, params, dedup_key: dedupKey }),
+    });
+    return response.json();
+  }
+
+  async getJob(jobId: string): Promise<ApiResponse<Job>> {
+    const response = await fetch(`${this.baseUrl}/api/jobs/${jobId}`);
+    return response.json();
+  }
+
+  async listJobs(status?: JobStatus, kind?: JobKind): Promise<ApiResponse<Job[]>> {
+    const params = new URLSearchParams();
+    if (status) params.set('status', status);
+    if (kind) params.set('kind', kind);
+    const response = await fetch(`${this.baseUrl}/api/jobs?${params.toString()}`);
+    return response.json();
+  }
+
+  async cancelJob(jobId: string): Promise<ApiResponse<Job>> {
+    const response = await fetch(`${this.baseUrl}/api/jobs/${jobId}/cancel`, { method: 'POST' });
+    return response.json();
+  }
+
+  // Poll a job until it finishes; onUpdate sees every intermediate state
+  async waitForJob(
+    jobId: string,
+    onUpdate?: (job: Job) => void,
+    intervalMs: number = 1500,
+    signal?: AbortSignal
+  ): Promise<Job> {
+    while (true) {
+      const response = await this.getJob(jobId);
+      if (!response.success || !response.data) {
+        throw new Error(response.error || '任务不存在');
+      }
+      onUpdate?.(response.data);
+      if (['done', 'failed', 'cancelled'].includes(response.data.status)) {
+        return response.data;
+      }
+      if (signal?.aborted) {
+        throw new DOMException('Aborted', 'AbortError');
+      }
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+  }
+
   // --- Skills API ---
 
   async getSkills(): Promise<ApiResponse<Skill[]>> {
@@ -522,9 +815,19 @@ class ApiService {
     return response.json();
   }
 
-  async recategorizeSkillsWithLLM(): Promise<{ success: boolean; message: string; updated_count?: number; details?: any[] }> {
+  async recategorizeSkillsWithLLM(force = false): Promise<{
+    success: boolean;
+    message: string;
+    updated_count?: number;
+    llm_count?: number;
+    cached_count?: number;
+    unresolved?: string[];
+    details?: any[];
+  }> {
     const response = await fetch(`${this.baseUrl}/api/skills/recategorize-llm`, {
       method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ force }),
     });
     return response.json();
   }
@@ -555,6 +858,20 @@ class ApiService {
     });
     return response.json();
   }
+
+  async getLLMTiers(): Promise<ApiResponse<LLMTiersResponse>> {
+    const response = await fetch(`${this.baseUrl}/api/config/llm/tiers`);
+    return response.json();
+  }
+
+  async saveLLMTiers(tiers: Record<string, Partial<LLMConfig>>): Promise<ApiResponse<null>> {
+    const response = await fetch(`${this.baseUrl}/api/config/llm/tiers`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ tiers }),
+    });
+    return response.json();
+  }
 }
 
 // New interfaces for Career Asset Management
@@ -626,6 +943,36 @@ export interface ExtractionResult {
   saved_items?: WorkItem[];
 }
 
+export interface BatchExtractionStatus {
+  days: {
+    log_date: string;
+    status: 'pending' | 'running' | 'done' | 'failed' | 'interrupted';
+    items_count: number;
+    error?: string;
+  }[];
+  counts: Record<string, number>;
+}
+
+export type JobKind = 'weekly_report' | 'okr' | 'star' | 'star_refresh_all' | 'extract_batch' | 'skill_recategorize';
+export type JobStatus = 'queued' | 'running' | 'done' | 'failed' | 'cancelled';
+
+export interface Job {
+  id: string;
+  kind: JobKind;
+  status: JobStatus;
+  params: Record<string, any>;
+  progress?: Record<string, any>;
+  checkpoint?: Record<string, any>;
+  result?: any;
+  error?: string;
+  attempts: number;
+  cancel_requested: boolean;
+  deduplicated?: boolean;
+  created_at: number;
+  started_at?: number;
+  finished_at?: number;
+}
+
 // LLM Configuration
 export interface LLMConfig {
   api_url: string;
@@ -633,5 +980,17 @@ export interface LLMConfig {
   model: string;
 }
 
+export type LLMTask = 'weekly_report' | 'okr' | 'extraction' | 'star' | 'skill_categorization' | 'summarize';
+
+export interface LLMTier extends LLMConfig {
+  effective_model: string;
+  latency: { calls: number; p50_ms: number | null; p95_ms: number | null } | null;
+}
+
+export interface LLMTiersResponse {
+  default_model: string;
+  tiers: Record<LLMTask, LLMTier>;
+}
+
 export const apiService = new ApiService();
 export default apiService;